@@ -0,0 +1,107 @@
+import argparse, asyncio, json, os, secrets, sys, threading, time
+
+# Load test of the api server, run from the root directory of the project: python -m benchmarks.api_load
+# The server is started with a headless QApplication (offscreen) and a Pomodoro widget like in the program,
+# requests are sent from a client thread while the gaps between the ticks of a 10 ms QTimer measure how long the Qt event loop was stalled
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtCore import QTimer, QElapsedTimer
+from PySide6.QtWidgets import QApplication
+
+app = QApplication([])
+
+import src.pomodoro as pmdr
+import src.api as api
+
+TOKEN = secrets.token_urlsafe(32) # Token of the server started by the load test, the token file of the program is not used
+
+# Mix of the requests sent by each client connection, (method, path, body)
+REQUESTS = [("GET", "/sections", None), ("GET", "/timer", None), ("GET", "/analytics?days=7", None), ("GET", "/stats", None)]
+
+def percentile(values: list, p: float) -> float:
+    '''Return the p-th percentile of the sorted values'''
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+async def client(port: int, num_requests: int, requests: list, latencies: list, errors: list):
+    # One keep-alive connection sending the requests one after another
+    reader, writer = await asyncio.open_connection(api.HOST, port)
+    for i in range(num_requests):
+        method, path, body = requests[i % len(requests)]
+        data = json.dumps(body).encode() if body is not None else b""
+        start = time.perf_counter()
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: {api.HOST}:{port}\r\nAuthorization: Bearer {TOKEN}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            key, value = line.decode().split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+        await reader.readexactly(int(headers["content-length"]))
+        latencies.append((time.perf_counter() - start) * 1000)
+        if status >= 400:
+            errors.append(f"{method} {path}: {status}")
+    writer.close()
+    await writer.wait_closed()
+
+def run_clients(port: int, connections: int, num_requests: int, requests: list, result: dict):
+    # Runs in the client thread
+    latencies, errors = [], []
+    start = time.perf_counter()
+    async def run_all():
+        await asyncio.gather(*[client(port, num_requests, requests, latencies, errors) for _ in range(connections)])
+    asyncio.run(run_all())
+    result.update(elapsed=time.perf_counter() - start, latencies=sorted(latencies), errors=errors)
+    app.quit()
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="Load test of the tododoro api server")
+    parser.add_argument("-c", "--connections", type=int, default=8, help="Number of keep-alive connections (default: 8)")
+    parser.add_argument("-n", "--requests", type=int, default=500, help="Number of requests sent by each connection (default: 500)")
+    parser.add_argument("-p", "--port", type=int, default=8766, help="Port of the api server (default: 8766)")
+    parser.add_argument("--pool-size", type=int, default=4, help="Number of database connections of the server (default: 4)")
+    parser.add_argument("-j", "--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    pomo = pmdr.Pomodoro()
+    server = api.ApiServer(pomo, args.port, args.pool_size, TOKEN)
+    server.start()
+
+    # Ticks of the QTimer are delayed if the event loop is blocked, the largest gap is the longest stall
+    gaps = []
+    clock = QElapsedTimer()
+    clock.start()
+    def tick():
+        gaps.append(clock.restart())
+    ticker = QTimer()
+    ticker.timeout.connect(tick)
+    ticker.start(10)
+
+    result = {}
+    threading.Thread(target=run_clients, args=(args.port, args.connections, args.requests, REQUESTS, result), daemon=True).start()
+    app.exec()
+    ticker.stop()
+    server.stop()
+
+    latencies = result["latencies"]
+    report = {"connections": args.connections, "requests": len(latencies), "errors": len(result["errors"]),
+              "requests_per_second": round(len(latencies) / result["elapsed"], 1),
+              "latency_ms": {"p50": round(percentile(latencies, 50), 3), "p95": round(percentile(latencies, 95), 3),
+                             "p99": round(percentile(latencies, 99), 3), "max": round(latencies[-1], 3) if latencies else 0.0},
+              "qt_event_loop": {"ticks": len(gaps), "max_gap_ms": max(gaps, default=0)},
+              "server_stats": {route: {"count": count, "avg_ms": round(total / count, 3), "max_ms": round(max_ms, 3)}
+                               for route, (count, total, max_ms) in server.stats.items()}}
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print(f"{report["requests"]} requests over {args.connections} connections in {result["elapsed"]:.2f} s ({report["requests_per_second"]} req/s), {report["errors"]} errors")
+        print("Latency (ms): " + ", ".join(f"{k} {v}" for k, v in report["latency_ms"].items()))
+        print(f"Qt event loop: {report["qt_event_loop"]["ticks"]} ticks of 10 ms, longest gap {report["qt_event_loop"]["max_gap_ms"]} ms")
+    for error in result["errors"][:10]:
+        print(error, file=sys.stderr)
+    return 1 if result["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,134 @@
+import argparse, json, os, statistics, subprocess, sys, time
+
+# Comparison of the chart backends of the analyse tab (native and matplotlib), run from the root directory of the project:
+#   python -m benchmarks.charts --repeat 20
+# Each backend is measured in a new process (headless QApplication, offscreen) so the start up time and memory include the imports:
+# - start up: importing the charts, creating the line chart and the calendar heatmap and drawing them once
+# - memory: resident memory added by the start up, and by each line chart after the first
+# - redraw: time the GUI thread is blocked by plot_line and the time until the chart shows the new points (drawn in the render thread for matplotlib)
+# NOTE: the charts are plotted with synthetic data, the database is not used
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKENDS = ("native", "matplotlib")
+SIZES = (20, 400) # Number of points of the redraws, the default view and the most points read after zooming out (MAX_POINTS)
+EXTRA_CHARTS = 10
+
+def get_points(size: int, i: int) -> tuple:
+    # (x, values, value_labels, ticks) of the last size days, the values change with i so every plot is drawn
+    import numpy as np
+    from src.analyse_charts import date_to_x
+    dates = np.arange(np.datetime64("2026-01-01") - size, np.datetime64("2026-01-01"))
+    values = (np.arange(size) * 37 + i * 11) % 240
+    x = date_to_x(dates)
+    labels = [f"{value} mins" for value in values] if size <= 31 else []
+    step = -(-size // 20)
+    return x, values, labels, (x[::step], [str(date) for date in dates[::step]])
+
+def summarise(times: list) -> dict:
+    return {"median_ms": statistics.median(times) * 1000, "max_ms": max(times) * 1000}
+
+def run_backend(backend: str, repeat: int) -> dict:
+    '''Measure the backend in this process, the backend is read from TODODORO_CHARTS when src.analyse_charts is imported'''
+    from PySide6.QtWidgets import QApplication
+    app = QApplication([])
+    import numpy as np
+    import src.overhead # Imported by every backend (config and logging)
+    from src.memory import get_rss_mb
+
+    # Start up: imports, the two charts and the first draw
+    rss = get_rss_mb()
+    start = time.perf_counter()
+    import src.analyse_charts as analyse_charts
+    chart, heatmap = analyse_charts.create_line_chart(), analyse_charts.create_heatmap()
+    x, values, labels, ticks = get_points(SIZES[0], 0)
+    chart.plot_line(x, values, labels, "Day", "Minutes", ticks, (x[0] - 0.5, x[-1] + 0.5))
+    heatmap.plot_calendar(np.arange(7 * 53, dtype=float).reshape(7, 53) % 9, (0.5, 8), ([0, 4], ["Jan", "Feb"]))
+    for widget, size in ((chart, (1000, 600)), (heatmap, (1000, 160))):
+        widget.resize(*size)
+        widget.show()
+    app.processEvents()
+    drawn = chart.wait_drawn() and heatmap.wait_drawn()
+    startup = time.perf_counter() - start
+    startup_rss = get_rss_mb()
+
+    # Memory of each chart after the first (figures, canvases and images of matplotlib)
+    charts = []
+    for i in range(EXTRA_CHARTS):
+        charts.append(analyse_charts.create_line_chart())
+        charts[-1].plot_line(x, values, labels, "Day", "Minutes", ticks, (x[0] - 0.5, x[-1] + 0.5))
+        charts[-1].resize(1000, 600)
+        charts[-1].show()
+        app.processEvents()
+        drawn = charts[-1].wait_drawn() and drawn
+    charts_rss = get_rss_mb()
+    for extra in charts:
+        extra.close()
+    app.processEvents()
+
+    # Redraw of new points, the GUI thread is blocked until plot_line and the events are done
+    redraws = {}
+    for size in SIZES:
+        blocked, shown = [], []
+        for i in range(1, repeat + 1):
+            x, values, labels, ticks = get_points(size, i)
+            start = time.perf_counter()
+            chart.plot_line(x, values, labels, "Day", "Minutes", ticks, (x[0] - 0.5, x[-1] + 0.5))
+            app.processEvents()
+            blocked.append(time.perf_counter() - start)
+            drawn = chart.wait_drawn() and drawn
+            shown.append(time.perf_counter() - start)
+        redraws[f"line({size})"] = {"blocked": summarise(blocked), "shown": summarise(shown)}
+    blocked, shown = [], []
+    for i in range(1, repeat + 1):
+        start = time.perf_counter()
+        heatmap.plot_calendar((np.arange(7 * 53, dtype=float).reshape(7, 53) + i) % 9, (0.5, 8), ([0, 4], ["Jan", "Feb"]))
+        app.processEvents()
+        blocked.append(time.perf_counter() - start)
+        drawn = heatmap.wait_drawn() and drawn
+        shown.append(time.perf_counter() - start)
+    redraws["heatmap"] = {"blocked": summarise(blocked), "shown": summarise(shown)}
+
+    return {"backend": backend, "chart": type(chart).__name__, "matplotlib_imported": "matplotlib" in sys.modules, "drawn": drawn,
+            "startup_s": startup, "startup_mb": startup_rss - rss if rss is not None else None,
+            "per_chart_mb": (charts_rss - startup_rss) / EXTRA_CHARTS if rss is not None else None, "redraw": redraws}
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="Start up time, memory and redraw latency of the chart backends of the analyse tab")
+    parser.add_argument("-r", "--repeat", type=int, default=20, help="Number of redraws of each chart (default: 20)")
+    parser.add_argument("-b", "--backend", action="append", choices=BACKENDS, help="Backend to measure, can be used more than once (default: all)")
+    parser.add_argument("-o", "--output", help="Write the results as JSON to the file instead of stdout")
+    parser.add_argument("--child", choices=BACKENDS, help=argparse.SUPPRESS) # Measure the backend in this process
+    args = parser.parse_args(argv)
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        print(json.dumps(run_backend(args.child, args.repeat)))
+        return 0
+
+    results = []
+    for backend in args.backend or BACKENDS:
+        env = dict(os.environ, TODODORO_CHARTS=backend, QT_QPA_PLATFORM="offscreen", MPLBACKEND="Agg")
+        process = subprocess.run([sys.executable, "-m", "benchmarks.charts", "--child", backend, "--repeat", str(args.repeat)],
+                                 cwd=ROOT, env=env, capture_output=True, text=True)
+        if process.returncode:
+            print(process.stderr, file=sys.stderr)
+            return process.returncode
+        result = json.loads(process.stdout.splitlines()[-1])
+        results.append(result)
+        memory = (f"{result["startup_mb"]:.1f} MB, {result["per_chart_mb"]:.2f} MB per chart" if result["startup_mb"] is not None
+                  else "memory not available")
+        print(f"{backend:<12}start up {result["startup_s"] * 1000:>8.1f} ms, {memory}", file=sys.stderr)
+        for name, redraw in result["redraw"].items():
+            print(f"{"":<12}{name:<12} blocked {redraw["blocked"]["median_ms"]:>8.2f} ms, shown {redraw["shown"]["median_ms"]:>8.2f} ms "
+                  f"(max {redraw["shown"]["max_ms"]:.2f} ms)", file=sys.stderr)
+
+    report = {"repeat": args.repeat, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
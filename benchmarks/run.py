@@ -0,0 +1,254 @@
+import argparse, datetime, json, os, platform, statistics, subprocess, sys, tempfile, time
+
+# Benchmark suite of the database functions and the widgets that load from the database, run from the root directory of the project:
+#   python -m benchmarks.run --scale 0.1 --output results.json
+# A separate database (default: tododoro_bench) is dropped, created and seeded with synthetic data on every run so the results can be compared between commits
+# NOTE: the widgets are created with a headless QApplication (offscreen), matplotlib uses the Agg backend when it is the chart backend
+# (see benchmarks/charts.py for the comparison of the chart backends)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import src.overhead as oh
+from benchmarks import seed as seeder
+
+PERIODS = ("day", "week", "month", "year")
+BENCHMARKS = ("todolist_init", "todolist_snapshot", "todolist_open_section", "completed_tab", "completed_filter", "analyse", "smart_list", "focus_time", "dashboard_plots", "bulk_sub_task_insert")
+
+def get_git_info() -> dict:
+    '''Return the commit hash and if there are uncommitted changes, None if git is not available'''
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+def create_database(dbname: str):
+    '''Drop and create the benchmark database, the database in the config is used to connect'''
+    import psycopg
+    login = oh.read_config()["postgres"]
+    if dbname == login["dbname"]:
+        raise ValueError(f"Benchmark database cannot be the database in the config ({dbname}), it is dropped on every run")
+    with psycopg.connect(f"user={login["user"]} dbname={login["dbname"]} password={login["pw"]}", autocommit=True) as conn:
+        conn.execute(f"DROP DATABASE IF EXISTS {dbname}")
+        conn.execute(f"CREATE DATABASE {dbname}")
+
+def measure(name: str, func, repeat: int, setup=None, teardown=None) -> dict:
+    '''Run the function repeat times and return the timings in seconds, setup and teardown are not timed
+    setup returns the arguments of the function, teardown is called with the result of the function'''
+    times = []
+    for i in range(repeat):
+        args = setup(i) if setup else ()
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+        if teardown:
+            teardown(result)
+    result = {"name": name, "repeat": repeat, "min_s": min(times), "median_s": statistics.median(times),
+              "mean_s": statistics.fmean(times), "max_s": max(times)}
+    print(f"{name:<55}{result["median_s"] * 1000:>12.2f} ms (min {result["min_s"] * 1000:.2f} ms)", file=sys.stderr)
+    return result
+
+def delete_widget(app, widget):
+    widget.deleteLater()
+    app.processEvents()
+
+def run_benchmarks(app, selected: list, repeat: int, bulk_size: int) -> list:
+    import src.todolist_main as todolist
+    import src.analyse as analyse
+    import src.analyse_dashboard as analyse_dashboard
+    import src.analyse_calendar as analyse_calendar
+    from src.db import Completed, AnalyseTodolist, SmartListTools, FocusTime, SectionTools, analyse_cache
+
+    results = []
+    if "todolist_init" in selected:
+        # Loading the sections with the number of open tasks and the tasks of the first section when the program starts
+        results.append(measure("todolist_init", todolist.Todolist, repeat, teardown=lambda w: delete_widget(app, w)))
+
+    if "todolist_snapshot" in selected:
+        # Starting from the snapshot saved by the last run, the changes since the snapshot are loaded in the background (waited for in teardown)
+        path = os.path.join(tempfile.gettempdir(), "tododoro_bench.snapshot")
+        delete_widget(app, todolist.Todolist(path))
+        def wait_reconciled(widget):
+            while widget.snapshot_pool is not None:
+                app.processEvents()
+            delete_widget(app, widget)
+        results.append(measure("todolist_snapshot", lambda: todolist.Todolist(path), repeat, teardown=wait_reconciled))
+        os.remove(path)
+
+    if "todolist_open_section" in selected:
+        # Opening the last section for the first time, its main tasks and sub tasks are loaded from the database
+        def open_section(widget):
+            widget.setCurrentIndex(widget.count() - 2)
+            return widget
+        results.append(measure("todolist_open_section", open_section, repeat, setup=lambda i: (todolist.Todolist(),),
+                               teardown=lambda w: delete_widget(app, w)))
+
+    if "completed_tab" in selected:
+        # Creating the completed pomodoro and completed tasks tables of the analyse tab
+        results.append(measure("completed_tab", analyse.CompletedTab, repeat, teardown=lambda w: delete_widget(app, w)))
+
+    if "completed_filter" in selected:
+        for filters in (("1", "", ""), ("", "Main task 1", ""), ("", "", "Section 1"), ("sub", "main", "section")):
+            results.append(measure(f"completed_filter{filters}", Completed.get_filtered_completed_tasks, repeat, setup=lambda i: filters))
+
+    if "analyse" in selected:
+        # The numbers of the dashboard are read from the database (the cache is cleared before each run) and from the cache
+        def uncached(*args):
+            return lambda i: (analyse_cache.clear(), args)[1]
+        results.append(measure("get_num_all_completed_tasks", AnalyseTodolist.get_num_all_completed_tasks, repeat, setup=uncached()))
+        results.append(measure("get_sum_all_timers", AnalyseTodolist.get_sum_all_timers, repeat, setup=uncached("focus")))
+        for days in (1, 7, 30, 365):
+            results.append(measure(f"get_num_completed_tasks({days})", AnalyseTodolist.get_num_completed_tasks, repeat, setup=uncached(days)))
+            results.append(measure(f"get_sum_timers({days})", AnalyseTodolist.get_sum_timers, repeat, setup=uncached(days, "focus")))
+        for days in (7, 30, 365):
+            results.append(measure(f"get_num_completed_tasks({days}, cached)", AnalyseTodolist.get_num_completed_tasks, repeat, setup=lambda i: (days,)))
+            results.append(measure(f"get_sum_timers({days}, cached)", AnalyseTodolist.get_sum_timers, repeat, setup=lambda i: (days, "focus")))
+        for period in PERIODS:
+            results.append(measure(f"get_num_completed_task_by_time({period})", AnalyseTodolist.get_num_completed_task_by_time, repeat, setup=lambda i: (period,)))
+            results.append(measure(f"get_sum_focus_timers_by_time({period})", AnalyseTodolist.get_sum_focus_timers_by_time, repeat, setup=lambda i: (period,)))
+        # All the dates by day as read after zooming out the plot, with and without downsampling
+        for max_points in (None, 400):
+            results.append(measure(f"get_focus_time_series(day, all, {max_points})", AnalyseTodolist.get_focus_time_series, repeat, 
+                                   setup=lambda i: ("day", datetime.datetime(2000, 1, 1), datetime.datetime.now(), max_points)))
+        # Totals of every day read by the calendar heatmap
+        results.append(measure("get_daily_totals", AnalyseTodolist.get_daily_totals, repeat))
+        # Lengths of the timers and the focus time by hour read by the focus sessions tab, from the rollups
+        results.append(measure("get_timer_lengths", AnalyseTodolist.get_timer_lengths, repeat, setup=uncached()))
+        results.append(measure("get_focus_by_weekday_hour", AnalyseTodolist.get_focus_by_weekday_hour, repeat, setup=uncached()))
+
+    if "smart_list" in selected:
+        # Pending tasks across all the sections, the whole list and only the tasks of one section as read after a change
+        for filters in (("all",), ("sub", None, None, 14), ("all", "task 1"), ("main", None, "section 1"), ("all", None, None, None, [1])):
+            results.append(measure(f"smart_list{filters}", SmartListTools.get_tasks, repeat, setup=lambda i: filters))
+
+    if "focus_time" in selected:
+        # Focus time of the sections and of the pending tasks of all the sections, read from the rollup instead of the pomodoro table
+        section_ids = [section_id for section_id, _ in SectionTools.get_sections()]
+        results.append(measure("get_section_focus_time", FocusTime.get_section_focus_time, repeat))
+        results.append(measure("get_task_focus_time", FocusTime.get_task_focus_time, repeat, setup=lambda i: (section_ids,)))
+
+    if "dashboard_plots" in selected:
+        # Refreshing the plots of the analyse tab (e.g. after a timer is added), the time the GUI thread is blocked and the time until the 
+        # chart is shown (drawn in the render thread for matplotlib), and while the analyse tab is hidden
+        for plots in (analyse_dashboard.PomodoroPlots(), analyse_dashboard.TodolistPlots()):
+            name = type(plots).__name__
+            plots.show()
+            app.processEvents()
+            def refresh():
+                plots.update_plot()
+                app.processEvents() # The figure is sent to the render thread by the event loop
+            def refresh_rendered():
+                getattr(plots.graph, "canvas", plots.graph).state = None # Drawn even if nothing changed, the matplotlib canvas keeps the state
+                refresh()
+                plots.graph.wait_drawn()
+            for idx, period in enumerate(PERIODS):
+                plots.drop_down_choices.setCurrentIndex(idx)
+                app.processEvents()
+                plots.graph.wait_drawn()
+                results.append(measure(f"{name}.update_plot({period})", refresh, repeat, setup=lambda i: (plots.graph.wait_drawn(), ())[1]))
+                results.append(measure(f"{name}.update_plot({period}, rendered)", refresh_rendered, repeat))
+            plots.hide()
+            results.append(measure(f"{name}.update_plot(hidden)", refresh, repeat))
+            delete_widget(app, plots)
+        # Refreshing the calendar heatmap with the streaks
+        heatmap = analyse_calendar.CalendarHeatmap()
+        heatmap.show()
+        app.processEvents()
+        def refresh_heatmap():
+            heatmap.update_heatmap()
+            app.processEvents()
+        def refresh_heatmap_rendered():
+            refresh_heatmap()
+            heatmap.canvas.wait_drawn()
+        results.append(measure("CalendarHeatmap.update_heatmap", refresh_heatmap, repeat))
+        results.append(measure("CalendarHeatmap.update_heatmap(rendered)", refresh_heatmap_rendered, repeat))
+        delete_widget(app, heatmap)
+
+    if "bulk_sub_task_insert" in selected:
+        # Adding sub tasks with the ^1-N^ format from the prompt of a section, same as the user in the GUI
+        widget = todolist.Todolist()
+        widget.setCurrentIndex(0)
+        section = widget.widget(0)
+        if not section.model.main_task_dicts:
+            section.task_prompt.setText("Bulk insert")
+            section.task_added()
+            widget.history.flush()
+        main_task = section.model.get_main_tasks()[0]
+
+        def setup(i):
+            section.reset_flags()
+            section.tasks.setCurrentIndex(section.model.get_main_task_index(main_task)) # Select the main task so the sub tasks are added under it
+            section.task_prompt.setText(f"Bulk {i} ^1-{bulk_size}^")
+            return ()
+        def bulk_insert():
+            section.task_added()
+            widget.history.flush() # The sub tasks are committed after the idle time in the program
+        results.append(measure(f"bulk_sub_task_insert({bulk_size})", bulk_insert, repeat, setup=setup))
+        delete_widget(app, widget)
+
+    return results
+
+def print_comparison(results: list, path: str):
+    '''Print the change of the median time of each benchmark compared to the results in the JSON file'''
+    with open(path, encoding="utf-8") as f:
+        previous = json.load(f)
+    previous_results = {r["name"]: r for r in previous["results"]}
+    print(f"\nCompared to {previous["git"]["commit"]} ({previous["timestamp"]}, scale {previous["scale"]})", file=sys.stderr)
+    for result in results:
+        if result["name"] in previous_results:
+            before, after = previous_results[result["name"]]["median_s"], result["median_s"]
+            print(f"{result["name"]:<55}{before * 1000:>12.2f} ms -> {after * 1000:>10.2f} ms ({after / before:.2f}x)", file=sys.stderr)
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark suite of tododoro with a synthetic dataset")
+    parser.add_argument("-s", "--scale", type=float, default=0.1,
+                        help=f"Scale of the dataset, 1.0 is {seeder.DATASET["sections"]} sections, {seeder.DATASET["main_tasks"]} main tasks, "
+                        f"{seeder.DATASET["sub_tasks"]} sub tasks and {seeder.DATASET["years"]} years of pomodoros (default: 0.1)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Number of times each benchmark is run (default: 3)")
+    parser.add_argument("-b", "--benchmark", action="append", choices=BENCHMARKS, help="Benchmark to run, can be used more than once (default: all)")
+    parser.add_argument("--bulk-size", type=int, default=100, help="Number of sub tasks added in the bulk insert benchmark (default: 100)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random data (default: 0)")
+    parser.add_argument("--dbname", default="tododoro_bench", help="Database used for the benchmark, dropped and created on every run (default: tododoro_bench)")
+    parser.add_argument("-o", "--output", help="Write the results as JSON to the file instead of stdout")
+    parser.add_argument("-c", "--compare", help="JSON file of a previous run to compare the median times with")
+    args = parser.parse_args(argv)
+
+    create_database(args.dbname)
+    os.environ["TODODORO_DBNAME"] = args.dbname # Has to be set before src.db is imported
+
+    from PySide6.QtWidgets import QApplication
+    app = QApplication([])
+
+    from src.db import cur, conn
+    from src.metrics import metrics
+    from src.analyse_charts import backend as chart_backend
+    dataset = seeder.get_dataset(args.scale)
+    start = time.perf_counter()
+    rows = seeder.seed(dataset, args.seed)
+    seed_time = time.perf_counter() - start
+    print(f"Seeded {rows} in {seed_time:.1f} s", file=sys.stderr)
+    cur.execute("ANALYZE")
+    conn.commit()
+    metrics.reset()
+
+    results = run_benchmarks(app, args.benchmark or BENCHMARKS, args.repeat, args.bulk_size)
+    report = {"git": get_git_info(), "timestamp": datetime.datetime.now().astimezone().isoformat(timespec="seconds"),
+              "python": platform.python_version(), "platform": platform.platform(), "postgres": cur.connection.info.server_version, "charts": chart_backend,
+              "scale": args.scale, "seed": args.seed, "dataset": dataset, "rows": rows, "seed_s": seed_time,
+              "results": results, "statements": metrics.get_summary()}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+    if args.compare:
+        print_comparison(results, args.compare)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,79 @@
+import datetime, random
+
+# Synthetic data generator for the benchmarks, the rows are added through db.Transfer.copy_in (COPY) so large datasets are seeded quickly
+# NOTE: src.db is imported in the functions as it connects to the database on import, TODODORO_DBNAME has to be set before
+
+# Default size of the dataset, multiplied by the scale of the benchmark
+DATASET = {"sections": 50, "main_tasks": 10000, "sub_tasks": 200000, "years": 5}
+PENDING_RATIO = 0.05 # Ratio of the main tasks that are still pending (loaded by the to do list)
+MAX_POMODOROS_PER_DAY = 12
+FOCUS_TASK_RATIO = 0.5 # Ratio of the focus timers with a focused main task
+STOPPED_RATIO = 0.1 # Ratio of the timers stopped early
+
+def get_dataset(scale: float) -> dict:
+    '''Return the size of the dataset at the scale, at least one of each'''
+    return {key: max(1, round(value * scale)) if key != "years" else max(value * scale, 1 / 365) for key, value in DATASET.items()}
+
+def generate_rows(dataset: dict, seed: int = 0, now=None) -> dict:
+    '''Return the rows of each table as a list of dict, the same seed and now always generate the same rows'''
+    rng = random.Random(seed)
+    now = now or datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    start = now - datetime.timedelta(days=365 * dataset["years"])
+    pending, completed = "pending", "completed"
+
+    def random_time(after=start):
+        return after + datetime.timedelta(seconds=rng.uniform(0, (now - after).total_seconds()))
+
+    sections = [{"section_id": i, "section_name": f"Section {i}"} for i in range(1, dataset["sections"] + 1)]
+
+    main_tasks = []
+    for i in range(1, dataset["main_tasks"] + 1):
+        start_time = random_time()
+        status = pending if rng.random() < PENDING_RATIO else completed
+        main_tasks.append({"main_task_id": i, "main_task_name": f"Main task {i}", "section_id": rng.randint(1, dataset["sections"]),
+                           "status": status, "start_time": start_time, "end_time": random_time(start_time) if status == completed else None})
+
+    # Sub tasks of completed main tasks are completed, sub tasks of pending main tasks are either
+    sub_tasks = []
+    for i in range(1, dataset["sub_tasks"] + 1):
+        main_task = main_tasks[rng.randrange(len(main_tasks))]
+        start_time = main_task["start_time"] + datetime.timedelta(seconds=rng.uniform(0, 3600))
+        if main_task["status"] == completed:
+            status, end_time = completed, min(main_task["end_time"], now)
+        else:
+            status = rng.choice((pending, completed))
+            end_time = random_time(min(start_time, now)) if status == completed else None
+        sub_tasks.append({"sub_task_id": i, "sub_task_name": f"Sub task {i}", "main_task_id": main_task["main_task_id"],
+                          "section_id": main_task["section_id"], "status": status, "start_time": min(start_time, now), "end_time": end_time})
+
+    # Pomodoros are added day by day with focus and break timers one after another, some focus timers are linked to a main task
+    pomodoros = []
+    day = start.replace(hour=8, minute=0, second=0)
+    while day < now:
+        time = day
+        for j in range(rng.randint(0, MAX_POMODOROS_PER_DAY)):
+            category = "focus" if j % 2 == 0 else "break"
+            planned = rng.choice((25, 45)) * 60 if category == "focus" else rng.choice((5, 10)) * 60
+            duration = rng.randint(60, planned - 1) if rng.random() < STOPPED_RATIO else planned
+            main_task_id = rng.randint(1, len(main_tasks)) if category == "focus" and rng.random() < FOCUS_TASK_RATIO else None
+            pomodoros.append({"start_time": time, "end_time": time + datetime.timedelta(seconds=duration), "duration": duration, "timer_category": category,
+                              "main_task_id": main_task_id, "planned_duration": planned})
+            time += datetime.timedelta(seconds=duration + rng.randint(0, 600))
+        day += datetime.timedelta(days=1)
+    pomodoros = [p for p in pomodoros if p["end_time"] <= now]
+
+    return {"todolist_section": sections, "todolist_main_tasks": main_tasks, "todolist_sub_tasks": sub_tasks, "pomodoro": pomodoros}
+
+def get_tuples(rows: list, cols: list):
+    '''Generator of the rows as tuples in the order of cols, columns that are not generated are NULL (e.g. the sort keys are added by copy_in)'''
+    for row in rows:
+        yield tuple(row.get(c) for c in cols)
+
+def seed(dataset: dict, seed: int = 0) -> dict:
+    '''Generate the rows and add them to the database, returns the number of rows added to each table'''
+    from src.db import Transfer
+    tables = {}
+    for table, rows in generate_rows(dataset, seed).items():
+        cols = Transfer.get_columns(table)
+        tables[table] = (cols, get_tuples(rows, cols), False)
+    return Transfer.copy_in(tables)
@@ -0,0 +1,183 @@
+import argparse, datetime, json, os, random, sys, time
+
+# Soak test of the program left open for days, run from the root directory of the project:
+#   python -m benchmarks.soak --days 7 --output soak.json
+# The main window is created with a headless QApplication (offscreen) on a separate database (default: tododoro_soak, dropped, created and
+# seeded on every run) and the use of each day is simulated with the signals the program uses: the focus timers and breaks are added
+# (some stopped early), tasks are added and completed as by the api server, the tabs are switched, the durations of the plots are changed
+# and the completed tasks are filtered. The timers and tasks of the day before are deleted (as from the completed tab) so the data shown
+# is the same every day and what grows is kept by the program. The memory is sampled after each day (see src/memory.py), the series that 
+# grew every day are reported and the exit code is 1 if any series grew
+# NOTE: the days are simulated as fast as possible, the first day is not sampled so the caches and lazy imports are loaded before
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from benchmarks import seed as seeder
+from benchmarks.run import create_database, get_git_info
+
+def process_events(app):
+    # Runs the queued slots and deletes the widgets of deleteLater, like the event loop of the program between user actions
+    from PySide6.QtCore import QCoreApplication, QEvent
+    for _ in range(3):
+        app.processEvents()
+        QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+
+def add_timers(app, window, day: datetime.datetime, num_timers: int, rng: random.Random) -> list:
+    '''Add the focus timers and breaks of the day from 9:00 as the pomodoro tab does, return the start times of the timers added'''
+    from src.db import add_timer_row
+    pomo = window.maintab.pomo
+    start, starts = day.replace(hour=9), []
+    for i in range(num_timers):
+        for category, planned in (("focus", rng.choice((25, 45)) * 60), ("break", rng.choice((5, 10)) * 60)):
+            duration = rng.randint(60, planned - 1) if rng.random() < seeder.STOPPED_RATIO else planned
+            end = start + datetime.timedelta(seconds=duration)
+            add_timer_row(start, end, duration, category, planned=planned)
+            pomo.pomo_added.emit()
+            process_events(app)
+            starts.append(start)
+            start = end + datetime.timedelta(minutes=1)
+    return starts
+
+def change_tasks(app, window, section: str, day: int, num_tasks: int) -> list:
+    '''Add main tasks with two sub tasks each and complete them through the functions of the api server, the widgets are updated
+    with the same slots as the signals of the api server, return the ids of the main tasks and the ids of their sub tasks'''
+    import src.api as api
+    todolist, completed = window.maintab.tdl.todolist, window.maintab.analyse.completed_widget.completed_tasks.completed_tasks
+    task_ids = []
+    for i in range(num_tasks):
+        main_task = f"Day {day} task {i}"
+        api.add_main_task(section, main_task)
+        for sub_task in ("first", "second"):
+            api.add_sub_task(section, main_task, sub_task)
+        task_ids.append((api.get_main_task_ids(section, main_task)[1], [api.get_sub_task_id(section, main_task, sub_task) for sub_task in ("first", "second")]))
+        todolist.load_changes()
+        process_events(app)
+        for sub_task in ("first", "second"):
+            api.complete_sub_task(section, main_task, sub_task)
+        api.complete_main_task(section, main_task)
+        todolist.load_changes()
+        todolist.update_completed_task.emit() # Emitted by the to do list when tasks are completed in the GUI
+        completed.update_items()
+        process_events(app)
+    return task_ids
+
+def delete_rows(app, window, starts: list, task_ids: list) -> None:
+    '''Delete the timers and the completed sub tasks and main tasks, and update the completed tables as the delete button of each row does'''
+    from src.db import Completed
+    completed = window.maintab.analyse.completed_widget
+    for start in starts:
+        Completed.delete_pomodoro_row(start)
+        completed.completed_pomo.completed_pomo.update_items()
+        process_events(app)
+    for main_task_id, sub_task_ids in task_ids:
+        for sub_task_id in sub_task_ids:
+            Completed.delete_completed_sub_task_by_id(sub_task_id)
+            completed.completed_tasks.completed_tasks.update_items()
+            process_events(app)
+        Completed.delete_completed_main_task_by_id(main_task_id) # Deleted from the table once it has no completed sub tasks
+        completed.completed_tasks.completed_tasks.update_items()
+        process_events(app)
+
+def browse(app, window) -> None:
+    '''Show every tab, change the durations of the plots and the metric of the calendar, and filter the completed tasks'''
+    maintab, analyse = window.maintab, window.maintab.analyse
+    for i in range(maintab.count()):
+        maintab.setCurrentIndex(i)
+        process_events(app)
+    maintab.setCurrentWidget(analyse)
+    for i in range(analyse.count()):
+        analyse.setCurrentIndex(i)
+        process_events(app)
+        if analyse.currentWidget() is analyse.completed_widget:
+            for j in range(analyse.completed_widget.count()):
+                analyse.completed_widget.setCurrentIndex(j)
+                process_events(app)
+    for plots in (analyse.analyse_pomo.graph, analyse.analyse_todolist.graph):
+        maintab.setCurrentWidget(analyse)
+        analyse.setCurrentWidget(plots.parentWidget())
+        for i in list(range(plots.drop_down_choices.count())) + [0]:
+            plots.drop_down_choices.setCurrentIndex(i)
+            process_events(app)
+    analyse.setCurrentWidget(analyse.analyse_pomo)
+    heatmap = analyse.analyse_pomo.heatmap
+    for i in (1, 0):
+        heatmap.drop_down_metric.setCurrentIndex(i)
+        process_events(app)
+    completed = analyse.completed_widget.completed_tasks.completed_tasks
+    completed.update_items_with_filter("first", "", "")
+    process_events(app)
+    completed.update_items()
+    process_events(app)
+    maintab.setCurrentIndex(0)
+    process_events(app)
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="Soak test of tododoro, a week of use is simulated and the memory is sampled after each day")
+    parser.add_argument("-d", "--days", type=int, default=7, help="Number of days simulated after the first day (default: 7)")
+    parser.add_argument("-t", "--timers", type=int, default=12, help="Number of focus timers (each with a break) each day (default: 12)")
+    parser.add_argument("--tasks", type=int, default=6, help="Number of main tasks added and completed each day (default: 6)")
+    parser.add_argument("--browse", type=int, default=4, help="Number of times all the tabs are shown each day (default: 4)")
+    parser.add_argument("--keep", action="store_true", help="Keep the timers and tasks of each day, the completed tables then grow every day")
+    parser.add_argument("-s", "--scale", type=float, default=0.001, help="Scale of the dataset seeded before the first day (default: 0.001)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random data (default: 0)")
+    parser.add_argument("--dbname", default="tododoro_soak", help="Database used for the soak test, dropped and created on every run (default: tododoro_soak)")
+    parser.add_argument("-o", "--output", help="Write the memory samples as JSON to the file")
+    args = parser.parse_args(argv)
+
+    create_database(args.dbname)
+    os.environ["TODODORO_DBNAME"] = args.dbname # Has to be set before src.db is imported
+    import tododoro # Starts the QApplication and connects to the database, the GUI is not started when imported
+    from PySide6.QtWidgets import QApplication
+    from src.memory import MemoryMonitor
+    import src.api as api
+    app = QApplication.instance()
+
+    rows = seeder.seed(seeder.get_dataset(args.scale), args.seed)
+    print(f"Seeded {rows}", file=sys.stderr)
+    api.add_section("Soak")
+    window = tododoro.Tododoro_Win()
+    window.show()
+    process_events(app)
+
+    monitor = MemoryMonitor(window=args.days, max_samples=args.days)
+    monitor.start()
+    rng = random.Random(args.seed)
+    first_day = datetime.datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0) - datetime.timedelta(days=args.days)
+    start, added = time.perf_counter(), ([], [])
+    for day in range(args.days + 1):
+        if not args.keep:
+            delete_rows(app, window, *added)
+        added = (add_timers(app, window, first_day + datetime.timedelta(days=day), args.timers, rng),
+                 change_tasks(app, window, "Soak", day, args.tasks))
+        for _ in range(args.browse):
+            browse(app, window)
+        if day == 0:
+            continue
+        values = monitor.sample(tododoro.get_qt_counts(window))["values"]
+        print(f"Day {day}: {values.get("rss_mb", 0):8.1f} MB resident, {values.get("traced_mb", 0):6.1f} MB traced, {values["objects"]:>8} objects, "
+              f"{values["qt:all children"]:>6} Qt objects, {values["qt:all widgets"]:>6} widgets ({time.perf_counter() - start:.0f} s)",
+              file=sys.stderr)
+
+    summary = monitor.get_summary()
+    for trend in summary["growing"]:
+        print(f"Growing: {trend["series"]} from {trend["first"]:g} to {trend["last"]:g}", file=sys.stderr)
+    for allocation in summary["last"]["top_allocations"][:5]:
+        print(f"Allocated since day 1: {allocation["growth_kb"]:>10.1f} KB at {allocation["location"]}", file=sys.stderr)
+    if not summary["growing"]:
+        print(f"Nothing grew in every one of the {args.days} days", file=sys.stderr)
+
+    if args.output:
+        report = {"git": get_git_info(), "timestamp": datetime.datetime.now().astimezone().isoformat(timespec="seconds"), "days": args.days,
+                  "timers": args.timers, "tasks": args.tasks, "browse": args.browse, "keep": args.keep, "scale": args.scale, "seed": args.seed,
+                  "growing": summary["growing"], "samples": list(monitor.samples)}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+    window.maintab.tdl.todolist.history.flush()
+    window.close()
+    return 1 if summary["growing"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
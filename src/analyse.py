@@ -5,6 +5,7 @@ from src.db import Completed
 
 from src.overhead import get_logger
 import src.analyse_dashboard as analyse_tdl
+import src.analyse_sessions as analyse_sessions
 from src.analyse_dashboard import error_handler
 
 logger = get_logger("analyse (c)")
@@ -76,8 +77,9 @@ class HeaderRow(QWidget):
 class RowEntry(QWidget):
     deleted_row = Signal() # Signal sent to the overall pomodoro entries widget to update list if any item is deleted 
 
-    def __init__(self, *args):
+    def __init__(self, *args, row_id=None):
         super().__init__()
+        self.row_id = row_id # Primary key of the row (start time of the pomodoro timer, sub task id or main task id) used to delete it
         self.layout = QHBoxLayout(self)
         self.setLayout = self.layout
         font = QFont()
@@ -113,28 +115,23 @@ class RowEntry(QWidget):
     @error_handler
     @Slot()
     def delete_row(self):
-        # Call db function to delete row in pomodoro table where endtime = self.endtime and emit signal to remove the row 
+        # Call db function to delete the row with self.row_id and emit signal to remove the row 
         num = self.layout.count()
         if num == 4:
             # if 3 item in the row, delete from pomodoro timer 
-            logger.debug(f"Deleting pomodoro timer entry: {self.layout.itemAt(0).widget().text()}")
-            Completed.delete_pomodoro_rows(self.layout.itemAt(0).widget().text())
+            logger.debug(f"Deleting pomodoro timer entry with start time {self.row_id}")
+            Completed.delete_pomodoro_row(self.row_id)
         elif num == 5:
             # if 4 item in the row, delete from the main task or sub task table
-            sub_task = self.layout.itemAt(1).widget().toolTip()
-            endtime = self.layout.itemAt(0).widget().text()
-            
-            if sub_task:
+            if self.layout.itemAt(1).widget().toolTip():
                 # if sub task is not blank, delete sub task
-                logger.debug(f"Deleting completed sub task entry {sub_task} with end time of {endtime}")
-                Completed.delete_completed_sub_task(sub_task, endtime)
+                logger.debug(f"Deleting completed sub task id {self.row_id}")
+                Completed.delete_completed_sub_task_by_id(self.row_id)
 
             else:
                 # delete main task and all its sub task 
-                maintask = self.layout.itemAt(2).widget().toolTip()
-                section = self.layout.itemAt(3).widget().toolTip()
-                logger.debug(f"Deleting completed main task entry {maintask} with end time of {endtime} from section {section}")
-                Completed.delete_completed_main_task(maintask, section, endtime)
+                logger.debug(f"Deleting completed main task id {self.row_id}")
+                Completed.delete_completed_main_task_by_id(self.row_id)
             
         self.deleted_row.emit()
         
@@ -162,8 +159,8 @@ class CompletedPomodoro(QWidget):
         # Update the layout 
         completed_pomo = Completed.get_pomodoro_rows()
         self.layout.addWidget(HeaderRow([1, 2, 2], 6, "Time Completed", "Duration (mins)", "Timer Type"))
-        for endtime, duration_mins, timertype in completed_pomo:
-            rowItem = RowEntry(str(endtime), str(duration_mins), timertype)
+        for starttime, endtime, duration_mins, timertype in completed_pomo:
+            rowItem = RowEntry(str(endtime), str(duration_mins), timertype, row_id=starttime)
             self.layout.addWidget(rowItem)
             rowItem.deleted_row.connect(self.update_items)
         self.layout.addStretch() # Add stretch at the end so there is no stretch on each row item
@@ -205,8 +202,8 @@ class CompletedTasks(QWidget):
         self.layout.addWidget(self.task_filter)
         completed_tasks = Completed.get_all_completed_tasks()
         self.layout.addWidget(HeaderRow([1, 2, 2, 2], 25, "Time Completed", "Sub Task", "Main Task", "Section"))
-        for endtime, sub_task, main_task, section in completed_tasks:
-            rowItem = RowEntry(str(endtime), sub_task, main_task, section)
+        for task_id, endtime, sub_task, main_task, section in completed_tasks:
+            rowItem = RowEntry(str(endtime), sub_task, main_task, section, row_id=task_id)
             self.layout.addWidget(rowItem)
             rowItem.deleted_row.connect(self.update_items)
         self.layout.addStretch() # Add stretch at the end so there is no stretch on each row item
@@ -243,8 +240,8 @@ class CompletedTasks(QWidget):
 
         completed_tasks_filtered = Completed.get_filtered_completed_tasks(subtaskfilter, maintaskfilter, sectionfilter)
         self.layout.addWidget(HeaderRow([1, 2, 2, 2], 25, "Time Completed", "Sub Task", "Main Task", "Section"))
-        for endtime, sub_task, main_task, section in completed_tasks_filtered:
-            rowItem = RowEntry(str(endtime), sub_task, main_task, section)
+        for task_id, endtime, sub_task, main_task, section in completed_tasks_filtered:
+            rowItem = RowEntry(str(endtime), sub_task, main_task, section, row_id=task_id)
             self.layout.addWidget(rowItem)
             rowItem.deleted_row.connect(self.update_items_with_filter)
 
@@ -277,7 +274,9 @@ class AnalyseTab(QTabWidget):
         self.completed_widget = CompletedTab()
         self.analyse_todolist = analyse_tdl.AnalyseTodolistWidget()
         self.analyse_pomo = analyse_tdl.AnalysePomodoroWidget()
+        self.analyse_sessions = analyse_sessions.FocusSessions()
         self.addTab(self.completed_widget, "Completed")
         self.addTab(self.analyse_pomo, "Pomodoro")
+        self.addTab(self.analyse_sessions, "Focus sessions")
         self.addTab(self.analyse_todolist, "To do list")
         self.setTabPosition(QTabWidget.TabPosition.West)
\ No newline at end of file
@@ -0,0 +1,176 @@
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QToolTip
+from PySide6.QtCore import Qt, Slot
+from PySide6.QtGui import QCursor
+
+import numpy as np
+
+import src.overhead as oh
+from src.db import AnalyseTodolist
+from src.analyse_charts import create_heatmap
+
+# Calendar heatmap of the focus time or completed tasks of each day (one column for each week) with the streaks of days in a row,
+# all the days are read with one query and the calendar and streaks are calculated with NumPy
+# NOTE: the functions at the top do not use Qt or the database, the days are datetime64[D]
+
+# Get logger and start logging
+logger = oh.get_logger("analyse (h)")
+logger.debug("Logger started")
+
+MONDAY = np.datetime64("1970-01-05") # Any Monday, the rows of the calendar start on Monday
+
+# Decorator to display error message when function fails
+def error_handler(func):
+    def inner(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Function execution of {func.__name__} failed: {e}")
+            err = oh.ErrorBox(str(e))
+            err.exec()
+    return inner
+
+def get_dense_days(days: np.ndarray, values: np.ndarray, first: np.datetime64, last: np.datetime64) -> np.ndarray:
+    '''Return the values of every day from first to last, days (in order, no duplicates) not in days are 0'''
+    dense = np.zeros(max((last - first).astype(int) + 1, 0), dtype=values.dtype)
+    mask = (days >= first) & (days <= last)
+    dense[(days[mask] - first).astype(int)] = values[mask]
+    return dense
+
+def get_streaks(active: np.ndarray) -> tuple:
+    '''Return (current, longest) number of active days in a row, the current streak ends on the last day
+    (or the day before, so the streak is not lost before the last day is over)'''
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) # Each streak is from start to end (not included)
+    if not len(starts):
+        return 0, 0
+    lengths = ends - starts
+    current = lengths[-1] if ends[-1] >= len(active) - 1 else 0
+    return int(current), int(lengths.max())
+
+def get_calendar(values: np.ndarray, first: np.datetime64) -> tuple:
+    '''Return (grid, offset) where grid is the values of the days from first as 7 rows (Monday to Sunday) and a column for each week,
+    the cells before first and after the last day are NaN, the day of the cell (row, column) is first + column * 7 + row - offset'''
+    offset = int((first - MONDAY).astype(int) % 7)
+    cells = np.arange(len(values)) + offset
+    grid = np.full((7, (len(values) + offset + 6) // 7), np.nan)
+    grid[cells % 7, cells // 7] = values
+    return grid, offset
+
+class CalendarHeatmap(QWidget):
+    METRICS = ("Focus time", "Completed tasks")
+    LAST_YEAR = "Last 12 months"
+
+    def __init__(self):
+        super().__init__()
+        self.layout = QVBoxLayout(self)
+        self.setLayout = self.layout
+        self.needs_update = False # True if the data changed while the heatmap is hidden
+        self.days, self.totals = np.array([], dtype="datetime64[D]"), {} # Days with any value and the values of each metric
+        self.today = np.datetime64("today", "D") # Today in the time zone of the database session, read with the totals
+        self.calendar = None # (first day, values, offset) of the calendar shown
+
+        # Drop down lists of the value and the dates shown, with the streaks of the value
+        self.drop_down_metric = QComboBox()
+        self.drop_down_metric.addItems(self.METRICS)
+        self.drop_down_metric.currentIndexChanged.connect(self.draw_heatmap)
+        self.drop_down_range = QComboBox()
+        self.drop_down_range.addItem(self.LAST_YEAR)
+        self.drop_down_range.currentIndexChanged.connect(self.draw_heatmap)
+        self.drop_down_range.setToolTip("Show the last 12 months or a year")
+        self.streaks = QLabel("")
+        self.streaks.setStyleSheet("color: #545E75; font-weight: bold; font-family: arial, roboto, sans-serif")
+        options_layout = QHBoxLayout()
+        options_layout.addWidget(self.drop_down_metric)
+        options_layout.addWidget(self.drop_down_range)
+        options_layout.addWidget(self.streaks, 1, Qt.AlignmentFlag.AlignRight)
+        self.layout.addLayout(options_layout)
+
+        # A square for each day, the days are shown by the tooltip
+        self.canvas = create_heatmap()
+        self.canvas.setMinimumHeight(140)
+        self.canvas.cell_hovered.connect(self.show_day)
+        self.layout.addWidget(self.canvas)
+
+        self.update_heatmap()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.needs_update:
+            self.update_heatmap()
+
+    @error_handler
+    @Slot()
+    def update_heatmap(self, *args):
+        # Read the totals of all the days again, only when the heatmap is shown
+        if not self.isVisible():
+            self.needs_update = True
+            return
+        self.needs_update = False
+        logger.debug("Updating calendar heatmap")
+        self.days, focus_minutes, completed_tasks = AnalyseTodolist.get_daily_totals()
+        self.totals = dict(zip(self.METRICS, (focus_minutes, completed_tasks)))
+        self.today = AnalyseTodolist.get_today()
+
+        # Years with any value, the range shown is kept
+        this_year = self.today.item().year
+        first_year = self.days[0].item().year if len(self.days) else this_year
+        years = [self.LAST_YEAR] + [str(year) for year in range(this_year, first_year - 1, -1)]
+        if years != [self.drop_down_range.itemText(i) for i in range(self.drop_down_range.count())]:
+            current = self.drop_down_range.currentText()
+            self.drop_down_range.blockSignals(True)
+            self.drop_down_range.clear()
+            self.drop_down_range.addItems(years)
+            self.drop_down_range.setCurrentIndex(years.index(current) if current in years else 0)
+            self.drop_down_range.blockSignals(False)
+        self.draw_heatmap()
+
+    def format_value(self, value) -> str:
+        if self.drop_down_metric.currentText() == self.METRICS[0]:
+            return oh.convert_to_hr_mins(int(value) * 60)
+        return f"{int(value)} tasks"
+
+    @error_handler
+    @Slot()
+    def draw_heatmap(self, *args):
+        # Show the days of the range chosen from the totals read, the streaks are from the first day with any value to today
+        metric = self.drop_down_metric.currentText()
+        values = self.totals.get(metric, np.array([], dtype=np.int64))
+        today = self.today
+        if self.drop_down_range.currentText() == self.LAST_YEAR:
+            first, last = today - 364, today
+        else:
+            first = np.datetime64(self.drop_down_range.currentText(), "D")
+            last = np.datetime64(str(int(self.drop_down_range.currentText()) + 1), "D") - 1
+        shown = get_dense_days(self.days, values, first, last)
+        grid, offset = get_calendar(shown, first)
+        self.calendar = (first, shown, offset)
+
+        # Darkest colour for the top 5% of the days so a few long days do not make all the other days pale
+        nonzero = shown[shown > 0]
+        clim = (0.5, max(np.percentile(nonzero, 95), 1) if len(nonzero) else 1)
+
+        # Month names above the week of the first day of each month
+        months = np.arange(first.astype("datetime64[M]"), last.astype("datetime64[M]") + 1).astype("datetime64[D]")
+        months = months[months >= first]
+        self.canvas.plot_calendar(grid, clim, (list(((months - first).astype(int) + offset) // 7), [month.item().strftime("%b") for month in months]))
+
+        # Streaks of the days with any value up to today
+        current, longest = 0, 0
+        if len(self.days):
+            current, longest = get_streaks(get_dense_days(self.days, values, self.days[0], today) > 0)
+        self.streaks.setText(f"Total: {self.format_value(shown.sum())}    Active days: {len(nonzero)}    "
+                             f"Current streak: {current} days    Longest streak: {longest} days")
+
+    @Slot(int, int)
+    def show_day(self, column: int, row: int):
+        # Show the day and its value under the mouse
+        if column < 0 or self.calendar is None:
+            QToolTip.hideText()
+            return
+        first, shown, offset = self.calendar
+        day = column * 7 + row - offset
+        if 0 <= day < len(shown):
+            date = (first + day).item().strftime("%a %d-%b-%Y")
+            QToolTip.showText(QCursor.pos(), f"{date}: {self.format_value(shown[day])}", self.canvas)
+        else:
+            QToolTip.hideText()
@@ -0,0 +1,485 @@
+from PySide6.QtWidgets import QWidget, QToolBar, QLabel, QFileDialog, QToolTip
+from PySide6.QtCore import Qt, Signal, QPointF, QRectF, QLineF
+from PySide6.QtGui import QPainter, QColor, QPen, QFont, QFontMetricsF, QCursor
+import abc, datetime, math, os
+
+import numpy as np
+
+import src.overhead as oh
+
+# Charts of the analyse tab behind a small interface (LineChart, BarChart and HeatmapChart) so the renderer can be changed, the native charts are
+# painted with QPainter and are the default, the matplotlib charts (analyse_render.py) are kept as an option
+# The backend is chosen with "charts": {"backend": "native"} or {"backend": "matplotlib"} in the config or the TODODORO_CHARTS environment variable
+# NOTE: matplotlib is only imported when it is the backend chosen, it is the largest part of the start up time and memory of the analyse tab
+
+# Get logger and start logging
+logger = oh.get_logger("analyse (g)")
+logger.debug("Logger started")
+
+BACKENDS = ("native", "matplotlib")
+EPOCH = np.datetime64("1970-01-01", "D") # The x values of the charts are days since EPOCH (same numbers as the matplotlib dates)
+MAX_MARKERS = 31 # The points are only marked and labelled when there are at most this number of points
+MAX_Y_TICKS = 8
+ZOOM_STEP = 0.8 # Part of the dates still shown after one step of the mouse wheel
+
+# Colours of the native charts, same as the seaborn darkgrid style and the Greens colormap of matplotlib
+SERIES_COLOURS = ("#4C72B0", "#DD8452", "#55A868") # Colours of the series of the bar charts, the line is the first colour
+BACKGROUND, GRID, TEXT, LINE = QColor("#EAEAF2"), QColor("#FFFFFF"), QColor("#262626"), QColor(SERIES_COLOURS[0])
+GREENS = np.array([QColor(c).getRgb()[:3] for c in ("#f7fcf5", "#e5f5e0", "#c7e9c0", "#a1d99b", "#74c476", "#41ab5d", "#238b45", "#006d2c", "#00441b")], dtype=float)
+NO_VALUE = QColor("#E4E6EB") # Days without any value
+
+def get_backend() -> str:
+    '''Return the chart backend from the TODODORO_CHARTS environment variable or the config, "native" if it is not set or unknown'''
+    name = os.environ.get("TODODORO_CHARTS") or oh.read_config().get("charts", {}).get("backend", "native")
+    if name not in BACKENDS:
+        logger.warning(f"Unknown chart backend ({name}), using the native charts")
+        return "native"
+    return name
+
+backend = get_backend()
+logger.info(f"Using the {backend} charts")
+
+def import_backend(name: str = None):
+    '''Return the module of the matplotlib charts, or None for the native charts (or if matplotlib is not installed)'''
+    if (name or backend) != "matplotlib":
+        return None
+    try:
+        import src.analyse_render as analyse_render
+        return analyse_render
+    except ImportError as e:
+        logger.warning(f"Failed to import matplotlib, using the native charts: {e}")
+        return None
+
+def create_line_chart(name: str = None) -> "LineChart":
+    '''Return a line chart of the backend (name) or of the backend chosen in the config'''
+    module = import_backend(name)
+    return module.MatplotlibLineChart() if module else NativeLineChart()
+
+def create_bar_chart(name: str = None) -> "BarChart":
+    '''Return a bar chart of the backend (name) or of the backend chosen in the config'''
+    module = import_backend(name)
+    return module.MatplotlibBarChart() if module else NativeBarChart()
+
+def create_heatmap(name: str = None) -> "HeatmapChart":
+    '''Return a calendar heatmap of the backend (name) or of the backend chosen in the config'''
+    module = import_backend(name)
+    return module.MatplotlibHeatmap() if module else NativeHeatmap()
+
+def date_to_x(dates) -> np.ndarray:
+    '''Return the x values (days since 1970-01-01) of the dates'''
+    return (np.asarray(dates, dtype="datetime64[s]") - EPOCH) / np.timedelta64(1, "D")
+
+def x_to_date(x: float) -> datetime.datetime:
+    '''Return the date of the x value (days since 1970-01-01)'''
+    return datetime.datetime(1970, 1, 1) + datetime.timedelta(days=float(x))
+
+def get_integer_ticks(low: float, high: float, max_ticks: int = MAX_Y_TICKS) -> list:
+    '''Return the integer ticks between low and high, at most max_ticks ticks on every 1, 2, 5, 10, 20... '''
+    span = max(high - low, 1)
+    step = 1
+    while span / step > max_ticks:
+        step = step * 5 // 2 if str(step)[0] == "2" else step * 2 # 1, 2, 5, 10, 20, 50...
+    return list(range(math.ceil(low / step) * step, math.floor(high) + 1, step))
+
+def get_colours(grid: np.ndarray, clim: tuple) -> np.ndarray:
+    '''Return the RGB colour of each cell of the grid from the Greens colours, the cells below clim[0] are NaN'''
+    scaled = np.clip((grid - clim[0]) / max(clim[1] - clim[0], 1e-9), 0, 1) * (len(GREENS) - 1)
+    scaled = np.where(grid >= clim[0], scaled, np.nan)
+    low = np.clip(np.floor(np.nan_to_num(scaled)).astype(int), 0, len(GREENS) - 2)
+    part = (np.nan_to_num(scaled) - low)[..., None]
+    colours = GREENS[low] * (1 - part) + GREENS[low + 1] * part
+    colours[np.isnan(scaled)] = np.nan
+    return colours
+
+
+# Shiboken creates the Qt widgets without the checks of abc, so the abstract methods are found and checked here. The charts of a backend
+# missing one of the methods cannot be created
+class AbstractWidgetType(type(QWidget), abc.ABCMeta):
+    def __init__(cls, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        cls.__abstractmethods__ = frozenset()
+        abc.update_abstractmethods(cls)
+
+    def __call__(cls, *args, **kwargs):
+        if cls.__abstractmethods__:
+            raise TypeError(f"Can't instantiate abstract class {cls.__name__} without an implementation for abstract methods {", ".join(sorted(cls.__abstractmethods__))}")
+        return super().__call__(*args, **kwargs)
+
+class LineChart(QWidget, abc.ABC, metaclass=AbstractWidgetType):
+    '''Line with a label on each point, the x values are days since 1970-01-01 (see date_to_x). Implemented by each backend'''
+    xlim_changed = Signal(float, float) # Emitted when the x limits change (pan, zoom and plot_line)
+
+    @abc.abstractmethod
+    def plot_line(self, x, values, value_labels: list, xlabel: str, ylabel: str, ticks: tuple, xlim=None) -> None:
+        '''Plot the values at x with a label on each point (empty labels are not shown), ticks is (x of the ticks, tick labels),
+        the x limits are kept if xlim is None. Nothing is drawn if nothing changed'''
+
+    @abc.abstractmethod
+    def get_xlim(self) -> tuple:
+        '''Return the x limits shown'''
+
+    @abc.abstractmethod
+    def set_xlim(self, xmin: float, xmax: float) -> None:
+        '''Show the x limits (same as a pan or zoom)'''
+
+    @abc.abstractmethod
+    def create_toolbar(self, parent: QWidget) -> QWidget:
+        '''Return the toolbar of the chart (pan, zoom and save)'''
+
+    @abc.abstractmethod
+    def wait_drawn(self, timeout: float = 10) -> bool:
+        '''Wait until the chart shows the last points plotted (e.g. for the benchmarks), returns False if it is not shown within the timeout'''
+
+class BarChart(QWidget, abc.ABC, metaclass=AbstractWidgetType):
+    '''Bars of one or more series stacked on each other. Implemented by each backend'''
+    @abc.abstractmethod
+    def plot_bars(self, labels: list, series: dict, ylabel: str) -> None:
+        '''Plot a bar for each label with the values of each series (dict of name: values) stacked in order, 
+        the names are shown in a legend if there is more than one series'''
+
+    @abc.abstractmethod
+    def wait_drawn(self, timeout: float = 10) -> bool:
+        '''Wait until the chart shows the last bars plotted, returns False if it is not shown within the timeout'''
+
+class HeatmapChart(QWidget, abc.ABC, metaclass=AbstractWidgetType):
+    '''Grid of 7 rows (Monday to Sunday) and a column for each week coloured by the value of each day. Implemented by each backend'''
+    cell_hovered = Signal(int, int) # (column, row) under the mouse, (-1, -1) when the mouse is not over the grid
+
+    @abc.abstractmethod
+    def plot_calendar(self, grid: np.ndarray, clim: tuple, months: tuple) -> None:
+        '''Show the calendar grid (see get_calendar) with the colour limits, months is (column, name) of the month labels'''
+
+    @abc.abstractmethod
+    def wait_drawn(self, timeout: float = 10) -> bool:
+        '''Wait until the heatmap shows the last grid plotted, returns False if it is not shown within the timeout'''
+
+
+# Line chart painted with QPainter on the GUI thread (a few hundred points at most, see MAX_POINTS of analyse_dashboard.py),
+# drag to pan the dates, the mouse wheel zooms around the mouse, double click to show the dates plotted last
+class NativeLineChart(LineChart):
+    def __init__(self):
+        super().__init__()
+        self.state = None # Points, labels and axes plotted
+        self.points = np.empty((0, 2)) # (x, value) of each point
+        self.xlim, self.home = (0.0, 1.0), None # x limits shown, and of the last points plotted with x limits
+        self.plot_rect = QRectF() # Area of the axes of the last paint, used to map the mouse to the x values
+        self.press = None # (mouse x, x limits) when the mouse is pressed
+        self.pending = False # True if the chart changed since the last paint
+        self.position = None # Label of the toolbar with the date under the mouse
+        self.label_font = QFont(self.font())
+        self.label_font.setPointSizeF(12)
+        self.setMouseTracking(True)
+        self.setMinimumSize(200, 200)
+
+    def plot_line(self, x, values, value_labels: list, xlabel: str, ylabel: str, ticks: tuple, xlim=None) -> None:
+        ylim = (max(0, min(values, default=0) - 1), max(values, default=0) + 2)
+        state = {"x": list(x), "values": list(values), "value_labels": list(value_labels), "xlabel": xlabel, "ylabel": ylabel,
+                 "ticks": (list(ticks[0]), list(ticks[1])), "xlim": xlim, "ylim": ylim}
+        if state == self.state:
+            return # Nothing changed
+        self.state = state
+        self.points = np.column_stack((np.asarray(state["x"], dtype=float), np.asarray(state["values"], dtype=float))).reshape(-1, 2)
+        if xlim is not None:
+            self.home = tuple(xlim)
+            self.set_xlim(*xlim)
+        elif self.home is None and len(self.points):
+            self.set_xlim(self.points[0, 0] - 0.5, self.points[-1, 0] + 0.5)
+        self.pending = True
+        self.update()
+
+    def get_xlim(self) -> tuple:
+        return self.xlim
+
+    def set_xlim(self, xmin: float, xmax: float) -> None:
+        xlim = (float(xmin), float(xmax))
+        if xlim == self.xlim or xlim[1] <= xlim[0]:
+            return
+        self.xlim = xlim
+        self.pending = True
+        self.update()
+        self.xlim_changed.emit(*xlim)
+
+    def create_toolbar(self, parent: QWidget) -> QWidget:
+        toolbar = QToolBar(parent)
+        toolbar.addAction("Home", self.show_home).setToolTip("Show the dates plotted last (or double click the chart)")
+        toolbar.addAction("Save", self.save).setToolTip("Save the chart as an image")
+        toolbar.addSeparator()
+        self.position = QLabel("")
+        toolbar.addWidget(self.position)
+        toolbar.setToolTip("Drag the chart to pan, scroll to zoom")
+        return toolbar
+
+    def wait_drawn(self, timeout: float = 10) -> bool:
+        if self.pending:
+            self.repaint() # Painted on the GUI thread right away
+        return True
+
+    def show_home(self):
+        if self.home is not None:
+            self.set_xlim(*self.home)
+
+    def save(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save the chart", "chart.png", "Images (*.png *.jpg *.bmp)")
+        if path:
+            self.grab().save(path)
+
+    def to_x(self, pixel: float) -> float:
+        return self.xlim[0] + (pixel - self.plot_rect.left()) / max(self.plot_rect.width(), 1) * (self.xlim[1] - self.xlim[0])
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton and self.plot_rect.contains(event.position()):
+            self.press = (event.position().x(), self.xlim)
+            self.setCursor(Qt.CursorShape.ClosedHandCursor)
+
+    def mouseMoveEvent(self, event):
+        if self.press is not None:
+            # The dates move with the mouse, the y limits are kept
+            start, (xmin, xmax) = self.press
+            shift = (start - event.position().x()) / max(self.plot_rect.width(), 1) * (xmax - xmin)
+            self.set_xlim(xmin + shift, xmax + shift)
+        if self.position is not None:
+            inside = self.plot_rect.contains(event.position())
+            self.position.setText(x_to_date(self.to_x(event.position().x())).strftime("%d-%b-%Y") if inside else "")
+
+    def mouseReleaseEvent(self, event):
+        self.press = None
+        self.unsetCursor()
+
+    def mouseDoubleClickEvent(self, event):
+        self.show_home()
+
+    def wheelEvent(self, event):
+        # Zoom around the date under the mouse
+        if not event.angleDelta().y():
+            return
+        scale = ZOOM_STEP ** (event.angleDelta().y() / 120)
+        centre = self.to_x(event.position().x())
+        self.set_xlim(centre - (centre - self.xlim[0]) * scale, centre + (self.xlim[1] - centre) * scale)
+
+    def paintEvent(self, event):
+        self.pending = False
+        painter = QPainter(self)
+        try:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.fillRect(self.rect(), Qt.GlobalColor.white)
+            if self.state is not None:
+                self.paint_chart(painter)
+        finally:
+            painter.end()
+
+    def paint_chart(self, painter: QPainter):
+        state, metrics = self.state, QFontMetricsF(self.font())
+        (xmin, xmax), (ymin, ymax) = self.xlim, state["ylim"]
+        ticks = [(x, label) for x, label in zip(*state["ticks"]) if xmin <= x <= xmax]
+        yticks = get_integer_ticks(ymin, ymax)
+
+        # Space around the axes for the labels, the tick labels of the x axis are rotated by 45 degrees
+        left = metrics.height() * 2 + max((metrics.horizontalAdvance(str(y)) for y in yticks), default=0) + 8
+        bottom = max((metrics.horizontalAdvance(label) for _, label in ticks), default=0) * 0.72 + metrics.height() * 2 + 12
+        self.plot_rect = rect = QRectF(left, 8, max(self.width() * 0.95 - left, 1), max(self.height() - bottom - 8, 1))
+        def to_pixel(x, y):
+            return QPointF(rect.left() + (x - xmin) / (xmax - xmin) * rect.width(), rect.bottom() - (y - ymin) / (ymax - ymin) * rect.height())
+
+        # Background with a white grid on the ticks
+        painter.fillRect(rect, BACKGROUND)
+        painter.setPen(QPen(GRID, 1))
+        for y in yticks:
+            painter.drawLine(to_pixel(xmin, y), to_pixel(xmax, y))
+        for x, _ in ticks:
+            painter.drawLine(to_pixel(x, ymin), to_pixel(x, ymax))
+
+        # Tick labels and the labels of the axes
+        painter.setPen(TEXT)
+        for y in yticks:
+            point = to_pixel(xmin, y)
+            painter.drawText(QRectF(0, point.y() - metrics.height() / 2, rect.left() - 6, metrics.height()),
+                             Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, str(y))
+        for x, label in ticks:
+            painter.save()
+            painter.translate(to_pixel(x, ymin) + QPointF(metrics.height() / 3, 6))
+            painter.rotate(-45)
+            painter.drawText(QPointF(-metrics.horizontalAdvance(label), 0), label)
+            painter.restore()
+        painter.drawText(QRectF(rect.left(), self.height() - metrics.height() - 4, rect.width(), metrics.height()),
+                         Qt.AlignmentFlag.AlignCenter, state["xlabel"])
+        painter.save()
+        painter.translate(4, rect.center().y())
+        painter.rotate(-90)
+        painter.drawText(QRectF(-rect.height() / 2, 0, rect.height(), metrics.height()), Qt.AlignmentFlag.AlignCenter, state["ylabel"])
+        painter.restore()
+
+        # Line and markers inside the axes, with the labels of the points
+        painter.setClipRect(rect)
+        points = [to_pixel(x, y) for x, y in self.points]
+        # Separate segments with square caps (to fill the joins), a wide antialiased polyline or round caps take up to a few hundred ms to paint
+        painter.setPen(QPen(LINE, 1.5, Qt.PenStyle.SolidLine, Qt.PenCapStyle.SquareCap))
+        painter.drawLines([QLineF(start, end) for start, end in zip(points, points[1:])])
+        if len(points) <= MAX_MARKERS:
+            painter.setBrush(LINE)
+            for point in points:
+                painter.drawEllipse(point, 3, 3)
+        painter.setClipping(False) # The labels of the points inside the axes are not cut off (same as matplotlib)
+        painter.setFont(self.label_font)
+        painter.setPen(TEXT)
+        for (x, _), point, text in zip(self.points, points, state["value_labels"]):
+            if text and xmin <= x <= xmax:
+                painter.drawText(point, text)
+
+
+# Bar chart painted with QPainter, the values of the bar under the mouse are shown by the tooltip
+class NativeBarChart(BarChart):
+    def __init__(self):
+        super().__init__()
+        self.labels, self.series, self.ylabel = [], {}, ""
+        self.bars = QRectF() # Area of the axes of the last paint
+        self.pending = False # True if the bars changed since the last paint
+        self.setMouseTracking(True)
+        self.setMinimumSize(200, 150)
+
+    def plot_bars(self, labels: list, series: dict, ylabel: str) -> None:
+        self.labels, self.ylabel = list(labels), ylabel
+        self.series = {name: np.asarray(values, dtype=float) for name, values in series.items()}
+        self.pending = True
+        self.update()
+
+    def wait_drawn(self, timeout: float = 10) -> bool:
+        if self.pending:
+            self.repaint()
+        return True
+
+    def mouseMoveEvent(self, event):
+        position = event.position()
+        if not self.labels or not self.bars.contains(position):
+            QToolTip.hideText()
+            return
+        i = min(int((position.x() - self.bars.left()) / self.bars.width() * len(self.labels)), len(self.labels) - 1)
+        values = ", ".join(f"{name}: {values[i]:g}" for name, values in self.series.items())
+        QToolTip.showText(QCursor.pos(), f"{self.labels[i]}\n{values}", self)
+
+    def paintEvent(self, event):
+        self.pending = False
+        painter = QPainter(self)
+        try:
+            painter.fillRect(self.rect(), Qt.GlobalColor.white)
+            if self.labels:
+                self.paint_bars(painter)
+        finally:
+            painter.end()
+
+    def paint_bars(self, painter: QPainter):
+        metrics = QFontMetricsF(self.font())
+        totals = np.sum(list(self.series.values()), axis=0)
+        ymax = max(float(totals.max()) * 1.1, 1)
+        yticks = get_integer_ticks(0, ymax)
+        left = metrics.height() * 2 + max((metrics.horizontalAdvance(str(y)) for y in yticks), default=0) + 8
+        self.bars = rect = QRectF(left, 8, max(self.width() - left - 12, 1), max(self.height() - metrics.height() * 2 - 16, 1))
+        width = rect.width() / len(self.labels)
+        def to_y(value):
+            return rect.bottom() - value / ymax * rect.height()
+
+        # Background with a white grid on the ticks, with the tick labels
+        painter.fillRect(rect, BACKGROUND)
+        for y in yticks:
+            painter.setPen(QPen(GRID, 1))
+            painter.drawLine(QPointF(rect.left(), to_y(y)), QPointF(rect.right(), to_y(y)))
+            painter.setPen(TEXT)
+            painter.drawText(QRectF(0, to_y(y) - metrics.height() / 2, rect.left() - 6, metrics.height()),
+                             Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, str(y))
+        painter.save()
+        painter.translate(4, rect.center().y())
+        painter.rotate(-90)
+        painter.drawText(QRectF(-rect.height() / 2, 0, rect.height(), metrics.height()), Qt.AlignmentFlag.AlignCenter, self.ylabel)
+        painter.restore()
+
+        # Labels below the bars, only every few labels if they do not fit
+        step = max(1, math.ceil(max(metrics.horizontalAdvance(label) for label in self.labels) * 1.3 / width))
+        for i in range(0, len(self.labels), step):
+            painter.drawText(QRectF(rect.left() + (i - step / 2 + 0.5) * width, rect.bottom() + 4, width * step, metrics.height()),
+                             Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignTop, self.labels[i])
+
+        # Bars of the series stacked on each other, 80% of the width of each label
+        bottoms = np.zeros(len(self.labels))
+        for (name, values), colour in zip(self.series.items(), SERIES_COLOURS):
+            for i, (bottom, value) in enumerate(zip(bottoms, values)):
+                if value > 0:
+                    painter.fillRect(QRectF(rect.left() + (i + 0.1) * width, to_y(bottom + value), width * 0.8, to_y(bottom) - to_y(bottom + value)), 
+                                     QColor(colour))
+            bottoms += values
+
+        # Legend at the top right
+        if len(self.series) > 1:
+            x = rect.right() - 8
+            for name, colour in reversed(list(zip(self.series, SERIES_COLOURS))):
+                x -= metrics.horizontalAdvance(name)
+                painter.setPen(TEXT)
+                painter.drawText(QPointF(x, rect.top() + 8 + metrics.ascent()), name)
+                x -= metrics.height() + 4
+                painter.fillRect(QRectF(x, rect.top() + 8, metrics.height(), metrics.height()), QColor(colour))
+                x -= 12
+
+# Calendar heatmap painted with QPainter, a square for each day
+class NativeHeatmap(HeatmapChart):
+    def __init__(self):
+        super().__init__()
+        self.grid, self.colours, self.months = None, None, ([], [])
+        self.pending = False # True if the grid changed since the last paint
+        self.cells = QRectF() # Area of the grid of the last paint
+        self.setMouseTracking(True)
+
+    def plot_calendar(self, grid: np.ndarray, clim: tuple, months: tuple) -> None:
+        self.grid, self.months = grid, months
+        self.colours = get_colours(grid, clim)
+        self.pending = True
+        self.update()
+
+    def wait_drawn(self, timeout: float = 10) -> bool:
+        if self.pending:
+            self.repaint() # Painted on the GUI thread right away
+        return True
+
+    def get_cell(self, position) -> tuple:
+        if self.grid is None or not self.cells.contains(position):
+            return -1, -1
+        size = self.cells.width() / self.grid.shape[1]
+        return int((position.x() - self.cells.left()) // size), min(int((position.y() - self.cells.top()) // size), 6)
+
+    def mouseMoveEvent(self, event):
+        self.cell_hovered.emit(*self.get_cell(event.position()))
+
+    def leaveEvent(self, event):
+        self.cell_hovered.emit(-1, -1)
+
+    def paintEvent(self, event):
+        self.pending = False
+        painter = QPainter(self)
+        try:
+            painter.fillRect(self.rect(), Qt.GlobalColor.white)
+            if self.grid is not None:
+                self.paint_grid(painter)
+        finally:
+            painter.end()
+
+    def paint_grid(self, painter: QPainter):
+        font = QFont(self.font())
+        font.setPointSizeF(8)
+        painter.setFont(font)
+        metrics = QFontMetricsF(font)
+        rows, columns = self.grid.shape
+        left, top = metrics.horizontalAdvance("Wed") + 8, metrics.height() + 4
+
+        # Square cells as large as the widget allows, centred
+        size = max(min((self.width() - left - 8) / columns, (self.height() - top - 4) / rows), 1)
+        self.cells = cells = QRectF(left + (self.width() - left - 8 - size * columns) / 2, top, size * columns, size * rows)
+        gap = 1 if size > 4 else 0
+        for row, column in zip(*np.nonzero(~np.isnan(self.grid))):
+            cell = QRectF(cells.left() + column * size, cells.top() + row * size, size - gap, size - gap)
+            colour = self.colours[row, column]
+            painter.fillRect(cell, NO_VALUE if np.isnan(colour[0]) else QColor(*colour.astype(int)))
+
+        # Month names above the columns and the days on the left
+        painter.setPen(TEXT)
+        for column, name in zip(*self.months):
+            painter.drawText(QPointF(cells.left() + column * size, top - 4), name)
+        for row, name in ((0, "Mon"), (2, "Wed"), (4, "Fri")):
+            painter.drawText(QRectF(0, cells.top() + row * size, cells.left() - 4, size),
+                             Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, name)
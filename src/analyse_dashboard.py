@@ -1,27 +1,23 @@
 from PySide6.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QLabel, QComboBox, QSizePolicy
-from PySide6.QtCore import Qt, Slot
+from PySide6.QtCore import Qt, Slot, QTimer
 
-import logging
 from src.overhead import get_logger
 from src.overhead import ErrorBox
-
-# Creating logger object to suppress logging messages from matplotlib
-mpl_logger = logging.getLogger('matplotlib')
-mpl_logger.setLevel(logging.WARNING)
-import matplotlib
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
-from matplotlib.backends.backend_qtagg import NavigationToolbar2QT as NavigationToolbar
-from matplotlib.ticker import MaxNLocator
+from src.overhead import convert_to_hr_mins
 
 from src.db import AnalyseTodolist
-
-matplotlib.use("QtAgg")
-plt.style.use("seaborn-v0_8-darkgrid")
+from src.analyse_calendar import CalendarHeatmap
+from src.analyse_charts import create_line_chart, date_to_x, x_to_date, MAX_MARKERS
+import src.snapshot as snapshot
 
 logger = get_logger("analyse (d)")
 logger.debug("Logger started")
 
+MAX_POINTS = 400 # Most points read for the dates shown in the plots, longer ranges are downsampled by the database 
+MAX_TICKS = 20
+PAN_DELAY = 200 # Time (ms) after the last pan or zoom before the points of the dates shown are read
+PERIOD_DAYS = {'day': 1, 'week': 7, 'month': 30, 'year': 365}
+
 def error_handler(func):
     def inner(*args, **kwargs):
         try:
@@ -32,6 +28,13 @@ def error_handler(func):
             err.exec()
     return inner 
 
+def get_aggregate(name: str, func, *args):
+    # Return the number saved in the snapshot of the last run if there is one (updated once the to do list loads the changes), 
+    # otherwise from the database, the number is saved with the next snapshot
+    if name not in snapshot.aggregates:
+        snapshot.aggregates[name] = func(*args)
+    return snapshot.aggregates[name]
+
 
 class CompletedTasks(QWidget):
     def __init__(self):
@@ -57,8 +60,10 @@ class CompletedTasks(QWidget):
         # labels to display, default to show last 7 days 
         self.all_completed_tasks = QLabel("All Completed Tasks", alignment=Qt.AlignmentFlag.AlignCenter)
         self.completed_tasks = QLabel(f"Completed Tasks\n{self.duration_dict[7]}", alignment=Qt.AlignmentFlag.AlignCenter)
-        self.num_all_completed_tasks = QLabel(str(AnalyseTodolist.get_num_all_completed_tasks()), alignment=Qt.AlignmentFlag.AlignCenter) 
-        self.num_completed_tasks = QLabel(str(AnalyseTodolist.get_num_completed_tasks(7)), alignment=Qt.AlignmentFlag.AlignCenter) 
+        self.num_all_completed_tasks = QLabel(str(get_aggregate("completed_tasks_all", AnalyseTodolist.get_num_all_completed_tasks)), 
+                                              alignment=Qt.AlignmentFlag.AlignCenter) 
+        self.num_completed_tasks = QLabel(str(get_aggregate("completed_tasks_7", AnalyseTodolist.get_num_completed_tasks, 7)), 
+                                          alignment=Qt.AlignmentFlag.AlignCenter) 
 
         # Styling to the text and numbers
         text_style = "color: #545E75; font-weight: bold; font-size: 25px; font-family: arial, roboto, sans-serif" 
@@ -84,18 +89,26 @@ class CompletedTasks(QWidget):
         logger.debug("Updating number of completed tasks")
         choices = [7, 30, 365]
         new_idx = self.drop_down_tasks.currentIndex()
-        self.num_completed_tasks.setText(str(AnalyseTodolist.get_num_completed_tasks(choices[new_idx])))
-        self.num_all_completed_tasks.setText(str(AnalyseTodolist.get_num_all_completed_tasks()))
+        num_completed_tasks = snapshot.aggregates[f"completed_tasks_{choices[new_idx]}"] = AnalyseTodolist.get_num_completed_tasks(choices[new_idx])
+        num_all_completed_tasks = snapshot.aggregates["completed_tasks_all"] = AnalyseTodolist.get_num_all_completed_tasks()
+        self.num_completed_tasks.setText(str(num_completed_tasks))
+        self.num_all_completed_tasks.setText(str(num_all_completed_tasks))
         self.completed_tasks.setText(f"Completed Tasks\n{self.duration_dict[choices[new_idx]]}")
 
-class MatplotLibGraph(FigureCanvasQTAgg):
-    def __init__(self, width=2, height=2, dpi=100):
-        fig = plt.figure(figsize=(width, height), dpi=dpi)
-        self.axes = fig.add_subplot(111)
-        plt.subplots_adjust(top=0.98, bottom=0.25)
-        super().__init__(fig)
+# Base class of the plots by day/week/month/year, the last 20 periods are shown first and the points of the dates shown are read again 
+# after pan and zoom (long ranges are downsampled by the database)
+class PeriodPlots(QWidget):
+    name = "" # Name used in the logs
+    ylabel = ""
+
+    def get_series(self, period: str, start, end, max_points) -> tuple:
+        '''Return (dates, values) as NumPy arrays from the database (see AnalyseTodolist.get_time_series)'''
+        raise NotImplementedError
+
+    def get_value_labels(self, values) -> list:
+        '''Return the label of each point'''
+        return [f"{y}" for y in values]
 
-class TodolistPlots(QWidget):
     def __init__(self):
         super().__init__()
         self.layout = QVBoxLayout(self)
@@ -108,40 +121,80 @@ class TodolistPlots(QWidget):
         self.drop_down_choices.addItem("Monthly")
         self.drop_down_choices.addItem("Yearly")
         self.drop_down_choices.setCurrentIndex(0)
-        self.drop_down_choices.setToolTip("Plots the last 20 data points\nChanges the x-axis to plot by daily/weekly/monthly/yearly")
+        self.drop_down_choices.setToolTip("Plots the last 20 data points, use pan and zoom to see the other dates\n"
+                                          "Changes the x-axis to plot by daily/weekly/monthly/yearly")
         self.drop_down_choices.setFixedWidth(100)
         self.layout.addWidget(self.drop_down_choices, alignment=Qt.AlignmentFlag.AlignCenter)
         self.drop_down_choices.currentIndexChanged.connect(self.update_plot)
-
-        # Matplotlib graph for top 20 (default is daily)
-        self.graph = MatplotLibGraph()
+        self.needs_update = False # True if the data changed while the plot is hidden (the analyse tab is not shown)
+        self.period = None # Period of the points plotted, the last 20 periods are shown when the period is changed
+        self.xlim = None # x limits of the points plotted
+
+        # The points are read again once the pan or zoom stops for PAN_DELAY
+        self.pan_timer = QTimer(self)
+        self.pan_timer.setSingleShot(True)
+        self.pan_timer.setInterval(PAN_DELAY)
+        self.pan_timer.timeout.connect(self.update_plot)
+
+        # Chart for top 20 (default is daily), native or matplotlib from the config (see analyse_charts.py)
+        self.graph = create_line_chart()
+        self.graph.xlim_changed.connect(self.xlim_changed)
         self.update_plot(0)
-        toolbar = NavigationToolbar(self.graph, self)
+        toolbar = self.graph.create_toolbar(self)
         self.layout.addWidget(toolbar, alignment=Qt.AlignmentFlag.AlignCenter)
         self.layout.addWidget(self.graph)
         self.layout.setStretch(0, 0)
         self.layout.setStretch(1, 0)
         self.layout.setStretch(2, 1)
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.needs_update:
+            self.update_plot()
+
+    @Slot(float, float)
+    def xlim_changed(self, xmin: float, xmax: float):
+        # The x limits also change while the points are plotted, the timer only runs if the dates shown are not the dates plotted
+        if (xmin, xmax) != self.xlim:
+            self.pan_timer.start()
+        else:
+            self.pan_timer.stop()
+
     @error_handler
     @Slot()
     def update_plot(self, idx=0):
-        logger.debug("Updating to do list plot")
+        if not self.isVisible():
+            self.needs_update = True # Updated when the plot is shown
+            return
+        self.needs_update = False
+        logger.debug(f"Updating {self.name} plot")
         option_chosen = ['day', 'week', 'month', 'year']
-        idx = self.drop_down_choices.currentIndex()
-        date_array, num_array = AnalyseTodolist.get_num_completed_task_by_time(option_chosen[idx])
-        self.graph.axes.cla()
-        self.graph.axes.plot(date_array, num_array, '-o')
-        self.graph.axes.set_xlabel(option_chosen[idx].title())
-        self.graph.axes.set_ylabel("Number of tasks completed")
-        self.graph.axes.set_ylim(max(0, min(num_array)-1), max(num_array)+2)
-        self.graph.axes.set_xticks(self.graph.axes.get_xticks())
-        self.graph.axes.set_xticklabels(date_array, rotation=45, ha='right', rotation_mode='anchor')
-        ax = self.graph.figure.gca()
-        ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-        for x, y in zip(date_array, num_array):
-            self.graph.axes.annotate(f"{y}", (x, y), textcoords='data', fontsize=12)
-        self.graph.draw()
+        period = option_chosen[self.drop_down_choices.currentIndex()]
+        if period == self.period:
+            # Same dates as shown (after pan and zoom or when the data changed)
+            start, end = (x_to_date(x) for x in self.graph.get_xlim())
+            dates, values = self.get_series(period, start, end, MAX_POINTS)
+            x = date_to_x(dates)
+            xlim = None
+        else:
+            dates, values = self.get_series(period, None, None, None)
+            x = date_to_x(dates)
+            xlim = (x[0] - PERIOD_DAYS[period] / 2, x[-1] + PERIOD_DAYS[period] / 2) if len(x) else None
+            self.period = period
+            self.xlim = xlim
+
+        step = -(-len(x) // MAX_TICKS) or 1 # Ticks on every step points
+        ticks = (x[::step], AnalyseTodolist.format_dates(dates[::step].tolist(), period))
+        value_labels = self.get_value_labels(values) if len(values) <= MAX_MARKERS else []
+        self.graph.plot_line(x, values, value_labels, period.title(), self.ylabel, ticks, xlim)
+        self.xlim = self.graph.get_xlim()
+
+class TodolistPlots(PeriodPlots):
+    name = "to do list"
+    ylabel = "Number of tasks completed"
+
+    def get_series(self, period: str, start, end, max_points) -> tuple:
+        return AnalyseTodolist.get_completed_task_series(period, start, end, max_points)
 
 class CompletedTimers(QWidget):
     def __init__(self):
@@ -165,8 +218,8 @@ class CompletedTimers(QWidget):
         self.duration_dict = {7: "in the last 7 days", 30: "in the last 30 days", 365: "in the last 365 days"}
 
         # labels to display, default to show last 7 days 
-        self.total_focus_time = AnalyseTodolist.get_sum_timers(7, 'focus')
-        self.all_focus_time = AnalyseTodolist.get_sum_all_timers('focus')
+        self.total_focus_time = get_aggregate("focus_time_7", AnalyseTodolist.get_sum_timers, 7, 'focus')
+        self.all_focus_time = get_aggregate("focus_time_all", AnalyseTodolist.get_sum_all_timers, 'focus')
         self.label_focus_time = QLabel(f"Total focus time \n{self.duration_dict[7]}", alignment=Qt.AlignmentFlag.AlignCenter)
         self.label_all_focus_time = QLabel("Total focus time \nfrom the beginning", alignment=Qt.AlignmentFlag.AlignCenter)
         self.num_total_focus_time = QLabel(str(self.convert_to_hr_mins(self.total_focus_time)), alignment=Qt.AlignmentFlag.AlignCenter) 
@@ -198,66 +251,25 @@ class CompletedTimers(QWidget):
         choices = [7, 30, 365]
         new_idx = self.drop_down_tasks.currentIndex()
 
-        self.total_focus_time = AnalyseTodolist.get_sum_timers(choices[new_idx], 'focus')
+        self.total_focus_time = snapshot.aggregates[f"focus_time_{choices[new_idx]}"] = AnalyseTodolist.get_sum_timers(choices[new_idx], 'focus')
         self.num_total_focus_time.setText(self.convert_to_hr_mins(self.total_focus_time))
         self.label_focus_time.setText(f"Total focus time \n{self.duration_dict[choices[new_idx]]}")
 
-        self.all_focus_time = AnalyseTodolist.get_sum_all_timers('focus')
+        self.all_focus_time = snapshot.aggregates["focus_time_all"] = AnalyseTodolist.get_sum_all_timers('focus')
         self.num_all_focus_time.setText(self.convert_to_hr_mins(self.all_focus_time))
 
     def convert_to_hr_mins(self, seconds: int):
-        hrs = seconds // 3600 
-        mins = (seconds - hrs * 3600) // 60
-        return f"{hrs} h {mins} mins" if hrs else f"{mins} mins"
+        return convert_to_hr_mins(seconds)
 
-class PomodoroPlots(QWidget):
-    def __init__(self):
-        super().__init__()
-        self.layout = QVBoxLayout(self)
-        self.setLayout = self.layout 
-
-        # Drop down list for selecting plot duration 
-        self.drop_down_choices = QComboBox()
-        self.drop_down_choices.addItem("Daily")
-        self.drop_down_choices.addItem("Weekly")
-        self.drop_down_choices.addItem("Monthly")
-        self.drop_down_choices.addItem("Yearly")
-        self.drop_down_choices.setCurrentIndex(0)
-        self.drop_down_choices.setToolTip("Plots the last 20 data points\nChanges the x-axis to plot by daily/weekly/monthly/yearly")
-        self.drop_down_choices.setFixedWidth(100)
-        self.layout.addWidget(self.drop_down_choices, alignment=Qt.AlignmentFlag.AlignCenter)
-        self.drop_down_choices.currentIndexChanged.connect(self.update_plot)
+class PomodoroPlots(PeriodPlots):
+    name = "pomodoro"
+    ylabel = "Sum of focus timer completed"
 
-        # Matplotlib graph for top 20 (default is weekly)
-        self.graph = MatplotLibGraph()
-        self.update_plot(0)
-        toolbar = NavigationToolbar(self.graph, self)
-        self.layout.addWidget(toolbar, alignment=Qt.AlignmentFlag.AlignCenter)
-        self.layout.addWidget(self.graph)
-        self.layout.setStretch(0, 0)
-        self.layout.setStretch(1, 0)
-        self.layout.setStretch(2, 1)
+    def get_series(self, period: str, start, end, max_points) -> tuple:
+        return AnalyseTodolist.get_focus_time_series(period, start, end, max_points)
 
-    @error_handler
-    @Slot()
-    def update_plot(self, idx=0):
-        logger.debug("Updating pomodoro plot")
-        option_chosen = ['day', 'week', 'month', 'year']
-        idx = self.drop_down_choices.currentIndex()
-        date_array, num_array = AnalyseTodolist.get_sum_focus_timers_by_time(option_chosen[idx])
-        self.graph.axes.cla()
-        self.graph.axes.plot(date_array, num_array, '-o')
-        self.graph.axes.set_xlabel(option_chosen[idx].title())
-        self.graph.axes.set_ylabel("Sum of focus timer completed")
-        self.graph.axes.set_ylim(max(0, min(num_array)-1), max(num_array)+2)
-        self.graph.axes.set_xticks(self.graph.axes.get_xticks())
-        self.graph.axes.set_xticklabels(date_array, rotation=45, ha='right', rotation_mode='anchor')
-        ax = self.graph.figure.gca()
-        ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-        for x, y in zip(date_array, num_array):
-            if y: # don't display any labels if 0 mins 
-                self.graph.axes.annotate(f"{CompletedTimers.convert_to_hr_mins(None, y*60)}", (x, y), textcoords='data', fontsize=12)
-        self.graph.draw()
+    def get_value_labels(self, values) -> list:
+        return [convert_to_hr_mins(y*60) if y else "" for y in values] # don't display any labels if 0 mins 
 
 class AnalysePomodoroWidget(QWidget):
     def __init__(self):
@@ -267,9 +279,15 @@ class AnalysePomodoroWidget(QWidget):
 
         self.completed_timers = CompletedTimers()
         self.graph = PomodoroPlots()
+        self.heatmap = CalendarHeatmap()
+
+        # The calendar heatmap is below the plot
+        plots_layout = QVBoxLayout()
+        plots_layout.addWidget(self.graph, 1)
+        plots_layout.addWidget(self.heatmap, 0)
 
         self.layout.addWidget(self.completed_timers, alignment=Qt.AlignmentFlag.AlignVCenter)
-        self.layout.addWidget(self.graph)
+        self.layout.addLayout(plots_layout)
         self.layout.setStretch(0, 0)
         self.layout.setStretch(1, 1)
         self.setContentsMargins(50, 0, 0, 0)
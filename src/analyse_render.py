@@ -0,0 +1,330 @@
+from PySide6.QtWidgets import QWidget, QVBoxLayout
+from PySide6.QtCore import Signal, Slot, QCoreApplication, QEventLoop
+from PySide6.QtGui import QImage, QPainter
+from concurrent.futures import ThreadPoolExecutor
+import abc, logging, shiboken6, time
+
+import numpy as np
+
+# Creating logger object to suppress logging messages from matplotlib
+mpl_logger = logging.getLogger('matplotlib')
+mpl_logger.setLevel(logging.WARNING)
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+from matplotlib.backends.backend_qtagg import NavigationToolbar2QT as NavigationToolbar
+
+import src.overhead as oh
+from src.analyse_charts import AbstractWidgetType, LineChart, BarChart, HeatmapChart, MAX_MARKERS, SERIES_COLOURS, x_to_date
+
+matplotlib.use("QtAgg")
+plt.style.use("seaborn-v0_8-darkgrid")
+
+# matplotlib backend of the charts of the analyse tab (see analyse_charts.py), only imported when it is chosen in the config
+# The figures are drawn with Agg in the render thread and the GUI thread only paints the image of the last render,
+# so drawing a figure does not block the timer or the input
+# NOTE: the figure of the canvas (GUI thread) has the same artists as the figure drawn in the render thread, it is only used for the events
+# (e.g. pan and zoom of the toolbar) and saving the figure, it is never drawn on the GUI thread
+
+# Get logger and start logging
+logger = oh.get_logger("analyse (r)")
+logger.debug("Logger started")
+
+# One thread so the figures are drawn one at a time, matplotlib is not thread safe
+render_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+
+CMAP = matplotlib.colormaps["Greens"].with_extremes(under="#E4E6EB", bad=(0, 0, 0, 0)) # Days without any value are grey, days outside the range are blank
+
+class RenderedCanvas(FigureCanvasQTAgg, abc.ABC, metaclass=AbstractWidgetType):
+    '''Canvas of a figure drawn in the render thread. Subclasses create the figure (create_figure) and update its artists from a state
+    of plain data (set_state), the same functions are used for the figure of the canvas and the figure of the render thread'''
+    rendered = Signal(object) # Emitted from the render thread with the future of the render
+
+    @abc.abstractmethod
+    def create_figure(self) -> Figure:
+        '''Return a new figure with the artists that set_state updates, called once in each thread'''
+
+    @abc.abstractmethod
+    def get_state(self) -> dict:
+        '''Return the state of the figure of the canvas to draw, called on the GUI thread'''
+
+    @abc.abstractmethod
+    def set_state(self, figure: Figure, state: dict) -> None:
+        '''Update the artists of the figure from the state'''
+
+    def __init__(self):
+        super().__init__(self.create_figure())
+        self.generation = 0 # Number of the last render requested, the older renders are not shown
+        self.future = None
+        self.image = None # (generation, QImage, buffer of the image) of the last render shown
+        self.render_figure = None # Figure of the render thread, only used in the render thread
+        self.rendered.connect(self.show_render)
+
+    def draw(self):
+        # Called by draw_idle after the artists are updated, pan, zoom and resize, the figure is drawn in the render thread instead
+        if self.width() <= 0 or self.height() <= 0:
+            return
+        state = self.get_state()
+        state["size"], state["dpi"], state["ratio"] = tuple(self.figure.get_size_inches()), self.figure.dpi, self.device_pixel_ratio
+        self.generation += 1
+        if self.future is not None:
+            self.future.cancel() # Only cancelled if it is not started yet, otherwise it is not shown once it is done
+        self.future = render_executor.submit(self.render, self.generation, state)
+        self.future.add_done_callback(self.emit_rendered)
+
+    def emit_rendered(self, future):
+        # Runs in the render thread (or the GUI thread when cancelled), the canvas may be deleted while the figure is drawn
+        if shiboken6.isValid(self):
+            self.rendered.emit(future)
+
+    def render(self, generation: int, state: dict):
+        # Runs in the render thread, returns (generation, image, buffer of the image) or None if a newer render is requested
+        if generation != self.generation:
+            return None
+        if self.render_figure is None:
+            self.render_figure = self.create_figure()
+        self.render_figure.set_dpi(state["dpi"])
+        self.render_figure.set_size_inches(*state["size"], forward=False)
+        self.set_state(self.render_figure, state)
+        canvas = FigureCanvasAgg(self.render_figure) # New canvas (and buffer) for each render so the image shown is never drawn over
+        canvas.draw()
+        buffer = canvas.buffer_rgba()
+        image = QImage(buffer, buffer.shape[1], buffer.shape[0], QImage.Format.Format_RGBA8888) # Uses the buffer without copying
+        image.setDevicePixelRatio(state["ratio"])
+        return generation, image, buffer
+
+    @Slot(object)
+    def show_render(self, future):
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"Failed to render the figure of {type(self).__name__}: {e}")
+            return
+        if result is None or result[0] != self.generation:
+            return # A newer render is requested
+        self.image = result
+        self.update()
+
+    def paintEvent(self, event):
+        # The image is scaled to the canvas while the image of the new size is drawn
+        painter = QPainter(self)
+        try:
+            if self.image is not None:
+                painter.drawImage(self.rect(), self.image[1])
+            self._draw_rect_callback(painter) # Zoom rectangle of the toolbar
+        finally:
+            painter.end()
+
+    def wait_rendered(self, timeout: float = 10) -> bool:
+        '''Process the Qt events until the image of the last render requested is shown (e.g. for the benchmarks), 
+        returns False if it is not shown within the timeout (seconds) or the render failed'''
+        deadline = time.monotonic() + timeout
+        while self.future is not None and (self.image is None or self.image[0] != self.generation):
+            if time.monotonic() > deadline or (self.future.done() and self.future.exception() is not None):
+                return False
+            QCoreApplication.processEvents(QEventLoop.ProcessEventsFlag.AllEvents, 5)
+        return True
+
+# Graph of a line with a label on each point, drawn in the render thread (see RenderedCanvas)
+class MatplotLibGraph(RenderedCanvas):
+    def __init__(self, width=2, height=2, dpi=100):
+        self.figsize, self.dpi = (width, height), dpi # Used by create_figure
+        super().__init__()
+        self.axes = self.figure.axes[0]
+        self.state = None # Points, labels and axes plotted
+
+    def create_figure(self) -> Figure:
+        fig = Figure(figsize=self.figsize, dpi=self.dpi)
+        axes = fig.add_subplot(111)
+        fig.subplots_adjust(top=0.98, bottom=0.25)
+        axes.plot([], [], '-o')
+        axes.yaxis.set_major_locator(MaxNLocator(integer=True))
+        return fig
+
+    def get_state(self) -> dict:
+        # The limits after pan and zoom are set last so the figure drawn shows the same dates as the canvas
+        return dict(self.state or {}, view=(self.axes.get_xlim(), self.axes.get_ylim()))
+
+    def set_state(self, figure: Figure, state: dict) -> None:
+        axes = figure.axes[0]
+        if "x" in state:
+            line = axes.lines[0]
+            line.set_data(state["x"], state["values"])
+            line.set_marker("o" if len(state["values"]) <= MAX_MARKERS else "")
+            for i, (x_value, y, text) in enumerate(zip(state["x"], state["values"], state["value_labels"])):
+                if i == len(axes.texts):
+                    axes.annotate("", (x_value, y), textcoords='data', fontsize=12) # More labels are added when there are more points
+                label = axes.texts[i]
+                label.set_text(text)
+                label.xy = label.xyann = (x_value, y)
+                label.set_visible(bool(text))
+            for label in axes.texts[len(state["value_labels"]):]:
+                label.set_visible(False)
+            axes.set_xlabel(state["xlabel"])
+            axes.set_ylabel(state["ylabel"])
+            if state["xlim"] is not None:
+                axes.set_xlim(*state["xlim"]) # Before the ticks so the ticks do not change the limits
+            axes.set_xticks(*state["ticks"], rotation=45, ha='right', rotation_mode='anchor')
+            axes.set_ylim(*state["ylim"])
+        if "view" in state:
+            axes.set_xlim(*state["view"][0])
+            axes.set_ylim(*state["view"][1])
+
+    def plot_line(self, x, values, value_labels: list, xlabel: str, ylabel: str, ticks: tuple, xlim=None) -> None:
+        '''Plot the values at x with a label on each point (empty labels are not shown), ticks is (x of the ticks, tick labels), 
+        the x limits are kept if xlim is None. The figure is drawn in the render thread when Qt is idle, nothing is drawn if nothing changed'''
+        ylim = (max(0, min(values, default=0) - 1), max(values, default=0) + 2)
+        state = {"x": list(x), "values": list(values), "value_labels": list(value_labels), "xlabel": xlabel, "ylabel": ylabel, 
+                 "ticks": (list(ticks[0]), list(ticks[1])), "xlim": xlim, "ylim": ylim}
+        if state == self.state:
+            return # Nothing changed
+        self.state = state
+        self.set_state(self.figure, state)
+        self.draw_idle()
+
+# Bars of one or more series stacked on each other, drawn in the render thread (see RenderedCanvas)
+class BarCanvas(RenderedCanvas):
+    def __init__(self):
+        super().__init__()
+        self.state = {}
+
+    def create_figure(self) -> Figure:
+        fig = Figure(figsize=(4, 2), dpi=100, layout="constrained") # The labels change, the margins are fitted when drawn
+        fig.add_subplot(111)
+        return fig
+
+    def get_state(self) -> dict:
+        return self.state
+
+    def set_state(self, figure: Figure, state: dict) -> None:
+        if not state:
+            return
+        axes = figure.axes[0]
+        axes.clear() # The number of bars changes, the bars are added again
+        positions = np.arange(len(state["labels"]))
+        bottom = np.zeros(len(positions))
+        for (name, values), colour in zip(state["series"].items(), SERIES_COLOURS):
+            axes.bar(positions, values, 0.8, bottom=bottom, color=colour, label=name)
+            bottom = bottom + values
+        # Labels thinned so they do not overlap (about 8 pixels for each character)
+        fits = max(1, int(figure.bbox.width * 0.8 / (max(map(len, state["labels"]), default=1) * 8 + 12)))
+        step = max(1, -(-len(positions) // fits))
+        axes.set_xticks(positions[::step], state["labels"][::step])
+        axes.set_ylabel(state["ylabel"])
+        axes.yaxis.set_major_locator(MaxNLocator(integer=True))
+        if len(state["series"]) > 1:
+            axes.legend(loc="upper right")
+
+    def plot_bars(self, labels: list, series: dict, ylabel: str) -> None:
+        '''Plot a bar for each label with the values of each series (dict of name: values) stacked in order'''
+        self.state = {"labels": list(labels), "series": {name: np.asarray(values, dtype=float) for name, values in series.items()}, "ylabel": ylabel}
+        self.set_state(self.figure, self.state)
+        self.draw_idle()
+
+# Image with a pixel for each day, drawn in the render thread (see RenderedCanvas)
+class HeatmapCanvas(RenderedCanvas):
+    def __init__(self):
+        super().__init__()
+        self.axes = self.figure.axes[0]
+        self.state = {}
+
+    def create_figure(self) -> Figure:
+        figure = Figure(figsize=(8, 1.6), dpi=100)
+        axes = figure.add_axes((0.05, 0.05, 0.93, 0.75))
+        axes.imshow(np.full((7, 53), np.nan), cmap=CMAP, vmin=0.5, vmax=1, aspect="equal", interpolation="nearest")
+        axes.grid(False)
+        axes.tick_params(length=0, labelsize=8)
+        axes.xaxis.tick_top()
+        axes.set_yticks([0, 2, 4], ["Mon", "Wed", "Fri"])
+        for spine in axes.spines.values():
+            spine.set_visible(False)
+        return figure
+
+    def get_state(self) -> dict:
+        return self.state
+
+    def set_state(self, figure: Figure, state: dict) -> None:
+        if not state:
+            return
+        axes = figure.axes[0]
+        columns = state["grid"].shape[1]
+        image = axes.images[0]
+        image.set_data(state["grid"])
+        image.set_extent((-0.5, columns - 0.5, 6.5, -0.5))
+        image.set_clim(*state["clim"])
+        axes.set_xlim(-0.5, columns - 0.5)
+        axes.set_ylim(6.5, -0.5)
+        axes.set_xticks(*state["months"])
+
+    def plot_calendar(self, grid: np.ndarray, clim: tuple, months: tuple) -> None:
+        '''Show the calendar grid (see get_calendar) with the colour limits, months is (column, name) of the month labels'''
+        self.state = {"grid": grid, "clim": clim, "months": months}
+        self.set_state(self.figure, self.state)
+        self.draw_idle()
+
+# The canvases in a widget of the chart interface, the toolbar is the matplotlib toolbar
+class MatplotlibLineChart(LineChart):
+    def __init__(self):
+        super().__init__()
+        self.canvas = MatplotLibGraph()
+        self.canvas.axes.fmt_xdata = lambda x: x_to_date(x).strftime("%d-%b-%Y") # Date shown by the toolbar
+        self.canvas.axes.callbacks.connect("xlim_changed", lambda axes: self.xlim_changed.emit(*axes.get_xlim()))
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.canvas)
+
+    def plot_line(self, x, values, value_labels: list, xlabel: str, ylabel: str, ticks: tuple, xlim=None) -> None:
+        self.canvas.plot_line(x, values, value_labels, xlabel, ylabel, ticks, xlim)
+
+    def get_xlim(self) -> tuple:
+        return tuple(float(x) for x in self.canvas.axes.get_xlim())
+
+    def set_xlim(self, xmin: float, xmax: float) -> None:
+        self.canvas.axes.set_xlim(xmin, xmax)
+        self.canvas.draw_idle()
+
+    def create_toolbar(self, parent: QWidget) -> QWidget:
+        return NavigationToolbar(self.canvas, parent)
+
+    def wait_drawn(self, timeout: float = 10) -> bool:
+        return self.canvas.wait_rendered(timeout)
+
+class MatplotlibBarChart(BarChart):
+    def __init__(self):
+        super().__init__()
+        self.canvas = BarCanvas()
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.canvas)
+
+    def plot_bars(self, labels: list, series: dict, ylabel: str) -> None:
+        self.canvas.plot_bars(labels, series, ylabel)
+
+    def wait_drawn(self, timeout: float = 10) -> bool:
+        return self.canvas.wait_rendered(timeout)
+
+class MatplotlibHeatmap(HeatmapChart):
+    def __init__(self):
+        super().__init__()
+        self.canvas = HeatmapCanvas()
+        self.canvas.mpl_connect("motion_notify_event", self.mouse_moved)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.canvas)
+
+    def plot_calendar(self, grid: np.ndarray, clim: tuple, months: tuple) -> None:
+        self.canvas.plot_calendar(grid, clim, months)
+
+    def wait_drawn(self, timeout: float = 10) -> bool:
+        return self.canvas.wait_rendered(timeout)
+
+    def mouse_moved(self, event):
+        if event.inaxes is not self.canvas.axes:
+            self.cell_hovered.emit(-1, -1)
+            return
+        self.cell_hovered.emit(int(round(event.xdata)), int(round(event.ydata)))
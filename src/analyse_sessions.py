@@ -0,0 +1,134 @@
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QComboBox
+from PySide6.QtCore import Qt, Slot
+
+import numpy as np
+
+import src.overhead as oh
+from src.db import AnalyseTodolist, TIMER_CATEGORIES
+from src.analyse_charts import create_bar_chart
+
+# Statistics of the focus sessions: how long the timers ran and how often they were stopped early, and the focus time by hour of the day
+# and day of the week. Each refresh reads two small grouped queries (duration rollup and time rollup), cached until the pomodoro table changes
+# NOTE: the functions at the top do not use Qt or the database
+
+# Get logger and start logging
+logger = oh.get_logger("analyse (s)")
+logger.debug("Logger started")
+
+LENGTH_BIN = 5 # Minutes of each bar of the lengths of the timers
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+# Decorator to display error message when function fails
+def error_handler(func):
+    def inner(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Function execution of {func.__name__} failed: {e}")
+            err = oh.ErrorBox(str(e))
+            err.exec()
+    return inner
+
+def get_completion(counts: np.ndarray) -> np.ndarray:
+    '''Return the ratio of the timers of each category that were not stopped early (see AnalyseTodolist.get_timer_lengths), NaN without timers'''
+    totals = counts.sum(axis=(1, 2))
+    return np.where(totals > 0, counts[:, 0].sum(axis=1) / np.maximum(totals, 1), np.nan)
+
+def get_length_bins(counts: np.ndarray, width: int = LENGTH_BIN) -> tuple:
+    '''Return (labels, completed, stopped) of the number of timers of one category (counts of shape (2, minutes)) in bins of width minutes,
+    up to the longest timer'''
+    bins = -(-counts.shape[1] // width)
+    padded = np.zeros((2, bins * width), dtype=counts.dtype)
+    padded[:, :counts.shape[1]] = counts
+    binned = padded.reshape(2, bins, width).sum(axis=2)
+    labels = [f"{i * width}-{i * width + width - 1}" for i in range(bins)]
+    return labels, binned[0], binned[1]
+
+def format_ratio(ratio: float) -> str:
+    return "-" if np.isnan(ratio) else f"{ratio:.0%}"
+
+class FocusSessions(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.layout = QHBoxLayout(self)
+        self.setLayout = self.layout
+        self.needs_update = False # True if the timers changed while the statistics are hidden
+        self.counts, self.seconds = np.zeros((len(TIMER_CATEGORIES), 2, 1), dtype=np.int64), np.zeros((len(TIMER_CATEGORIES), 2, 1), dtype=np.int64)
+
+        # Completion ratio of the focus timers and breaks, and the ratio of the focus time to the break time
+        text_style = "color: #545E75; font-weight: bold; font-size: 20px; font-family: arial, roboto, sans-serif"
+        num_style = "color: #304D6D; font-weight: bold; font-size: 32px; font-family: arial, roboto, sans-serif"
+        numbers_layout = QVBoxLayout()
+        self.numbers = {}
+        for name, text in (("focus", "Focus timers\ncompleted"), ("break", "Breaks\ncompleted"), ("stopped", "Stopped early"), ("ratio", "Focus to break time")):
+            label, number = QLabel(text, alignment=Qt.AlignmentFlag.AlignCenter), QLabel("-", alignment=Qt.AlignmentFlag.AlignCenter)
+            label.setStyleSheet(text_style)
+            number.setStyleSheet(num_style)
+            numbers_layout.addWidget(label)
+            numbers_layout.addWidget(number)
+            numbers_layout.addSpacing(20)
+            self.numbers[name] = number
+        numbers_layout.addStretch()
+
+        # Lengths of the focus timers or breaks, with the focus time by hour and by day of the week below
+        self.drop_down_category = QComboBox()
+        self.drop_down_category.addItems(["Focus timers", "Breaks"])
+        self.drop_down_category.setToolTip("Show the lengths of the focus timers or the breaks")
+        self.drop_down_category.setFixedWidth(120)
+        self.drop_down_category.currentIndexChanged.connect(self.draw_lengths)
+        self.lengths_chart = create_bar_chart()
+        self.hours_chart = create_bar_chart()
+        self.weekdays_chart = create_bar_chart()
+        charts_layout = QGridLayout()
+        charts_layout.addWidget(self.drop_down_category, 0, 0, 1, 2, alignment=Qt.AlignmentFlag.AlignCenter)
+        charts_layout.addWidget(self.lengths_chart, 1, 0, 1, 2)
+        charts_layout.addWidget(self.hours_chart, 2, 0)
+        charts_layout.addWidget(self.weekdays_chart, 2, 1)
+        charts_layout.setColumnStretch(0, 2)
+        charts_layout.setColumnStretch(1, 1)
+        charts_layout.setRowStretch(1, 1)
+        charts_layout.setRowStretch(2, 1)
+
+        self.layout.addLayout(numbers_layout)
+        self.layout.addLayout(charts_layout)
+        self.layout.setStretch(0, 0)
+        self.layout.setStretch(1, 1)
+        self.setContentsMargins(50, 0, 0, 0)
+
+        self.update_sessions()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.needs_update:
+            self.update_sessions()
+
+    @error_handler
+    @Slot()
+    def update_sessions(self, *args):
+        # Read the lengths of the timers and the focus time by hour again, only when the statistics are shown
+        if not self.isVisible():
+            self.needs_update = True
+            return
+        self.needs_update = False
+        logger.debug("Updating focus session statistics")
+        self.counts, self.seconds = AnalyseTodolist.get_timer_lengths()
+        focus = AnalyseTodolist.get_focus_by_weekday_hour()
+
+        completion = get_completion(self.counts)
+        self.numbers["focus"].setText(format_ratio(completion[0]))
+        self.numbers["break"].setText(format_ratio(completion[1]))
+        stopped = self.counts[:, 1].sum(axis=1)
+        self.numbers["stopped"].setText(f"{stopped[0]} focus, {stopped[1]} breaks")
+        focus_seconds, break_seconds = self.seconds.sum(axis=(1, 2))
+        self.numbers["ratio"].setText(f"{focus_seconds / break_seconds:.1f} : 1" if break_seconds else "-")
+
+        self.hours_chart.plot_bars([str(hour) for hour in range(24)], {"Focus time": np.round(focus.sum(axis=0) / 3600, 1)}, "Hours by hour of the day")
+        self.weekdays_chart.plot_bars(WEEKDAYS, {"Focus time": np.round(focus.sum(axis=1) / 3600, 1)}, "Hours by day")
+        self.draw_lengths()
+
+    @error_handler
+    @Slot()
+    def draw_lengths(self, *args):
+        # Number of timers of each length of the category chosen, from the lengths read
+        labels, completed, stopped = get_length_bins(self.counts[self.drop_down_category.currentIndex()])
+        self.lengths_chart.plot_bars([f"{label} mins" for label in labels], {"Completed": completed, "Stopped early": stopped}, "Number of timers")
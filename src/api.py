@@ -0,0 +1,441 @@
+import asyncio, json, re, threading, time, contextlib, hmac, os, secrets, psycopg
+from concurrent.futures import Future
+from urllib.parse import urlsplit, unquote, parse_qs
+from PySide6.QtCore import QObject, Signal, Slot, QTimer
+
+import src.overhead as oh
+from src.metrics import metrics
+from src.db import ConnectionPool, SectionTools, MainTaskTools, SubTaskTools, AnalyseTodolist
+
+# Get logger and start logging
+logger = oh.get_logger("api")
+logger.debug("Logger started")
+
+HOST = "127.0.0.1" # Only bound to localhost so the api cannot be accessed from other computers
+TOKEN_PATH = os.path.join(oh.parent_dir, "config", "api_token") # Token sent by the clients, created when the server is first started
+STATUS_TEXT = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 
+               409: "Conflict", 415: "Unsupported Media Type", 500: "Internal Server Error"}
+MAX_MAIN_TASK_LEN, MAX_SUB_TASK_LEN, MAX_SECTION_LEN = 50, 60, 50 # Same character limits as the GUI
+
+class ApiError(Exception):
+    # Raised by the request handlers, returned to the client as the status code with the error message
+    def __init__(self, status: int, msg: str):
+        super().__init__(msg)
+        self.status = status
+
+def clean_name(body: dict, max_len: int, key="name") -> str:
+    '''Return the name in the request body with the same cleaning as the GUI (stripped and without single quotes)'''
+    name = body.get(key)
+    if not isinstance(name, str) or not name.strip().replace("'", ""):
+        raise ApiError(400, f"'{key}' has to be a non empty string")
+    name = name.strip().replace("'", "")
+    if len(name) > max_len:
+        raise ApiError(400, f"'{key}' exceeded character limit of {max_len}")
+    return name
+
+def get_token(path: str = TOKEN_PATH) -> str:
+    '''Return the token of the api from the file, a new token is written to the file (only readable by the user) if there is none'''
+    try:
+        with open(path, encoding="utf-8") as f:
+            token = f.read().strip()
+        if token:
+            return token
+    except FileNotFoundError:
+        pass
+    token = secrets.token_urlsafe(32)
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+        f.write(token)
+    logger.info(f"Created api token in {path}")
+    return token
+
+@contextlib.contextmanager
+def unique_name(msg: str):
+    # The names are unique in the database, the duplicate is returned to the client as a conflict 
+    try:
+        yield
+    except psycopg.errors.UniqueViolation:
+        raise ApiError(409, msg)
+
+# Functions that run in the connection pool threads, each does all the database calls of one request
+# The names in the request are only used to get the ids, the changes are done with the ids
+def get_section_id(section: str) -> int:
+    section_id = SectionTools.get_section_id(section)
+    if section_id is None:
+        raise ApiError(404, f"Section '{section}' not found")
+    return section_id
+
+def get_section_tasks(section: str) -> list:
+    '''Return the main tasks of the section with their sub tasks'''
+    return [{"name": main_task, "sub_tasks": sub_tasks} for _, main_task, _, _, sub_tasks, _ in MainTaskTools.get_section_tasks(get_section_id(section))]
+
+def get_main_task_ids(section: str, main_task: str) -> tuple:
+    '''Return the section id and main task id, raises 404 if the section or main task does not exist'''
+    section_id = get_section_id(section)
+    main_task_id = MainTaskTools.get_main_task_id(main_task, section_id)
+    if main_task_id is None:
+        raise ApiError(404, f"Main task '{main_task}' not found in section '{section}'")
+    return section_id, main_task_id
+
+def get_main_task(section: str, main_task: str) -> dict:
+    '''Return the main task with its sub tasks, raises 404 if the section or main task does not exist'''
+    _, main_task_id = get_main_task_ids(section, main_task)
+    return {"name": main_task, "sub_tasks": [sub_task for _, sub_task in SubTaskTools.get_sub_tasks(main_task_id)]}
+
+def add_section(name: str) -> None:
+    with unique_name(f"Duplicate section of '{name}' not allowed"):
+        SectionTools.add_section_name(name)
+
+def rename_section(section: str, name: str) -> None:
+    section_id = get_section_id(section)
+    with unique_name(f"Duplicate section of '{name}' not allowed"):
+        SectionTools.rename_section(section_id, name)
+
+def delete_section(section: str) -> None:
+    # Same as deleting the tab in the GUI, all the open tasks in the section are deleted
+    SectionTools.delete_section_with_tasks(get_section_id(section))
+
+def add_main_task(section: str, name: str) -> None:
+    section_id = get_section_id(section)
+    with unique_name(f"Duplicate main task '{name}' not allowed"):
+        MainTaskTools.add_main_task_to_section(name, section_id)
+
+def rename_main_task(section: str, main_task: str, name: str) -> None:
+    _, main_task_id = get_main_task_ids(section, main_task)
+    with unique_name(f"Duplicate main task '{name}' not allowed"):
+        MainTaskTools.rename_main_task_by_id(main_task_id, name)
+
+def delete_main_task(section: str, main_task: str) -> None:
+    # Same as deleting the main task in the GUI, all its sub tasks are deleted
+    MainTaskTools.delete_main_task_by_id(get_main_task_ids(section, main_task)[1])
+
+def complete_main_task(section: str, main_task: str) -> None:
+    _, main_task_id = get_main_task_ids(section, main_task)
+    sub_tasks = SubTaskTools.get_sub_tasks(main_task_id)
+    if sub_tasks:
+        raise ApiError(409, f"{len(sub_tasks)} sub task(s) still exist in '{main_task}'. Not allowed to mark as complete")
+    MainTaskTools.complete_main_task_by_id(main_task_id)
+
+def add_sub_task(section: str, main_task: str, name: str) -> None:
+    section_id, main_task_id = get_main_task_ids(section, main_task)
+    with unique_name(f"Duplicate sub task '{name}' not allowed"):
+        SubTaskTools.add_sub_tasks_to_main_task([name], main_task_id, section_id)
+
+def get_sub_task_id(section: str, main_task: str, sub_task: str) -> int:
+    # Raises 404 if the sub task does not exist 
+    for sub_task_id, name in SubTaskTools.get_sub_tasks(get_main_task_ids(section, main_task)[1]):
+        if name == sub_task:
+            return sub_task_id
+    raise ApiError(404, f"Sub task '{sub_task}' not found in main task '{main_task}'")
+
+def rename_sub_task(section: str, main_task: str, sub_task: str, name: str) -> None:
+    sub_task_id = get_sub_task_id(section, main_task, sub_task)
+    with unique_name(f"Duplicate sub task '{name}' not allowed"):
+        SubTaskTools.rename_sub_task_by_id(sub_task_id, name)
+
+def delete_sub_task(section: str, main_task: str, sub_task: str) -> None:
+    SubTaskTools.delete_sub_tasks_by_id([get_sub_task_id(section, main_task, sub_task)])
+
+def complete_sub_task(section: str, main_task: str, sub_task: str) -> None:
+    SubTaskTools.complete_sub_task_by_id(get_sub_task_id(section, main_task, sub_task))
+
+def get_analytics(days: int) -> dict:
+    return {"days": days,
+            "focus_seconds": AnalyseTodolist.get_sum_timers(days, "focus"), "all_focus_seconds": AnalyseTodolist.get_sum_all_timers("focus"),
+            "completed_tasks": AnalyseTodolist.get_num_completed_tasks(days), "all_completed_tasks": AnalyseTodolist.get_num_all_completed_tasks()}
+
+def get_analytics_by_time(period: str) -> dict:
+    focus_dates, focus_mins = AnalyseTodolist.get_sum_focus_timers_by_time(period)
+    task_dates, num_tasks = AnalyseTodolist.get_num_completed_task_by_time(period)
+    return {"period": period, "focus": {"dates": focus_dates, "minutes": focus_mins}, "completed_tasks": {"dates": task_dates, "counts": num_tasks}}
+
+class ApiServer(QObject):
+    '''Local HTTP/JSON api server running an asyncio event loop in its own thread,
+    database calls are run in a connection pool and timer requests are passed to the GUI thread with signals'''
+    tasks_changed = Signal() # Emitted (at most once every CHANGE_DELAY) when sections or tasks are changed by the api
+    completed_tasks_changed = Signal() # Emitted when tasks are marked as completed by the api
+
+    timer_request = Signal(str, dict, object) # Used to pass timer requests to the GUI thread with (action, request body, future)
+    changed = Signal(bool) # Used to pass changes to the GUI thread, True if tasks were completed
+
+    CHANGE_DELAY = 300 # Changes are grouped so the GUI is not reloaded on every request
+
+    def __init__(self, pomodoro, port: int, pool_size: int = 4, token: str = None):
+        super().__init__()
+        self.pomo = pomodoro
+        self.port = port
+        self.token = token or get_token()
+        self.hosts = {f"{HOST}:{port}", f"localhost:{port}"} # Host header of the requests, other hosts are web pages using DNS rebinding
+        self.pool_size = pool_size
+        self.loop = None
+        self.pool = None
+        self.thread = None
+        self.stats = {} # Request timing by route: [count, total ms, max ms]
+
+        # Signals emitted from the server thread are queued to the slots in the GUI thread
+        self.timer_request.connect(self.handle_timer_request)
+        self.changed.connect(self.queue_change)
+        self.completed_pending = False
+        self.change_timer = QTimer(self)
+        self.change_timer.setSingleShot(True)
+        self.change_timer.timeout.connect(self.emit_changes)
+
+        # Routes of the api: (method, route, handler), each {name} in the route is passed to the handler (url decoded)
+        self.routes = [
+            ("GET", "/timer", self.timer_state),
+            ("POST", "/timer/(start|pause|stop)", self.timer_action),
+            ("GET", "/sections", self.get_sections),
+            ("POST", "/sections", self.add_section),
+            ("PATCH", "/sections/{name}", self.rename_section),
+            ("DELETE", "/sections/{name}", self.delete_section),
+            ("GET", "/sections/{name}/tasks", self.get_tasks),
+            ("POST", "/sections/{name}/tasks", self.add_main_task),
+            ("GET", "/sections/{name}/tasks/{name}", self.get_main_task),
+            ("PATCH", "/sections/{name}/tasks/{name}", self.rename_main_task),
+            ("DELETE", "/sections/{name}/tasks/{name}", self.delete_main_task),
+            ("POST", "/sections/{name}/tasks/{name}/complete", self.complete_main_task),
+            ("POST", "/sections/{name}/tasks/{name}/subtasks", self.add_sub_task),
+            ("PATCH", "/sections/{name}/tasks/{name}/subtasks/{name}", self.rename_sub_task),
+            ("DELETE", "/sections/{name}/tasks/{name}/subtasks/{name}", self.delete_sub_task),
+            ("POST", "/sections/{name}/tasks/{name}/subtasks/{name}/complete", self.complete_sub_task),
+            ("GET", "/analytics", self.get_analytics),
+            ("GET", "/analytics/(day|week|month|year)", self.get_analytics_by_time),
+            ("GET", "/stats", self.get_stats),
+            ("GET", "/metrics", self.get_metrics),
+        ]
+        self.routes = [(method, route, re.compile(route.replace("{name}", r"([^/]+)") + "/?"), handler) for method, route, handler in self.routes]
+
+    def start(self):
+        '''Start the server thread, raises the error if the server failed to start (e.g. port already in use)'''
+        started = Future()
+        self.thread = threading.Thread(target=self.run_loop, args=(started,), name="api_server", daemon=True)
+        self.thread.start()
+        started.result(timeout=10)
+        logger.info(f"Api server started on http://{HOST}:{self.port}")
+
+    def run_loop(self, started: Future):
+        # Runs in the server thread until stop() is called
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.pool = ConnectionPool(self.pool_size)
+            server = self.loop.run_until_complete(asyncio.start_server(self.handle_connection, HOST, self.port))
+        except Exception as e:
+            logger.error(f"Api server failed to start: {e}")
+            if self.pool:
+                self.pool.close()
+            self.loop.close()
+            started.set_exception(e)
+            return
+        started.set_result(True)
+        self.loop.run_forever()
+        server.close()
+        self.loop.run_until_complete(server.wait_closed())
+        self.loop.close()
+        self.pool.close()
+
+    def stop(self):
+        '''Stop the server and wait for the server thread to end'''
+        if self.thread and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=10)
+            logger.info("Api server stopped")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Handles the requests of a connection, the connection is kept alive unless the client closes it
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    key, value = line.decode("latin-1").split(":", 1)
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                start = time.perf_counter()
+                status, route, payload = await self.dispatch(method, target, body, headers)
+                elapsed = (time.perf_counter() - start) * 1000
+                self.record_timing(f"{method} {route}", elapsed)
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                data = json.dumps(payload).encode()
+                writer.write((f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\nContent-Type: application/json\r\n"
+                              f"Content-Length: {len(data)}\r\nX-Response-Time: {elapsed:.3f}ms\r\n"
+                              f"Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n").encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            logger.debug(f"Api connection closed: {e}")
+        finally:
+            writer.close()
+
+    def check_request(self, headers: dict, body: bytes):
+        '''Raise ApiError if the request may be sent by a web page (another host, a cross origin request or a form) or has no valid token'''
+        if headers.get("host") not in self.hosts:
+            raise ApiError(403, "Host not allowed")
+        if "origin" in headers:
+            raise ApiError(403, "Requests from web pages are not allowed")
+        if not hmac.compare_digest(headers.get("authorization", "").encode(), f"Bearer {self.token}".encode()):
+            raise ApiError(401, "Missing or invalid token")
+        if body and headers.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+            raise ApiError(415, "Content-Type has to be application/json")
+
+    async def dispatch(self, method: str, target: str, body: bytes, headers: dict) -> tuple:
+        '''Return the (status code, route, json payload) of the request'''
+        url = urlsplit(target)
+        try:
+            self.check_request(headers, body)
+        except ApiError as e:
+            return e.status, url.path, {"error": str(e)}
+        allowed = False
+        for route_method, route, pattern, handler in self.routes:
+            match = pattern.fullmatch(url.path)
+            if not match:
+                continue
+            allowed = True
+            if route_method != method:
+                continue
+            try:
+                request = json.loads(body) if body else {}
+                if not isinstance(request, dict):
+                    raise ApiError(400, "Request body has to be a JSON object")
+                args = [unquote(group) for group in match.groups()]
+                status, payload = await handler(*args, request=request, query=parse_qs(url.query))
+                return status, route, payload
+            except ApiError as e:
+                return e.status, route, {"error": str(e)}
+            except json.JSONDecodeError as e:
+                return 400, route, {"error": f"Invalid JSON: {e}"}
+            except Exception as e:
+                logger.error(f"Api request {method} {target} failed: {e}")
+                return 500, route, {"error": str(e)}
+        if allowed:
+            return 405, url.path, {"error": f"Method {method} not allowed"}
+        return 404, url.path, {"error": f"{url.path} not found"}
+
+    def record_timing(self, route: str, elapsed: float):
+        stats = self.stats.setdefault(route, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+        logger.debug(f"Api request {route} took {elapsed:.3f} ms")
+
+    # Timer requests are run in the GUI thread as the timer widgets can only be used from the GUI thread
+    async def timer_state(self, request, query):
+        return 200, await self.run_in_gui("state", request)
+
+    async def timer_action(self, action, request, query):
+        return 200, await self.run_in_gui(action, request)
+
+    async def run_in_gui(self, action: str, request: dict) -> dict:
+        future = Future()
+        self.timer_request.emit(action, request, future)
+        return await asyncio.wrap_future(future)
+
+    @Slot()
+    def handle_timer_request(self, action: str, request: dict, future: Future):
+        # Runs in the GUI thread, sets the result of the future to the state of the timer
+        try:
+            if action == "start":
+                if self.pomo.is_running():
+                    raise ApiError(409, "Timer is already running")
+                if not self.pomo.is_started(): # Timer type can only be changed if the timer is not started
+                    timer = request.get("timer", "focus")
+                    if timer not in ("focus", "break"):
+                        raise ApiError(400, "'timer' has to be 'focus' or 'break'")
+                    self.pomo.tabbar.setCurrentIndex(0 if timer == "focus" else 1)
+                    if "extended" in request:
+                        self.pomo.timer_type.setChecked(bool(request["extended"]))
+                self.pomo.start_or_pause_timer()
+            elif action == "pause":
+                if not self.pomo.is_running():
+                    raise ApiError(409, "Timer is not running")
+                self.pomo.start_or_pause_timer()
+            elif action == "stop":
+                if not self.pomo.is_started():
+                    raise ApiError(409, "Timer is not started")
+                self.pomo.timer_stopped()
+            future.set_result(self.pomo.get_state())
+        except Exception as e:
+            future.set_exception(e)
+
+    @Slot()
+    def queue_change(self, completed: bool):
+        # Runs in the GUI thread, restarts the timer so the changes are grouped
+        self.completed_pending = self.completed_pending or completed
+        self.change_timer.start(self.CHANGE_DELAY)
+
+    @Slot()
+    def emit_changes(self):
+        self.tasks_changed.emit()
+        if self.completed_pending:
+            self.completed_pending = False
+            self.completed_tasks_changed.emit()
+
+    async def run_and_notify(self, func, *args, completed=False, status=200):
+        await self.pool.run(func, *args)
+        self.changed.emit(completed)
+        return status, {"ok": True}
+
+    # Section and task requests
+    async def get_sections(self, request, query):
+        return 200, await self.pool.run(SectionTools.get_section_name)
+
+    async def add_section(self, request, query):
+        return await self.run_and_notify(add_section, clean_name(request, MAX_SECTION_LEN), status=201)
+
+    async def rename_section(self, section, request, query):
+        return await self.run_and_notify(rename_section, section, clean_name(request, MAX_SECTION_LEN))
+
+    async def delete_section(self, section, request, query):
+        return await self.run_and_notify(delete_section, section)
+
+    async def get_tasks(self, section, request, query):
+        return 200, await self.pool.run(get_section_tasks, section)
+
+    async def add_main_task(self, section, request, query):
+        return await self.run_and_notify(add_main_task, section, clean_name(request, MAX_MAIN_TASK_LEN), status=201)
+
+    async def get_main_task(self, section, main_task, request, query):
+        return 200, await self.pool.run(get_main_task, section, main_task)
+
+    async def rename_main_task(self, section, main_task, request, query):
+        return await self.run_and_notify(rename_main_task, section, main_task, clean_name(request, MAX_MAIN_TASK_LEN))
+
+    async def delete_main_task(self, section, main_task, request, query):
+        return await self.run_and_notify(delete_main_task, section, main_task)
+
+    async def complete_main_task(self, section, main_task, request, query):
+        return await self.run_and_notify(complete_main_task, section, main_task, completed=True)
+
+    async def add_sub_task(self, section, main_task, request, query):
+        return await self.run_and_notify(add_sub_task, section, main_task, clean_name(request, MAX_SUB_TASK_LEN), status=201)
+
+    async def rename_sub_task(self, section, main_task, sub_task, request, query):
+        return await self.run_and_notify(rename_sub_task, section, main_task, sub_task, clean_name(request, MAX_SUB_TASK_LEN))
+
+    async def delete_sub_task(self, section, main_task, sub_task, request, query):
+        return await self.run_and_notify(delete_sub_task, section, main_task, sub_task)
+
+    async def complete_sub_task(self, section, main_task, sub_task, request, query):
+        return await self.run_and_notify(complete_sub_task, section, main_task, sub_task, completed=True)
+
+    # Analytics and server statistics
+    async def get_analytics(self, request, query):
+        days = query.get("days", ["7"])[0]
+        if not days.isdigit():
+            raise ApiError(400, "'days' has to be a positive integer")
+        return 200, await self.pool.run(get_analytics, int(days))
+
+    async def get_analytics_by_time(self, period, request, query):
+        return 200, await self.pool.run(get_analytics_by_time, period)
+
+    async def get_stats(self, request, query):
+        return 200, {route: {"count": count, "avg_ms": round(total / count, 3), "max_ms": round(max_ms, 3)}
+                     for route, (count, total, max_ms) in self.stats.items()}
+
+    async def get_metrics(self, request, query):
+        return 200, metrics.get_summary()
@@ -0,0 +1,110 @@
+import argparse, json, sys
+
+# Command line interface of tododoro, the subcommands are run without starting the GUI
+# NOTE: modules are imported in the subcommands so only the modules needed by the subcommand are loaded
+
+last_progress = None # Last progress printed so the same progress is not printed twice 
+
+def progress_bar(table: str, done: int, total: int) -> None:
+    '''Print a progress bar of the table to stderr'''
+    global last_progress
+    if last_progress == (table, done, total):
+        return
+    last_progress = table, done, total
+    width = 30
+    ratio = done / total if total else 1
+    filled = int(width * ratio)
+    sys.stderr.write(f"\r{table:<22} [{"#" * filled}{" " * (width - filled)}] {ratio:>4.0%}")
+    if ratio >= 1:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+def export_cmd(args) -> int:
+    import src.transfer as transfer
+    exported = transfer.export_history(args.directory, args.format, None if args.quiet else progress_bar)
+    for table, num in exported.items():
+        print(f"Exported {num} rows from {table}")
+    return 0
+
+def import_cmd(args) -> int:
+    import src.transfer as transfer
+    added = transfer.import_history(args.directory, args.format, None if args.quiet else progress_bar)
+    for table, num in added.items():
+        print(f"Imported {num} rows into {table}")
+    return 0
+
+def get_report(periods: list) -> dict:
+    '''Return the totals of the focus timers and completed tasks, and the totals by each period in periods (day/week/month/year)'''
+    from src.db import AnalyseTodolist
+    report = {"focus_seconds": {}, "completed_tasks": {}, "periods": {}}
+    for days in (1, 7, 30, 365):
+        report["focus_seconds"][f"last_{days}_days"] = AnalyseTodolist.get_sum_timers(days, "focus")
+        report["completed_tasks"][f"last_{days}_days"] = AnalyseTodolist.get_num_completed_tasks(days)
+    report["focus_seconds"]["all"] = AnalyseTodolist.get_sum_all_timers("focus")
+    report["completed_tasks"]["all"] = AnalyseTodolist.get_num_all_completed_tasks()
+
+    for period in periods:
+        # The focus timers and the completed tasks may not cover the same dates, so they are merged by date before formatting
+        focus_dates, focus_mins = AnalyseTodolist.get_sum_focus_timers_by_time(period, formatted=False)
+        task_dates, num_tasks = AnalyseTodolist.get_num_completed_task_by_time(period, formatted=False)
+        totals = {date: [mins, 0] for date, mins in zip(focus_dates, focus_mins)}
+        for date, num in zip(task_dates, num_tasks):
+            totals.setdefault(date, [0, 0])[1] = num
+        dates = sorted(totals)
+        report["periods"][period] = [{period: label, "focus_minutes": totals[date][0], "completed_tasks": totals[date][1]} 
+                                     for date, label in zip(dates, AnalyseTodolist.format_dates(dates, period))]
+    return report
+
+def print_report(report: dict) -> None:
+    '''Print the report as tables'''
+    from src.overhead import convert_to_hr_mins
+    print(f"{"":<16}{"Focus time":>16}{"Completed tasks":>18}")
+    for key in report["focus_seconds"]:
+        label = {"all": "All", "last_1_days": "Last 24 hours"}.get(key, key.replace("_", " ").capitalize())
+        print(f"{label:<16}{convert_to_hr_mins(report["focus_seconds"][key]):>16}{report["completed_tasks"][key]:>18}")
+
+    for period, rows in report["periods"].items():
+        print(f"\n{period.title():<20}{"Focus time":>16}{"Completed tasks":>18}")
+        for row in rows:
+            print(f"{row[period]:<20}{convert_to_hr_mins(row["focus_minutes"] * 60):>16}{row["completed_tasks"]:>18}")
+
+def report_cmd(args) -> int:
+    report = get_report(args.period or ["day", "week"])
+    if args.json:
+        print(json.dumps(report, indent=None if args.compact else 4))
+    else:
+        print_report(report)
+    return 0
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="tododoro", description="Pomodoro timer and to do list, run without a subcommand to start the GUI")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export the pomodoro and to do list tables to a directory, one file per table")
+    export_parser.add_argument("directory", help="Directory to export the files to")
+    export_parser.add_argument("-f", "--format", choices=("csv", "jsonl", "parquet"), default="csv", help="File format (default: csv)")
+    export_parser.add_argument("-q", "--quiet", action="store_true", help="Do not show the progress bar")
+    export_parser.set_defaults(func=export_cmd)
+
+    import_parser = subparsers.add_parser("import", help="Import the files exported by the export subcommand, ids are remapped to new ids")
+    import_parser.add_argument("directory", help="Directory containing the exported files")
+    import_parser.add_argument("-f", "--format", choices=("csv", "jsonl", "parquet"), default="csv", help="File format (default: csv)")
+    import_parser.add_argument("-q", "--quiet", action="store_true", help="Do not show the progress bar")
+    import_parser.set_defaults(func=import_cmd)
+
+    report_parser = subparsers.add_parser("report", help="Print the focus time and completed tasks without starting the GUI")
+    report_parser.add_argument("-p", "--period", action="append", choices=("day", "week", "month", "year"), 
+                               help="Show the totals by period for the last 20 periods, can be used more than once (default: day and week)")
+    report_parser.add_argument("-j", "--json", action="store_true", help="Print the report as JSON")
+    report_parser.add_argument("-c", "--compact", action="store_true", help="Print the JSON in a single line")
+    report_parser.set_defaults(func=report_cmd)
+
+    return parser
+
+def main(argv: list) -> int:
+    args = get_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except Exception as e:
+        print(f"tododoro {args.command} failed: {e}", file=sys.stderr)
+        return 1
@@ -1,10 +1,14 @@
-import psycopg, sys
+import psycopg, sys, os, threading, asyncio, functools, time, contextlib, datetime
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum 
+import numpy as np
 
 if __name__ == "__main__":
     import overhead as oh 
+    from metrics import metrics
 else:
     import src.overhead as oh 
+    from src.metrics import metrics
 
 # Get logger and start logging
 logger = oh.get_logger("db_func")
@@ -14,6 +18,11 @@ logger.debug("Logger started")
 logger.debug("Getting postgres configuration from json")
 db_login = oh.read_config()["postgres"]
 
+# The database can be changed without editing the config with the TODODORO_DBNAME environment variable (e.g. for the benchmarks)
+if os.environ.get("TODODORO_DBNAME"):
+    db_login["dbname"] = os.environ["TODODORO_DBNAME"]
+    logger.info(f"Using database ({db_login["dbname"]}) from TODODORO_DBNAME")
+
 # NOTE: Hard coded table names, column names, enum name, and primary key for POMODORO table
 table_name = "pomodoro"
 start_time = "start_time"
@@ -21,11 +30,33 @@ end_time = "end_time"
 duration = "duration" 
 timer_category = "timer_category"
 enum_name = "timer_type"
+TIMER_CATEGORIES = ("focus", "break") # Values of the timer type enum
 pkey = "start_time"
+pmdr_main_task_id = "main_task_id" # Task focused on when the timer started, NULL if no task (or a break timer) 
+pmdr_sub_task_id = "sub_task_id"
+planned_duration = "planned_duration" # Length of the timer (seconds) when it started, the duration is shorter if the timer was stopped early
+rollup_table = "pomodoro_focus_rollup" # Focus time of each task, kept up to date by the triggers of the pomodoro table
+time_rollup_table = "analyse_time_rollup" # Focus time and completed tasks by time, kept up to date by the triggers of the pomodoro and to do list tables
+duration_rollup_table = "analyse_duration_rollup" # Number of timers of each length (minutes) completed or stopped early, kept up to date by the triggers of the pomodoro table
+TIME_BUCKET = "15 minutes" # Time of each row of the time rollup, the rows are added up by day/week/month/year in the time zone of the session
 
 # First element in list is the type of the column, second element indicates if NOT NULL (true = NOT NULL)
+# NOTE: the foreign keys of the task ids are added after the to do list tables are checked
 pmdr_columns = {start_time: ["TIMESTAMP WITH TIME ZONE", True], end_time: ["TIMESTAMP WITH TIME ZONE", True], 
-           duration: ["INT", True], timer_category: [enum_name, True]}
+           duration: ["INT", True], timer_category: [enum_name, True], pmdr_main_task_id: ["INT", False], pmdr_sub_task_id: ["INT", False],
+           planned_duration: ["INT", False]}
+
+# Change log of the to do list and pomodoro tables, a row is added with the section id of the changed rows by the triggers of each statement
+# so the programs that keep a copy of the tasks (e.g. the snapshot of the to do list) can find what changed since the version they have
+changes_table = "todolist_changes"
+CHANGE_LOG_DAYS = 30 # Changes older than this are deleted when the program starts, older snapshots are not used
+CHANGE_WINDOW = 100 # Versions below the last one checked for the changes of the transactions not committed yet
+ANALYSE_CACHE_TTL = 60 # Seconds before the numbers of the analyse dashboard are read again even if the tables did not change
+CHANGE_CHECK_INTERVAL = 2 # Seconds between the reads of the change log by the cache, unless this program committed since the last read
+
+# Saved filters of the pending tasks across all the sections (smart lists), evaluated by the database when a list is opened 
+smart_lists_table = "todolist_smart_lists"
+SMART_LIST_TYPES = ("all", "main", "sub") # Type of the tasks in a smart list
 
 # Hard coded table names, column names for todolist section 
 class Todolist(Enum):
@@ -52,6 +83,9 @@ class Todolist(Enum):
     SUB_TASK_ID = "sub_task_id"
     SUB_TASK_PKEY = SUB_TASK_ID
 
+    # Order of the pending tasks under the same parent (see overhead.get_sort_key), in the main tasks and sub tasks tables
+    SORT_KEY = "sort_key"
+
     # Status enum type
     STATUS_ENUM = "status_type"
     STATUS_ENUM_TYPES = ("completed", "pending", "deleted")
@@ -60,16 +94,81 @@ class Todolist(Enum):
 COL_SECTION = {Todolist.SECTION_NAME.value: ["VARCHAR", True], Todolist.SECTION_ID.value: ["INT", True]}
 COL_MAIN_TASKS = {Todolist.MAIN_TASK_NAME.value: ["VARCHAR", True], Todolist.MAIN_TASK_ID.value: ["INT", True], Todolist.SECTION_ID.value: ["INT", True], 
                   Todolist.STATUS.value: [Todolist.STATUS_ENUM.value, True], Todolist.START_TIME.value: ["TIMESTAMP WITH TIME ZONE", True], 
-                 Todolist.END_TIME.value: ["TIMESTAMP WITH TIME ZONE", False]}
+                 Todolist.END_TIME.value: ["TIMESTAMP WITH TIME ZONE", False], Todolist.SORT_KEY.value: ['TEXT COLLATE "C"', False]}
 COL_SUB_TASKS = {Todolist.SUB_TASK_NAME.value: ["VARCHAR", True], Todolist.MAIN_TASK_ID.value: ["INT", True], Todolist.SECTION_ID.value: ["INT", True],
                  Todolist.STATUS.value: [Todolist.STATUS_ENUM.value, True], Todolist.START_TIME.value: ["TIMESTAMP WITH TIME ZONE", True], 
-                 Todolist.END_TIME.value: ["TIMESTAMP WITH TIME ZONE", False], Todolist.SUB_TASK_ID.value: ["INT", True]}
+                 Todolist.END_TIME.value: ["TIMESTAMP WITH TIME ZONE", False], Todolist.SUB_TASK_ID.value: ["INT", True],
+                 Todolist.SORT_KEY.value: ['TEXT COLLATE "C"', False]}
+
+# Time zone of the sessions, the days/weeks/months/years of the analysis and the time stamps read are in this time zone
+session_timezone = oh.get_timezone(db_login.get("timezone", ""))
+logger.debug(f"Using time zone ({session_timezone}) for the database sessions")
+
+def connect() -> psycopg.Connection:
+    '''Return a new connection to the database with the time zone of the session set'''
+    return psycopg.connect(f"user={db_login["user"]} dbname={db_login["dbname"]} password={db_login["pw"]}", options=f"-c TimeZone={session_timezone}")
+
+# Threads can have their own connection and cursor (e.g. the worker threads of the ConnectionPool), other threads use the main connection 
+thread_local = threading.local()
+commit_count = 0 # Commits of all the connections of this program, the cache reads the change log at once after its own changes
+
+class ThreadLocalProxy():
+    '''Forwards everything to the connection or cursor (name) of the current thread, or to the default if the thread has none,
+    so all the functions in this module can be used from any thread with its own connection'''
+    def __init__(self, name: str, default):
+        self._name = name
+        self._default = default
+
+    def __getattr__(self, attr):
+        return getattr(getattr(thread_local, self._name, self._default), attr)
+
+def get_caller() -> str:
+    # Name of the function that called the cursor or connection (e.g. SectionTools.get_section_name), used as the statement name
+    return sys._getframe(2).f_code.co_qualname
+
+class InstrumentedCursor(ThreadLocalProxy):
+    '''Cursor of the current thread with the latency and row count of each execute recorded in the metrics'''
+    def execute(self, query, params=None, name=None, **kwargs):
+        # Statement is named after the function that executed it if name is not given 
+        name = name or get_caller()
+        start = time.perf_counter()
+        cursor = getattr(thread_local, self._name, self._default)
+        try:
+            result = cursor.execute(query, params, **kwargs)
+        except Exception as e:
+            metrics.record(f"{name} (failed)", time.perf_counter() - start)
+            raise e
+        metrics.record(name, time.perf_counter() - start, cursor.rowcount)
+        return result
+
+class InstrumentedConnection(ThreadLocalProxy):
+    '''Connection of the current thread with the time of each commit and rollback recorded in the metrics'''
+    def commit(self, name=None):
+        # In a transaction the commit of each function is skipped, everything is committed at the end of the transaction 
+        if getattr(thread_local, "in_transaction", False):
+            return
+        name = name or get_caller()
+        start = time.perf_counter()
+        getattr(thread_local, self._name, self._default).commit()
+        global commit_count
+        commit_count += 1
+        metrics.record(f"{name} (commit)", time.perf_counter() - start)
+
+    def rollback(self, name=None):
+        # In a transaction the rollback of a failed function is skipped, it would discard the statements before it while the transaction 
+        # goes on. The transaction stays aborted and is rolled back by transaction() when the exception reaches it
+        if getattr(thread_local, "in_transaction", False):
+            return
+        name = name or get_caller()
+        start = time.perf_counter()
+        getattr(thread_local, self._name, self._default).rollback()
+        metrics.record(f"{name} (rollback)", time.perf_counter() - start)
 
 # Connecting to db and creating cursor to db
 try: 
-    conn = psycopg.connect(f"user={db_login["user"]} dbname={db_login["dbname"]} password={db_login["pw"]}")
+    conn = InstrumentedConnection("conn", connect())
     logger.debug("Connected to db")
-    cur = conn.cursor()
+    cur = InstrumentedCursor("cur", conn.cursor())
     logger.debug("Cursor to db created")
 
 except psycopg.OperationalError as e:
@@ -77,6 +176,57 @@ except psycopg.OperationalError as e:
     logger.error(e)
     raise e
 
+@contextlib.contextmanager
+def transaction():
+    '''Context manager to commit all the statements executed in the block at once (including the functions in this module that commit), 
+    or rollback all of them if any fails. A transaction inside another one is part of the outer transaction'''
+    if getattr(thread_local, "in_transaction", False):
+        yield cur
+        return
+    name = sys._getframe(2).f_code.co_qualname # Function using the transaction, for the metrics 
+    thread_local.in_transaction = True
+    try:
+        yield cur
+    except Exception as e:
+        thread_local.in_transaction = False
+        conn.rollback(name)
+        raise e
+    thread_local.in_transaction = False
+    conn.commit(name)
+
+class ConnectionPool():
+    '''Pool of worker threads with a connection each, so the functions in this module can be awaited from asyncio 
+    without blocking the event loop or sharing the main connection with the GUI'''
+    def __init__(self, size: int = 4):
+        self.connections = []
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="db_pool", initializer=self.connect_thread)
+
+    def connect_thread(self):
+        # Called once by each worker thread when it is started 
+        thread_local.conn = connect()
+        thread_local.cur = thread_local.conn.cursor()
+        self.connections.append(thread_local.conn)
+        logger.debug(f"Connected to db from pool thread {threading.current_thread().name}")
+
+    def call(self, func, *args, **kwargs):
+        # Runs in the worker thread, rollback if the function failed so the connection can be used again
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            conn.rollback()
+            raise e
+
+    async def run(self, func, *args, **kwargs):
+        '''Run the function in one of the worker threads and return the result'''
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(self.call, func, *args, **kwargs))
+
+    def close(self):
+        '''Wait for the running functions to complete and close all the connections'''
+        self.executor.shutdown(wait=True)
+        for connection in self.connections:
+            connection.close()
+        logger.debug(f"Closed {len(self.connections)} pool connections")
+
 def check_table_exist(tb_name: str) -> bool:
     '''Check if table 'tb_name' exist in the database'''
     logger.debug(f"Checking if table ({tb_name}) exists")
@@ -252,15 +402,250 @@ else:
 conn.commit()  # Commit any changes
 logger.debug("Db changes committed")
 
+# Unique indexes so duplicate names are rejected by the database instead of being checked by the program,
+# only the pending tasks have to be unique as completed and deleted tasks can have the same name
+# Name of the index: (table, columns, condition)
+unique_indexes = {"todolist_section_name_key": (Todolist.TABLE_SECTION.value, Todolist.SECTION_NAME.value, ""),
+                  "todolist_pending_main_task_name_key": (Todolist.TABLE_MAIN_TASKS.value, f"{Todolist.SECTION_ID.value}, {Todolist.MAIN_TASK_NAME.value}",
+                                                          f"WHERE {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}'"),
+                  "todolist_pending_sub_task_name_key": (Todolist.TABLE_SUB_TASKS.value, f"{Todolist.MAIN_TASK_ID.value}, {Todolist.SUB_TASK_NAME.value}",
+                                                         f"WHERE {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}'")}
+for index, (table, columns, condition) in unique_indexes.items():
+    try:
+        cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {table} ({columns}) {condition}")
+        conn.commit()
+    except psycopg.errors.UniqueViolation as e:
+        # The index cannot be created if there are duplicates already, the program still works without it
+        conn.rollback()
+        logger.warning(f"Unique index ({index}) not created as there are duplicates in ({table}), remove the duplicates and restart: {e}")
+
+# Indexes of the pending tasks in the order they are loaded, so the tasks of a section (or main task) are read in order from the index
+pending_condition = f"WHERE {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}'"
+cur.execute(f"CREATE INDEX IF NOT EXISTS todolist_pending_main_task_order_idx ON {Todolist.TABLE_MAIN_TASKS.value} \
+            ({Todolist.SECTION_ID.value}, {Todolist.SORT_KEY.value}, {Todolist.MAIN_TASK_ID.value}) {pending_condition}")
+cur.execute(f"CREATE INDEX IF NOT EXISTS todolist_pending_sub_task_order_idx ON {Todolist.TABLE_SUB_TASKS.value} \
+            ({Todolist.MAIN_TASK_ID.value}, {Todolist.SORT_KEY.value}, {Todolist.SUB_TASK_ID.value}) {pending_condition}")
+conn.commit()
+
+# Change log with the version (increasing) of each change, the connection that made the change is kept so a program can skip its own changes
+cur.execute(f"CREATE TABLE IF NOT EXISTS {changes_table} (version BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY, table_name TEXT NOT NULL, \
+            {Todolist.SECTION_ID.value} INT, backend_pid INT NOT NULL DEFAULT pg_backend_pid(), changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW())")
+
+# The triggers run once for each statement with the changed rows (transition tables), so a bulk insert only adds one row for each section
+# Function name: statement adding the rows to the change log (the pomodoro table has no section id)
+log_functions = {"todolist_log_changes": f"SELECT DISTINCT TG_TABLE_NAME, r.{Todolist.SECTION_ID.value} FROM changed_rows r",
+                 "pomodoro_log_changes": "SELECT TG_TABLE_NAME, NULL::INT WHERE EXISTS (SELECT 1 FROM changed_rows)"}
+for function, select in log_functions.items():
+    cur.execute(f"""CREATE OR REPLACE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $$
+                BEGIN
+                    IF TG_OP = 'INSERT' THEN
+                        INSERT INTO {changes_table} (table_name, {Todolist.SECTION_ID.value}) {select.replace("changed_rows", "new_rows")};
+                    ELSIF TG_OP = 'DELETE' THEN
+                        INSERT INTO {changes_table} (table_name, {Todolist.SECTION_ID.value}) {select.replace("changed_rows", "old_rows")};
+                    ELSE
+                        INSERT INTO {changes_table} (table_name, {Todolist.SECTION_ID.value}) {select.replace("changed_rows", "new_rows")} 
+                        UNION {select.replace("changed_rows", "old_rows")};
+                    END IF;
+                    RETURN NULL;
+                END $$""")
+
+triggers = {row[0] for row in cur.execute("SELECT tgname FROM pg_trigger WHERE NOT tgisinternal").fetchall()}
+referencing = {"INSERT": "NEW TABLE AS new_rows", "UPDATE": "OLD TABLE AS old_rows NEW TABLE AS new_rows", "DELETE": "OLD TABLE AS old_rows"}
+for table in (Todolist.TABLE_SECTION.value, Todolist.TABLE_MAIN_TASKS.value, Todolist.TABLE_SUB_TASKS.value, table_name):
+    for op, tables in referencing.items():
+        if f"{table}_log_{op.lower()}" not in triggers:
+            cur.execute(f"CREATE TRIGGER {table}_log_{op.lower()} AFTER {op} ON {table} REFERENCING {tables} FOR EACH STATEMENT \
+                        EXECUTE FUNCTION {"pomodoro_log_changes" if table == table_name else "todolist_log_changes"}()")
+            logger.info(f"Created trigger ({table}_log_{op.lower()}) of the change log")
+conn.commit()
+
+# Foreign keys of the focused task of the pomodoro timers, the timers are kept without the task when the task is deleted 
+constraints = {row[0] for row in cur.execute(f"SELECT conname FROM pg_constraint WHERE conrelid = '{table_name}'::regclass").fetchall()}
+for col, table in ((pmdr_main_task_id, Todolist.TABLE_MAIN_TASKS.value), (pmdr_sub_task_id, Todolist.TABLE_SUB_TASKS.value)):
+    if f"{table_name}_{col}_fkey" not in constraints:
+        cur.execute(f"UPDATE {table_name} SET {col} = NULL WHERE {col} NOT IN (SELECT {col} FROM {table})") # Ids of deleted tasks
+        cur.execute(f"ALTER TABLE {table_name} ADD CONSTRAINT {table_name}_{col}_fkey FOREIGN KEY ({col}) REFERENCES {table} ({col}) ON DELETE SET NULL")
+        logger.info(f"Added foreign key of ({col}) of ({table_name})")
+    # The timers of a deleted task are found from the index instead of reading the whole table 
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {table_name}_{col}_idx ON {table_name} ({col}) WHERE {col} IS NOT NULL")
+
+# Focus time of each main task (sub_task_id is 0) and sub task, so the focus time of the tasks is read without adding up the pomodoro table
+# The rows are added to or subtracted from the rollup for each statement on the pomodoro table (including the task ids set to NULL on delete)
+if not check_table_exist(rollup_table):
+    cur.execute(f"CREATE TABLE {rollup_table} ({Todolist.MAIN_TASK_ID.value} INT NOT NULL, {Todolist.SUB_TASK_ID.value} INT NOT NULL DEFAULT 0, \
+                focus_seconds BIGINT NOT NULL, num_timers INT NOT NULL, PRIMARY KEY ({Todolist.MAIN_TASK_ID.value}, {Todolist.SUB_TASK_ID.value}))")
+    cur.execute(f"INSERT INTO {rollup_table} SELECT {pmdr_main_task_id}, COALESCE({pmdr_sub_task_id}, 0), SUM({duration}), COUNT(*) FROM {table_name} \
+                WHERE {timer_category} = 'focus' AND {pmdr_main_task_id} IS NOT NULL GROUP BY 1, 2")
+    logger.info(f"Created table ({rollup_table}) with the focus time of {cur.rowcount} tasks")
+
+def get_rollup_statement(rows: dict) -> str:
+    # Statement adding the focus timers of the transition tables to the rollup, rows is a dict of transition table: sign (- for the old rows)
+    timers = " UNION ALL ".join(f"SELECT {pmdr_main_task_id}, COALESCE({pmdr_sub_task_id}, 0) AS {pmdr_sub_task_id}, {sign}{duration} AS seconds, {sign}1 AS num \
+                                FROM {table} WHERE {timer_category} = 'focus' AND {pmdr_main_task_id} IS NOT NULL" for table, sign in rows.items())
+    statement = f"INSERT INTO {rollup_table} SELECT {pmdr_main_task_id}, {pmdr_sub_task_id}, SUM(seconds), SUM(num) FROM ({timers}) AS timers GROUP BY 1, 2 \
+                ON CONFLICT ({Todolist.MAIN_TASK_ID.value}, {Todolist.SUB_TASK_ID.value}) DO UPDATE SET focus_seconds = {rollup_table}.focus_seconds + \
+                EXCLUDED.focus_seconds, num_timers = {rollup_table}.num_timers + EXCLUDED.num_timers;"
+    if "old_rows" in rows:
+        statement += f" DELETE FROM {rollup_table} WHERE num_timers <= 0;"
+    return statement
+
+cur.execute(f"""CREATE OR REPLACE FUNCTION pomodoro_focus_rollup() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    {get_rollup_statement({"new_rows": ""})}
+                ELSIF TG_OP = 'DELETE' THEN
+                    {get_rollup_statement({"old_rows": "-"})}
+                ELSE
+                    {get_rollup_statement({"new_rows": "", "old_rows": "-"})}
+                END IF;
+                RETURN NULL;
+            END $$""")
+for op, tables in referencing.items():
+    if f"{table_name}_rollup_{op.lower()}" not in triggers:
+        cur.execute(f"CREATE TRIGGER {table_name}_rollup_{op.lower()} AFTER {op} ON {table_name} REFERENCING {tables} FOR EACH STATEMENT \
+                    EXECUTE FUNCTION pomodoro_focus_rollup()")
+        logger.info(f"Created trigger ({table_name}_rollup_{op.lower()}) of the focus time rollup")
+conn.commit()
+
+def get_time_bucket(column: str) -> str:
+    # Start of the time bucket of the column, the buckets start from a UTC time so they are the same in any time zone 
+    return f"date_bin('{TIME_BUCKET}', {column}, TIMESTAMPTZ '2000-01-01 00:00+00')"
+
+# Focus time (by end time of the focus timers) and completed tasks (by end time of the main tasks and sub tasks) in each time bucket, 
+# so the plots of any range of dates read at most one row for each bucket instead of all the timers and tasks
+completed_condition = f"{Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[0]}' AND {Todolist.END_TIME.value} IS NOT NULL"
+if not check_table_exist(time_rollup_table):
+    cur.execute(f"CREATE TABLE {time_rollup_table} (bucket TIMESTAMP WITH TIME ZONE PRIMARY KEY, focus_seconds BIGINT NOT NULL DEFAULT 0, \
+                num_timers INT NOT NULL DEFAULT 0, completed_tasks INT NOT NULL DEFAULT 0)")
+    cur.execute(f"INSERT INTO {time_rollup_table} (bucket, focus_seconds, num_timers) SELECT {get_time_bucket(end_time)}, SUM({duration}), COUNT(*) \
+                FROM {table_name} WHERE {timer_category} = 'focus' GROUP BY 1")
+    cur.execute(f"INSERT INTO {time_rollup_table} (bucket, completed_tasks) SELECT {get_time_bucket(Todolist.END_TIME.value)}, COUNT(*) FROM \
+                (SELECT {Todolist.END_TIME.value} FROM {Todolist.TABLE_MAIN_TASKS.value} WHERE {completed_condition} UNION ALL \
+                SELECT {Todolist.END_TIME.value} FROM {Todolist.TABLE_SUB_TASKS.value} WHERE {completed_condition}) AS completed GROUP BY 1 \
+                ON CONFLICT (bucket) DO UPDATE SET completed_tasks = EXCLUDED.completed_tasks")
+    logger.info(f"Created table ({time_rollup_table}) of the focus time and completed tasks by time")
+
+def get_time_rollup_statement(rows: dict, values: dict, condition: str) -> str:
+    # Statement adding the rows of the transition tables (dict of transition table: sign) to the time rollup, values is a dict of 
+    # rollup column: value of each row, the buckets without any timer or completed task left are deleted
+    # NOTE: the end time column has the same name in the pomodoro and to do list tables
+    changed = " UNION ALL ".join(f"SELECT {get_time_bucket(end_time)} AS bucket, {", ".join(f"{sign}{value} AS {col}" for col, value in values.items())} \
+                                 FROM {table} WHERE {condition}" for table, sign in rows.items())
+    statement = f"INSERT INTO {time_rollup_table} (bucket, {", ".join(values)}) SELECT bucket, {", ".join(f"SUM({col})" for col in values)} \
+                FROM ({changed}) AS changed_rows GROUP BY bucket HAVING {" OR ".join(f"SUM({col}) <> 0" for col in values)} \
+                ON CONFLICT (bucket) DO UPDATE SET {", ".join(f"{col} = {time_rollup_table}.{col} + EXCLUDED.{col}" for col in values)};"
+    if "old_rows" in rows:
+        statement += f" DELETE FROM {time_rollup_table} WHERE num_timers <= 0 AND completed_tasks <= 0 AND bucket IN \
+                      (SELECT {get_time_bucket(end_time)} FROM old_rows WHERE {condition});"
+    return statement
+
+# Function name: (rollup column: value of each row, condition of the rows added to the rollup)
+time_rollup_functions = {"pomodoro_time_rollup": ({"focus_seconds": duration, "num_timers": "1"}, f"{timer_category} = 'focus'"),
+                         "todolist_time_rollup": ({"completed_tasks": "1"}, completed_condition)}
+for function, (values, condition) in time_rollup_functions.items():
+    cur.execute(f"""CREATE OR REPLACE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $$
+                BEGIN
+                    IF TG_OP = 'INSERT' THEN
+                        {get_time_rollup_statement({"new_rows": ""}, values, condition)}
+                    ELSIF TG_OP = 'DELETE' THEN
+                        {get_time_rollup_statement({"old_rows": "-"}, values, condition)}
+                    ELSE
+                        {get_time_rollup_statement({"new_rows": "", "old_rows": "-"}, values, condition)}
+                    END IF;
+                    RETURN NULL;
+                END $$""")
+for table in (Todolist.TABLE_MAIN_TASKS.value, Todolist.TABLE_SUB_TASKS.value, table_name):
+    for op, tables in referencing.items():
+        if f"{table}_time_rollup_{op.lower()}" not in triggers:
+            cur.execute(f"CREATE TRIGGER {table}_time_rollup_{op.lower()} AFTER {op} ON {table} REFERENCING {tables} FOR EACH STATEMENT \
+                        EXECUTE FUNCTION {"pomodoro_time_rollup" if table == table_name else "todolist_time_rollup"}()")
+            logger.info(f"Created trigger ({table}_time_rollup_{op.lower()}) of the time rollup")
+conn.commit()
+
+# Timers stopped early are shorter than the length they started with, the timers added before the length was saved are completed if they are whole minutes
+stopped_condition = f"{duration} < COALESCE({planned_duration}, CEIL({duration} / 60.0) * 60)"
+
+# Number and seconds of the timers of each category by length (whole minutes) and if they were stopped early, so the distributions and the 
+# completion ratios read a few hundred rows at most instead of all the timers
+if not check_table_exist(duration_rollup_table):
+    cur.execute(f"CREATE TABLE {duration_rollup_table} ({timer_category} {enum_name} NOT NULL, minutes INT NOT NULL, stopped BOOLEAN NOT NULL, \
+                num_timers INT NOT NULL, seconds BIGINT NOT NULL, PRIMARY KEY ({timer_category}, minutes, stopped))")
+    cur.execute(f"INSERT INTO {duration_rollup_table} SELECT {timer_category}, {duration} / 60, {stopped_condition}, COUNT(*), SUM({duration}) \
+                FROM {table_name} GROUP BY 1, 2, 3")
+    logger.info(f"Created table ({duration_rollup_table}) with the lengths of the timers")
+
+def get_duration_rollup_statement(rows: dict) -> str:
+    # Statement adding the timers of the transition tables to the duration rollup, rows is a dict of transition table: sign (- for the old rows)
+    timers = " UNION ALL ".join(f"SELECT {timer_category}, {duration} / 60 AS minutes, {stopped_condition} AS stopped, {sign}1 AS num, \
+                                {sign}{duration} AS seconds FROM {table}" for table, sign in rows.items())
+    statement = f"INSERT INTO {duration_rollup_table} SELECT {timer_category}, minutes, stopped, SUM(num), SUM(seconds) FROM ({timers}) AS timers \
+                GROUP BY 1, 2, 3 HAVING SUM(num) <> 0 OR SUM(seconds) <> 0 ON CONFLICT ({timer_category}, minutes, stopped) DO UPDATE SET \
+                num_timers = {duration_rollup_table}.num_timers + EXCLUDED.num_timers, seconds = {duration_rollup_table}.seconds + EXCLUDED.seconds;"
+    if "old_rows" in rows:
+        statement += f" DELETE FROM {duration_rollup_table} WHERE num_timers <= 0;"
+    return statement
+
+cur.execute(f"""CREATE OR REPLACE FUNCTION pomodoro_duration_rollup() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    {get_duration_rollup_statement({"new_rows": ""})}
+                ELSIF TG_OP = 'DELETE' THEN
+                    {get_duration_rollup_statement({"old_rows": "-"})}
+                ELSE
+                    {get_duration_rollup_statement({"new_rows": "", "old_rows": "-"})}
+                END IF;
+                RETURN NULL;
+            END $$""")
+for op, tables in referencing.items():
+    if f"{table_name}_duration_rollup_{op.lower()}" not in triggers:
+        cur.execute(f"CREATE TRIGGER {table_name}_duration_rollup_{op.lower()} AFTER {op} ON {table_name} REFERENCING {tables} FOR EACH STATEMENT \
+                    EXECUTE FUNCTION pomodoro_duration_rollup()")
+        logger.info(f"Created trigger ({table_name}_duration_rollup_{op.lower()}) of the duration rollup")
+conn.commit()
+
+# Smart lists, empty filters (NULL) match all the pending tasks, two lists are added when the table is created 
+if not check_table_exist(smart_lists_table):
+    cur.execute(f"CREATE TABLE {smart_lists_table} (smart_list_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY, smart_list_name VARCHAR NOT NULL UNIQUE, \
+                task_type VARCHAR NOT NULL DEFAULT '{SMART_LIST_TYPES[0]}', task_text VARCHAR, section_text VARCHAR, min_age_days INT)")
+    cur.execute(f"INSERT INTO {smart_lists_table} (smart_list_name, task_type, min_age_days) VALUES \
+                ('Sub tasks started over 14 days ago', '{SMART_LIST_TYPES[2]}', 14), ('All pending tasks', '{SMART_LIST_TYPES[0]}', NULL)")
+    logger.info(f"Created table ({smart_lists_table}) of the smart lists")
+
+# Indexes of the start time of the pending tasks for the smart lists filtering by age 
+cur.execute(f"CREATE INDEX IF NOT EXISTS todolist_pending_main_task_start_idx ON {Todolist.TABLE_MAIN_TASKS.value} ({Todolist.START_TIME.value}) {pending_condition}")
+cur.execute(f"CREATE INDEX IF NOT EXISTS todolist_pending_sub_task_start_idx ON {Todolist.TABLE_SUB_TASKS.value} ({Todolist.START_TIME.value}) {pending_condition}")
+conn.commit()
+
+# Trigram indexes of the names of the pending tasks so the text of the smart lists (ILIKE '%text%') is matched from the index, 
+# pg_trgm is optional (not always installed and creating it can need more privileges), the smart lists still work without it 
+try:
+    if cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'").fetchone():
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for table, col in ((Todolist.TABLE_MAIN_TASKS.value, Todolist.MAIN_TASK_NAME.value), (Todolist.TABLE_SUB_TASKS.value, Todolist.SUB_TASK_NAME.value)):
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {col}_trgm_idx ON {table} USING GIN ({col} gin_trgm_ops) {pending_condition}")
+        conn.commit()
+    else:
+        logger.info("Extension pg_trgm is not available, the text of the smart lists is matched without an index")
+except psycopg.Error as e:
+    conn.rollback()
+    logger.warning(f"Trigram indexes not created, the text of the smart lists is matched without an index: {e}")
+
 # NOTE: values sequence are hard coded: duration, end time, start time and timer type
 # Any changes to the columns name will break this 
-def add_timer_row(start_time: str, end_time: str, duration:int , timer_category:str) -> None:
+def add_timer_row(start_time: datetime.datetime, end_time: datetime.datetime, duration:int , timer_category:str, main_task_id: int = None, 
+                  sub_task_id: int = None, planned: int = None) -> None:
+    # planned is the length of the timer (seconds) when it started, the duration is shorter if the timer was stopped early
     try:
-        cur.execute(f"INSERT INTO {table_name} (start_time, end_time, duration, timer_category) \
-                    VALUES ('{start_time}', '{end_time}', {duration}, '{timer_category}')".replace("'None'","NULL"))
+        # The task ids are NULL if the tasks were deleted while the timer ran (as ON DELETE SET NULL does for the timers already saved)
+        cur.execute(f"INSERT INTO {table_name} (start_time, end_time, duration, timer_category, {pmdr_main_task_id}, {pmdr_sub_task_id}, {planned_duration}) \
+                    VALUES (%s, %s, %s, %s, (SELECT {Todolist.MAIN_TASK_ID.value} FROM {Todolist.TABLE_MAIN_TASKS.value} WHERE {Todolist.MAIN_TASK_ID.value} = %s), \
+                    (SELECT {Todolist.SUB_TASK_ID.value} FROM {Todolist.TABLE_SUB_TASKS.value} WHERE {Todolist.SUB_TASK_ID.value} = %s), %s)", 
+                    (start_time, end_time, duration, timer_category, main_task_id, sub_task_id, planned))
         conn.commit()
-        logger.info(f"Added entry to ({table_name}) with {start_time} START, {end_time} END, {duration} DURATION, {timer_category} TYPE")
+        logger.info(f"Added entry to ({table_name}) with {start_time} START, {end_time} END, {duration} DURATION, {timer_category} TYPE, \
+{main_task_id} MAIN TASK, {sub_task_id} SUB TASK, {planned} PLANNED")
     except Exception as e:
+        conn.rollback() # The connection has to be usable again for the next timer
         logger.error(f"Failed to add entry to ({table_name}): {e}")
         raise e
 
@@ -278,39 +663,52 @@ class SectionTools():
             logger.error(f"Failed to get section information from the section table ({Todolist.TABLE_SECTION.value}): {e}")
             raise e
 
-    def add_section_name(section: str) -> None:
-        '''Add a single entry to the todolist_section table of a new section_name'''
+    def get_sections() -> list:
+        '''Return a list of (section_id, section_name) of all the sections from the todolist_section table'''
+        try:
+            sections = cur.execute(f"SELECT {Todolist.SECTION_ID.value}, {Todolist.SECTION_NAME.value} FROM {Todolist.TABLE_SECTION.value} \
+                                   ORDER BY {Todolist.SECTION_ID.value}").fetchall()
+            logger.debug(f"Getting sections from '{Todolist.TABLE_SECTION.value}'")
+            return sections
+        except Exception as e:
+            logger.error(f"Failed to get sections from the section table ({Todolist.TABLE_SECTION.value}): {e}")
+            raise e
+
+    def add_section_name(section: str) -> int:
+        '''Add a single entry to the todolist_section table of a new section_name, returns the section id'''
         try:
-            cur.execute(f"INSERT INTO {Todolist.TABLE_SECTION.value} ({Todolist.SECTION_NAME.value}) \
-                        VALUES ('{section}')")
+            section_id = cur.execute(f"INSERT INTO {Todolist.TABLE_SECTION.value} ({Todolist.SECTION_NAME.value}) \
+                        VALUES ('{section}') RETURNING {Todolist.SECTION_ID.value}").fetchone()[0]
             conn.commit()
-            logger.debug(f"Adding section name '{section}' to '{Todolist.TABLE_SECTION.value}'")
+            logger.debug(f"Adding section name '{section}' to '{Todolist.TABLE_SECTION.value}' with id {section_id}")
+            return section_id
         except Exception as e:
+            conn.rollback() # The name can be a duplicate, the connection has to be usable again
             logger.error(f"Faield to add {section} to table ({Todolist.TABLE_SECTION.value}): {e}")
             raise e
         
-    def change_section_name(oldname: str, newname: str) -> None:
-        '''Change the section name in the todolist_section table'''
+    def rename_section(section_id: int, name: str) -> None:
+        '''Change the name of the section with the section id'''
         try:
-            cur.execute(f"UPDATE {Todolist.TABLE_SECTION.value} SET {Todolist.SECTION_NAME.value} = '{newname}' \
-                        WHERE {Todolist.SECTION_ID.value} = (SELECT {Todolist.SECTION_ID.value} FROM {Todolist.TABLE_SECTION.value} \
-                        WHERE {Todolist.SECTION_NAME.value} = '{oldname}')")
+            cur.execute(f"UPDATE {Todolist.TABLE_SECTION.value} SET {Todolist.SECTION_NAME.value} = %s WHERE {Todolist.SECTION_ID.value} = {section_id}", (name,))
             conn.commit()
-            logger.debug(f"Updating section name from '{oldname}' to '{newname}' in '{Todolist.TABLE_SECTION.value}'")
+            logger.debug(f"Updating name of section id {section_id} to '{name}' in '{Todolist.TABLE_SECTION.value}'")
         except Exception as e:
-            logger.error(f"Failed to update {oldname} with {newname} in {Todolist.TABLE_SECTION.value}: {e}")
+            conn.rollback() # The name can be a duplicate, the connection has to be usable again
+            logger.error(f"Failed to update name of section id {section_id} to {name} in {Todolist.TABLE_SECTION.value}: {e}")
             raise e
     
-    def delete_section_name(name: str) -> None:
-        '''Delete a single row in the todolist_section based on the name'''
+    def delete_section_with_tasks(section_id: int) -> None:
+        '''Delete the section with all its open main tasks and sub tasks in a single transaction'''
         try:
-            cur.execute(f"DELETE FROM {Todolist.TABLE_SECTION.value} WHERE {Todolist.SECTION_NAME.value} = '{name}'")
-            conn.commit()
-            logger.debug(f"Deleting section '{name}' from {Todolist.TABLE_SECTION.value}")
+            with transaction():
+                num = MainTaskTools.delete_pending_main_tasks(f"{Todolist.SECTION_ID.value} = {section_id}")
+                cur.execute(f"DELETE FROM {Todolist.TABLE_SECTION.value} WHERE {Todolist.SECTION_ID.value} = {section_id}")
+            logger.debug(f"Deleting section id {section_id} with {num} open main tasks from {Todolist.TABLE_SECTION.value}")
         except Exception as e:
-            logger.error(f"Failed to delete {name} from {Todolist.TABLE_SECTION.value}: {e}")
+            logger.error(f"Failed to delete section id {section_id} with its open tasks: {e}")
             raise e
-        
+
     def get_section_id(name: str) -> int:
         '''Return the primary key of the section name in the todolist_section table'''
         try:
@@ -325,6 +723,98 @@ class SectionTools():
             logger.error(f"Failed to get section id of {name} from {Todolist.TABLE_SECTION.value}: {e}")
             raise e
 
+    def get_num_open_tasks() -> dict:
+        '''Return a dict of section id: number of pending main tasks and sub tasks, counted without loading the tasks'''
+        try:
+            section, main, sub = Todolist.TABLE_SECTION.value, Todolist.TABLE_MAIN_TASKS.value, Todolist.TABLE_SUB_TASKS.value
+            pending = Todolist.STATUS_ENUM_TYPES.value[1]
+            num_tasks = dict(cur.execute(f"SELECT {Todolist.SECTION_ID.value}, COALESCE(main_count.num, 0) + COALESCE(sub_count.num, 0) FROM {section} \
+                        LEFT OUTER JOIN (SELECT {Todolist.SECTION_ID.value}, COUNT(*) AS num FROM {main} WHERE {Todolist.STATUS.value} = '{pending}' \
+                        GROUP BY {Todolist.SECTION_ID.value}) AS main_count USING ({Todolist.SECTION_ID.value}) \
+                        LEFT OUTER JOIN (SELECT {Todolist.SECTION_ID.value}, COUNT(*) AS num FROM {sub} WHERE {Todolist.STATUS.value} = '{pending}' \
+                        GROUP BY {Todolist.SECTION_ID.value}) AS sub_count USING ({Todolist.SECTION_ID.value})").fetchall())
+            logger.debug(f"Got number of open tasks of each section: {num_tasks}")
+            return num_tasks
+        except Exception as e:
+            logger.error(f"Failed to get number of open tasks of each section: {e}")
+            raise e
+
+# Class for the smart list functions, the smart lists are (smart_list_id, smart_list_name, task_type, task_text, section_text, min_age_days)
+class SmartListTools():
+    def get_smart_lists() -> list:
+        '''Return a list of all the smart lists ordered by name'''
+        try:
+            smart_lists = cur.execute(f"SELECT smart_list_id, smart_list_name, task_type, task_text, section_text, min_age_days FROM {smart_lists_table} \
+                                      ORDER BY smart_list_name").fetchall()
+            logger.debug(f"Getting {len(smart_lists)} smart lists from '{smart_lists_table}'")
+            return smart_lists
+        except Exception as e:
+            logger.error(f"Failed to get the smart lists from ({smart_lists_table}): {e}")
+            raise e
+
+    def add_smart_list(name: str, task_type: str, task_text: str = None, section_text: str = None, min_age_days: int = None) -> int:
+        '''Add a smart list, empty filters match all the pending tasks, returns the smart list id'''
+        try:
+            smart_list_id = cur.execute(f"INSERT INTO {smart_lists_table} (smart_list_name, task_type, task_text, section_text, min_age_days) \
+                        VALUES (%s, %s, %s, %s, %s) RETURNING smart_list_id", (name, task_type, task_text or None, section_text or None, min_age_days or None)).fetchone()[0]
+            conn.commit()
+            logger.debug(f"Adding smart list '{name}' with id {smart_list_id}")
+            return smart_list_id
+        except Exception as e:
+            conn.rollback() # The name can be a duplicate, the connection has to be usable again
+            logger.error(f"Failed to add smart list {name} to ({smart_lists_table}): {e}")
+            raise e
+
+    def delete_smart_list(smart_list_id: int) -> None:
+        try:
+            cur.execute(f"DELETE FROM {smart_lists_table} WHERE smart_list_id = {smart_list_id}")
+            conn.commit()
+            logger.debug(f"Deleting smart list id {smart_list_id}")
+        except Exception as e:
+            logger.error(f"Failed to delete smart list id {smart_list_id}: {e}")
+            raise e
+
+    def get_tasks(task_type: str, task_text: str = None, section_text: str = None, min_age_days: int = None, section_ids: list = None) -> list:
+        '''Return the pending tasks matching the filters of a smart list as a list of (task_type, task_id, start_time, task_name, main_task_name, 
+        section_id, section_name) ordered by start time, only the tasks of the section ids are returned if section_ids is not None'''
+        try:
+            section, main, sub = Todolist.TABLE_SECTION.value, Todolist.TABLE_MAIN_TASKS.value, Todolist.TABLE_SUB_TASKS.value
+            pending = Todolist.STATUS_ENUM_TYPES.value[1]
+            params = {"text": f"%{oh.escape_like(task_text)}%" if task_text else None, "section": f"%{oh.escape_like(section_text)}%" if section_text else None, 
+                      "days": min_age_days, "section_ids": section_ids}
+
+            def get_conditions(table: str, name_col: str) -> str:
+                # Only the filters that are set are added so the indexes of the pending tasks can be used 
+                conditions = [f"{table}.{Todolist.STATUS.value} = '{pending}'"]
+                if task_text:
+                    conditions.append(f"{table}.{name_col} ILIKE %(text)s")
+                if section_text:
+                    conditions.append(f"{section}.{Todolist.SECTION_NAME.value} ILIKE %(section)s")
+                if min_age_days:
+                    conditions.append(f"{table}.{Todolist.START_TIME.value} < NOW() - make_interval(days => %(days)s)")
+                if section_ids is not None:
+                    conditions.append(f"{table}.{Todolist.SECTION_ID.value} = ANY(%(section_ids)s)")
+                return " AND ".join(conditions)
+
+            queries = []
+            if task_type != SMART_LIST_TYPES[2]:
+                queries.append(f"SELECT '{SMART_LIST_TYPES[1]}', {main}.{Todolist.MAIN_TASK_ID.value}, {main}.{Todolist.START_TIME.value}, \
+                               {Todolist.MAIN_TASK_NAME.value}, NULL, {main}.{Todolist.SECTION_ID.value}, {Todolist.SECTION_NAME.value} FROM {main} \
+                               JOIN {section} ON {section}.{Todolist.SECTION_ID.value} = {main}.{Todolist.SECTION_ID.value} \
+                               WHERE {get_conditions(main, Todolist.MAIN_TASK_NAME.value)}")
+            if task_type != SMART_LIST_TYPES[1]:
+                queries.append(f"SELECT '{SMART_LIST_TYPES[2]}', {Todolist.SUB_TASK_ID.value}, {sub}.{Todolist.START_TIME.value}, {Todolist.SUB_TASK_NAME.value}, \
+                               {Todolist.MAIN_TASK_NAME.value}, {sub}.{Todolist.SECTION_ID.value}, {Todolist.SECTION_NAME.value} FROM {sub} \
+                               JOIN {main} ON {main}.{Todolist.MAIN_TASK_ID.value} = {sub}.{Todolist.MAIN_TASK_ID.value} \
+                               JOIN {section} ON {section}.{Todolist.SECTION_ID.value} = {sub}.{Todolist.SECTION_ID.value} \
+                               WHERE {get_conditions(sub, Todolist.SUB_TASK_NAME.value)}")
+            tasks = cur.execute(f"{" UNION ALL ".join(queries)} ORDER BY 3, 1, 2", params).fetchall()
+            logger.debug(f"Got {len(tasks)} pending tasks of the smart list{f" in sections {section_ids}" if section_ids is not None else ""}")
+            return tasks
+        except Exception as e:
+            logger.error(f"Failed to get the pending tasks of the smart list: {e}")
+            raise e
+
 # Class for all main task table related functions 
 class MainTaskTools():
     def get_main_tasks() -> list:
@@ -340,214 +830,275 @@ class MainTaskTools():
             logger.error(f"Failed to get main task details from ({Todolist.TABLE_MAIN_TASKS.value}) and ({Todolist.TABLE_SECTION.value}): {e}")
             raise e
 
-    def add_main_tasks(task: str, section: str) -> None:
-        '''Add a single entry to the todolist_main_tasks table of a new pending main task'''
+    def get_section_tasks(section_id: int) -> list:
+        '''Return a list of (main_task_id, main_task, sort_key, [sub_task_ids], [sub_tasks], [sort_keys]) of the pending tasks in the section, 
+        ordered by the sort keys with the same order as get_sub_tasks'''
         try:
-            cur.execute(f"INSERT INTO {Todolist.TABLE_MAIN_TASKS.value} ({Todolist.MAIN_TASK_NAME.value}, {Todolist.SECTION_ID.value}, \
-                        {Todolist.STATUS.value}, {Todolist.START_TIME.value}) VALUES ('{task}', (SELECT {Todolist.SECTION_ID.value} FROM \
-                        {Todolist.TABLE_SECTION.value} WHERE {Todolist.SECTION_NAME.value} = '{section}'), '{Todolist.STATUS_ENUM_TYPES.value[1]}', \
-                        '{oh.get_datetime_now()}')")
+            main, sub = Todolist.TABLE_MAIN_TASKS.value, Todolist.TABLE_SUB_TASKS.value
+            pending = Todolist.STATUS_ENUM_TYPES.value[1]
+            sub_order = f"ORDER BY {sub}.{Todolist.SORT_KEY.value}, {sub}.{Todolist.SUB_TASK_ID.value}"
+            not_null = f"FILTER (WHERE {sub}.{Todolist.SUB_TASK_ID.value} IS NOT NULL), '{{}}')"
+            tasks = cur.execute(f"SELECT {main}.{Todolist.MAIN_TASK_ID.value}, {main}.{Todolist.MAIN_TASK_NAME.value}, {main}.{Todolist.SORT_KEY.value}, \
+                        COALESCE(ARRAY_AGG({sub}.{Todolist.SUB_TASK_ID.value} {sub_order}) {not_null}, \
+                        COALESCE(ARRAY_AGG({sub}.{Todolist.SUB_TASK_NAME.value} {sub_order}) {not_null}, \
+                        COALESCE(ARRAY_AGG({sub}.{Todolist.SORT_KEY.value} {sub_order}) {not_null} FROM {main} \
+                        LEFT OUTER JOIN {sub} ON {sub}.{Todolist.MAIN_TASK_ID.value} = {main}.{Todolist.MAIN_TASK_ID.value} AND {sub}.{Todolist.STATUS.value} = '{pending}' \
+                        WHERE {main}.{Todolist.SECTION_ID.value} = {section_id} AND {main}.{Todolist.STATUS.value} = '{pending}' \
+                        GROUP BY {main}.{Todolist.MAIN_TASK_ID.value} ORDER BY {main}.{Todolist.SORT_KEY.value}, {main}.{Todolist.MAIN_TASK_ID.value}").fetchall()
+            logger.debug(f"Got {len(tasks)} pending main tasks with their sub tasks of section id {section_id}")
+            return tasks
+        except Exception as e:
+            logger.error(f"Failed to get the pending tasks of section id {section_id}: {e}")
+            raise e
+
+    def delete_pending_main_tasks(condition: str) -> int:
+        '''Delete the pending main tasks matching the condition (on the main task table) with their pending sub tasks in one statement, 
+        main tasks with completed sub tasks are set as deleted instead so the completed sub tasks keep their main task. Not committed, 
+        used in a transaction. Returns the number of main tasks deleted'''
+        main, sub = Todolist.TABLE_MAIN_TASKS.value, Todolist.TABLE_SUB_TASKS.value
+        main_id = Todolist.MAIN_TASK_ID.value
+        pending, completed, deleted = Todolist.STATUS_ENUM_TYPES.value[1], Todolist.STATUS_ENUM_TYPES.value[0], Todolist.STATUS_ENUM_TYPES.value[2]
+        cur.execute(f"WITH main_tasks AS (SELECT {main_id} FROM {main} WHERE {condition} AND {Todolist.STATUS.value} = '{pending}'), \
+                    sub_tasks AS (DELETE FROM {sub} WHERE {main_id} IN (SELECT {main_id} FROM main_tasks) AND {Todolist.STATUS.value} = '{pending}'), \
+                    kept AS (UPDATE {main} SET {Todolist.STATUS.value} = '{deleted}' WHERE {main_id} IN (SELECT {main_id} FROM main_tasks) \
+                    AND EXISTS (SELECT 1 FROM {sub} WHERE {sub}.{main_id} = {main}.{main_id} AND {sub}.{Todolist.STATUS.value} = '{completed}') \
+                    RETURNING {main_id}), \
+                    removed AS (DELETE FROM {main} WHERE {main_id} IN (SELECT {main_id} FROM main_tasks) AND {main_id} NOT IN (SELECT {main_id} FROM kept) \
+                    RETURNING {main_id}) \
+                    SELECT (SELECT COUNT(*) FROM kept) + (SELECT COUNT(*) FROM removed)")
+        return cur.fetchone()[0]
+
+    def get_last_sort_key(section_id: int) -> str:
+        '''Return the highest sort key of the pending main tasks in the section, None if there are none'''
+        return cur.execute(f"SELECT MAX({Todolist.SORT_KEY.value}) FROM {Todolist.TABLE_MAIN_TASKS.value} WHERE {Todolist.SECTION_ID.value} = {section_id} \
+                           AND {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}'").fetchone()[0]
+
+    def add_main_task_to_section(task: str, section_id: int, sort_key: str = None) -> int:
+        '''Add a new pending main task to the section, returns the main task id. It is added after the other main tasks if sort_key is None'''
+        try:
+            sort_key = sort_key or oh.get_sort_key(MainTaskTools.get_last_sort_key(section_id))
+            main_task_id = cur.execute(f"INSERT INTO {Todolist.TABLE_MAIN_TASKS.value} ({Todolist.MAIN_TASK_NAME.value}, {Todolist.SECTION_ID.value}, \
+                        {Todolist.STATUS.value}, {Todolist.START_TIME.value}, {Todolist.SORT_KEY.value}) VALUES (%s, {section_id}, \
+                        '{Todolist.STATUS_ENUM_TYPES.value[1]}', %s, %s) RETURNING {Todolist.MAIN_TASK_ID.value}", 
+                        (task, oh.get_datetime_now(), sort_key)).fetchone()[0]
             conn.commit()
-            logger.debug(f"Adding section name '{section}' to '{Todolist.TABLE_SECTION.value}'")
+            logger.debug(f"Adding main task '{task}' to section id {section_id} with id {main_task_id}")
+            return main_task_id
         except Exception as e:
-            logger.error(f"Faield to add {section} to table ({Todolist.TABLE_SECTION.value}): {e}")
+            conn.rollback() # The name can be a duplicate, the connection has to be usable again
+            logger.error(f"Failed to add main task {task} to section id {section_id}: {e}")
             raise e
 
-    def rename_main_tasks(oldtaskname: str, newtaskname: str, section: str) -> None:
-        '''Rename the main task, function has to take note that different main task name can exist in different sections'''
+    def rename_main_task_by_id(main_task_id: int, name: str) -> None:
         try:
-            cur.execute(f"UPDATE {Todolist.TABLE_MAIN_TASKS.value} SET {Todolist.MAIN_TASK_NAME.value} = '{newtaskname}' \
-                        WHERE {Todolist.MAIN_TASK_ID.value} = (SELECT {Todolist.MAIN_TASK_ID.value} FROM {Todolist.TABLE_MAIN_TASKS.value} \
-                        WHERE {Todolist.MAIN_TASK_NAME.value} = '{oldtaskname}') AND {Todolist.SECTION_ID.value} = \
-                        (SELECT {Todolist.SECTION_ID.value} FROM {Todolist.TABLE_SECTION.value} WHERE {Todolist.SECTION_NAME.value} = '{section}') \
-                        AND {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}'")
+            cur.execute(f"UPDATE {Todolist.TABLE_MAIN_TASKS.value} SET {Todolist.MAIN_TASK_NAME.value} = %s WHERE {Todolist.MAIN_TASK_ID.value} = {main_task_id}", (name,))
             conn.commit()
-            logger.debug(f"""Updating main task name from '{oldtaskname}' to '{newtaskname}' in section '{section}' \
-                         in table '{Todolist.TABLE_MAIN_TASKS.value}'""")
+            logger.debug(f"Updating name of main task id {main_task_id} to '{name}'")
         except Exception as e:
-            logger.error(f"Failed to update {oldtaskname} with {newtaskname} in section {section} in table {Todolist.TABLE_MAIN_TASKS.value}: {e}")
+            conn.rollback() # The name can be a duplicate, the connection has to be usable again
+            logger.error(f"Failed to update name of main task id {main_task_id} to {name}: {e}")
             raise e
 
-    def delete_main_tasks(task: str, section: str) -> None:
-        '''Delete a single row based on the main task name and the section name'''
+    def move_main_task(main_task_id: int, sort_key: str, section_id: int = None) -> None:
+        '''Move the main task to the position of the sort key, only the row of the main task is updated if section_id is None. 
+        Otherwise the main task is moved to the section with all its sub tasks in one statement'''
         try:
-            # Set main task status to deleted instead of deleting the entry if an associated sub task is marked as completed 
-            if Completed.completed_sub_task_with_main_task_exist(MainTaskTools.get_main_task_id(task, section)):
-                cur.execute(f"UPDATE {Todolist.TABLE_MAIN_TASKS.value} SET {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[2]}' \
-                            WHERE {Todolist.MAIN_TASK_NAME.value} = '{task}' AND {Todolist.SECTION_ID.value} = \
-                            (SELECT {Todolist.SECTION_ID.value} FROM {Todolist.TABLE_SECTION.value} WHERE {Todolist.SECTION_NAME.value} = '{section}') \
-                            AND {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}'")
-            # Permanently delete the main task if no sub task is associated with it
+            main, sub = Todolist.TABLE_MAIN_TASKS.value, Todolist.TABLE_SUB_TASKS.value
+            if section_id is None:
+                cur.execute(f"UPDATE {main} SET {Todolist.SORT_KEY.value} = '{sort_key}' WHERE {Todolist.MAIN_TASK_ID.value} = {main_task_id}")
             else:
-                cur.execute(f"DELETE FROM {Todolist.TABLE_MAIN_TASKS.value} WHERE {Todolist.MAIN_TASK_NAME.value} = '{task}' AND \
-                            {Todolist.SECTION_ID.value} = (SELECT {Todolist.SECTION_ID.value} FROM {Todolist.TABLE_SECTION.value} \
-                            WHERE {Todolist.SECTION_NAME.value} = '{section}') AND {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}'")
-                logger.debug(f"Deleting main task '{task}' in section '{section}' from {Todolist.TABLE_MAIN_TASKS.value}")
+                cur.execute(f"WITH moved AS (UPDATE {main} SET {Todolist.SECTION_ID.value} = {section_id}, {Todolist.SORT_KEY.value} = '{sort_key}' \
+                            WHERE {Todolist.MAIN_TASK_ID.value} = {main_task_id} RETURNING {Todolist.MAIN_TASK_ID.value}) \
+                            UPDATE {sub} SET {Todolist.SECTION_ID.value} = {section_id} WHERE {Todolist.MAIN_TASK_ID.value} IN (SELECT {Todolist.MAIN_TASK_ID.value} FROM moved)")
             conn.commit()
+            logger.debug(f"Moved main task id {main_task_id} to sort key '{sort_key}'{f" of section id {section_id}" if section_id is not None else ""}")
+        except Exception as e:
+            conn.rollback() # The name can be a duplicate, the connection has to be usable again
+            logger.error(f"Failed to move main task id {main_task_id} to sort key {sort_key}: {e}")
+            raise e
+
+    def delete_main_task_by_id(main_task_id: int) -> None:
+        '''Delete the pending main task with all its pending sub tasks in a single transaction'''
+        try:
+            with transaction():
+                MainTaskTools.delete_pending_main_tasks(f"{Todolist.MAIN_TASK_ID.value} = {main_task_id}")
+            logger.debug(f"Deleting main task id {main_task_id} with its sub tasks")
         except Exception as e:
-            logger.error(f"Failed to delete '{task}' from section '{section}' in table {Todolist.TABLE_MAIN_TASKS.value}: {e}")
+            logger.error(f"Failed to delete main task id {main_task_id} with its sub tasks: {e}")
             raise e
 
-    def complete_main_tasks(task: str, section: str) -> None:
+    def complete_main_task_by_id(main_task_id: int) -> None:
         '''Update the main task as completed and adds the end time'''
         try:
             cur.execute(f"UPDATE {Todolist.TABLE_MAIN_TASKS.value} SET {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[0]}', \
-                        {Todolist.END_TIME.value} = '{oh.get_datetime_now()}' \
-                        WHERE {Todolist.MAIN_TASK_NAME.value} = '{task}' AND {Todolist.SECTION_ID.value} = \
-                        (SELECT {Todolist.SECTION_ID.value} FROM {Todolist.TABLE_SECTION.value} WHERE {Todolist.SECTION_NAME.value} = '{section}')")
+                        {Todolist.END_TIME.value} = %s WHERE {Todolist.MAIN_TASK_ID.value} = {main_task_id}", (oh.get_datetime_now(),))
             conn.commit()
-            logger.debug(f"Updating main task '{task}' to as completed in '{Todolist.TABLE_MAIN_TASKS.value}'")
+            logger.debug(f"Updating main task id {main_task_id} as completed")
         except Exception as e:
-            logger.error(f"Failed to update {task} as completed in {Todolist.TABLE_MAIN_TASKS.value}: {e}")
+            logger.error(f"Failed to update main task id {main_task_id} as completed: {e}")
             raise e
-        
-    def get_main_task_id(task: str, section: str) -> int:
-        '''Return the main task id from main task name and section name'''
-        try:
-            id = cur.execute(f"SELECT {Todolist.MAIN_TASK_ID.value} FROM {Todolist.TABLE_MAIN_TASKS.value}, {Todolist.TABLE_SECTION.value} \
-                            WHERE {Todolist.TABLE_MAIN_TASKS.value}.{Todolist.SECTION_ID.value} = {Todolist.TABLE_SECTION.value}.{Todolist.SECTION_ID.value} \
-                            AND {Todolist.TABLE_MAIN_TASKS.value}.{Todolist.MAIN_TASK_NAME.value} = '{task}' \
-                            AND {Todolist.TABLE_MAIN_TASKS.value}.{Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}' \
-                            AND {Todolist.TABLE_SECTION.value}.{Todolist.SECTION_NAME.value} = '{section}'").fetchone()[0]
-            logger.debug(f"Got main task ({task}) from section ({section}) with main task id of {id}")
-            return id
-        except Exception as e:
-            logger.error(f"Failed to get main task id of {task} from section {section}: {e}")
-            raise e 
-        
-    def set_main_task_as_pending(task: str, section: str):
+
+    def set_main_task_as_pending_by_id(main_task_id: int) -> None:
         '''Set the main task status as pending and removes the end time'''
         try:
             cur.execute(f"UPDATE {Todolist.TABLE_MAIN_TASKS.value} SET {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}', \
-                        {Todolist.END_TIME.value} = NULL WHERE {Todolist.MAIN_TASK_NAME.value} = '{task}' AND {Todolist.SECTION_ID.value} = \
-                        (SELECT {Todolist.SECTION_ID.value} FROM {Todolist.TABLE_SECTION.value} WHERE {Todolist.SECTION_NAME.value} = '{section}')")
+                        {Todolist.END_TIME.value} = NULL WHERE {Todolist.MAIN_TASK_ID.value} = {main_task_id}")
             conn.commit()
-            logger.debug(f"Change main task {task} in section {section} to pending and clearing end time")
+            logger.debug(f"Change main task id {main_task_id} to pending and clearing end time")
         except Exception as e:
-            logger.error(f"Failed to set main task {task} as pending and clear end time: {e}")
+            logger.error(f"Failed to set main task id {main_task_id} as pending: {e}")
             raise e
 
-# Class for all sub task table related functions     
+    def has_task(main_task_id: int, sub_task_id: int = None) -> bool:
+        '''Return True if the main task (not deleted) and the sub task (if not None) are still in the database, pending or completed'''
+        try:
+            return cur.execute(f"SELECT EXISTS (SELECT 1 FROM {Todolist.TABLE_MAIN_TASKS.value} WHERE {Todolist.MAIN_TASK_ID.value} = %s \
+                               AND {Todolist.STATUS.value} <> '{Todolist.STATUS_ENUM_TYPES.value[2]}') AND (%s::INT IS NULL OR EXISTS \
+                               (SELECT 1 FROM {Todolist.TABLE_SUB_TASKS.value} WHERE {Todolist.SUB_TASK_ID.value} = %s))", 
+                               (main_task_id, sub_task_id, sub_task_id)).fetchone()[0]
+        except Exception as e:
+            logger.error(f"Failed to check main task id {main_task_id} and sub task id {sub_task_id}: {e}")
+            raise e
+
+    def get_main_task_id(task: str, section_id: int) -> int:
+        '''Return the id of the pending main task from main task name and section id, None if it does not exist'''
+        try:
+            id = cur.execute(f"SELECT {Todolist.MAIN_TASK_ID.value} FROM {Todolist.TABLE_MAIN_TASKS.value} \
+                            WHERE {Todolist.MAIN_TASK_NAME.value} = '{task}' AND {Todolist.SECTION_ID.value} = {section_id} \
+                            AND {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}'").fetchone()
+            logger.debug(f"Got main task ({task}) from section id ({section_id}) with main task id of {id}")
+            return id[0] if id else None
+        except Exception as e:
+            logger.error(f"Failed to get main task id of {task} from section id {section_id}: {e}")
+            raise e 
+        
 class SubTaskTools():
     def get_sub_tasks(main_task_id: int) -> list:
-        '''Get all sub tasks with main_task_id as the parent task where sub task is not completed'''
+        '''Get all (sub_task_id, sub_task_name) with main_task_id as the parent task where sub task is not completed'''
         try:
-            sub_tasks = [c[0] for c in cur.execute(f"SELECT {Todolist.SUB_TASK_NAME.value} FROM {Todolist.TABLE_SUB_TASKS.value} \
+            sub_tasks = cur.execute(f"SELECT {Todolist.SUB_TASK_ID.value}, {Todolist.SUB_TASK_NAME.value} FROM {Todolist.TABLE_SUB_TASKS.value} \
                                     WHERE {Todolist.MAIN_TASK_ID.value} = {main_task_id} \
-                                    AND {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}' ORDER BY {Todolist.SUB_TASK_ID.value}").fetchall()]
+                                    AND {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}' ORDER BY {Todolist.SORT_KEY.value}, {Todolist.SUB_TASK_ID.value}").fetchall()
             logger.debug(f"Got sub_tasks with main_task_id ({main_task_id}): {sub_tasks}")
             return sub_tasks
         except Exception as e:
             logger.error(f"Failed to get sub tasks with main_task_id of {main_task_id}: {e}")
             raise e
 
-    def add_sub_tasks(sub_task: str, main_task: str, section: str):
-        '''Add a single entry to the todolist_sub_tasks table of a new pending sub task'''
+    def get_last_sort_key(main_task_id: int) -> str:
+        '''Return the highest sort key of the pending sub tasks under the main task, None if there are none'''
+        return cur.execute(f"SELECT MAX({Todolist.SORT_KEY.value}) FROM {Todolist.TABLE_SUB_TASKS.value} WHERE {Todolist.MAIN_TASK_ID.value} = {main_task_id} \
+                           AND {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}'").fetchone()[0]
+
+    def add_sub_tasks_to_main_task(sub_tasks: list, main_task_id: int, section_id: int, sort_keys: list = None) -> list:
+        '''Add the new pending sub tasks under the main task with one statement, returns the sub task ids in the same order. 
+        They are added after the other sub tasks if sort_keys is None'''
+        try:
+            now = oh.get_datetime_now()
+            sort_keys = sort_keys or oh.get_sort_keys(SubTaskTools.get_last_sort_key(main_task_id), None, len(sub_tasks))
+            # The names and sort keys are sent as two arrays so any number of sub tasks is added with three parameters
+            ids = dict(cur.execute(f"INSERT INTO {Todolist.TABLE_SUB_TASKS.value} ({Todolist.SUB_TASK_NAME.value}, {Todolist.MAIN_TASK_ID.value}, \
+                        {Todolist.SECTION_ID.value}, {Todolist.STATUS.value}, {Todolist.START_TIME.value}, {Todolist.SORT_KEY.value}) \
+                        SELECT sub_task, {main_task_id}, {section_id}, '{Todolist.STATUS_ENUM_TYPES.value[1]}', %s, sort_key \
+                        FROM UNNEST(%s::VARCHAR[], %s::TEXT[]) AS new_sub_tasks (sub_task, sort_key) \
+                        RETURNING {Todolist.SUB_TASK_NAME.value}, {Todolist.SUB_TASK_ID.value}", (now, list(sub_tasks), list(sort_keys))).fetchall())
+            conn.commit()
+            logger.debug(f"Adding {len(sub_tasks)} sub tasks under main task id {main_task_id}")
+            return [ids[sub_task] for sub_task in sub_tasks]
+        except Exception as e:
+            conn.rollback() # The name can be a duplicate, the connection has to be usable again
+            logger.error(f"Failed to add {len(sub_tasks)} sub tasks under main task id {main_task_id}: {e}")
+            raise e
+
+    def rename_sub_task_by_id(sub_task_id: int, name: str) -> None:
         try:
-            sectionid = SectionTools.get_section_id(section)
-            maintaskid = MainTaskTools.get_main_task_id(main_task, section)
-            cur.execute(f"INSERT INTO {Todolist.TABLE_SUB_TASKS.value} ({Todolist.SUB_TASK_NAME.value}, {Todolist.MAIN_TASK_ID.value}, {Todolist.SECTION_ID.value}, \
-                        {Todolist.STATUS.value}, {Todolist.START_TIME.value}) VALUES ('{sub_task}', {maintaskid}, {sectionid}, '{Todolist.STATUS_ENUM_TYPES.value[1]}', \
-                        '{oh.get_datetime_now()}')")
+            cur.execute(f"UPDATE {Todolist.TABLE_SUB_TASKS.value} SET {Todolist.SUB_TASK_NAME.value} = %s WHERE {Todolist.SUB_TASK_ID.value} = {sub_task_id}", (name,))
             conn.commit()
-            logger.debug(f"Adding sub task '{sub_task}' under '{main_task}'")
+            logger.debug(f"Updating name of sub task id {sub_task_id} to '{name}'")
         except Exception as e:
-            logger.error(f"Faield to add {sub_task} to table ({Todolist.TABLE_SECTION.value}): {e}")
+            conn.rollback() # The name can be a duplicate, the connection has to be usable again
+            logger.error(f"Failed to update name of sub task id {sub_task_id} to {name}: {e}")
             raise e
 
-    def rename_sub_tasks(old_sub_task, new_sub_task: str, main_task: str, section: str):
-        '''Rename the sub task'''
+    def move_sub_task(sub_task_id: int, main_task_id: int, section_id: int, sort_key: str) -> None:
+        '''Move the sub task under the main task (in the section) at the position of the sort key, only the row of the sub task is updated'''
         try:
-            maintaskid = MainTaskTools.get_main_task_id(main_task, section)
-            sectionid = SectionTools.get_section_id(section)
-            cur.execute(f"UPDATE {Todolist.TABLE_SUB_TASKS.value} SET {Todolist.SUB_TASK_NAME.value} = '{new_sub_task}' \
-                        WHERE {Todolist.SUB_TASK_NAME.value} = '{old_sub_task}' \
-                        AND {Todolist.MAIN_TASK_ID.value} = {maintaskid} AND {Todolist.SECTION_ID.value} = {sectionid};")
+            cur.execute(f"UPDATE {Todolist.TABLE_SUB_TASKS.value} SET {Todolist.MAIN_TASK_ID.value} = {main_task_id}, {Todolist.SECTION_ID.value} = {section_id}, \
+                        {Todolist.SORT_KEY.value} = '{sort_key}' WHERE {Todolist.SUB_TASK_ID.value} = {sub_task_id}")
             conn.commit()
-            logger.debug(f"Renaming sub task {old_sub_task} of {main_task} of {section} from {Todolist.TABLE_SUB_TASKS.value} to new name '{new_sub_task}'")
+            logger.debug(f"Moved sub task id {sub_task_id} under main task id {main_task_id} with sort key '{sort_key}'")
         except Exception as e:
-            logger.error(f"Failed to rename sub task {old_sub_task} of \
-                         main task {main_task} of section {section} from {Todolist.TABLE_SUB_TASKS.value} to new name '{new_sub_task}': {e}")
+            conn.rollback() # The name can be a duplicate, the connection has to be usable again
+            logger.error(f"Failed to move sub task id {sub_task_id} under main task id {main_task_id}: {e}")
             raise e
 
-    def delete_sub_tasks(sub_task: str, main_task: str, section: str):
-        '''Delete the sub task from table'''
+    def delete_sub_tasks_by_id(sub_task_ids: list) -> None:
+        '''Delete the pending sub tasks with one statement'''
         try:
-            maintaskid = MainTaskTools.get_main_task_id(main_task, section)
-            sectionid = SectionTools.get_section_id(section)
-            cur.execute(f"DELETE FROM {Todolist.TABLE_SUB_TASKS.value} WHERE {Todolist.SUB_TASK_NAME.value} = '{sub_task}' \
-                        AND {Todolist.MAIN_TASK_ID.value} = {maintaskid} AND {Todolist.SECTION_ID.value} = {sectionid} \
-                        AND {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}';")
+            cur.execute(f"DELETE FROM {Todolist.TABLE_SUB_TASKS.value} WHERE {Todolist.SUB_TASK_ID.value} IN ({", ".join(str(i) for i in sub_task_ids)}) \
+                        AND {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}'")
             conn.commit()
-            logger.debug(f"Deleting sub task {sub_task} of {main_task} of {section} from {Todolist.TABLE_SUB_TASKS.value}")
+            logger.debug(f"Deleting sub task ids {sub_task_ids}")
         except Exception as e:
-            logger.error(f"Failed to delete sub task {sub_task} of {main_task} of {section} from {Todolist.TABLE_SUB_TASKS.value}: {e}")
+            logger.error(f"Failed to delete sub task ids {sub_task_ids}: {e}")
             raise e
 
-    def complete_sub_tasks(sub_task: str, main_task: str, section: str):
+    def complete_sub_task_by_id(sub_task_id: int) -> None:
         '''Mark the sub task as completed and adds the end time'''
         try:
-            maintaskid = MainTaskTools.get_main_task_id(main_task, section)
-            sectionid = SectionTools.get_section_id(section)
             cur.execute(f"UPDATE {Todolist.TABLE_SUB_TASKS.value} SET {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[0]}', \
-                        {Todolist.END_TIME.value} = '{oh.get_datetime_now()}' \
-                        WHERE {Todolist.SUB_TASK_NAME.value} = '{sub_task}' \
-                        AND {Todolist.MAIN_TASK_ID.value} = {maintaskid} AND {Todolist.SECTION_ID.value} = {sectionid};")
+                        {Todolist.END_TIME.value} = %s WHERE {Todolist.SUB_TASK_ID.value} = {sub_task_id}", (oh.get_datetime_now(),))
             conn.commit()
-            logger.debug(f"Updating {sub_task} as completed, main task id: {maintaskid}, section id: {sectionid}")
+            logger.debug(f"Updating sub task id {sub_task_id} as completed")
         except Exception as e:
-            logger.error(f"Failed to update sub task {sub_task} as completed, main task id: {maintaskid}, section id: {sectionid}: {e}")
+            logger.error(f"Failed to update sub task id {sub_task_id} as completed: {e}")
             raise e
-        
-    def set_sub_task_as_pending(sub_task: str, main_task: str, section: str):
+
+    def set_sub_task_as_pending_by_id(sub_task_id: int) -> None:
         '''Set the status of the sub task as pending and clears the ending time'''
         try:
-            maintaskid = MainTaskTools.get_main_task_id(main_task, section)
-            sectionid = SectionTools.get_section_id(section)
             cur.execute(f"UPDATE {Todolist.TABLE_SUB_TASKS.value} SET {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}', \
-                        {Todolist.END_TIME.value} = NULL \
-                        WHERE {Todolist.SUB_TASK_NAME.value} = '{sub_task}' \
-                        AND {Todolist.MAIN_TASK_ID.value} = {maintaskid} AND {Todolist.SECTION_ID.value} = {sectionid};")
+                        {Todolist.END_TIME.value} = NULL WHERE {Todolist.SUB_TASK_ID.value} = {sub_task_id}")
             conn.commit()
-            logger.debug(f"Changed sub task {sub_task} to pending and clearing end time")
+            logger.debug(f"Changed sub task id {sub_task_id} to pending and clearing end time")
         except Exception as e:
-            logger.error(f"Failed to update sub task {sub_task} as pending in main task id: {maintaskid}, section id: {sectionid}: {e}")
+            logger.error(f"Failed to update sub task id {sub_task_id} as pending: {e}")
             raise e
         
 class Completed():
     def get_pomodoro_rows():
-        """Get all the pomodoro timer entries"""
+        """Get all the pomodoro timer entries, the start time (primary key) is the first column"""
         try:
             logger.debug("Getting pomodoro rows")
-            return cur.execute(f"SELECT {end_time}, {duration} / 60 AS duration, {timer_category} FROM {table_name} ORDER BY {end_time} DESC").fetchall()
+            return cur.execute(f"SELECT {pkey}, {end_time}, {duration} / 60 AS duration, {timer_category} FROM {table_name} ORDER BY {end_time} DESC").fetchall()
         except Exception as e:
             logger.error(f"Failed to get pomodoro rows: {e}")
             raise e
         
-    def delete_pomodoro_rows(endtime: str):
-        """Remove a row from the pomodoro table"""
+    def delete_pomodoro_row(starttime):
+        """Remove the row with the start time (primary key) from the pomodoro table"""
         try:
-            cur.execute(f"DELETE FROM {table_name} WHERE {end_time} = '{endtime}'")
+            cur.execute(f"DELETE FROM {table_name} WHERE {pkey} = '{starttime}'")
             conn.commit()
-            logger.debug(f"Deleting pomodoro row with end time of {end_time}")
+            logger.debug(f"Deleting pomodoro row with start time of {starttime}")
         except Exception as e:
-            logger.error(f"Failed to delete pomodoro row with end time of {end_time}: {e}")
+            logger.error(f"Failed to delete pomodoro row with start time of {starttime}: {e}")
             raise e
         
     def get_all_completed_tasks():
-        """Getting all the completed task from the main task and sub task tables"""
+        """Getting all the completed task from the main task and sub task tables, the first column is the sub task id (or main task id if there is no sub task)"""
         try:
             logger.debug("Getting todolist completed tasks")
-            ans = cur.execute(f"SELECT {Todolist.TABLE_SUB_TASKS.value}.{Todolist.END_TIME.value}, {Todolist.SUB_TASK_NAME.value}, {Todolist.MAIN_TASK_NAME.value}, \
-                        {Todolist.SECTION_NAME.value} FROM {Todolist.TABLE_SUB_TASKS.value} \
+            ans = cur.execute(f"SELECT {Todolist.SUB_TASK_ID.value} AS id, {Todolist.TABLE_SUB_TASKS.value}.{Todolist.END_TIME.value}, {Todolist.SUB_TASK_NAME.value}, \
+                        {Todolist.MAIN_TASK_NAME.value}, {Todolist.SECTION_NAME.value} FROM {Todolist.TABLE_SUB_TASKS.value} \
                         LEFT OUTER JOIN {Todolist.TABLE_MAIN_TASKS.value} ON {Todolist.TABLE_MAIN_TASKS.value}.{Todolist.MAIN_TASK_ID.value} = \
                         {Todolist.TABLE_SUB_TASKS.value}.{Todolist.MAIN_TASK_ID.value} \
                         LEFT OUTER JOIN {Todolist.TABLE_SECTION.value} ON {Todolist.TABLE_SUB_TASKS.value}.{Todolist.SECTION_ID.value} = \
                         {Todolist.TABLE_SECTION.value}.{Todolist.SECTION_ID.value} \
                         WHERE {Todolist.TABLE_SUB_TASKS.value}.{Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[0]}' \
                         UNION \
-                        SELECT {Todolist.END_TIME.value}, NULL AS {Todolist.SUB_TASK_NAME.value}, {Todolist.MAIN_TASK_NAME.value}, \
-                        {Todolist.SECTION_NAME.value} FROM {Todolist.TABLE_MAIN_TASKS.value} \
+                        SELECT {Todolist.TABLE_MAIN_TASKS.value}.{Todolist.MAIN_TASK_ID.value}, {Todolist.END_TIME.value}, NULL AS {Todolist.SUB_TASK_NAME.value}, \
+                        {Todolist.MAIN_TASK_NAME.value}, {Todolist.SECTION_NAME.value} FROM {Todolist.TABLE_MAIN_TASKS.value} \
                         LEFT OUTER JOIN {Todolist.TABLE_SECTION.value} ON {Todolist.TABLE_MAIN_TASKS.value}.{Todolist.SECTION_ID.value} = \
                         {Todolist.TABLE_SECTION.value}.{Todolist.SECTION_ID.value} WHERE {Todolist.STATUS.value} = \
                         '{Todolist.STATUS_ENUM_TYPES.value[0]}' ORDER BY {Todolist.END_TIME.value} DESC").fetchall()
@@ -556,40 +1107,31 @@ class Completed():
             logger.error(f"Failed to get todolist completed tasks: {e}")
             raise e
         
-    def delete_completed_sub_task(subtask, endtime):
+    def delete_completed_sub_task_by_id(sub_task_id: int):
         """Deleting a completed sub task entry from the sub task table"""
         try:
-            cur.execute(f"DELETE FROM {Todolist.TABLE_SUB_TASKS.value} WHERE {Todolist.SUB_TASK_NAME.value} = '{subtask}' \
-                        AND {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[0]}' \
-                        AND {Todolist.END_TIME.value} = '{endtime}';")
+            cur.execute(f"DELETE FROM {Todolist.TABLE_SUB_TASKS.value} WHERE {Todolist.SUB_TASK_ID.value} = {sub_task_id} \
+                        AND {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[0]}'")
             conn.commit()
-            logger.debug(f"Deleting completed sub task {subtask} with end time {endtime}")
+            logger.debug(f"Deleting completed sub task id {sub_task_id}")
         except Exception as e:
-            logger.error(f"Failed to delete sub task {subtask} with endtime: {endtime}: {e}")
-            raise e 
-        
-    def delete_completed_main_task(maintask, section, endtime):
-        """Deleting a completed main task and all its associated sub tasks"""
-        try:
-            # Get main task id 
-            maintaskid = cur.execute(f"SELECT {Todolist.MAIN_TASK_ID.value} FROM {Todolist.TABLE_MAIN_TASKS.value} \
-                                     WHERE {Todolist.MAIN_TASK_NAME.value} = '{maintask}' \
-                                     AND {Todolist.END_TIME.value} = '{endtime}' \
-                                     AND {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[0]}'").fetchone()[0]
-            
-            # Delete main task 
-            if Completed.completed_sub_task_with_main_task_exist(maintaskid):
+            logger.error(f"Failed to delete completed sub task id {sub_task_id}: {e}")
+            raise e
+
+    def delete_completed_main_task_by_id(main_task_id: int):
+        """Deleting a completed main task, it is kept as deleted if it has completed sub tasks"""
+        try:
+            if Completed.completed_sub_task_with_main_task_exist(main_task_id):
                 cur.execute(f"UPDATE {Todolist.TABLE_MAIN_TASKS.value} SET {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[2]}' \
-                            WHERE {Todolist.MAIN_TASK_ID.value} = '{maintaskid}'")
+                            WHERE {Todolist.MAIN_TASK_ID.value} = {main_task_id}")
             else:
-                cur.execute(f"DELETE FROM {Todolist.TABLE_MAIN_TASKS.value} WHERE {Todolist.MAIN_TASK_ID.value} = '{maintaskid}'")
-
+                cur.execute(f"DELETE FROM {Todolist.TABLE_MAIN_TASKS.value} WHERE {Todolist.MAIN_TASK_ID.value} = {main_task_id}")
             conn.commit()
-            logger.debug(f"Deleting completed main task '{maintask}' with end time {endtime} in section '{section}' as well as all its associated sub task")
+            logger.debug(f"Deleting completed main task id {main_task_id}")
         except Exception as e:
-            logger.error(f"Failed to delete completed main task '{maintask}' from section '{section}' with end time {endtime} and its associated sub task: {e}")
+            logger.error(f"Failed to delete completed main task id {main_task_id}: {e}")
             raise e
-        
+
     def completed_sub_task_with_main_task_exist(maintask_id: int):
         """Return true if there exist completed sub task(s) with section_id"""
         try:
@@ -610,16 +1152,16 @@ class Completed():
             s_filter_str = f"AND LOWER({Todolist.SECTION_NAME.value}) LIKE LOWER('%{s_filter.strip()}%')" if s_filter else ""
 
 
-            ans = cur.execute(f"SELECT * FROM (SELECT {Todolist.TABLE_SUB_TASKS.value}.{Todolist.END_TIME.value}, {Todolist.SUB_TASK_NAME.value}, {Todolist.MAIN_TASK_NAME.value}, \
-                        {Todolist.SECTION_NAME.value} FROM {Todolist.TABLE_SUB_TASKS.value} \
+            ans = cur.execute(f"SELECT * FROM (SELECT {Todolist.SUB_TASK_ID.value} AS id, {Todolist.TABLE_SUB_TASKS.value}.{Todolist.END_TIME.value}, {Todolist.SUB_TASK_NAME.value}, \
+                        {Todolist.MAIN_TASK_NAME.value}, {Todolist.SECTION_NAME.value} FROM {Todolist.TABLE_SUB_TASKS.value} \
                         LEFT OUTER JOIN {Todolist.TABLE_MAIN_TASKS.value} ON {Todolist.TABLE_MAIN_TASKS.value}.{Todolist.MAIN_TASK_ID.value} = \
                         {Todolist.TABLE_SUB_TASKS.value}.{Todolist.MAIN_TASK_ID.value} \
                         LEFT OUTER JOIN {Todolist.TABLE_SECTION.value} ON {Todolist.TABLE_SUB_TASKS.value}.{Todolist.SECTION_ID.value} = \
                         {Todolist.TABLE_SECTION.value}.{Todolist.SECTION_ID.value} \
                         WHERE {Todolist.TABLE_SUB_TASKS.value}.{Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[0]}' \
                         UNION \
-                        SELECT {Todolist.END_TIME.value}, NULL AS {Todolist.SUB_TASK_NAME.value}, {Todolist.MAIN_TASK_NAME.value}, \
-                        {Todolist.SECTION_NAME.value} FROM {Todolist.TABLE_MAIN_TASKS.value} \
+                        SELECT {Todolist.TABLE_MAIN_TASKS.value}.{Todolist.MAIN_TASK_ID.value}, {Todolist.END_TIME.value}, NULL AS {Todolist.SUB_TASK_NAME.value}, \
+                        {Todolist.MAIN_TASK_NAME.value}, {Todolist.SECTION_NAME.value} FROM {Todolist.TABLE_MAIN_TASKS.value} \
                         LEFT OUTER JOIN {Todolist.TABLE_SECTION.value} ON {Todolist.TABLE_MAIN_TASKS.value}.{Todolist.SECTION_ID.value} = \
                         {Todolist.TABLE_SECTION.value}.{Todolist.SECTION_ID.value} WHERE {Todolist.STATUS.value} = \
                         '{Todolist.STATUS_ENUM_TYPES.value[0]}') \
@@ -630,7 +1172,170 @@ class Completed():
             logger.error("Failed to get filtered todolist completed tasks")
             raise e
 
+class ResultCache():
+    '''Results of the functions by their arguments, a result is read again after ttl seconds (e.g. the last x days move with the time) or 
+    once any of the tables the function reads from is changed by any program, the changed tables are read from the change log (see Changes)'''
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.results = {} # (function name, args): (time read, tables, result)
+        self.version = None # Version of the change log that the results match
+        self.checked_at, self.checked_commits = 0, None # Time of the last read of the change log and the commits of this program then
+        self.lock = threading.Lock() # The functions are also called from the threads of the ConnectionPool (api)
+
+    def cached(self, *tables):
+        '''Decorator to cache the results of the function, which only reads from the tables'''
+        def decorator(func):
+            @functools.wraps(func)
+            def inner(*args):
+                key = (func.__qualname__, args)
+                self.drop_changed()
+                with self.lock:
+                    entry = self.results.get(key)
+                    if entry and time.monotonic() - entry[0] < self.ttl:
+                        return entry[2]
+                    version = self.version
+                # The change log is read before the result, so a change made while the result is read drops it on the next call. The result 
+                # is not kept if another thread read the change log meanwhile, the changes it dropped can be newer than the result
+                read_at = time.monotonic()
+                result = func(*args)
+                with self.lock:
+                    if self.version == version:
+                        self.results[key] = (read_at, tables, result)
+                return result
+            return inner
+        return decorator
+
+    def drop_changed(self):
+        # Drop the results that read from the tables changed since the results were read. The change log is read at most every 
+        # CHANGE_CHECK_INTERVAL seconds (the changes of other programs are seen that much later) or after any commit of this program, 
+        # outside the lock so the threads do not wait for each other's query
+        now = time.monotonic()
+        with self.lock:
+            version, commits = self.version, commit_count
+            if version is not None and commits == self.checked_commits and now - self.checked_at < CHANGE_CHECK_INTERVAL:
+                return
+            self.checked_at, self.checked_commits = now, commits
+        if version is None:
+            last, changed = Changes.get_version(), set()
+        else:
+            last, _, changed, _ = Changes.get_changes(version)
+        with self.lock:
+            if self.version is None or last > self.version:
+                self.version = last
+            if changed:
+                self.results = {key: entry for key, entry in self.results.items() if changed.isdisjoint(entry[1])}
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+
+# Numbers of the analyse dashboard, switching between the last 7/30/365 days or refreshing after a change of the other table reads the cache
+analyse_cache = ResultCache(ANALYSE_CACHE_TTL)
+
+@functools.lru_cache(maxsize=4096)
+def format_date(date: datetime.datetime, time_period: str) -> str:
+    # Label of the day/week/month/year of the date, cached as the same periods are labelled again on every refresh and pan of the plots
+    if time_period == 'week':
+        return str(int(date.strftime("%W")) + 1)
+    return date.strftime({'day': "%d-%b-%Y (%a)", 'month': "%b-%Y", 'year': "%Y"}[time_period])
+
 class AnalyseTodolist():
+    def format_dates(dates: list, time_period: str) -> list:
+        '''Return the dates as the labels used for the day/week/month/year plots'''
+        return [format_date(date, time_period) for date in dates]
+
+    def get_time_series(column: str, value: str, time_period: str, start=None, end=None, max_points=None, num=20) -> tuple:
+        '''Return (dates, values) as NumPy arrays of the value (of the column of the time rollup) by day/week/month/year from the period of start 
+        to the period of end (naive datetimes in the time zone of the session), the last num periods if start is None. Only the periods from the 
+        first to the last period with data are returned. 
+        If there are more than max_points periods, the periods are split into max_points / 2 bins and only the lowest and highest period 
+        of each bin are returned, so the shape of a long range is kept with a few points'''
+        try:
+            interval = {'day': '1 day', 'week': '1 week', 'month': '1 month', 'year': '1 year'}[time_period]
+            query = f"WITH data_range AS (SELECT DATE_TRUNC('{time_period}', MIN(bucket)) AS first_period, DATE_TRUNC('{time_period}', MAX(bucket)) \
+                    AS last_period FROM {time_rollup_table} WHERE {column} <> 0), \
+                    ends AS (SELECT first_period, LEAST(DATE_TRUNC('{time_period}', %(end)s::TIMESTAMP::TIMESTAMPTZ), last_period) AS last_period \
+                    FROM data_range), \
+                    bounds AS (SELECT GREATEST(COALESCE(DATE_TRUNC('{time_period}', %(start)s::TIMESTAMP::TIMESTAMPTZ), \
+                    last_period - interval '{interval}' * (%(num)s - 1)), first_period) AS first_period, last_period FROM ends), \
+                    periods AS (SELECT period, COALESCE(data.value, 0) AS value, ROW_NUMBER() OVER (ORDER BY period) - 1 AS i, COUNT(*) OVER () AS n \
+                    FROM bounds, generate_series(bounds.first_period, bounds.last_period, interval '{interval}') AS period LEFT OUTER JOIN \
+                    (SELECT DATE_TRUNC('{time_period}', bucket) AS period, {value} AS value FROM {time_rollup_table}, bounds \
+                    WHERE bucket >= bounds.first_period AND bucket < bounds.last_period + interval '{interval}' GROUP BY 1) AS data USING (period)), \
+                    bins AS (SELECT period, value, i / CASE WHEN n > %(max_points)s THEN CEIL(n::FLOAT / (%(max_points)s / 2))::INT ELSE 1 END AS bin \
+                    FROM periods) \
+                    SELECT EXTRACT(EPOCH FROM period::TIMESTAMP)::BIGINT, value::BIGINT FROM \
+                    (SELECT period, value, ROW_NUMBER() OVER (PARTITION BY bin ORDER BY value, period) AS low, \
+                    ROW_NUMBER() OVER (PARTITION BY bin ORDER BY value DESC, period) AS high FROM bins) AS ranked \
+                    WHERE low = 1 OR high = 1 ORDER BY period"
+            params = {"start": start, "end": end, "num": num, "max_points": max(max_points, 2) if max_points else None}
+            rows = np.array(cur.execute(query, params).fetchall(), dtype=np.int64).reshape(-1, 2)
+            return rows[:, 0].astype("datetime64[s]"), rows[:, 1]
+        except Exception as e:
+            logger.error(f"Failed to get {column} by {time_period}: {e}")
+            raise e
+
+    def get_focus_time_series(time_period: str, start=None, end=None, max_points=None) -> tuple:
+        '''Return (dates, minutes) of the focus timers by day/week/month/year as NumPy arrays (see get_time_series)'''
+        return AnalyseTodolist.get_time_series("focus_seconds", "SUM(focus_seconds) / 60", time_period, start, end, max_points)
+
+    def get_completed_task_series(time_period: str, start=None, end=None, max_points=None) -> tuple:
+        '''Return (dates, number of tasks) of the completed main tasks and sub tasks by day/week/month/year as NumPy arrays (see get_time_series)'''
+        return AnalyseTodolist.get_time_series("completed_tasks", "SUM(completed_tasks)", time_period, start, end, max_points)
+
+    def get_daily_totals() -> tuple:
+        '''Return (days, focus minutes, completed tasks) as NumPy arrays of all the days with focus timers or completed tasks (in the time zone 
+        of the session), days is in the order of the days as datetime64[D]'''
+        try:
+            query = f"SELECT bucket::DATE - DATE '1970-01-01', SUM(focus_seconds) / 60, SUM(completed_tasks) FROM {time_rollup_table} GROUP BY 1 ORDER BY 1"
+            rows = np.array(cur.execute(query).fetchall(), dtype=np.int64).reshape(-1, 3)
+            return rows[:, 0].astype("datetime64[D]"), rows[:, 1], rows[:, 2]
+        except Exception as e:
+            logger.error(f"Failed to get the daily totals: {e}")
+            raise e
+
+    @analyse_cache.cached(table_name)
+    def get_timer_lengths() -> tuple:
+        '''Return (counts, seconds) of the timers from the duration rollup as NumPy arrays of shape (2, 2, minutes), indexed by 
+        [category (TIMER_CATEGORIES), stopped early (0 or 1), length in whole minutes]'''
+        try:
+            logger.debug("Getting the lengths of the timers")
+            query = f"SELECT ({timer_category} = '{TIMER_CATEGORIES[1]}')::INT, stopped::INT, minutes, num_timers, seconds FROM {duration_rollup_table}"
+            rows = np.array(cur.execute(query).fetchall(), dtype=np.int64).reshape(-1, 5)
+            shape = (len(TIMER_CATEGORIES), 2, rows[:, 2].max() + 1 if len(rows) else 1)
+            counts, seconds = np.zeros(shape, dtype=np.int64), np.zeros(shape, dtype=np.int64)
+            counts[rows[:, 0], rows[:, 1], rows[:, 2]] = rows[:, 3] # One row for each index (primary key)
+            seconds[rows[:, 0], rows[:, 1], rows[:, 2]] = rows[:, 4]
+            return counts, seconds
+        except Exception as e:
+            logger.error(f"Failed to get the lengths of the timers: {e}")
+            raise e
+
+    @analyse_cache.cached(table_name)
+    def get_focus_by_weekday_hour() -> np.ndarray:
+        '''Return the focus time (seconds) by day of the week (rows, Monday first) and hour of the day (columns) in the time zone of the session 
+        as a NumPy array of shape (7, 24), the focus timers are counted in the hour they ended'''
+        try:
+            logger.debug("Getting the focus time by day of the week and hour")
+            query = f"SELECT EXTRACT(ISODOW FROM bucket)::INT - 1, EXTRACT(HOUR FROM bucket)::INT, SUM(focus_seconds) FROM {time_rollup_table} \
+                    WHERE focus_seconds <> 0 GROUP BY 1, 2"
+            rows = np.array(cur.execute(query).fetchall(), dtype=np.int64).reshape(-1, 3)
+            focus = np.zeros((7, 24), dtype=np.int64)
+            focus[rows[:, 0], rows[:, 1]] = rows[:, 2]
+            return focus
+        except Exception as e:
+            logger.error(f"Failed to get the focus time by day of the week and hour: {e}")
+            raise e
+
+    def get_today() -> np.datetime64:
+        '''Return the date today in the time zone of the session as datetime64[D], the same days as get_daily_totals'''
+        try:
+            return np.datetime64(cur.execute("SELECT CURRENT_DATE").fetchone()[0], "D")
+        except Exception as e:
+            logger.error(f"Failed to get the date today: {e}")
+            raise e
+
+    @analyse_cache.cached(Todolist.TABLE_MAIN_TASKS.value, Todolist.TABLE_SUB_TASKS.value)
     def get_num_all_completed_tasks() -> int:
         """Get the number of all completed tasks from the todolist tables"""
         try:
@@ -653,6 +1358,7 @@ class AnalyseTodolist():
             logger.error("Failed to get all completed tasks from todolist tables")
             raise e
         
+    @analyse_cache.cached(Todolist.TABLE_MAIN_TASKS.value, Todolist.TABLE_SUB_TASKS.value)
     def get_num_completed_tasks(last_x_days: int) -> int:
         """Get the number of completed tasks in the last x days"""
         try:
@@ -676,52 +1382,15 @@ class AnalyseTodolist():
             logger.error(f"Failed to get the number of completed tasks in the last {last_x_days} days")
             raise e 
         
-    def get_num_completed_task_by_time(time_period: str) -> list:
-        """Get the total number of completed task by day/week/month/year"""
-        try:
-            date_format = {'day': "%d-%b-%Y (%a)", 'week': "%W", 'month': "%b-%Y", 'year': "%Y"}
-            interval = {'day': '1 day', 'week': '1 week', 'month': '1 month', 'year': '1 year'}
-            query = f"SELECT date_series, num FROM \
-                    (SELECT generate_series((SELECT DATE_TRUNC('{time_period}', MIN({Todolist.END_TIME.value})) FROM {Todolist.TABLE_SUB_TASKS.value} \
-                    WHERE {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[0]}'), \
-                    (SELECT DATE_TRUNC('{time_period}', MAX({Todolist.END_TIME.value})) FROM {Todolist.TABLE_SUB_TASKS.value} \
-                    WHERE {Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[0]}'), \
-                    interval '{interval[time_period]}') AS date_series) \
-                    LEFT OUTER JOIN \
-                    (SELECT date_trunc('{time_period}', {Todolist.END_TIME.value}) AS x_axis, COUNT(*) AS num FROM \
-                    (SELECT {Todolist.TABLE_SUB_TASKS.value}.{Todolist.END_TIME.value}, {Todolist.SUB_TASK_NAME.value}, {Todolist.MAIN_TASK_NAME.value}, \
-                    {Todolist.SECTION_NAME.value} FROM {Todolist.TABLE_SUB_TASKS.value} \
-                    LEFT OUTER JOIN {Todolist.TABLE_MAIN_TASKS.value} ON {Todolist.TABLE_MAIN_TASKS.value}.{Todolist.MAIN_TASK_ID.value} = \
-                    {Todolist.TABLE_SUB_TASKS.value}.{Todolist.MAIN_TASK_ID.value} \
-                    LEFT OUTER JOIN {Todolist.TABLE_SECTION.value} ON {Todolist.TABLE_SUB_TASKS.value}.{Todolist.SECTION_ID.value} = \
-                    {Todolist.TABLE_SECTION.value}.{Todolist.SECTION_ID.value} \
-                    WHERE {Todolist.TABLE_SUB_TASKS.value}.{Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[0]}' \
-                    UNION \
-                    SELECT {Todolist.END_TIME.value}, NULL AS {Todolist.SUB_TASK_NAME.value}, {Todolist.MAIN_TASK_NAME.value}, \
-                    {Todolist.SECTION_NAME.value} FROM {Todolist.TABLE_MAIN_TASKS.value} \
-                    LEFT OUTER JOIN {Todolist.TABLE_SECTION.value} ON {Todolist.TABLE_MAIN_TASKS.value}.{Todolist.SECTION_ID.value} = \
-                    {Todolist.TABLE_SECTION.value}.{Todolist.SECTION_ID.value} WHERE {Todolist.STATUS.value} = \
-                    '{Todolist.STATUS_ENUM_TYPES.value[0]}') \
-                    GROUP BY 1) AS sorted_tasks \
-                    on sorted_tasks.x_axis = date_series \
-                    ORDER BY date_series DESC \
-                    LIMIT 20"
-            ans = cur.execute(query).fetchall()
-            date_array = []
-            num_array = []
-            date_format_selected = date_format[time_period]
-            # Return a list of formatted date and the number of tasks completed 
-            for date, num in ans:
-                date_array.insert(0, date.strftime(date_format_selected))
-                if not num: # Convert from None to 0 
-                    num = 0
-                num_array.insert(0, num)
-            if time_period == 'week':
-                date_array = [str(int(w) + 1) for w in date_array]
-            return date_array, num_array
-        except Exception as e:
-            raise e
-        
+    def get_num_completed_task_by_time(time_period: str, formatted=True) -> list:
+        """Get the total number of completed task by day/week/month/year for the last 20 periods, dates are returned as datetime if formatted is False"""
+        dates, nums = AnalyseTodolist.get_completed_task_series(time_period)
+        date_array = dates.tolist() # datetime64 to datetime
+        if formatted:
+            date_array = AnalyseTodolist.format_dates(date_array, time_period)
+        return date_array, nums.tolist()
+
+    @analyse_cache.cached(table_name)
     def get_sum_timers(last_x_days: int, timer_type: str):
         """Get the sum of focus or break timers duration in the last x days"""
         try:
@@ -734,6 +1403,7 @@ class AnalyseTodolist():
             logger.error(f"Failed to get the sum of {timer_type} timers in the last {last_x_days} days: {e}")
             raise e
         
+    @analyse_cache.cached(table_name)
     def get_sum_all_timers(timer_type: str):
         """Get the sum of focus or break timers duration since the beginning"""
         try:
@@ -745,39 +1415,163 @@ class AnalyseTodolist():
             logger.error(f"Failed to get the sum of {timer_type} timers since the beginning: {e}")
             raise e
     
-    def get_sum_focus_timers_by_time(time_period: str) -> list:
-        """Get the sum of focus timers duration by day/week/month/year"""
-        try:
-            logger.debug(f"Getting sum of focus timer by {timer_category}")
-            date_format = {'day': "%d-%b-%Y (%a)", 'week': "%W", 'month': "%b-%Y", 'year': "%Y"}
-            interval = {'day': '1 day', 'week': '1 week', 'month': '1 month', 'year': '1 year'}
-            query = f"SELECT date_series, sum_duration FROM \
-            (SELECT generate_series( \
-            (SELECT DATE_TRUNC('{time_period}', MIN({end_time})) FROM {table_name} WHERE {timer_category} = 'focus'), \
-            (SELECT DATE_TRUNC('{time_period}', MAX({end_time})) FROM {table_name} WHERE {timer_category} = 'focus'), \
-            interval '{interval[time_period]}') AS date_series) \
-            LEFT OUTER JOIN \
-            (SELECT date_trunc('{time_period}', {end_time}) AS x_axis, SUM({duration})/60 AS sum_duration FROM {table_name} WHERE {timer_category} = 'focus' GROUP BY 1) \
-            AS sorted_tasks \
-            on sorted_tasks.x_axis = date_series \
-            ORDER BY date_series DESC \
-            LIMIT 20"
-            ans = cur.execute(query).fetchall()
-            date_array = []
-            num_array = []
-            date_format_selected = date_format[time_period]
-            for date, num in ans:
-                date_array.insert(0, date.strftime(date_format_selected))
-                if not num:
-                    num = 0
-                num_array.insert(0, num)
-            if time_period == 'week':
-                date_array = [str(int(w) + 1) for w in date_array]
-            return date_array, num_array
-        except Exception as e:
-            logger.error(f"Failed to get sum of focus timer by {time_period}: {e}")
-            raise e
+    def get_sum_focus_timers_by_time(time_period: str, formatted=True) -> list:
+        """Get the sum of focus timers duration (minutes) by day/week/month/year for the last 20 periods, dates are returned as datetime if formatted is False"""
+        dates, mins = AnalyseTodolist.get_focus_time_series(time_period)
+        date_array = dates.tolist() # datetime64 to datetime
+        if formatted:
+            date_array = AnalyseTodolist.format_dates(date_array, time_period)
+        return date_array, mins.tolist()
         
+# Tables that can be exported and imported with the columns (in order) and the column used to order the rows
+# NOTE: the order of the tables is the order that they are imported in, so the ids can be remapped
+TRANSFER_TABLES = {Todolist.TABLE_SECTION.value: (COL_SECTION, Todolist.SECTION_PKEY.value),
+                   Todolist.TABLE_MAIN_TASKS.value: (COL_MAIN_TASKS, Todolist.MAIN_TASK_PKEY.value),
+                   Todolist.TABLE_SUB_TASKS.value: (COL_SUB_TASKS, Todolist.SUB_TASK_PKEY.value),
+                   table_name: (pmdr_columns, pkey)}
+
+# Class for exporting and importing the tables with COPY so the rows are streamed instead of fetched all at once
+class Transfer():
+    def get_columns(table: str) -> list:
+        '''Return the list of columns of the table that are exported'''
+        return list(TRANSFER_TABLES[table][0].keys())
+
+    def get_column_types(table: str) -> list:
+        '''Return the list of the database types of the exported columns'''
+        return [v[0] for v in TRANSFER_TABLES[table][0].values()]
+
+    def count_rows(table: str) -> int:
+        '''Return the number of rows in the table, used for the progress bar'''
+        try:
+            return cur.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        except Exception as e:
+            logger.error(f"Failed to count rows of ({table}): {e}")
+            raise e
+
+    def copy_out(table: str, csv=True):
+        '''Generator streaming the rows of the table using COPY TO STDOUT,
+        yields chunks of CSV (with header) if csv is True, otherwise yields the rows as tuples of python objects'''
+        cols = Transfer.get_columns(table)
+        query = f"SELECT {", ".join(cols)} FROM {table} ORDER BY {TRANSFER_TABLES[table][1]}"
+        try:
+            logger.debug(f"Exporting table ({table}) with COPY")
+            if csv:
+                with cur.copy(f"COPY ({query}) TO STDOUT (FORMAT CSV, HEADER)") as copy:
+                    for data in copy:
+                        yield bytes(data)
+            else:
+                # Enum and VARCHAR columns are loaded as text, the other columns are loaded as their python types
+                types = ["timestamptz" if t.startswith("TIMESTAMP") else "int4" if t == "INT" else "text" for t in Transfer.get_column_types(table)]
+                with cur.copy(f"COPY ({query}) TO STDOUT") as copy:
+                    copy.set_types(types)
+                    for row in copy.rows():
+                        yield row
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Failed to export table ({table}): {e}")
+            raise e
+
+    def copy_in(tables: dict) -> dict:
+        '''Import the tables in a single transaction and returns the number of rows added to each table
+        tables is a dictionary of table name: (columns in the file, generator of data, True if data is CSV chunks (with header) else rows as tuples)
+        Rows are copied into temporary tables first, the ids of the sections and tasks are then remapped to new ids
+        so they do not clash with the existing rows'''
+        section, main, sub = Todolist.TABLE_SECTION.value, Todolist.TABLE_MAIN_TASKS.value, Todolist.TABLE_SUB_TASKS.value
+        section_id, main_task_id, sub_task_id = Todolist.SECTION_ID.value, Todolist.MAIN_TASK_ID.value, Todolist.SUB_TASK_ID.value
+        try:
+            # Copy every file into a temporary table with the same columns as the file
+            file_cols = {}
+            for table in TRANSFER_TABLES:
+                cols = tables[table][0] if table in tables else Transfer.get_columns(table)
+                col_types = dict(zip(Transfer.get_columns(table), Transfer.get_column_types(table)))
+                file_cols[table] = [c for c in cols if c in col_types] # Unknown columns are copied as text but not imported
+                cur.execute(f"CREATE TEMP TABLE import_{table} ({", ".join(f"{c} {col_types.get(c, "TEXT")}" for c in cols)}) ON COMMIT DROP")
+                if table not in tables:
+                    continue
+                logger.debug(f"Copying rows into temporary table (import_{table})")
+                data, csv = tables[table][1], tables[table][2]
+                with cur.copy(f"COPY import_{table} ({", ".join(cols)}) FROM STDIN {"(FORMAT CSV, HEADER)" if csv else ""}") as copy:
+                    if csv:
+                        for chunk in data:
+                            copy.write(chunk)
+                    else:
+                        for row in data:
+                            copy.write_row(row)
+
+            # Map the old section ids to the existing section with the same name, otherwise to a new id
+            # Section ids that are referred to by the tasks but no longer exist (deleted sections with completed tasks) are kept if no section 
+            # can have the id (given before and not used), so the tasks of deleted sections are matched when the same file is imported again. 
+            # Otherwise they are mapped to new ids that are not used
+            last_section_id = cur.execute(f"SELECT last_value FROM {cur.execute("SELECT pg_get_serial_sequence(%s, %s)", (section, section_id)).fetchone()[0]}").fetchone()[0]
+            cur.execute(f"CREATE TEMP TABLE map_{section} ON COMMIT DROP AS \
+                        SELECT i.{section_id} AS old_id, COALESCE(s.{section_id}, nextval(pg_get_serial_sequence('{section}', '{section_id}'))) AS new_id, \
+                        s.{section_id} IS NULL AS is_new FROM import_{section} i LEFT OUTER JOIN {section} s ON s.{Todolist.SECTION_NAME.value} = i.{Todolist.SECTION_NAME.value} \
+                        ORDER BY i.{section_id}")
+            cur.execute(f"INSERT INTO map_{section} SELECT old_id, CASE WHEN old_id <= {last_section_id} AND NOT EXISTS (SELECT 1 FROM {section} \
+                        WHERE {section_id} = old_id) THEN old_id ELSE nextval(pg_get_serial_sequence('{section}', '{section_id}')) END, FALSE FROM \
+                        (SELECT {section_id} AS old_id FROM import_{main} UNION SELECT {section_id} FROM import_{sub}) \
+                        WHERE old_id NOT IN (SELECT old_id FROM map_{section})")
+
+            # Main tasks are mapped to the existing main task with the same name and status in the same section, otherwise to a new id
+            # Completed (and deleted) main tasks also need the same start and end time, so importing the same file again adds nothing
+            pending = Todolist.STATUS_ENUM_TYPES.value[1]
+            same_times = " AND ".join(f"e.{c} IS NOT DISTINCT FROM i.{c}" for c in (Todolist.START_TIME.value, Todolist.END_TIME.value) if c in file_cols[main])
+            cur.execute(f"CREATE TEMP TABLE map_{main} ON COMMIT DROP AS \
+                        SELECT DISTINCT ON (i.{main_task_id}) i.{main_task_id} AS old_id, \
+                        COALESCE(e.{main_task_id}, nextval(pg_get_serial_sequence('{main}', '{main_task_id}'))) AS new_id, \
+                        e.{main_task_id} IS NULL AS is_new FROM import_{main} i JOIN map_{section} ms ON ms.old_id = i.{section_id} \
+                        LEFT OUTER JOIN {main} e ON e.{section_id} = ms.new_id AND e.{Todolist.MAIN_TASK_NAME.value} = i.{Todolist.MAIN_TASK_NAME.value} \
+                        AND e.{Todolist.STATUS.value} = i.{Todolist.STATUS.value} AND (i.{Todolist.STATUS.value} = '{pending}'{f" OR ({same_times})" if same_times else ""}) \
+                        ORDER BY i.{main_task_id}, e.{main_task_id}")
+
+            # Insert the rows with the remapped ids
+            added = {}
+            cur.execute(f"INSERT INTO {section} ({section_id}, {Todolist.SECTION_NAME.value}) OVERRIDING SYSTEM VALUE \
+                        SELECT m.new_id, i.{Todolist.SECTION_NAME.value} FROM import_{section} i JOIN map_{section} m ON m.old_id = i.{section_id} \
+                        WHERE m.is_new ORDER BY i.{section_id}")
+            added[section] = cur.rowcount
+
+            cols = [c for c in file_cols[main] if c not in (main_task_id, section_id)]
+            cur.execute(f"INSERT INTO {main} ({main_task_id}, {section_id}, {", ".join(cols)}) OVERRIDING SYSTEM VALUE \
+                        SELECT mm.new_id, ms.new_id, {", ".join(f"i.{c}" for c in cols)} FROM import_{main} i \
+                        JOIN map_{main} mm ON mm.old_id = i.{main_task_id} JOIN map_{section} ms ON ms.old_id = i.{section_id} \
+                        WHERE mm.is_new ORDER BY i.{main_task_id}")
+            added[main] = cur.rowcount
+
+            # Sub tasks of main tasks that are not in the import are dropped as they cannot be remapped
+            # Sub tasks that already exist under the same main task are skipped, pending ones by the name and completed ones by the name and end time
+            cols = [c for c in file_cols[sub] if c not in (sub_task_id, main_task_id, section_id)]
+            same_end = f" OR e.{Todolist.END_TIME.value} IS NOT DISTINCT FROM i.{Todolist.END_TIME.value}" if Todolist.END_TIME.value in cols else ""
+            last_sub_task_id = cur.execute(f"SELECT COALESCE(MAX({sub_task_id}), 0) FROM {sub}").fetchone()[0]
+            cur.execute(f"INSERT INTO {sub} ({main_task_id}, {section_id}, {", ".join(cols)}) \
+                        SELECT mm.new_id, ms.new_id, {", ".join(f"i.{c}" for c in cols)} FROM import_{sub} i \
+                        JOIN map_{main} mm ON mm.old_id = i.{main_task_id} JOIN map_{section} ms ON ms.old_id = i.{section_id} \
+                        WHERE NOT EXISTS (SELECT 1 FROM {sub} e WHERE e.{main_task_id} = mm.new_id AND e.{Todolist.SUB_TASK_NAME.value} = i.{Todolist.SUB_TASK_NAME.value} \
+                        AND e.{Todolist.STATUS.value} = i.{Todolist.STATUS.value} AND (i.{Todolist.STATUS.value} = '{pending}'{same_end})) \
+                        ORDER BY i.{sub_task_id}")
+            added[sub] = cur.rowcount
+
+            # Pomodoro timers are identified by the start time, timers that already exist are skipped
+            # The focused main tasks are remapped, the sub tasks get new ids that are not mapped so their time is kept on the main task only
+            cols = file_cols[table_name]
+            values = {pmdr_main_task_id: "mm.new_id", pmdr_sub_task_id: "NULL::INT"}
+            cur.execute(f"INSERT INTO {table_name} ({", ".join(cols)}) SELECT DISTINCT ON (i.{pkey}) {", ".join(values.get(c, f"i.{c}") for c in cols)} \
+                        FROM import_{table_name} i LEFT OUTER JOIN map_{main} mm ON {"mm.old_id = i." + pmdr_main_task_id if pmdr_main_task_id in cols else "FALSE"} \
+                        WHERE NOT EXISTS (SELECT 1 FROM {table_name} p WHERE p.{pkey} = i.{pkey}) ORDER BY i.{pkey}")
+            added[table_name] = cur.rowcount
+
+            # The imported pending tasks are given new sort keys after the existing tasks with the same parent (in the order of their keys)
+            # so they cannot have the same key as an existing task 
+            fill_sort_keys({main: f"{main_task_id} IN (SELECT new_id FROM map_{main} WHERE is_new)",
+                            sub: f"{sub_task_id} > {last_sub_task_id} AND {main_task_id} IN (SELECT new_id FROM map_{main})"})
+            conn.commit()
+            logger.info(f"Imported rows into the database: {added}")
+            return added
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Failed to import rows into the database: {e}")
+            raise e
+
 def clean_deleted_main_tasks():
     """Clean up function to delete main task marked as "deleted" when there are no longer any associated sub task
     so the database does not contain any main tasks that are no longer referenced"""
@@ -790,7 +1584,108 @@ def clean_deleted_main_tasks():
             logger.debug(f"Deleted main task id of {id} from table due to no associated completed sub tasks")
     conn.commit()
 
+def fill_sort_keys(conditions: dict = None):
+    """Give the pending tasks without a sort key (added before the sort keys or imported without them) a sort key after the other tasks 
+    with the same parent, in the order they were added. conditions ({table: SQL condition}) gives new keys to the pending rows matching 
+    the condition instead, in the order of their current keys (the rows without a key last). Not committed, the caller commits"""
+    for table, parent, order in ((Todolist.TABLE_MAIN_TASKS.value, Todolist.SECTION_ID.value, f"{Todolist.START_TIME.value}, {Todolist.MAIN_TASK_ID.value}"),
+                                 (Todolist.TABLE_SUB_TASKS.value, Todolist.MAIN_TASK_ID.value, Todolist.SUB_TASK_ID.value)):
+        id_col = order.split(", ")[-1]
+        pending = f"{Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}'"
+        condition = conditions[table] if conditions else f"{Todolist.SORT_KEY.value} IS NULL"
+        rows = cur.execute(f"SELECT {parent}, {id_col} FROM {table} WHERE {pending} AND ({condition}) ORDER BY {parent}, {Todolist.SORT_KEY.value}, {order}").fetchall()
+        if not rows:
+            continue
+        last_keys = dict(cur.execute(f"SELECT {parent}, MAX({Todolist.SORT_KEY.value}) FROM {table} WHERE {pending} AND NOT ({condition}) \
+                                     AND {parent} IN (SELECT {parent} FROM {table} WHERE {pending} AND ({condition})) GROUP BY {parent}").fetchall())
+        ids = {}
+        for parent_id, task_id in rows:
+            ids.setdefault(parent_id, []).append(task_id)
+        values = ", ".join(f"({task_id}, '{sort_key}')" for parent_id, task_ids in ids.items()
+                           for task_id, sort_key in zip(task_ids, oh.get_sort_keys(last_keys.get(parent_id), None, len(task_ids))))
+        cur.execute(f"UPDATE {table} SET {Todolist.SORT_KEY.value} = v.sort_key FROM (VALUES {values}) AS v (id, sort_key) WHERE {table}.{id_col} = v.id")
+        logger.info(f"Added sort keys to {len(rows)} pending rows of ({table})")
+
+class FocusTime():
+    def get_task_focus_time(section_ids: list) -> tuple:
+        '''Return ({main_task_id: focus seconds of the main task and its sub tasks}, {sub_task_id: focus seconds}) of the pending main tasks 
+        of the sections, read from the rollup'''
+        try:
+            main = Todolist.TABLE_MAIN_TASKS.value
+            rows = cur.execute(f"SELECT r.{Todolist.MAIN_TASK_ID.value}, r.{Todolist.SUB_TASK_ID.value}, r.focus_seconds FROM {rollup_table} r \
+                        JOIN {main} m ON m.{Todolist.MAIN_TASK_ID.value} = r.{Todolist.MAIN_TASK_ID.value} WHERE m.{Todolist.SECTION_ID.value} = ANY(%s) \
+                        AND m.{Todolist.STATUS.value} = '{Todolist.STATUS_ENUM_TYPES.value[1]}'", (list(section_ids),)).fetchall()
+            main_tasks, sub_tasks = {}, {}
+            for main_task_id, sub_task_id, seconds in rows:
+                main_tasks[main_task_id] = main_tasks.get(main_task_id, 0) + seconds
+                if sub_task_id:
+                    sub_tasks[sub_task_id] = seconds
+            logger.debug(f"Got focus time of {len(main_tasks)} main tasks and {len(sub_tasks)} sub tasks of sections {section_ids}")
+            return main_tasks, sub_tasks
+        except Exception as e:
+            logger.error(f"Failed to get focus time of the tasks of sections {section_ids}: {e}")
+            raise e
+
+    def get_section_focus_time() -> dict:
+        '''Return {section_id: focus seconds} of all the tasks (pending and completed) in each section, read from the rollup'''
+        try:
+            main = Todolist.TABLE_MAIN_TASKS.value
+            focus_time = dict(cur.execute(f"SELECT m.{Todolist.SECTION_ID.value}, SUM(r.focus_seconds)::BIGINT FROM {rollup_table} r \
+                        JOIN {main} m ON m.{Todolist.MAIN_TASK_ID.value} = r.{Todolist.MAIN_TASK_ID.value} GROUP BY 1").fetchall())
+            logger.debug(f"Got focus time of {len(focus_time)} sections")
+            return focus_time
+        except Exception as e:
+            logger.error(f"Failed to get focus time of the sections: {e}")
+            raise e
+
+class Changes():
+    # The versions are given when the rows are inserted but the transactions can commit in another order, so a version below the last one
+    # can be added later by a transaction still in progress. While other transactions are in progress, the version returned is the one before
+    # the first missing version (in the last CHANGE_WINDOW versions) and the changes after it are read again with the missing ones
+    def get_safe_version(version: int) -> str:
+        '''Return the query of the last version that all the changes up to are committed, None if there are no changes after the version'''
+        return f"SELECT CASE WHEN NOT EXISTS (SELECT 1 FROM pg_snapshot_xip(pg_current_snapshot()) x WHERE x IS DISTINCT FROM \
+                pg_current_xact_id_if_assigned()) THEN m.last ELSE COALESCE((SELECT MIN(c.version) FROM {changes_table} c WHERE c.version < m.last \
+                AND c.version >= GREATEST({version}, m.last - {CHANGE_WINDOW}) AND NOT EXISTS (SELECT 1 FROM {changes_table} n \
+                WHERE n.version = c.version + 1)), m.last) END FROM (SELECT MAX(version) AS last FROM {changes_table} WHERE version > {version}) m"
+
+    def get_version() -> int:
+        '''Return the version of the last change, 0 if there are no changes'''
+        try:
+            return cur.execute(f"SELECT COALESCE(({Changes.get_safe_version(0)}), 0)").fetchone()[0]
+        except Exception as e:
+            logger.error(f"Failed to get the version of the change log: {e}")
+            raise e
+
+    def get_changes(version: int, others: bool = False) -> tuple:
+        '''Return (last version, set of changed section ids, set of changed tables, True if all the changes were made by this connection) 
+        of the changes after the version, only the changes made by the other connections if others is True. The changes after the last version
+        can be returned again on the next call if they were committed before the changes of another transaction with lower versions'''
+        try:
+            last, sections, tables, own = cur.execute(f"SELECT ({Changes.get_safe_version(version)}), ARRAY_AGG(DISTINCT {Todolist.SECTION_ID.value}) FILTER \
+                        (WHERE {Todolist.SECTION_ID.value} IS NOT NULL), ARRAY_AGG(DISTINCT table_name), BOOL_AND(backend_pid = pg_backend_pid()) \
+                        FROM {changes_table} WHERE version > {version}{" AND backend_pid <> pg_backend_pid()" if others else ""}").fetchone()
+            logger.debug(f"Got changes after version {version} up to version {last} of sections {sections} in tables {tables}")
+            return last or version, set(sections or ()), set(tables or ()), own is not False
+        except Exception as e:
+            logger.error(f"Failed to get the changes after version {version}: {e}")
+            raise e
+
+    def clean_changes() -> int:
+        '''Delete the changes older than CHANGE_LOG_DAYS, returns the number of changes deleted'''
+        try:
+            cur.execute(f"DELETE FROM {changes_table} WHERE changed_at < NOW() - INTERVAL '{CHANGE_LOG_DAYS} days'")
+            conn.commit()
+            logger.debug(f"Deleted {cur.rowcount} changes older than {CHANGE_LOG_DAYS} days from ({changes_table})")
+            return cur.rowcount
+        except Exception as e:
+            logger.error(f"Failed to delete the old changes from ({changes_table}): {e}")
+            raise e
+
 clean_deleted_main_tasks()
+fill_sort_keys()
+conn.commit()
+Changes.clean_changes()
 
 def end_connection() -> bool:
     # Commit changes then close db cursor and db connection
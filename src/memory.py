@@ -0,0 +1,118 @@
+import collections, gc, itertools, json, os, sys, threading, time, tracemalloc
+
+# Samples of the memory of the program to find what grows while it is left open: the resident memory, the memory allocated by Python
+# (tracemalloc, with the lines that allocated the most since the first sample), the Python objects by type and the Qt objects counted
+# by the caller. Taken by the memory diagnostics of the program (see tododoro.py) and the soak test (benchmarks/soak.py)
+# NOTE: this module does not import Qt or the database so it can be used from anywhere
+
+MAX_SAMPLES = 288 # Samples kept (a day of samples every 5 minutes), the oldest are dropped
+TOP_TYPES = 40 # Python types with the most objects kept in each sample
+TOP_ALLOCATIONS = 10 # Lines that allocated the most since the first sample kept in each sample
+MIN_GROWTH = {"mb": 1.0, "count": 20} # Smallest growth over the window flagged, in MB for the memory and in objects for the counts
+MIN_GROWTH_RATIO = 0.01 # and relative to the first value, so a bounded cache filling up (e.g. the queries of psycopg) is not flagged in all the objects
+
+def get_rss_mb() -> float:
+    '''Return the resident memory of this process in MB (peak memory if the current memory cannot be read), None on Windows'''
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10 # Bytes on macOS, KB on Linux
+
+def get_type_counts(top: int = TOP_TYPES) -> dict:
+    '''Return the number of objects tracked by the garbage collector of the top types with the most objects (module.name except builtins)'''
+    counts = collections.Counter(map(type, gc.get_objects())) # Counted by the type first, formatting the name of every object is slow
+    return {cls.__qualname__ if cls.__module__ == "builtins" else f"{cls.__module__}.{cls.__qualname__}": count for cls, count in counts.most_common(top)}
+
+def is_growing(values: list, min_growth: float, min_ratio: float = 0) -> bool:
+    '''Return True if the values never go down and the last value is at least min_growth and min_ratio of the first value more than the first'''
+    return all(b >= a for a, b in zip(values, values[1:])) and values[-1] - values[0] >= max(min_growth, values[0] * min_ratio)
+
+class MemoryMonitor():
+    '''Memory samples of the program, a series (e.g. "type:dict" or "qt:QLabel") is flagged when it grows in every sample of the window'''
+    def __init__(self, window: int = 6, max_samples: int = MAX_SAMPLES):
+        self.lock = threading.Lock()
+        self.window = window
+        self.samples = collections.deque(maxlen=max_samples) # Dict of the time, values of each series and the top allocations
+        self.first_snapshot = None # Allocations of the first sample, the top allocations are compared with it
+
+    def start(self, frames: int = 1):
+        '''Start tracing the allocations (frames of the traceback kept for each allocation), the program uses more memory and is slower'''
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.first_snapshot = None
+
+    def get_top_allocations(self) -> list:
+        # Lines of the allocations that grew the most since the first sample, the allocations of tracemalloc, the samples kept and the imports
+        # are left out of the lines instead of the traces (filter_traces matches the file name of every trace, which is slow once there are many)
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot()
+        if self.first_snapshot is None:
+            self.first_snapshot = snapshot
+        stats = (stat for stat in snapshot.compare_to(self.first_snapshot, "lineno")
+                 if stat.traceback[0].filename not in (tracemalloc.__file__, __file__) and not stat.traceback[0].filename.startswith("<"))
+        return [{"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "size_kb": round(stat.size / 1024, 1),
+                 "growth_kb": round(stat.size_diff / 1024, 1), "count": stat.count} for stat in itertools.islice(stats, TOP_ALLOCATIONS)]
+
+    def sample(self, qt_counts: dict = None) -> dict:
+        '''Add a sample of the memory with the number of Qt objects of each class (counted by the caller), return the sample'''
+        gc.collect() # Only the objects still referenced are counted
+        values = {"rss_mb": get_rss_mb(), "objects": len(gc.get_objects())}
+        if tracemalloc.is_tracing():
+            values["traced_mb"] = tracemalloc.get_traced_memory()[0] / 2**20
+        values.update({f"type:{name}": count for name, count in get_type_counts().items()})
+        values.update({f"qt:{name}": count for name, count in (qt_counts or {}).items()})
+        sample = {"time": time.time(), "values": {name: value for name, value in values.items() if value is not None},
+                  "top_allocations": self.get_top_allocations()}
+        with self.lock:
+            self.samples.append(sample)
+        return sample
+
+    def get_trends(self) -> list:
+        '''Return the series that grew in every sample of the last window samples, sorted by the growth compared to the first value'''
+        with self.lock:
+            samples = list(self.samples)[-self.window:]
+        if len(samples) < self.window:
+            return []
+        trends = []
+        for name, last in samples[-1]["values"].items():
+            values = [sample["values"].get(name) for sample in samples]
+            if None in values: # Not in the top types of every sample
+                continue
+            if is_growing(values, MIN_GROWTH["mb"] if name.endswith("_mb") else MIN_GROWTH["count"], MIN_GROWTH_RATIO):
+                trends.append({"series": name, "first": values[0], "last": last, "growth": last - values[0], "samples": len(values)})
+        return sorted(trends, key=lambda t: t["growth"] / max(t["first"], 1), reverse=True)
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+        self.first_snapshot = None
+
+    def get_summary(self) -> dict:
+        '''Return the last sample, the series growing and the first and last value of every series sampled'''
+        with self.lock:
+            samples = list(self.samples)
+        if not samples:
+            return {"samples": 0, "last": None, "growing": [], "series": {}}
+        series = {name: {"first": samples[0]["values"].get(name), "last": value} for name, value in samples[-1]["values"].items()}
+        return {"samples": len(samples), "last": samples[-1], "growing": self.get_trends(), "series": series}
+
+    def dump(self, path: str):
+        '''Write the summary with all the samples to the path as JSON'''
+        with self.lock:
+            samples = list(self.samples)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(dict(self.get_summary(), all_samples=samples), f, indent=4)
+
+memory = MemoryMonitor() # Memory samples of the program, only taken when the memory diagnostics are enabled
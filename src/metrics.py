@@ -0,0 +1,88 @@
+import json, threading, math
+
+# In memory metrics of the database statements, recorded by db.py and shown in the Diagnostics dialog
+# NOTE: this module does not import Qt or the database so it can be used from anywhere
+
+class Histogram():
+    '''HDR style histogram of positive integers (e.g. latency in microseconds), the values are counted in buckets
+    with a relative error below 1/2**(SUB_BUCKET_BITS-1) so the memory used does not grow with the number of values'''
+    SUB_BUCKET_BITS = 7 # 128 sub buckets for each power of 2, error below 1.6%
+
+    def __init__(self):
+        self.counts = {} # Bucket index: number of values
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def get_bucket(self, value: int) -> int:
+        '''Return the index of the bucket of the value, values below 2**SUB_BUCKET_BITS have their own bucket'''
+        if value < (1 << self.SUB_BUCKET_BITS):
+            return value
+        shift = value.bit_length() - self.SUB_BUCKET_BITS
+        return (shift << self.SUB_BUCKET_BITS) + (value >> shift)
+
+    def get_bucket_value(self, bucket: int) -> int:
+        '''Return the highest value counted in the bucket'''
+        if bucket < (1 << self.SUB_BUCKET_BITS):
+            return bucket
+        shift = bucket >> self.SUB_BUCKET_BITS
+        return ((bucket & ((1 << self.SUB_BUCKET_BITS) - 1)) << shift) + (1 << shift) - 1
+
+    def record(self, value: int):
+        value = max(int(value), 0)
+        bucket = self.get_bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def get_percentile(self, percentile: float) -> int:
+        '''Return the value at the percentile (0-100), within the relative error of the buckets'''
+        if not self.count:
+            return 0
+        target = max(math.ceil(self.count * percentile / 100), 1)
+        done = 0
+        for bucket in sorted(self.counts):
+            done += self.counts[bucket]
+            if done >= target:
+                return min(self.get_bucket_value(bucket), self.max)
+        return self.max
+
+    def get_mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+class Metrics():
+    '''Latency (microseconds) and row count histograms of each statement, statements can be recorded from any thread'''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.statements = {} # Statement name: (latency histogram, row count histogram)
+
+    def record(self, name: str, seconds: float, rows=None):
+        with self.lock:
+            latency, row_count = self.statements.setdefault(name, (Histogram(), Histogram()))
+            latency.record(seconds * 1_000_000)
+            if rows is not None and rows >= 0:
+                row_count.record(rows)
+
+    def reset(self):
+        with self.lock:
+            self.statements = {}
+
+    def get_summary(self) -> list:
+        '''Return a list of dict of the count, percentiles (ms), and average rows of each statement, sorted by the total time'''
+        with self.lock:
+            summary = [{"statement": name, "count": latency.count, "total_ms": round(latency.total / 1000, 3),
+                        "p50_ms": latency.get_percentile(50) / 1000, "p95_ms": latency.get_percentile(95) / 1000,
+                        "p99_ms": latency.get_percentile(99) / 1000, "max_ms": latency.max / 1000,
+                        "avg_rows": round(row_count.get_mean(), 1)}
+                       for name, (latency, row_count) in self.statements.items()]
+        return sorted(summary, key=lambda s: s["total_ms"], reverse=True)
+
+    def dump(self, path: str):
+        '''Write the summary to the path as JSON'''
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.get_summary(), f, indent=4)
+
+metrics = Metrics() # Metrics of the program, used by db.py
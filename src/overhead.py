@@ -1,12 +1,13 @@
 import json, logging, sys, os, datetime, re 
-from PySide6.QtWidgets import QMessageBox
 
 # For displaying error messages with the critical icon
-class ErrorBox(QMessageBox):
-    def __init__(self, msg):
-        super().__init__()
-        self.setText(msg)
-        self.setIcon(QMessageBox.Icon.Critical)
+# NOTE: Qt is imported when the message box is created so the command line can use this module without importing Qt 
+def ErrorBox(msg):
+    from PySide6.QtWidgets import QMessageBox
+    error_box = QMessageBox()
+    error_box.setText(msg)
+    error_box.setIcon(QMessageBox.Icon.Critical)
+    return error_box
 
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -40,9 +41,31 @@ def get_logger(name: str, mode='a') -> logging.Logger:
     logging.basicConfig(level=logging.DEBUG, format=config["format"], style="{", filename=os.path.dirname(__file__) + config["outfile"], filemode=mode)
     return logging.getLogger(name)
 
-def get_datetime_now():
-    '''Return the current date time in the specified format (e.g. 2025-05-06 18:48:20+08)'''
-    return datetime.datetime.now().astimezone().isoformat(timespec='seconds', sep=' ')
+def get_datetime_now() -> datetime.datetime:
+    '''Return the current date time with the local time zone, to the second (e.g. 2025-05-06 18:48:20+08:00)'''
+    return datetime.datetime.now().astimezone().replace(microsecond=0)
+
+def get_timezone(name: str = "") -> str:
+    '''Return the time zone of the database session, the name from the config (IANA name e.g. Asia/Singapore) or the time zone
+    of this computer if the name is empty'''
+    if name:
+        return name
+    if os.environ.get("TZ"):
+        return os.environ["TZ"].lstrip(":")
+    # Linux and macOS link /etc/localtime to the zoneinfo file of the time zone (e.g. /usr/share/zoneinfo/Asia/Singapore)
+    localtime = os.path.realpath("/etc/localtime")
+    if "zoneinfo" + os.sep in localtime:
+        return localtime.split("zoneinfo" + os.sep, 1)[1]
+    # Otherwise the current UTC offset in the POSIX format (e.g. <+0800>-8:00), the day boundaries do not follow daylight saving time changes
+    offset = int(datetime.datetime.now().astimezone().utcoffset().total_seconds()) // 60
+    hrs, mins = divmod(abs(offset), 60)
+    return f"<{"+" if offset >= 0 else "-"}{hrs:02}{mins:02}>{"-" if offset >= 0 else "+"}{hrs}:{mins:02}"
+
+def convert_to_hr_mins(seconds: int) -> str:
+    '''Convert seconds to a string of hours and minutes (e.g. 1 h 5 mins)'''
+    hrs = seconds // 3600 
+    mins = (seconds - hrs * 3600) // 60
+    return f"{hrs} h {mins} mins" if hrs else f"{mins} mins"
 
 def check_task_re(task: str) -> tuple:
     '''Checks using regex if ^[NUM]-[NUM]^ exists in the string 'task' '''
@@ -56,3 +79,55 @@ def check_task_re(task: str) -> tuple:
     else:
         return False, None, None
 
+def escape_like(text: str) -> str:
+    '''Escape the wildcards (% and _) of the text so it is matched as it is in a LIKE pattern'''
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Digits of the sort keys of the tasks in ascending order (same order as the "C" collation), the keys are compared as strings so 
+# a task can be moved between two other tasks by giving it a key between their keys without changing the keys of the other tasks
+SORT_KEY_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+def get_sort_key(before: str = None, after: str = None) -> str:
+    '''Return a sort key between the keys before and after (None if there is no task before or after), 
+    the keys never end with "0" so there is always a key between two different keys'''
+    if after is not None and before is not None and after <= before:
+        after = None # Keys are not in order, add after the key before instead
+    if after is None:
+        # Increment the first digit that is not the last digit, the first key is "1" so many tasks can be added before the keys get longer
+        before = before or ""
+        for i, c in enumerate(before):
+            if c != SORT_KEY_DIGITS[-1]:
+                return before[:i] + SORT_KEY_DIGITS[SORT_KEY_DIGITS.index(c) + 1]
+        return before + SORT_KEY_DIGITS[1]
+
+    return get_middle_key(before or "", after)
+
+def get_middle_key(before: str, after: str = None) -> str:
+    '''Return the key in the middle between the keys before and after, after is None if there is no upper limit'''
+    if after is not None:
+        # Skip the common prefix, the missing digits of the key before are "0"
+        i = 0
+        while i < len(after) and (before[i] if i < len(before) else "0") == after[i]:
+            i += 1
+        if i:
+            return after[:i] + get_middle_key(before[i:], after[i:])
+    low = SORT_KEY_DIGITS.index(before[0]) if before else 0
+    high = SORT_KEY_DIGITS.index(after[0]) if after is not None else len(SORT_KEY_DIGITS)
+    if high - low > 1:
+        return SORT_KEY_DIGITS[(low + high) // 2]
+    if after is not None and len(after) > 1:
+        return after[0] # The key after is longer, its first digit is between the keys
+    return SORT_KEY_DIGITS[low] + get_middle_key(before[1:], None)
+
+def get_sort_keys(before: str = None, after: str = None, num: int = 1) -> list:
+    '''Return num sort keys in order between the keys before and after, the keys are spread out so they stay short'''
+    if num <= 0:
+        return []
+    if after is None:
+        # The other keys are between the first key and the key after it, the next key added at the end is still short
+        first = get_sort_key(before, None)
+        return [first] + get_sort_keys(first, get_sort_key(first, None), num - 1)
+    middle = get_sort_key(before, after)
+    half = (num - 1) // 2
+    return get_sort_keys(before, middle, half) + [middle] + get_sort_keys(middle, after, num - 1 - half)
@@ -128,6 +128,8 @@ class Pomodoro(QWidget):
         self.timer_mode = "focus", TimerMode.FOCUS_LONG # Default starting state is in the focus extended mode 
         self.timer_starting_time = None 
         self.timer_ending_time = None 
+        self.focus_task_ids = None, None # Main task id and sub task id of the focus task set in the to do list 
+        self.timer_task_ids = None, None # Task ids of the focus task when the timer started, saved with the timer 
 
         logger.debug("Creating objects for GUI")
         
@@ -238,6 +240,8 @@ class Pomodoro(QWidget):
         # Checks if the timer is newly started
         if self.initial:
             logger.debug("Timer started")
+            if not self.is_started(): # The focus task can be changed while the timer is paused, the timer keeps the task it started with 
+                self.timer_task_ids = self.focus_task_ids if self.tabbar.currentIndex() == 0 else (None, None)
             self.timer_starting_time = oh.get_datetime_now()
 
             # Enable the stop button once timer is started and disable the timer type check box 
@@ -286,6 +290,7 @@ class Pomodoro(QWidget):
         self.initial = True
         self.timer_starting_time = None 
         self.timer_ending_time = None
+        self.timer_task_ids = None, None
         self.stop_button.setEnabled(False) 
         self.start_pause.setStyleSheet(f"background-color: {ObjectsColour.START.value}")
         self.stop_button.setStyleSheet(f"background-color: {ObjectsColour.STOP_DISABLED.value}")
@@ -317,7 +322,8 @@ class Pomodoro(QWidget):
     def add_to_db(self, duration: int):
         # Call function from db to add entry to database, displays error if encountered 
         try:
-            add_timer_row(self.timer_starting_time, self.timer_ending_time, duration, str(self.timer_mode[0]))
+            add_timer_row(self.timer_starting_time, self.timer_ending_time, duration, str(self.timer_mode[0]), *self.timer_task_ids, 
+                          planned=self.timer_mode[1] * 60) # Longer than the duration if the timer is stopped early
             self.pomo_added.emit()
         except Exception as e:
             logger.error(f"Adding timer details to database failed: {e}")
@@ -326,14 +332,43 @@ class Pomodoro(QWidget):
             error_msg.exec()
             return 
 
+    def is_running(self) -> bool:
+        '''Return True if the focus or break timer is running'''
+        return self.timer_focus.timer.isActive() or self.timer_break.timer.isActive()
+
+    def is_started(self) -> bool:
+        '''Return True if the timer is started (running or paused)'''
+        return self.timer_starting_time is not None
+
+    def get_state(self) -> dict:
+        '''Return the state of the timer, used by the api'''
+        timer = self.timer_focus if self.tabbar.currentIndex() == 0 else self.timer_break
+        remaining = timer.timer.remainingTime() if timer.timer.isActive() else timer.timer.interval()
+        if self.is_running():
+            status = "running"
+        else:
+            status = "paused" if self.is_started() else "stopped"
+        return {"status": status, "timer": "focus" if self.tabbar.currentIndex() == 0 else "break", 
+                "extended": self.timer_type.checkState() == Qt.CheckState.Checked, "remaining_seconds": remaining // 1000,
+                "started": self.timer_starting_time.isoformat(timespec='seconds', sep=' ') if self.timer_starting_time else None}
+
     @Slot() 
-    def update_focus_task(self, focus_task):
-        # Set the focus task text when focus task is set in the to do list section 
+    def update_focus_task(self, focus_task, main_task_id=None, sub_task_id=None):
+        # Set the focus task text when focus task is set in the to do list section, the task ids are saved with the next focus timer 
         self.focus_task.setText(f"FOCUS: {focus_task}")
+        self.focus_task_ids = main_task_id, sub_task_id
 
     @Slot()
     def clear_focus_task(self):
         self.focus_task.setText("FOCUS: ")
+        self.focus_task_ids = None, None
+
+    @Slot()
+    def focus_task_deleted(self, main_task_id, sub_task_id):
+        # The focus task was deleted in the to do list, the running timer is saved without it 
+        if self.timer_task_ids == (main_task_id, sub_task_id):
+            self.timer_task_ids = None, None
+        self.clear_focus_task()
 
     @Slot()
     def toggle_focus_task(self, tab):
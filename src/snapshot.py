@@ -0,0 +1,123 @@
+import struct, os, time
+
+import src.overhead as oh
+
+# Binary snapshot of the pending tasks of the to do list and the numbers of the dashboard, saved after the changes are committed and when the
+# program is closed so the next start can show them without waiting for the database. The change log version of the snapshot is used to
+# load only the sections that changed since then (see db.Changes)
+# NOTE: this module does not import Qt or the database, the data is passed in the same format as MainTaskTools.get_section_tasks
+
+# Get logger and start logging
+logger = oh.get_logger("snapshot")
+logger.debug("Logger started")
+
+MAGIC = b"TDDS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHqd") # Magic, format version, change log version, time saved (seconds since epoch)
+SECTION = struct.Struct("<iI?") # Section id, number of open tasks, True if the tasks are saved
+TASK = struct.Struct("<iI") # Main task id, number of sub tasks
+COUNT = struct.Struct("<I")
+INT = struct.Struct("<i")
+VALUE = struct.Struct("<q")
+STRING = struct.Struct("<H") # Length of the UTF-8 string that follows
+
+aggregates = {} # Name: number shown in the dashboard, updated by the dashboard when the numbers are calculated and saved with the snapshot
+
+def get_snapshot_path():
+    '''Return the path of the snapshot file from the config, None if the snapshot is disabled'''
+    config = oh.read_config().get("snapshot", {})
+    if not config.get("enabled", False):
+        return None
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), config.get("file", "tododoro.snapshot"))
+
+def pack_string(s: str) -> bytes:
+    data = s.encode("utf-8")
+    return STRING.pack(len(data)) + data
+
+def save(path: str, version: int, dbname: str, sections: list) -> None:
+    '''Write the snapshot to the path, sections is a list of (section_id, section_name, num_tasks, tasks) where tasks is None if the tasks of the
+    section are not loaded, otherwise a list of (main_task_id, main_task, sort_key, [sub_task_ids], [sub_tasks], [sort_keys])
+    The file is written to a temporary file first so a snapshot is never half written'''
+    chunks = [HEADER.pack(MAGIC, FORMAT_VERSION, version, time.time()), pack_string(dbname), COUNT.pack(len(sections))]
+    for section_id, section_name, num_tasks, tasks in sections:
+        chunks.append(SECTION.pack(section_id, num_tasks, tasks is not None))
+        chunks.append(pack_string(section_name))
+        if tasks is None:
+            continue
+        chunks.append(COUNT.pack(len(tasks)))
+        for main_task_id, main_task, sort_key, sub_task_ids, sub_tasks, sort_keys in tasks:
+            chunks.append(TASK.pack(main_task_id, len(sub_task_ids)))
+            chunks.append(pack_string(main_task))
+            chunks.append(pack_string(sort_key or ""))
+            for sub_task_id, sub_task, sub_sort_key in zip(sub_task_ids, sub_tasks, sort_keys):
+                chunks.append(INT.pack(sub_task_id))
+                chunks.append(pack_string(sub_task))
+                chunks.append(pack_string(sub_sort_key or ""))
+    saved_aggregates = {name: value for name, value in aggregates.items() if value is not None}
+    chunks.append(COUNT.pack(len(saved_aggregates)))
+    for name, value in saved_aggregates.items():
+        chunks.append(pack_string(name))
+        chunks.append(VALUE.pack(int(value)))
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(b"".join(chunks))
+    os.replace(temp_path, path)
+    logger.debug(f"Saved snapshot of {len(sections)} sections with version {version} to {path}")
+
+class Reader():
+    '''Reads the values from the data in the order they were packed'''
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def read(self, fmt: struct.Struct) -> tuple:
+        values = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+        return values
+
+    def read_string(self) -> str:
+        length = self.read(STRING)[0]
+        if self.offset + length > len(self.data):
+            raise ValueError("String is longer than the data")
+        s = str(self.data[self.offset:self.offset + length], "utf-8")
+        self.offset += length
+        return s
+
+def load(path: str):
+    '''Return the snapshot as a dict of version, saved_at, dbname, sections (in the same format as save) and aggregates,
+    None if there is no snapshot or it cannot be read (it is written again after the tasks are loaded from the database)'''
+    try:
+        with open(path, "rb") as f:
+            reader = Reader(f.read())
+        magic, format_version, version, saved_at = reader.read(HEADER)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            logger.info(f"Snapshot {path} is not in format version {FORMAT_VERSION}, not used")
+            return None
+        dbname = reader.read_string()
+        sections = []
+        for _ in range(reader.read(COUNT)[0]):
+            section_id, num_tasks, has_tasks = reader.read(SECTION)
+            section_name = reader.read_string()
+            tasks = [] if has_tasks else None
+            for _ in range(reader.read(COUNT)[0] if has_tasks else 0):
+                main_task_id, num_sub_tasks = reader.read(TASK)
+                main_task, sort_key = reader.read_string(), reader.read_string()
+                sub_task_ids, sub_tasks, sort_keys = [], [], []
+                for _ in range(num_sub_tasks):
+                    sub_task_ids.append(reader.read(INT)[0])
+                    sub_tasks.append(reader.read_string())
+                    sort_keys.append(reader.read_string())
+                tasks.append((main_task_id, main_task, sort_key, sub_task_ids, sub_tasks, sort_keys))
+            sections.append((section_id, section_name, num_tasks, tasks))
+        saved_aggregates = {}
+        for _ in range(reader.read(COUNT)[0]):
+            name = reader.read_string()
+            saved_aggregates[name] = reader.read(VALUE)[0]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, struct.error) as e: # UnicodeDecodeError is a ValueError
+        logger.warning(f"Failed to read snapshot {path}, not used: {e}")
+        return None
+    logger.debug(f"Loaded snapshot of {len(sections)} sections with version {version} from {path}")
+    return {"version": version, "saved_at": saved_at, "dbname": dbname, "sections": sections, "aggregates": saved_aggregates}
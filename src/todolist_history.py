@@ -0,0 +1,312 @@
+from PySide6.QtCore import Signal, Slot, QTimer
+from PySide6.QtGui import QUndoStack, QUndoCommand
+
+import src.overhead as oh
+import src.db as db
+from src.db import MainTaskTools, SubTaskTools
+
+logger = oh.get_logger("tdl history")
+logger.debug("Logger started")
+
+FLUSH_DELAY = 500 # Time (ms) without any new change before the queued database operations are committed
+
+# Undo stack of all the sections of the to do list, the commands change the section right away and queue their database operations,
+# the queued operations are committed together in one transaction once nothing is changed for FLUSH_DELAY
+class TaskHistory(QUndoStack):
+    flushed = Signal(bool) # Emitted after the queued operations are committed, True if the completed tasks were changed
+    flush_failed = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pending = [] # List of (command, is_redo, function, args) not committed yet, in the order they were done
+        self.changed_sections = set() # Sections changed by the commands since the set was last cleared, also after the stack is cleared
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(FLUSH_DELAY)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def queue(self, command, is_redo: bool, operations: list):
+        '''Queue the database operations (function, args) of the command and restart the idle timer'''
+        self.pending.extend((command, is_redo, func, args) for func, args in operations)
+        self.changed_sections.update(command.get_sections())
+        self.flush_timer.start()
+
+    def cancel(self, command, is_redo: bool) -> bool:
+        '''Remove the queued operations of the redo (or undo) of the command if they are not committed yet,
+        returns False if there is nothing to remove (the opposite operations have to be queued instead)'''
+        num = 0
+        while num < len(self.pending) and self.pending[-1 - num][:2] == (command, is_redo):
+            num += 1
+        if not num:
+            return False
+        del self.pending[-num:]
+        logger.debug(f"Removed {num} queued operations of '{command.text()}'")
+        return True
+
+    def has_section(self, section) -> bool:
+        '''Return True if any of the commands in the stack changed the section'''
+        return any(section in self.command(i).get_sections() for i in range(self.count()))
+
+    @Slot()
+    def flush(self) -> bool:
+        '''Commit all the queued operations in one transaction, the stack is cleared if it fails as it no longer matches the database'''
+        self.flush_timer.stop()
+        if not self.pending:
+            return True
+        pending, self.pending = self.pending, []
+        try:
+            with db.transaction():
+                for _, _, func, args in pending:
+                    func(*args)
+        except Exception as e:
+            logger.error(f"Failed to commit {len(pending)} queued operations: {e}")
+            self.clear()
+            self.flush_failed.emit(str(e))
+            return False
+        logger.debug(f"Committed {len(pending)} queued operations")
+        self.flushed.emit(any(command.changes_completed for command, _, _, _ in pending))
+        return True
+
+# Base class of the commands, subclasses change the section in apply and revert and return the database operations as a list of (function, args)
+# The commands keep the nodes of the tasks, the operations read the ids of the nodes when they are committed as new tasks only get their ids then
+class TaskCommand(QUndoCommand):
+    changes_completed = False # True if the command changes the completed tasks, the completed table is updated after it is committed
+
+    def __init__(self, section, text: str):
+        super().__init__(text)
+        self.section = section
+
+    def get_sections(self) -> tuple:
+        '''Return the sections changed by the command'''
+        return (self.section,)
+
+    def redo(self):
+        self.apply()
+        if not self.section.history.cancel(self, False):
+            self.section.history.queue(self, True, self.get_operations())
+
+    def undo(self):
+        self.revert()
+        if not self.section.history.cancel(self, True):
+            self.section.history.queue(self, False, self.get_undo_operations())
+
+    # Database operations of the nodes, the ids of the added tasks are saved in the nodes 
+    def add_main_task(self, main_task):
+        main_task.id = MainTaskTools.add_main_task_to_section(main_task.name, self.section.section_id, main_task.sort_key)
+
+    def add_sub_tasks(self, main_task, sub_tasks: list):
+        if not sub_tasks:
+            return
+        ids = SubTaskTools.add_sub_tasks_to_main_task([node.name for node in sub_tasks], main_task.id, self.section.section_id, 
+                                                      [node.sort_key for node in sub_tasks])
+        for node, sub_task_id in zip(sub_tasks, ids):
+            node.id = sub_task_id
+
+    def delete_main_task(self, main_task):
+        MainTaskTools.delete_main_task_by_id(main_task.id)
+        main_task.id = None
+        for node in main_task.children:
+            node.id = None
+
+    def delete_sub_tasks(self, sub_tasks: list):
+        SubTaskTools.delete_sub_tasks_by_id([node.id for node in sub_tasks])
+        for node in sub_tasks:
+            node.id = None
+
+# Base class of the commands that remove a task from the section, the node is inserted back at the same row when it is undone
+class RemoveTask(TaskCommand):
+    def __init__(self, section, node, text: str):
+        super().__init__(section, text)
+        self.node = node
+        self.parent = node.parent
+        self.row = node.row
+
+    def apply(self):
+        self.section.model.remove_task(self.section.model.get_index(self.node))
+        self.section.reset_flags()
+
+    def revert(self):
+        self.section.model.insert_tasks(self.parent, self.row, [self.node])
+
+class AddMainTask(TaskCommand):
+    def __init__(self, section, main_task: str):
+        super().__init__(section, f"Added main task '{main_task}'")
+        self.main_task = main_task
+        self.node = None # Created by the model when the command is first done, the same node is added again on redo
+
+    def apply(self):
+        if self.node is None:
+            self.node = self.section.model.get_node(self.section.model.add_main_task(self.main_task))
+        else:
+            self.section.model.insert_tasks(self.section.model.root, len(self.section.model.root.children), [self.node])
+        self.section.tasks.setCurrentIndex(self.section.model.get_index(self.node)) # Select the main task so sub tasks can be added to it
+
+    def revert(self):
+        self.section.model.remove_task(self.section.model.get_index(self.node))
+        self.section.reset_flags()
+
+    def get_operations(self) -> list:
+        return [(self.add_main_task, (self.node,))]
+
+    def get_undo_operations(self) -> list:
+        return [(self.delete_main_task, (self.node,))]
+
+class AddSubTasks(TaskCommand):
+    def __init__(self, section, main_task, sub_tasks: list):
+        super().__init__(section, f"Added sub task '{sub_tasks[0]}'" if len(sub_tasks) == 1 else f"Added {len(sub_tasks)} sub tasks")
+        self.main_task = main_task
+        self.sub_tasks = sub_tasks
+        self.nodes = None
+
+    def apply(self):
+        # All the sub tasks are added to the view at once
+        if self.nodes is None:
+            self.nodes = self.section.model.add_sub_tasks(self.main_task, self.sub_tasks)
+        else:
+            self.section.model.insert_tasks(self.main_task, len(self.main_task.children), self.nodes)
+
+    def revert(self):
+        for node in reversed(self.nodes):
+            self.section.model.remove_task(self.section.model.get_index(node))
+        self.section.reset_flags()
+
+    def get_operations(self) -> list:
+        return [(self.add_sub_tasks, (self.main_task, self.nodes))]
+
+    def get_undo_operations(self) -> list:
+        return [(self.delete_sub_tasks, (self.nodes,))]
+
+class RenameTask(TaskCommand):
+    def __init__(self, section, node, new_name: str):
+        super().__init__(section, f"Renamed '{node.name}' to '{new_name}'")
+        self.node = node
+        self.old_name = node.name
+        self.new_name = new_name
+
+    def rename(self, name: str):
+        if self.node.parent is self.section.model.root:
+            MainTaskTools.rename_main_task_by_id(self.node.id, name)
+        else:
+            SubTaskTools.rename_sub_task_by_id(self.node.id, name)
+
+    # The rename (or its undo) is skipped without queueing anything if another task under the same parent has the name, e.g. a task
+    # added after the rename was undone, so the names stay unique as in the database
+    def redo(self):
+        if self.new_name not in self.node.parent.children_by_name:
+            super().redo()
+
+    def undo(self):
+        if self.old_name not in self.node.parent.children_by_name:
+            super().undo()
+
+    def apply(self):
+        self.section.model.rename_task(self.section.model.get_index(self.node), self.new_name)
+
+    def revert(self):
+        self.section.model.rename_task(self.section.model.get_index(self.node), self.old_name)
+
+    def get_operations(self) -> list:
+        return [(self.rename, (self.new_name,))]
+
+    def get_undo_operations(self) -> list:
+        return [(self.rename, (self.old_name,))]
+
+class DeleteMainTask(RemoveTask):
+    def __init__(self, section, node):
+        super().__init__(section, node, f"Deleted main task '{node.name}'")
+
+    def get_operations(self) -> list:
+        return [(self.delete_main_task, (self.node,))]
+
+    def get_undo_operations(self) -> list:
+        # The main task and sub tasks are added again with new ids if the delete was already committed
+        return [(self.add_main_task, (self.node,)), (self.add_sub_tasks, (self.node, self.node.children))]
+
+class DeleteSubTask(RemoveTask):
+    def __init__(self, section, node):
+        super().__init__(section, node, f"Deleted sub task '{node.name}'")
+
+    def get_operations(self) -> list:
+        return [(self.delete_sub_tasks, ([self.node],))]
+
+    def get_undo_operations(self) -> list:
+        return [(self.add_sub_tasks, (self.parent, [self.node]))]
+
+class CompleteMainTask(RemoveTask):
+    changes_completed = True
+
+    def __init__(self, section, node):
+        super().__init__(section, node, f"Completed main task '{node.name}'")
+
+    def set_completed(self, completed: bool):
+        if completed:
+            MainTaskTools.complete_main_task_by_id(self.node.id)
+        else:
+            MainTaskTools.set_main_task_as_pending_by_id(self.node.id)
+
+    def get_operations(self) -> list:
+        return [(self.set_completed, (True,))]
+
+    def get_undo_operations(self) -> list:
+        return [(self.set_completed, (False,))]
+
+class CompleteSubTask(RemoveTask):
+    changes_completed = True
+
+    def __init__(self, section, node):
+        super().__init__(section, node, f"Completed sub task '{node.name}'")
+
+    def set_completed(self, completed: bool):
+        if completed:
+            SubTaskTools.complete_sub_task_by_id(self.node.id)
+        else:
+            SubTaskTools.set_sub_task_as_pending_by_id(self.node.id)
+
+    def get_operations(self) -> list:
+        return [(self.set_completed, (True,))]
+
+    def get_undo_operations(self) -> list:
+        return [(self.set_completed, (False,))]
+
+# Moves a main task (with its sub tasks) or a sub task to the row of the parent in the section, the task can be from another section (source)
+# The task gets a sort key between the tasks around it, the main tasks and sub tasks are moved in the model without loading the sections again 
+class MoveTask(TaskCommand):
+    def __init__(self, section, source, node, parent, row: int):
+        super().__init__(section, f"Moved '{node.name}'" if source is section else f"Moved '{node.name}' to '{section.section_name}'")
+        self.source = source # Section the task is moved from, can be the same section
+        self.node = node
+        self.old_parent, self.old_row, self.old_key = node.parent, node.row, node.sort_key
+        self.new_parent, self.new_row = parent, row
+        siblings = [child for child in parent.children if child is not node]
+        self.new_key = oh.get_sort_key(siblings[row - 1].sort_key if row > 0 else None, siblings[row].sort_key if row < len(siblings) else None)
+
+    def get_sections(self) -> tuple:
+        return (self.section, self.source)
+
+    def move(self, from_section, to_section, parent, row: int, sort_key: str):
+        self.node.sort_key = sort_key
+        if from_section is to_section:
+            to_section.model.move_task(self.node, parent, row)
+        else:
+            from_section.model.remove_task(from_section.model.get_index(self.node))
+            from_section.reset_flags()
+            to_section.model.insert_tasks(parent, row, [self.node])
+
+    def save(self, section, parent, sort_key: str):
+        # Only the row of the moved task is updated (and the sub tasks of a main task moved to another section), the other tasks keep their sort keys 
+        if parent is section.model.root:
+            MainTaskTools.move_main_task(self.node.id, sort_key, None if self.source is self.section else section.section_id)
+        else:
+            SubTaskTools.move_sub_task(self.node.id, parent.id, section.section_id, sort_key)
+
+    def apply(self):
+        self.move(self.source, self.section, self.new_parent, self.new_row, self.new_key)
+
+    def revert(self):
+        self.move(self.section, self.source, self.old_parent, self.old_row, self.old_key)
+
+    def get_operations(self) -> list:
+        return [(self.save, (self.section, self.new_parent, self.new_key))]
+
+    def get_undo_operations(self) -> list:
+        return [(self.save, (self.source, self.old_parent, self.old_key))]
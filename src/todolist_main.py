@@ -1,16 +1,31 @@
 from PySide6.QtWidgets import QApplication, QTabWidget, QLabel, QTabBar, QMessageBox, QInputDialog, QWidget, QVBoxLayout, QHBoxLayout, QPushButton
 from PySide6.QtCore import Slot, Qt, Signal 
-import sys 
+from PySide6.QtGui import QKeySequence
+import sys, time, psycopg
 
 import src.overhead as oh 
 import src.todolist_section as tdl
-from src.db import SectionTools, MainTaskTools, SubTaskTools
-from src.todolist_section import SubTaskItem
+import src.todolist_history as history
+import src.snapshot as snapshot
+from src.db import SectionTools, MainTaskTools, Changes, FocusTime, ConnectionPool, CHANGE_LOG_DAYS, table_name, db_login
 
 # Get logger and start logging 
 logger = oh.get_logger("todolist")
 logger.debug("Logger started")
 
+# Runs in the thread of the connection pool after the sections are shown from the snapshot, returns None if the database is older than 
+# the snapshot (e.g. restored from a backup) so everything is loaded again, otherwise (last version, sections, number of open tasks, 
+# section id: tasks of the changed sections that are loaded, focus time of the sections and the loaded tasks) where sections is None if no section changed 
+def get_snapshot_changes(version: int, loaded_sections: set):
+    if Changes.get_version() < version:
+        return None
+    focus_time = FocusTime.get_section_focus_time(), FocusTime.get_task_focus_time(loaded_sections)
+    last, section_ids, tables, _ = Changes.get_changes(version)
+    if not tables - {table_name}: # Only the pomodoro timers changed 
+        return last, None, None, {}, focus_time
+    tasks = {section_id: MainTaskTools.get_section_tasks(section_id) for section_id in section_ids & loaded_sections}
+    return last, SectionTools.get_sections(), SectionTools.get_num_open_tasks(), tasks, focus_time
+
 # Decorator to display error message when function fails 
 def error_handler(func):
     def inner(*args, **kwargs):
@@ -23,22 +38,47 @@ def error_handler(func):
     return inner 
 
 class Todolist(QTabWidget):
-    update_focus_task_section = Signal(str)
+    update_focus_task_section = Signal(str, object, object) # Name, main task id and sub task id of the focused task 
+    focus_task_deleted = Signal(object, object) # Main task id and sub task id of the focused task, emitted once it is deleted from the database 
     update_completed_task = Signal()
+    reconciled = Signal() # Emitted when the sections shown from the snapshot are updated with the changes in the database 
+    snapshot_changes_loaded = Signal(object) # Emitted from the connection pool thread with the future of get_snapshot_changes
 
-    def __init__(self):
+    def __init__(self, snapshot_path=None):
         super().__init__()
 
-        # Keep track of the tab names to ensure no duplicates 
-        # Get the section name from the database 
-        self.tab_sections = SectionTools.get_section_name()
+        # The sections are shown from the snapshot at the path (if any) and updated with the changes in the database in the background 
+        # version is the version of the change log that the sections match 
+        self.snapshot_path = snapshot_path
+        self.version = None
+        self.snapshot_pool = None
+        self.changes_pending = False # True if changes of other programs were made while the changes since the snapshot were loaded 
+        self.snapshot_changes_loaded.connect(self.apply_snapshot_changes)
+        self.section_focus_time = {} # Section id: focus time (seconds) of all the tasks in the section, shown in the tooltip of the tab 
+        self.focus_task_ids = None, None # Main task id and sub task id of the focused task, checked after tasks are deleted 
+
+        # Undo stack of the changes in all the sections, the changes are saved to the database together after a short idle time
+        self.history = history.TaskHistory(self)
+        self.history.flushed.connect(self.history_flushed)
+        self.history.flush_failed.connect(self.history_flush_failed)
+        self.undo_action = self.history.createUndoAction(self, "Undo")
+        self.undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        self.redo_action = self.history.createRedoAction(self, "Redo")
+        self.redo_action.setShortcuts([QKeySequence("Ctrl+Shift+Z"), QKeySequence.StandardKey.Redo])
+        for action in (self.undo_action, self.redo_action):
+            action.setShortcutContext(Qt.ShortcutContext.WidgetWithChildrenShortcut)
+            self.addAction(action)
 
         # Connecting tab bar signals and enabling tabs closable 
         self.tabBarClicked.connect(self.tab_bar_clicked)
+        self.currentChanged.connect(self.load_section)
         self.tabBarDoubleClicked.connect(self.rename_tab)
         self.setTabsClosable(True)
         self.tabCloseRequested.connect(self.delete_tab)
         self.setTabPosition(QTabWidget.TabPosition.West)
+        # Open the section when a task is dragged over its tab so sub tasks can be dropped in another section 
+        self.tabBar().setChangeCurrentOnDrag(True)
+        self.tabBar().setAcceptDrops(True)
 
         # Creating an empty tab with "+", when "+" tab bar is clicked, create a new tab
         empty_tab = QLabel("")
@@ -48,26 +88,217 @@ class Todolist(QTabWidget):
         # Hide the close button of the "+" tab so it cannot be clicked
         self.tabBar().tabButton(self.count()-1, QTabBar.ButtonPosition.RightSide).resize(0, 0)
 
-        # Initialize all the tab sections based on the database information
-        for i, section in enumerate(self.tab_sections):
-            self.add_tab_section(i, section)
+        if not self.load_snapshot():
+            self.load_sections()
+            self.save_snapshot()
+
+    def load_sections(self):
+        # Initialize all the tab sections based on the database information, only the number of open tasks is loaded for each section
+        self.version = Changes.get_version() # Read first so the changes made while loading are loaded again from the snapshot 
+        num_tasks = SectionTools.get_num_open_tasks()
+        self.section_focus_time = FocusTime.get_section_focus_time()
+        sections = SectionTools.get_sections()
+        for i, (section_id, section) in enumerate(sections):
+            self.add_tab_section(i, section_id, section, num_tasks.get(section_id, 0))
         
-        # Selecting the first tab when the app is first opened 
-        if self.tab_sections:
+        # Selecting the first tab when the app is first opened, the tasks of the other sections are loaded when they are opened
+        if sections:
             self.setCurrentIndex(0)
+            self.load_section(0)
+
+    @error_handler
+    @Slot()
+    def load_section(self, i):
+        # Add the main tasks and sub tasks from the database to the section the first time it is opened 
+        section = self.widget(i)
+        if not isinstance(section, tdl.TodolistSection) or section.loaded:
+            return
+        logger.debug(f"Loading tasks of section '{section.section_name}'")
+        section.load_tasks(MainTaskTools.get_section_tasks(section.section_id))
+        section.model.set_focus_time(*FocusTime.get_task_focus_time([section.section_id]))
+        self.update_tab_text(section)
+
+    def load_snapshot(self) -> bool:
+        '''Show the sections from the snapshot and load the changes since the snapshot in the background, 
+        returns False if there is no snapshot that can be used (the sections are loaded from the database instead)'''
+        if not self.snapshot_path:
+            return False
+        saved = snapshot.load(self.snapshot_path)
+        if saved is None or saved["dbname"] != db_login["dbname"] or time.time() - saved["saved_at"] > CHANGE_LOG_DAYS * 86400:
+            return False # The changes of an old snapshot may already be deleted from the change log 
+
+        logger.debug(f"Showing {len(saved["sections"])} sections from the snapshot of version {saved["version"]}")
+        for i, (section_id, section_name, num_tasks, tasks) in enumerate(saved["sections"]):
+            self.add_tab_section(i, section_id, section_name, num_tasks)
+            if tasks is not None:
+                self.widget(i).load_tasks(tasks)
+                self.update_tab_text(self.widget(i))
+        self.version = saved["version"]
+        snapshot.aggregates.update(saved["aggregates"])
+        if saved["sections"]:
+            self.setCurrentIndex(0)
+            self.load_section(0)
+
+        # The changes are loaded with a separate connection so the sections can be used in the meantime 
+        self.snapshot_pool = ConnectionPool(1)
+        self.history.changed_sections.clear()
+        loaded = {self.widget(i).section_id for i in range(self.count() - 1) if self.widget(i).loaded}
+        future = self.snapshot_pool.executor.submit(self.snapshot_pool.call, get_snapshot_changes, self.version, loaded)
+        future.add_done_callback(self.snapshot_changes_loaded.emit)
+        return True
+
+    @Slot()
+    def apply_snapshot_changes(self, future):
+        # Update the sections shown from the snapshot with the sections and tasks that changed in the database since the snapshot 
+        self.snapshot_pool.close()
+        self.snapshot_pool = None
+        try:
+            changes = future.result()
+        except Exception as e:
+            logger.error(f"Failed to load the changes since the snapshot, loading all sections again: {e}")
+            changes = None
+        if changes is None:
+            self.reload_sections()
+            self.reconciled.emit()
+            return
+
+        version, sections, num_tasks, tasks, focus_time = changes
+        if sections is not None:
+            logger.debug(f"Applying changes up to version {version} to the sections shown from the snapshot, {len(tasks)} sections loaded again")
+            # The tasks of the sections changed in the to do list while the changes were loaded are older than those changes, 
+            # they are read again once the changes are committed instead 
+            edited = {section.section_id for section in self.history.changed_sections if section.section_id in tasks}
+            self.update_sections(sections, num_tasks, tasks, edited)
+
+        self.set_focus_time(*focus_time)
+        self.version = version
+        self.history.changed_sections.clear()
+        self.save_snapshot()
+        self.check_focus_task()
+        self.reconciled.emit()
+        if self.changes_pending:
+            self.changes_pending = False
+            self.load_changes()
+
+    def update_sections(self, sections: list, num_tasks: dict, tasks: dict, edited: set = frozenset()):
+        # Update the tabs to the sections (list of section id, name) in the database: the tasks of the sections in tasks (section id: tasks) 
+        # are replaced, or read again for the sections in edited, and the sections removed are deleted. The undo stack is only cleared 
+        # if its commands changed those sections
+        tabs = {self.widget(i).section_id: self.widget(i) for i in range(self.count() - 1)}
+        section_ids = {section_id for section_id, _ in sections}
+        changed = [section for section_id, section in tabs.items() if section_id not in section_ids or section_id in tasks]
+        if edited or any(self.history.has_section(section) for section in changed):
+            self.history.flush()
+            self.history.clear() # The commands cannot be undone on the tasks loaded again 
+
+        for section_id, section in tabs.items():
+            if section_id not in section_ids:
+                self.removeTab(self.indexOf(section))
+                section.deleteLater()
+        for i, (section_id, section_name) in enumerate(sections):
+            section = tabs.get(section_id)
+            if section is None:
+                self.add_tab_section(i, section_id, section_name, num_tasks.get(section_id, 0))
+                continue
+            section.section_name = section_name
+            if section_id in edited:
+                section.load_tasks(MainTaskTools.get_section_tasks(section_id))
+            elif section_id in tasks:
+                section.load_tasks(tasks[section_id])
+            elif not section.loaded:
+                section.num_tasks = num_tasks.get(section_id, 0)
+                section.loaded = section.num_tasks == 0
+            self.update_tab_text(section)
+        self.load_section(self.currentIndex())
+
+    @error_handler
+    @Slot()
+    def load_changes(self):
+        # Show the sections and tasks changed outside of the to do list (e.g. by the api) since the version the sections match, only the 
+        # loaded sections that changed are read again and the undo stack is kept unless its commands changed those sections
+        if self.snapshot_pool is not None:
+            self.changes_pending = True # Loaded after the changes since the snapshot are applied 
+            return
+        self.history.flush() # The sections read again include the changes of the to do list
+        version, section_ids, tables, _ = Changes.get_changes(self.version, others=True)
+        if tables - {table_name}: # Not only the pomodoro timers changed 
+            loaded = {self.widget(i).section_id for i in range(self.count() - 1) if self.widget(i).loaded}
+            tasks = {section_id: MainTaskTools.get_section_tasks(section_id) for section_id in section_ids & loaded}
+            logger.debug(f"Loading changes up to version {version} of other programs, {len(tasks)} sections loaded again")
+            self.update_sections(SectionTools.get_sections(), SectionTools.get_num_open_tasks(), tasks)
+        self.version = max(self.version, version)
+        self.save_snapshot()
+        self.check_focus_task()
+
+    def save_snapshot(self):
+        # Save the sections with the tasks that are loaded to the snapshot, after the changes are committed and when the program is closed 
+        if not self.snapshot_path or self.snapshot_pool is not None: # Not saved until the changes since the last snapshot are applied 
+            return
+        try:
+            # The version only moves forward if all the changes since then are the changes of the to do list (already shown), 
+            # otherwise the sections of the other changes are loaded again from the next snapshot 
+            version, _, _, own = Changes.get_changes(self.version)
+            if own:
+                self.version = version
+            sections = [self.widget(i) for i in range(self.count() - 1)]
+            sections = [(section.section_id, section.section_name, section.get_num_tasks(), section.get_tasks() if section.loaded else None) 
+                        for section in sections]
+            if any(None in (task[0], *task[3]) for _, _, _, tasks in sections if tasks for task in tasks):
+                logger.debug("Snapshot not saved as some tasks are not saved to the database")
+                return
+            snapshot.save(self.snapshot_path, self.version, db_login["dbname"], sections)
+        except Exception as e:
+            logger.warning(f"Failed to save the snapshot to {self.snapshot_path}: {e}")
 
-            # Add main tasks to each section based on database entries 
-            main_tasks = MainTaskTools.get_main_tasks()
-            for tab in self.tab_sections:
-                for maintask, section in main_tasks:
-                    if section == tab:
-                        self.widget(self.tab_sections.index(tab)).add_main_task_to_tab(maintask)
-                        main_task_id = MainTaskTools.get_main_task_id(maintask, section)
+    def get_current_section(self) -> str:
+        '''Return the section name of the selected tab'''
+        return self.currentWidget().section_name
 
-                        # Add sub tasks to each main task based on database entries 
-                        sub_tasks = SubTaskTools.get_sub_tasks(main_task_id)
-                        for sub_task in sub_tasks:
-                            self.widget(self.tab_sections.index(tab)).tasks_scroll.all_main_tasks.main_task_dicts[maintask].addItem(SubTaskItem(sub_task))
+    @Slot()
+    def update_tab_text(self, section):
+        # Show the section name with the number of open tasks in the tab 
+        num = section.get_num_tasks()
+        name = section.section_name.replace("'", "")
+        self.setTabText(self.indexOf(section), f"{name} ({num})" if num else name)
+        seconds = self.section_focus_time.get(section.section_id)
+        self.setTabToolTip(self.indexOf(section), f"Focus time: {oh.convert_to_hr_mins(seconds)}" if seconds else "")
+
+    def set_focus_time(self, section_focus_time: dict, task_focus_time: tuple):
+        # Show the focus time of the sections (in the tooltip of the tabs) and the tasks of the loaded sections (see db.FocusTime) 
+        self.section_focus_time = section_focus_time
+        for i in range(self.count() - 1):
+            section = self.widget(i)
+            if section.loaded:
+                section.model.set_focus_time(*task_focus_time)
+            self.update_tab_text(section)
+
+    @error_handler
+    @Slot()
+    def update_focus_time(self):
+        # Read the focus time again from the rollup after a pomodoro timer is added 
+        loaded = [self.widget(i).section_id for i in range(self.count() - 1) if self.widget(i).loaded]
+        self.set_focus_time(FocusTime.get_section_focus_time(), FocusTime.get_task_focus_time(loaded))
+
+    def reload_sections(self):
+        # Remove all the tab sections (except the "+" tab) and load them again from the database, used when the database is changed outside of the to do list
+        logger.debug("Reloading all sections from the database")
+        self.history.flush()
+        self.history.clear() # The commands cannot be undone on the new sections
+        current_section = self.currentWidget().section_id if isinstance(self.currentWidget(), tdl.TodolistSection) else None
+        while self.count() > 1:
+            widget = self.widget(0)
+            self.removeTab(0)
+            widget.deleteLater()
+        self.load_sections()
+
+        # Go back to the section that was opened before reloading if it still exists 
+        for i in range(self.count() - 1):
+            if self.widget(i).section_id == current_section:
+                self.setCurrentIndex(i)
+                self.load_section(i)
+                break
+        self.save_snapshot()
+        self.check_focus_task()
 
     # Slot for when tab_bar is clicked
     @error_handler
@@ -82,118 +313,67 @@ class Todolist(QTabWidget):
             if ok:
                 if ans.strip() == '': # Don't allow empty strings as tab names
                     QMessageBox.warning(self, "Empty name", "Empty name is not allowed.")
-                elif ans not in self.tab_sections:
-                    logger.debug(f"Adding new tab '{ans}' at index {idx}")
-                    self.add_tab_section(idx, ans)
-                    self.tab_sections.append(ans)
-                    SectionTools.add_section_name(ans)
-                else: # Don't allow duplicate of tab section
+                    return
+                try:
+                    section_id = SectionTools.add_section_name(ans)
+                except psycopg.errors.UniqueViolation: # Don't allow duplicate of tab section, the section names are unique in the database
                     QMessageBox.warning(self, "Duplicate", f"Duplicate section of '{ans}' not allowed!")
+                    return
+                logger.debug(f"Adding new tab '{ans}' at index {idx}")
+                self.add_tab_section(idx, section_id, ans)
 
-    def add_tab_section(self, i, name):
-        # Creates a new tab
-        tdlSection = tdl.TodolistSection()
+    def add_tab_section(self, i, section_id, name, num_tasks=0):
+        # Creates a new tab, the tasks are loaded from the database when the tab is opened
+        tdlSection = tdl.TodolistSection(section_id, name, num_tasks, self.history)
 
         # Adding all the signals from the TodolistSection widget to the existing todolist_main slot
-        tdlSection.add_main_task_to_db.connect(self.add_main_task_to_db)
-        tdlSection.rename_main_task_in_db.connect(self.rename_main_task_in_db)
-        tdlSection.delete_main_task_in_db.connect(self.delete_main_task_in_db)
-        tdlSection.complete_main_task_in_db.connect(self.complete_main_task_in_db)
-        tdlSection.add_sub_task_to_db.connect(self.add_sub_task_to_db)
-        tdlSection.rename_sub_task_in_db.connect(self.rename_sub_task_in_db)
-        tdlSection.delete_sub_task_in_db.connect(self.delete_sub_task_in_db)
-        tdlSection.complete_sub_task_in_db.connect(self.complete_sub_task_in_db)
-        tdlSection.set_main_task_as_pending.connect(self.set_main_task_as_pending)
-        tdlSection.set_sub_task_as_pending.connect(self.set_sub_task_as_pending)
         tdlSection.update_focus_task.connect(self.update_focus_task)
+        tdlSection.num_tasks_changed.connect(self.update_tab_text)
+        tdlSection.move_to_section.connect(self.move_to_section)
 
         self.insertTab(i, tdlSection, name.replace("'", ""))
+        self.update_tab_text(tdlSection)
 
-    # Slots for when information in database has to be changed
-    @error_handler 
-    @Slot()
-    def add_main_task_to_db(self, task):
-        MainTaskTools.add_main_tasks(task, self.tabText(self.currentIndex()))
-
-    @error_handler
-    @Slot()
-    def rename_main_task_in_db(self, oldnametask, newnametask):
-        MainTaskTools.rename_main_tasks(oldnametask, newnametask, self.tabText(self.currentIndex()))
-
-    @error_handler
     @Slot()
-    def delete_main_task_in_db(self, task):
-        MainTaskTools.delete_main_tasks(task, self.tabText(self.currentIndex()))
+    def history_flushed(self, completed_changed):
+        self.save_snapshot()
+        self.check_focus_task()
+        if completed_changed:
+            self.update_completed_task.emit()
 
-    @error_handler
-    @Slot()
-    def complete_main_task_in_db(self, task):
-        MainTaskTools.complete_main_tasks(task, self.tabText(self.currentIndex()))
-        self.update_completed_task.emit()
-
-    @error_handler
     @Slot()
-    def add_sub_task_to_db(self, subtask, maintask):
-        SubTaskTools.add_sub_tasks(subtask, maintask, self.tabText(self.currentIndex()))
-
-    @error_handler
-    @Slot()
-    def rename_sub_task_in_db(self, oldnametask, newnametask, main_task):
-        SubTaskTools.rename_sub_tasks(oldnametask, newnametask, main_task, self.tabText(self.currentIndex()))
-
-    @error_handler
-    @Slot()
-    def delete_sub_task_in_db(self, subtask, maintask):
-        SubTaskTools.delete_sub_tasks(subtask, maintask, self.tabText(self.currentIndex()))
-
-    @error_handler
-    @Slot()
-    def complete_sub_task_in_db(self, subtask, maintask):
-        SubTaskTools.complete_sub_tasks(subtask, maintask, self.tabText(self.currentIndex()))
-        self.update_completed_task.emit()
-
-    @error_handler
-    @Slot()
-    def set_main_task_as_pending(self, task):
-        MainTaskTools.set_main_task_as_pending(task, self.tabText(self.currentIndex()))
-        self.update_completed_task.emit()
-
-    @error_handler  
-    @Slot()
-    def set_sub_task_as_pending(self, subtask, maintask):
-        SubTaskTools.set_sub_task_as_pending(subtask, maintask, self.tabText(self.currentIndex()))
-        self.update_completed_task.emit()
+    def history_flush_failed(self, error):
+        # The changes in the sections were not saved, load the sections again so they match the database 
+        err = oh.ErrorBox(f"Failed to save the changes to the to do list: {error}")
+        err.exec()
+        self.reload_sections()
 
     # Slot for when delete button is clicked on the section
     @error_handler  
     @Slot()      
     def delete_tab(self, i):
-        num = self.widget(i).tasks_scroll.all_main_tasks.get_num_tasks() # Gets the number of all tasks in the section
+        section = self.widget(i)
+        num = section.get_num_tasks() # Gets the number of all tasks in the section
 
         # Prompts the user to confirm to delete the section with x number of open tasks
-        ans = QMessageBox.warning(self, "Confirm?", f"Do you want to delete section '{self.tabText(i)}' with {num} open tasks?", 
+        ans = QMessageBox.warning(self, "Confirm?", f"Do you want to delete section '{section.section_name}' with {num} open tasks?", 
                             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         
         if ans == QMessageBox.StandardButton.Yes:
-            logger.debug(f"Deleting '{self.tabText(i)}' from index {i}")
+            logger.debug(f"Deleting '{section.section_name}' from index {i}")
+            # Delete the section with all its tasks in the database first, the tab is kept if it fails 
+            if not self.history.flush():
+                return
+            SectionTools.delete_section_with_tasks(section.section_id)
+            if self.history.has_section(section):
+                self.history.clear() # The commands of the deleted section cannot be undone
             if self.currentIndex() == i:
                 self.setCurrentIndex(max(0, i - 1)) # Go to the tab to the left of the deleted tab if the deleted tab is the selected tab
 
-            for main_task in self.widget(i).tasks_scroll.all_main_tasks.get_main_tasks():
-
-                # Delete sub tasks when tab is deleted
-                num_sub_tasks = self.widget(i).tasks_scroll.all_main_tasks.main_task_dicts[main_task].count()
-                while num_sub_tasks > 1:
-                    item = self.widget(i).tasks_scroll.all_main_tasks.main_task_dicts[main_task].takeItem(1)
-                    SubTaskTools.delete_sub_tasks(item.text(), main_task, self.tabText(i))
-                    num_sub_tasks = self.widget(i).tasks_scroll.all_main_tasks.main_task_dicts[main_task].count()
-
-                # Delete main tasks when tab is deleted
-                MainTaskTools.delete_main_tasks(main_task, self.tabText(i))
-
-            SectionTools.delete_section_name(self.tabText(i))
-            self.tab_sections.remove(self.tabText(i))
-            self.removeTab(i)
+            # Remove the whole tab at once instead of each task 
+            self.removeTab(self.indexOf(section))
+            section.deleteLater()
+            self.check_focus_task()
 
     # Slot for when tab is double clicked
     @error_handler
@@ -204,26 +384,61 @@ class Todolist(QTabWidget):
             return
         
         # Prompts the user to enter a name
-        ans = QInputDialog.getText(self, "Rename", f"Enter new name for {self.tabText(i)}", text=f"{self.tabText(i)}")
+        section = self.widget(i)
+        ans = QInputDialog.getText(self, "Rename", f"Enter new name for {section.section_name}", text=f"{section.section_name}")
         
         if ans[1]:
-            if ans[0] in self.tab_sections: # If tab name already exist, show error
-                QMessageBox.warning(self, "Duplicate", f"Duplicate name '{ans[0]}' not allowed!")
-                return
-            
-            elif ans[0].strip() == "": # Show error if empty name 
+            if ans[0].strip() == "": # Show error if empty name 
                 QMessageBox.warning(self, "Empty name", "Empty name is not allowed.")
                 return
 
-            SectionTools.change_section_name(self.tabText(i), ans[0]) # Update database 
-            self.tab_sections.remove(self.tabText(i))
-            self.setTabText(i, ans[0])
-            self.tab_sections.append(ans[0])
-            logger.debug(f"Tab at index {i} renamed from '{self.tabText(i)}' to '{ans[0]}'")
+            try:
+                SectionTools.rename_section(section.section_id, ans[0]) # Update database 
+            except psycopg.errors.UniqueViolation: # If tab name already exist, show error
+                QMessageBox.warning(self, "Duplicate", f"Duplicate name '{ans[0]}' not allowed!")
+                return
+            logger.debug(f"Tab at index {i} renamed from '{section.section_name}' to '{ans[0]}'")
+            section.section_name = ans[0]
+            self.update_tab_text(section)
 
+    @error_handler
     @Slot()
-    def update_focus_task(self, focus_task):
-        self.update_focus_task_section.emit(focus_task)
+    def move_to_section(self, section, main_task):
+        # Prompts the user for the section to move the main task (with its sub tasks) to 
+        sections = [self.widget(i) for i in range(self.count() - 1) if self.widget(i) is not section]
+        if not sections:
+            QMessageBox.information(self, "Move to section", "There is no other section to move the task to.")
+            return
+        ans, ok = QInputDialog.getItem(self, "Move to section", f"Move '{main_task.name}' with {len(main_task.children)} sub tasks to:", 
+                                       [target.section_name for target in sections], 0, False)
+        if not ok:
+            return
+        target = sections[[target.section_name for target in sections].index(ans)]
+        self.load_section(self.indexOf(target)) # The tasks of the section are needed to add the main task at the end 
+        if main_task.name in target.model.main_task_dicts:
+            QMessageBox.warning(self, "Duplicate", f"Main task '{main_task.name}' already exists in '{target.section_name}'!")
+            return
+        logger.debug(f"Moving main task '{main_task.name}' from '{section.section_name}' to '{target.section_name}'")
+        section.push_with_status(history.MoveTask(target, section, main_task, target.model.root, len(target.model.root.children)))
+
+    @Slot()
+    def update_focus_task(self, focus_task, main_task_id, sub_task_id):
+        self.focus_task_ids = main_task_id, sub_task_id
+        self.update_focus_task_section.emit(focus_task, main_task_id, sub_task_id)
+
+    @Slot()
+    def clear_focus_task(self):
+        self.focus_task_ids = None, None
+
+    def check_focus_task(self):
+        # The focused task can be deleted in any section, by an undo of its add or by the api, the focus (and the timer) is cleared then 
+        # so the timer is not saved with the id of the deleted task (undoing the delete adds the task again with a new id)
+        main_task_id, sub_task_id = self.focus_task_ids
+        if main_task_id is None or MainTaskTools.has_task(main_task_id, sub_task_id):
+            return
+        logger.debug(f"Focused main task id {main_task_id} (sub task id {sub_task_id}) was deleted, clearing the focus task")
+        self.focus_task_ids = None, None
+        self.focus_task_deleted.emit(main_task_id, sub_task_id)
 
 class FocusSection(QWidget):
     def __init__(self):
@@ -239,7 +454,7 @@ class FocusSection(QWidget):
         self.clear_task.released.connect(self.clear_focus_task)
 
     @Slot()
-    def update_focus_task(self, focus_task):
+    def update_focus_task(self, focus_task, main_task_id=None, sub_task_id=None):
         self.focus_task.setText(f"FOCUS: {focus_task}")
 
     @Slot()
@@ -248,15 +463,17 @@ class FocusSection(QWidget):
 
 class TodolistwFocus(QWidget):
     w, h = 800, 700
-    def __init__(self):
+    def __init__(self, snapshot_path=None):
         super().__init__()
         self.layout = QVBoxLayout(self)
         self.setLayout = self.layout
         self.focus_section = FocusSection()
-        self.todolist = Todolist()
+        self.todolist = Todolist(snapshot_path)
         self.layout.addWidget(self.focus_section)
         self.layout.addWidget(self.todolist)
         self.todolist.update_focus_task_section.connect(self.focus_section.update_focus_task)
+        self.todolist.focus_task_deleted.connect(self.focus_section.clear_focus_task)
+        self.focus_section.clear_task.released.connect(self.todolist.clear_focus_task)
         
 if __name__ == "__main__":
     app = QApplication([])
@@ -1,47 +1,367 @@
-from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QLineEdit, QLabel, QListWidget, QSizePolicy, QScrollArea, QAbstractScrollArea, QListWidgetItem, \
+from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout, QLineEdit, QLabel, QTreeView, QStyledItemDelegate, \
 QAbstractItemView, QGridLayout, QPushButton, QInputDialog, QMessageBox
-from PySide6.QtCore import Qt, Slot, Signal, QTimer
-from PySide6.QtGui import QBrush, QFont, QColor, QAction 
+from PySide6.QtCore import Qt, Slot, Signal, QTimer, QAbstractItemModel, QModelIndex, QPersistentModelIndex, QSize, QEvent, QMimeData
+from PySide6.QtGui import QBrush, QFont, QColor, QFontMetrics, QKeySequence
 
 if __name__ == "__main__":
     import overhead as oh 
+    import todolist_history as history
 else:
     import src.overhead as oh 
+    import src.todolist_history as history
 
 logger = oh.get_logger("tdl section")
 logger.debug("Logger started")
 
-# Main Task Item (the first item) in the QListWidget, hence text is bold with highlighted background
-class MainTaskItem(QListWidgetItem):
-    def __init__(self, main_task):
-        super().__init__(main_task)
-        font = QFont()
-        font.setBold(True)
-        font.setPointSize(14)
-        self.setFont(font)
-        self.setBackground(QBrush(QColor("#FFFCA1")))
-
-# Sub Task Item in the QListWidget, setting the text is be slightly bigger than default
-class SubTaskItem(QListWidgetItem):
-    def __init__(self, sub_task):
-        super().__init__(sub_task)
-        font = QFont()
-        font.setPointSize(12)
-        self.setFont(font)
-
-# Widget for the five buttons 
+ID_ROLE = Qt.ItemDataRole.UserRole # Role of the main task id or sub task id in the model
+FOCUS_ROLE = Qt.ItemDataRole.UserRole + 1 # Role of the focus time (seconds) of the task in the model
+TASK_MIME_TYPE = "application/x-tododoro-task" # Mime type of the tasks dragged in the to do list
+
+# Node of the task tree, the main tasks are the children of the root node and the sub tasks are the children of the main tasks
+class TaskNode():
+    def __init__(self, name: str, parent=None, row=0, id=None, sort_key=None):
+        self.name = name
+        self.parent = parent
+        self.row = row # Row in the parent, updated when the rows above it are added or removed 
+        self.id = id # Main task id or sub task id in the database, None until the task is saved 
+        self.sort_key = sort_key # Order of the task in its parent in the database, the children are kept in the order of their keys
+        self.children = []
+        self.children_by_name = {} # Name: node of the children, kept in sync with children by the model so duplicates are found without going through the children
+        self.focus_seconds = 0 # Focus time of the pomodoro timers of the task (with its sub tasks for a main task), see db.FocusTime
+
+# Model of all the tasks in a section, shown by the TaskTreeView 
+class TaskTreeModel(QAbstractItemModel):
+    task_dropped = Signal(object, object, object, int) # Emitted with the source model, node, new parent node and new row of a dropped task
+    dragged = None # (model, node) of the task being dragged, the node is moved by a command when it is dropped instead of copying the mime data
+
+    def __init__(self, section=None):
+        super().__init__()
+        self.section = section # Section showing the tasks, used to move the tasks dropped from another section
+        self.root = TaskNode("")
+        # Dictionary to store all the main task nodes for tracking and accessing each main task
+        self.main_task_dicts = self.root.children_by_name
+        self.num_tasks = 0 # Number of main tasks and sub tasks, updated when the rows are added or removed
+
+    def get_node(self, index: QModelIndex) -> TaskNode:
+        return index.internalPointer() if index.isValid() else self.root
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column, self.get_node(parent).children[row])
+
+    def parent(self, index):
+        node = self.get_node(index)
+        if node is self.root or node.parent is self.root:
+            return QModelIndex()
+        return self.createIndex(node.parent.row, 0, node.parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.get_node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return node.name
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"{node.name}\nFocus time: {oh.convert_to_hr_mins(node.focus_seconds)}" if node.focus_seconds else node.name
+        if role == ID_ROLE:
+            return node.id
+        if role == FOCUS_ROLE:
+            return node.focus_seconds
+        return None
+
+    def flags(self, index):
+        # Main tasks are dropped between the main tasks (on the root) and sub tasks are dropped on or between the sub tasks of a main task
+        if not index.isValid():
+            return Qt.ItemFlag.ItemIsDropEnabled
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsDragEnabled
+        return flags | Qt.ItemFlag.ItemIsDropEnabled if self.is_main_task(index) else flags
+
+    def supportedDropActions(self):
+        return Qt.DropAction.MoveAction
+
+    def supportedDragActions(self):
+        return Qt.DropAction.MoveAction
+
+    def mimeTypes(self):
+        return [TASK_MIME_TYPE]
+
+    def mimeData(self, indexes):
+        # The node is kept in the model class as it cannot be stored in the mime data, the mime data only marks it as a task 
+        node = self.get_node(indexes[0])
+        TaskTreeModel.dragged = (self, node)
+        data = QMimeData()
+        data.setData(TASK_MIME_TYPE, str(node.id).encode())
+        return data
+
+    def get_drop_target(self, row: int, parent: QModelIndex):
+        '''Return (parent node, row) where the dragged task is moved to if it is dropped at the row of the parent, 
+        the row does not count the dragged task. Returns None if it cannot be dropped there'''
+        if TaskTreeModel.dragged is None:
+            return None
+        source, node = TaskTreeModel.dragged
+        parent_node = self.get_node(parent)
+        if node.parent is source.root:
+            # Main tasks are only dropped between the main tasks, a main task of another section cannot have the same name as a main task in this section
+            if parent_node is not self.root or (source is not self and node.name in self.main_task_dicts):
+                return None
+        elif parent_node is self.root or parent_node.parent is not self.root:
+            return None
+        elif parent_node is not node.parent and self.has_sub_task(parent_node, node.name):
+            return None # Same name as another sub task of the main task 
+
+        row = len(parent_node.children) if row < 0 else row
+        if parent_node is node.parent:
+            row = row - 1 if row > node.row else row
+            if row == node.row:
+                return None # Dropped at the same place 
+        return parent_node, row
+
+    def canDropMimeData(self, data, action, row, column, parent):
+        return data.hasFormat(TASK_MIME_TYPE) and self.get_drop_target(row, parent) is not None
+
+    def dropMimeData(self, data, action, row, column, parent):
+        if not data.hasFormat(TASK_MIME_TYPE):
+            return False
+        target = self.get_drop_target(row, parent)
+        if target is None:
+            return False
+        source, node = TaskTreeModel.dragged
+        TaskTreeModel.dragged = None
+        self.task_dropped.emit(source, node, *target)
+        return True
+
+    def is_main_task(self, index: QModelIndex) -> bool:
+        return index.isValid() and not index.parent().isValid()
+
+    def get_name(self, index: QModelIndex) -> str:
+        return self.get_node(index).name
+
+    def get_main_task_name(self, index: QModelIndex) -> str:
+        '''Return the name of the main task of the index, or the main task itself if it is a main task'''
+        return self.get_name(index) if self.is_main_task(index) else self.get_name(index.parent())
+
+    def get_main_task_node(self, index: QModelIndex) -> TaskNode:
+        '''Return the node of the main task of the index, or the main task itself if it is a main task'''
+        return self.get_node(index) if self.is_main_task(index) else self.get_node(index.parent())
+
+    def get_index(self, node: TaskNode) -> QModelIndex:
+        return QModelIndex() if node is self.root else self.createIndex(node.row, 0, node)
+
+    def get_main_task_index(self, main_task: str) -> QModelIndex:
+        return self.get_index(self.main_task_dicts[main_task])
+
+    def get_main_tasks(self) -> list:
+        '''Returns a list of all the main task in the section'''
+        return [node.name for node in self.root.children]
+
+    def get_sub_tasks(self, main_task: str) -> list:
+        '''Return the list of sub tasks name of the main task'''
+        return [node.name for node in self.main_task_dicts[main_task].children]
+
+    def has_sub_task(self, main_task: TaskNode, sub_task: str) -> bool:
+        return sub_task in main_task.children_by_name
+
+    def get_num_tasks(self) -> int:
+        '''Return the number of open tasks (including the main tasks) in a section'''
+        return self.num_tasks
+
+    def insert_tasks(self, parent: TaskNode, row: int, nodes: list) -> None:
+        '''Insert the nodes (with their children) at the row of the parent, all the rows are inserted at once
+        the nodes of removed tasks can be inserted again so the ids are kept'''
+        if not nodes:
+            return
+        self.beginInsertRows(self.get_index(parent), row, row + len(nodes) - 1)
+        parent.children[row:row] = nodes
+        for i in range(row, len(parent.children)):
+            parent.children[i].row = i
+        for node in nodes:
+            node.parent = parent
+            parent.children_by_name[node.name] = node
+            self.num_tasks += len(node.children) + 1
+        self.endInsertRows()
+
+    def get_last_sort_key(self, parent: TaskNode) -> str:
+        return parent.children[-1].sort_key if parent.children else None
+
+    def add_main_task(self, main_task: str, main_task_id=None, sort_key=None) -> QModelIndex:
+        '''Add the main task at the end of the section, a sort key after the last main task is used if sort_key is None'''
+        node = TaskNode(main_task, id=main_task_id, sort_key=sort_key or oh.get_sort_key(self.get_last_sort_key(self.root)))
+        self.insert_tasks(self.root, len(self.root.children), [node])
+        return self.get_index(node)
+
+    def add_sub_tasks(self, main_task: TaskNode, sub_tasks: list, sub_task_ids=None, sort_keys=None) -> list:
+        '''Add the sub tasks at the end of the main task, returns the nodes of the sub tasks'''
+        sort_keys = sort_keys or oh.get_sort_keys(self.get_last_sort_key(main_task), None, len(sub_tasks))
+        nodes = [TaskNode(sub_task, id=sub_task_id, sort_key=sort_key) 
+                 for sub_task, sub_task_id, sort_key in zip(sub_tasks, sub_task_ids or [None] * len(sub_tasks), sort_keys)]
+        self.insert_tasks(main_task, len(main_task.children), nodes)
+        return nodes
+
+    def move_task(self, node: TaskNode, parent: TaskNode, row: int) -> None:
+        '''Move the task to the row (not counting the task itself) of the parent in the same model, the selection and expanded 
+        main tasks are kept as the rows are moved instead of removed and inserted'''
+        old_parent, old_row = node.parent, node.row
+        # The destination row of Qt counts the task if it is moved down in the same parent 
+        destination = row + 1 if parent is old_parent and row > old_row else row
+        if not self.beginMoveRows(self.get_index(old_parent), old_row, old_row, self.get_index(parent), destination):
+            return
+        del old_parent.children[old_row]
+        del old_parent.children_by_name[node.name]
+        parent.children.insert(row, node)
+        parent.children_by_name[node.name] = node
+        node.parent = parent
+        for i in range(min(old_row, row) if parent is old_parent else old_row, len(old_parent.children)):
+            old_parent.children[i].row = i
+        for i in range(row, len(parent.children)):
+            parent.children[i].row = i
+        self.endMoveRows()
+
+    def remove_task(self, index: QModelIndex) -> None:
+        '''Remove the main task (with its sub tasks) or the sub task at the index'''
+        node = self.get_node(index)
+        parent = node.parent
+        self.beginRemoveRows(self.parent(index), node.row, node.row)
+        del parent.children[node.row]
+        for row in range(node.row, len(parent.children)):
+            parent.children[row].row = row
+        del parent.children_by_name[node.name]
+        self.num_tasks -= len(node.children) + 1
+        self.endRemoveRows()
+
+    def clear(self) -> None:
+        '''Remove all the tasks at once'''
+        self.beginResetModel()
+        self.root.children = []
+        self.root.children_by_name.clear()
+        self.num_tasks = 0
+        self.endResetModel()
+
+    def set_focus_time(self, main_tasks: dict, sub_tasks: dict) -> None:
+        '''Set the focus time of the tasks from the dicts of main task id: seconds and sub task id: seconds (see db.FocusTime)'''
+        for node in self.root.children:
+            node.focus_seconds = main_tasks.get(node.id, 0)
+            for child in node.children:
+                child.focus_seconds = sub_tasks.get(child.id, 0)
+            if node.children:
+                self.dataChanged.emit(self.get_index(node.children[0]), self.get_index(node.children[-1]), [FOCUS_ROLE, Qt.ItemDataRole.ToolTipRole])
+        if self.root.children:
+            self.dataChanged.emit(self.get_index(self.root.children[0]), self.get_index(self.root.children[-1]), [FOCUS_ROLE, Qt.ItemDataRole.ToolTipRole])
+
+    def rename_task(self, index: QModelIndex, new_name: str) -> bool:
+        '''Rename the task, returns False without renaming it if another task under the same parent already has the name'''
+        node = self.get_node(index)
+        if new_name in node.parent.children_by_name:
+            return False
+        del node.parent.children_by_name[node.name]
+        node.parent.children_by_name[new_name] = node
+        node.name = new_name
+        self.dataChanged.emit(index, index)
+        return True
+
+# Delegate to draw the main tasks with bold text and highlighted background, and the sub tasks with slightly bigger text than default
+class TaskDelegate(QStyledItemDelegate):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.main_task_font = QFont()
+        self.main_task_font.setBold(True)
+        self.main_task_font.setPointSize(14)
+        self.sub_task_font = QFont()
+        self.sub_task_font.setPointSize(12)
+        self.main_task_background = QBrush(QColor("#FFFCA1"))
+        self.focus_time_colour = QColor("#545E75")
+
+        # Font metrics and row heights are only calculated once so the size hint is cheap for every row 
+        self.main_task_metrics = QFontMetrics(self.main_task_font)
+        self.sub_task_metrics = QFontMetrics(self.sub_task_font)
+        self.main_task_height = self.main_task_metrics.height() + 8
+        self.sub_task_height = self.sub_task_metrics.height() + 6
+
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        if index.parent().isValid():
+            option.font = self.sub_task_font
+        else:
+            option.font = self.main_task_font
+            option.backgroundBrush = self.main_task_background
+
+    def paint(self, painter, option, index):
+        # The focus time of the task is drawn on the right of the row, over the name if the name is too long
+        super().paint(painter, option, index)
+        seconds = index.data(FOCUS_ROLE)
+        if seconds:
+            painter.save()
+            painter.setFont(self.sub_task_font)
+            painter.setPen(self.focus_time_colour)
+            painter.drawText(option.rect.adjusted(0, 0, -8, 0), Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, oh.convert_to_hr_mins(seconds))
+            painter.restore()
+
+    def sizeHint(self, option, index):
+        if index.parent().isValid():
+            return QSize(self.sub_task_metrics.horizontalAdvance(index.data()) + 10, self.sub_task_height)
+        return QSize(self.main_task_metrics.horizontalAdvance(index.data()) + 10, self.main_task_height)
+
+# View of all the tasks in a section, only the rows that are visible are drawn
+class TaskTreeView(QTreeView):
+    def __init__(self, model: TaskTreeModel):
+        super().__init__()
+        self.setModel(model)
+        self.setItemDelegate(TaskDelegate(self))
+        self.setHeaderHidden(True)
+        self.setRootIsDecorated(False)
+        self.setItemsExpandable(False) # Sub tasks are always shown 
+        self.setIndentation(20)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection) # Only one item can be selected at the same time 
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setTextElideMode(Qt.TextElideMode.ElideRight)
+        model.rowsInserted.connect(self.expand_main_tasks)
+
+        # Tasks are moved by dragging, the model moves them with a command instead of the view removing the dragged rows
+        self.setDragDropMode(QAbstractItemView.DragDropMode.DragDrop)
+        self.setDefaultDropAction(Qt.DropAction.MoveAction)
+        self.setDropIndicatorShown(True)
+
+    @Slot()
+    def expand_main_tasks(self, parent, first, last):
+        # Expand the main tasks when they are added so the sub tasks are shown
+        if not parent.isValid():
+            for row in range(first, last + 1):
+                self.expand(self.model().index(row, 0))
+
+    # Ignore all mouse clicks except for left button clicks, clicking on the selected task unselects it 
+    def mousePressEvent(self, event):
+        if event.button() != Qt.MouseButton.LeftButton:
+            return
+        index = self.indexAt(event.position().toPoint())
+        if index.isValid() and self.selectionModel().isSelected(index):
+            logger.debug(f"Detected click on selected item '{index.data()}', unselecting")
+            self.clearSelection()
+            return
+        super().mousePressEvent(event)
+
+# Widget for the six buttons 
 class Buttons(QWidget):
     def __init__(self):
         super().__init__()
         self.layout = QVBoxLayout(self)
         self.unselect_button = QPushButton("Unselect")
         self.rename_button = QPushButton("Rename")
+        self.move_button = QPushButton("Move")
         self.delete_button = QPushButton("Delete")
         self.complete_button = QPushButton("Complete")
         self.focus_button = QPushButton("Focus")
         self.layout.addWidget(self.complete_button)
         self.layout.addWidget(self.delete_button)
         self.layout.addWidget(self.rename_button)
+        self.layout.addWidget(self.move_button)
         self.layout.addWidget(self.unselect_button)
         self.layout.addWidget(self.focus_button)
 
@@ -50,115 +370,30 @@ class Buttons(QWidget):
         self.delete_button.setStyleSheet("background-color: #FC9595") # Delete colour red 
         self.focus_button.setStyleSheet("background-color: #CFFFFF") # Focus colour blue 
 
-# QListWidget for each main task with many sub tasks
-class MainTaskList(QListWidget):
-    # Custom signal that is emitted when any item is clicked
-    clicked = Signal(QListWidget, QListWidgetItem)
-
-    def __init__(self, main_task_txt):
-        # Takes in a main_task_txt name and adds that as the first item
-        super().__init__()
-        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection) # Only one item can be selected in the qlistwidget at the same time 
-        self.setSizeAdjustPolicy(QAbstractScrollArea.SizeAdjustPolicy.AdjustToContents)
-        self.main_task_item = MainTaskItem(main_task_txt)
-        self.addItem(self.main_task_item)
-        self.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Minimum)
-        self.itemClicked.connect(self.item_clicked)
-
-    # Emit a custom signal when items are clicked
-    def item_clicked(self, item):
-        self.clicked.emit(self, item)
-        logger.debug(f"Detected click on '{self.item(0).text()}' widget on item '{item.text()}'")
-
-    # Ignore all mouse clicks except for left button clicks 
-    def mousePressEvent(self, event):
-        if event.buttons() == Qt.MouseButton.LeftButton:
-            super(MainTaskList, self).mousePressEvent(event)
-        else:
-            return
-        
-    def get_num_sub_tasks(self):
-        '''Return the list of sub tasks name in the main task list widget'''
-        sub_tasks = []
-        for i in range(1, self.count()):
-            sub_tasks.append(self.item(i).text())
-        return sub_tasks
-
-# Class for all the main task widgets
-class AllMainTaskList(QWidget):
-    def __init__(self):
-        super().__init__()
-        self.layout = QVBoxLayout(self)
-        self.layout.setContentsMargins(0, 0, 0, 0)
-        self.setLayout = self.layout
-        self.layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-
-        # Dictionary to store all the QListWidget objects for tracking and accessing each QListWidget
-        self.main_task_dicts = {}
-
-    def get_num_tasks(self)->int:
-        '''Return the number of open tasks (including the main tasks) in a section'''
-        num = 0
-        for main_tasks in self.main_task_dicts.values():
-            num += main_tasks.count()
-        return num
-    
-    @Slot()
-    def unselect_all_items(self) -> None:
-        '''Unselect all items in the section'''
-        for main_task_widget in self.main_task_dicts.values():
-            for item in main_task_widget.selectedItems():
-                item.setSelected(False)
-
-    def get_main_tasks(self) -> list:
-        '''Returns a list of all the main task in the section'''
-        main_tasks = []
-        for main_task_widget in self.main_task_dicts.values():
-            main_tasks.append(main_task_widget.item(0).text())
-        return main_tasks
-
-
-# Class to create a scrollable area for all the QListWidgets in each section        
-class TodolistScroll(QScrollArea):
-    def __init__(self):
-        super().__init__()
-        self.all_main_tasks = AllMainTaskList()
-        self.setWidget(self.all_main_tasks)
-        self.setWidgetResizable(True)
-
 # Class to create the main Todolist Section 
 class TodolistSection(QWidget):
-    # Custom signals received by the todolist_main widgets for adding items to the database
-    add_main_task_to_db = Signal(str)
-    delete_main_task_in_db = Signal(str)
-    complete_main_task_in_db = Signal(str)
-    rename_main_task_in_db = Signal(str, str)
-
-    rename_sub_task_in_db = Signal(str, str, str)
-    add_sub_task_to_db = Signal(str, str)
-    delete_sub_task_in_db = Signal(str, str)
-    complete_sub_task_in_db = Signal(str, str)
-
-    set_main_task_as_pending = Signal(str)
-    set_sub_task_as_pending = Signal(str, str)
+    # Custom signals received by the todolist_main widgets
+    update_focus_task = Signal(str, object, object) # Name, main task id and sub task id (None for a main task) of the focused task
+    num_tasks_changed = Signal(QWidget) # Emitted with the section when tasks are added or removed, to update the count in the tab
+    move_to_section = Signal(QWidget, object) # Emitted with the section and the node of the main task to move to another section
+
+    def __init__(self, section_id=None, section_name: str = "", num_tasks: int = 0, task_history=None):
+        # Id and name of the section in the database, the tasks are only loaded from the database when the section is first opened
+        # until then num_tasks is the number of open tasks counted by the database 
+        self.section_id = section_id
+        self.section_name = section_name
+        self.num_tasks = num_tasks
+        self.loaded = num_tasks == 0 # Nothing to load if there are no open tasks
 
-    update_focus_task = Signal(str)
-
-    def __init__(self):
         # Creating some flags for tracking 
-        self.selected = None # To ensure only one item is clicked at the same time 
         self.mode_is_main = True # Check if qlineedit item is a main task or sub task 
-
-        self.selected_widget = None 
-        self.selected_task = None
-
-        # Some flags to remember the last action for undo
-        self.last_task_is_main = None
-        self.last_task_name = None
-        self.last_main_task_name = None
-        self.last_task_is_complete = None 
+        self.selected_task = None # Index of the selected task, only one task can be selected at the same time 
+        self.last_command = None # Command shown in the status message with the undo option 
 
         super().__init__()
+
+        # All the changes are done with commands on the undo stack shared by the sections, which also saves them to the database 
+        self.history = task_history if task_history is not None else history.TaskHistory(self)
         self.layout = QGridLayout(self)
         self.setLayout = self.layout  
 
@@ -166,6 +401,7 @@ class TodolistSection(QWidget):
         self.task_prompt = QLineEdit(placeholderText="Main task name")
         self.task_prompt.setMaxLength(50)
         self.task_prompt.returnPressed.connect(self.task_added) # Connect the return pressed signal to the task added function 
+        self.task_prompt.installEventFilter(self) # Undo and redo the tasks from the prompt when there is no text to undo 
         self.msg_prompt = QLabel("Insert main task:")
         self.msg_prompt.setFixedHeight(self.task_prompt.sizeHint().height())
         self.enter_button = QPushButton("Insert")
@@ -175,10 +411,16 @@ class TodolistSection(QWidget):
         self.layout.setVerticalSpacing(0)
         self.layout.addWidget(self.task_prompt, 2, 0, 1, 1, Qt.AlignmentFlag.AlignTop)
 
-        # Creating the scrollable object and adding to the layout 
-        self.tasks_scroll = TodolistScroll()
+        # Creating the model and the view of the tasks and adding to the layout 
+        self.model = TaskTreeModel(self)
+        self.model.task_dropped.connect(self.task_dropped)
+        self.tasks = TaskTreeView(self.model)
+        self.tasks.selectionModel().selectionChanged.connect(self.selection_changed)
+        self.model.rowsInserted.connect(self.tasks_changed)
+        self.model.rowsRemoved.connect(self.tasks_changed)
+        self.model.modelReset.connect(self.tasks_changed)
         self.layout.setRowMinimumHeight(2, 5)
-        self.layout.addWidget(self.tasks_scroll, 3, 0, 1, 1)
+        self.layout.addWidget(self.tasks, 3, 0, 1, 1)
 
         # Creating status message with undo option 
         self.status_with_undo_msg = QLabel("")
@@ -191,8 +433,8 @@ class TodolistSection(QWidget):
         self.buttons = Buttons()
         self.layout.addWidget(self.buttons, 3, 1, 1, 1, Qt.AlignmentFlag.AlignTop)
         self.buttons.rename_button.released.connect(self.rename)
+        self.buttons.move_button.released.connect(self.move)
         self.buttons.delete_button.released.connect(self.delete)
-        self.buttons.unselect_button.released.connect(self.tasks_scroll.all_main_tasks.unselect_all_items)
         self.buttons.unselect_button.released.connect(self.reset_flags)
         self.buttons.complete_button.released.connect(self.complete)
         self.buttons.focus_button.released.connect(self.focus)
@@ -203,66 +445,56 @@ class TodolistSection(QWidget):
         if task:
             if self.mode_is_main:
                 # If main task is added
-                if task not in self.tasks_scroll.all_main_tasks.main_task_dicts.keys():
+                if task not in self.model.main_task_dicts:
                     # Check that the main task is not duplicated in the section 
-                    main_task_list = MainTaskList(task)
-                    main_task_list.clicked.connect(self.item_clicked)
-                    main_task_list.itemClicked.emit(main_task_list.item(0)) # Emit signal so the newly added main task is selected 
-                    main_task_list.item(0).setSelected(True)
-                    self.tasks_scroll.all_main_tasks.main_task_dicts[task] = main_task_list
+                    self.history.push(history.AddMainTask(self, task)) # The newly added main task is selected so sub tasks can be added to it 
                     self.task_prompt.setText("")
-                    self.tasks_scroll.all_main_tasks.layout.addWidget(main_task_list)
                     logger.debug(f"Added main task '{task}' to section")
-                    self.add_main_task_to_db.emit(task)
                 else: # Show error if main task name already exist 
                     QMessageBox.warning(self, "Duplicate", f"Duplicate main task '{task}' not allowed!")
                     logger.debug(f"Duplicate main task '{task}' is not allowed")
                     self.task_prompt.setText("")
             else:
                 # If sub task is added 
+                main_task = self.model.get_main_task_node(self.get_selected_index())
                 repeat, items, s =  oh.check_task_re(task) # Use regex to check if ^num-num^ format exist for mass adding task 
-                existing_sub_tasks = self.selected_widget.get_num_sub_tasks()
                 if repeat:
-                    for i in range(items[0], items[1] + 1):
-                        task = s[0] + str(i) + s[1]
-                        if task in existing_sub_tasks: # Don't add the task if a same name already exist 
-                            continue 
-                        else:
-                            self.selected_widget.addItem(SubTaskItem(task))
-                            logger.debug(f"Sub task '{task}' added under main task '{self.selected_widget.item(0).text()}'")
-                            self.add_sub_task_to_db.emit(task, self.selected_widget.item(0).text())
+                    # Don't add the task if a same name already exist, the names in the range are all different 
+                    sub_tasks = [s[0] + str(i) + s[1] for i in range(items[0], items[1] + 1)]
+                    sub_tasks = [task for task in sub_tasks if not self.model.has_sub_task(main_task, task)]
+                    if sub_tasks:
+                        self.history.push(history.AddSubTasks(self, main_task, sub_tasks)) # All the sub tasks are added with one command 
+                        logger.debug(f"{len(sub_tasks)} sub tasks added under main task '{main_task.name}'")
                     self.task_prompt.setText("")
                     return
 
-                if task in existing_sub_tasks: # Show error if sub task name already exist
+                if self.model.has_sub_task(main_task, task): # Show error if sub task name already exist
                     QMessageBox.warning(self, "Duplicate", f"Duplicate sub task '{task}' not allowed!")
                     return
                 
-                self.selected_widget.addItem(SubTaskItem(task))
+                self.history.push(history.AddSubTasks(self, main_task, [task]))
                 self.task_prompt.setText("")
-                logger.debug(f"Sub task '{task}' added under main task '{self.selected_widget.item(0).text()}'")
-                self.add_sub_task_to_db.emit(task, self.selected_widget.item(0).text())
+                logger.debug(f"Sub task '{task}' added under main task '{main_task.name}'")
 
     @Slot()
-    def item_clicked(self, main_widget, item):
-        # Ensure only one item is clicked at the same time
-        self.selected_task = item
-        if self.selected:
-            if self.selected == item:
-                # If the item was already selected, unselect it
-                self.selected.setSelected(False)
-                self.selected = None
-            else:
-                # If a different item was selected, unselected that item as only one item can be selected at the same time
-                self.selected.setSelected(False)
-                self.selected = item
-        else:
-            self.selected = item
+    def task_dropped(self, source, node, parent, row):
+        # Move the task dragged from this section (or another section) to the row of the parent 
+        logger.debug(f"Moving '{node.name}' to row {row} of '{parent.name}'")
+        self.history.push(history.MoveTask(self, source.section, node, parent, row))
 
-        self.selected_widget = main_widget
-        self.selected_task = item
+    @Slot()
+    def selection_changed(self):
+        # Ensure only one item is selected at the same time and change the prompt based on the selected task
+        indexes = self.tasks.selectionModel().selectedIndexes()
+        if not indexes:
+            # If no tasks are selected, change the prompt to ask for main task details
+            self.selected_task = None
+            self.set_mode_main()
+            return
 
-        if main_widget.item(0) == item:
+        self.selected_task = QPersistentModelIndex(indexes[0])
+        logger.debug(f"Selected item '{self.model.get_name(indexes[0])}'")
+        if self.model.is_main_task(indexes[0]):
             # If the main task is selected, change the prompt to ask for sub task details
             self.set_mode_sub()
 
@@ -270,25 +502,30 @@ class TodolistSection(QWidget):
             # If sub task is selected, disable the prompt
             self.disable_prompt()
 
-        if self.selected == None:
-            # If no tasks are selected, change the prompt to ask for main task details
-            self.set_mode_main()
-            self.selected_widget = None
-            self.selected_task = None
+    def get_selected_index(self) -> QModelIndex:
+        return QModelIndex(self.selected_task)
 
     @Slot()
     def focus(self):
         # If the focus button is clicked, update the text in the focus section
         if self.selected_task:
-            self.update_focus_task.emit(self.selected_task.text())
+            self.history.flush() # New tasks only get their ids when they are saved 
+            index = self.get_selected_index()
+            node = self.model.get_node(index)
+            if self.model.is_main_task(index):
+                self.update_focus_task.emit(node.name, node.id, None)
+            else:
+                self.update_focus_task.emit(node.name, node.parent.id, node.id)
 
 
     @Slot()
     def rename(self):
         if self.selected_task:
+            index = self.get_selected_index()
+            name = self.model.get_name(index)
             max_len = 50 if self.mode_is_main else 60
             # Prompt user to enter the new task name
-            new_name, accepted = QInputDialog.getText(self, "Rename", f"Enter new name for '{self.selected_task.text()}'", text=f"{self.selected_task.text()}")
+            new_name, accepted = QInputDialog.getText(self, "Rename", f"Enter new name for '{name}'", text=f"{name}")
             if accepted:
                 new_name = new_name.strip()
                 if new_name: # Continue only if not empty string 
@@ -297,130 +534,114 @@ class TodolistSection(QWidget):
                         QMessageBox.information(self, "Character limit exceeded", f"New name exceeded character limit of {max_len}")
                         return
                     
-                    logger.debug(f"Updating task name '{self.selected_task.text()}' to '{new_name}'")
-                    if self.selected_task == self.selected_widget.item(0): # If main task is renamed 
-                        self.tasks_scroll.all_main_tasks.main_task_dicts[new_name] = self.tasks_scroll.all_main_tasks.main_task_dicts[self.selected_task.text()]
-                        del self.tasks_scroll.all_main_tasks.main_task_dicts[self.selected_task.text()]
-                        self.rename_main_task_in_db.emit(self.selected_task.text(), new_name)
-                        
-                    else: # If sub task is renamed 
-                        self.rename_sub_task_in_db.emit(self.selected_task.text(), new_name, self.selected_widget.item(0).text())
-                    self.selected_task.setText(new_name)
+                    if new_name == name:
+                        return
+                    node = self.model.get_node(index)
+                    if self.model.has_sub_task(node.parent, new_name): # Show error if another task under the same parent has the name
+                        QMessageBox.warning(self, "Duplicate", f"Duplicate {"main" if self.model.is_main_task(index) else "sub"} task '{new_name}' not allowed!")
+                        logger.debug(f"Duplicate name '{new_name}' is not allowed for task '{name}'")
+                        return
+
+                    logger.debug(f"Updating task name '{name}' to '{new_name}'")
+                    self.history.push(history.RenameTask(self, node, new_name))
+
+    @Slot()
+    def move(self):
+        # The main task is moved with its sub tasks to the section chosen in the to do list, sub tasks are moved by dragging them 
+        if self.selected_task:
+            index = self.get_selected_index()
+            if not self.model.is_main_task(index):
+                QMessageBox.information(self, "Move to section", "Only main tasks can be moved to another section, drag the sub task to move it.")
+                return
+            self.move_to_section.emit(self, self.model.get_node(index))
 
     @Slot()
     def delete(self):
         if self.selected_task:
+            index = self.get_selected_index()
+            name = self.model.get_name(index)
             # Checks if the selected task is the main task
-            if self.selected_widget.item(0) == self.selected_task:
-                # Ask the user for confirmation then remove widget and delete from dictionary
-                ans = QMessageBox.warning(self, "Confirm delete?", f"Are you sure to you to delete '{self.selected_task.text()}'"
-                                           f"main task with {self.selected_widget.count()-1} sub tasks?", 
+            if self.model.is_main_task(index):
+                # Ask the user for confirmation then remove the main task with its sub tasks
+                ans = QMessageBox.warning(self, "Confirm delete?", f"Are you sure to you to delete '{name}'"
+                                           f"main task with {len(self.model.get_node(index).children)} sub tasks?", 
                                            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
                 if ans == QMessageBox.StandardButton.Yes:
-                    logger.debug(f"Deleting main task '{self.selected_task.text()}'")
-                    # Emit signal to delete each subtasks
-                    item_count = self.selected_widget.count()
-                    if item_count > 1:
-                        for i in range(1, item_count):
-                            self.delete_sub_task_in_db.emit(self.selected_widget.item(i).text(), self.selected_task.text())
-
-                    # Deleting the main task 
-                    self.delete_main_task_in_db.emit(self.selected_task.text())
-                    self.tasks_scroll.all_main_tasks.layout.removeWidget(self.selected_widget)
-                    del self.tasks_scroll.all_main_tasks.main_task_dicts[self.selected_widget.item(0).text()]
-                    self.selected_widget.deleteLater()
-                    self.selected_widget = None
-                    self.reset_flags()
+                    logger.debug(f"Deleting main task '{name}'")
+                    # Deleting the main task, its sub tasks are deleted with it in the database 
+                    self.push_with_status(history.DeleteMainTask(self, self.model.get_node(index)))
             else:
                 # If sub task is selected, delete item without prompt 
-                self.start_timer() # Start timer to show the undo option 
-                self.get_status(False, self.selected_task.text(), self.selected_widget.item(0).text(), False) # Show the status message with undo button 
-                logger.debug(f"Deleting sub task '{self.selected_task.text()}'")
-                self.delete_sub_task_in_db.emit(self.selected_task.text(), self.selected_widget.item(0).text())
-                self.selected_widget.takeItem(self.selected_widget.row(self.selected_task))
-                selected = self.selected_widget.selectedItems()
-                for items in selected:
-                    items.setSelected(False) # Unselect all the items 
-                self.reset_flags()
+                logger.debug(f"Deleting sub task '{name}'")
+                self.push_with_status(history.DeleteSubTask(self, self.model.get_node(index)))
 
     @Slot()
     def complete(self):
         if self.selected_task:
+            index = self.get_selected_index()
+            name = self.model.get_name(index)
             # Check if selected task is the main task
-            if self.selected_task == self.selected_widget.item(0):
+            if self.model.is_main_task(index):
                 # Check if subtasks exist, do not allow to be marked as complete if subtasks exist
-                task_count = self.selected_widget.count()
-                if task_count > 1:
-                    QMessageBox.warning(self, "Sub tasks not completed", f"{task_count - 1} sub task(s) still exist in"
-                                         f" '{self.selected_task.text()}'. \nNot allowed to mark as complete.")
+                task_count = len(self.model.get_node(index).children)
+                if task_count > 0:
+                    QMessageBox.warning(self, "Sub tasks not completed", f"{task_count} sub task(s) still exist in"
+                                         f" '{name}'. \nNot allowed to mark as complete.")
                     return
-                self.start_timer() # Start timer for the undo message to show 
-                self.get_status(True, self.selected_task.text(), self.selected_task.text(), True) # Show status with undo button 
-                self.complete_main_task_in_db.emit(self.selected_task.text())
-                self.tasks_scroll.all_main_tasks.layout.removeWidget(self.selected_widget)
-                del self.tasks_scroll.all_main_tasks.main_task_dicts[self.selected_widget.item(0).text()]
-                self.selected_widget.deleteLater()
-                self.selected_widget = None
+                self.push_with_status(history.CompleteMainTask(self, self.model.get_node(index)))
             else: # If selected task is sub task 
-                self.start_timer()
-                self.get_status(False, self.selected_task.text(), self.selected_widget.item(0).text(), True)
-                self.complete_sub_task_in_db.emit(self.selected_task.text(), self.selected_widget.item(0).text())
-                self.selected_widget.takeItem(self.selected_widget.row(self.selected_task))
-                selected = self.selected_widget.selectedItems()
-                for items in selected:
-                    items.setSelected(False) # Unselect all the items 
-            self.reset_flags()
+                self.push_with_status(history.CompleteSubTask(self, self.model.get_node(index)))
     
     @Slot()
     def undo(self, _):
-        # Slot to capture the undo click on the status message to undo the action
-        if self.last_task_is_complete:
-            # Last action was set as complete, so have to set as incomplete:
-            if self.last_task_is_main:
-                # Last action was setting main task as complete, undoing action: adding back item into UI and updating database
-                logger.debug(f"User undid action of completing main task {self.last_task_name}")
-                main_task_list = MainTaskList(self.last_task_name)
-                main_task_list.clicked.connect(self.item_clicked)
-                self.tasks_scroll.all_main_tasks.main_task_dicts[self.last_task_name] = main_task_list
-                self.tasks_scroll.all_main_tasks.layout.addWidget(main_task_list)
-
-                # Emit signal to change main task status from complete to pending and remove end time 
-                self.set_main_task_as_pending.emit(self.last_task_name)
-            else:
-                # Last action was setting sub task as complete, add sub task back under main task and update database 
-                logger.debug(f"User undid action of completing sub task {self.last_task_name}")
-                self.tasks_scroll.all_main_tasks.main_task_dicts[self.last_main_task_name].addItem(SubTaskItem(self.last_task_name))
-
-                # Emit signal to change sub task status from complete to pending and remove end time
-                self.set_sub_task_as_pending.emit(self.last_task_name, self.last_main_task_name)
-        else:
-            # Last action was delete the task, only sub task have undo option, main task deletion will not be able to undo as there is already a message prompt
-            # Add sub task back under the main task and add it into the database 
-            logger.debug(f"User undid action of deleting task {self.last_task_name}")
-            self.tasks_scroll.all_main_tasks.main_task_dicts[self.last_main_task_name].addItem(SubTaskItem(self.last_task_name))
-            self.add_sub_task_to_db.emit(self.last_task_name, self.last_main_task_name)
-            
+        # Slot to capture the undo click on the status message, only undo if it is still the last command (nothing else was done after it)
+        if self.history.canUndo() and self.history.command(self.history.index() - 1) is self.last_command:
+            logger.debug(f"User undid action '{self.last_command.text()}'")
+            self.history.undo()
         self.status_with_undo_msg.clear()
 
     def start_timer(self):
         self.timer5s.start(8000)
 
-    def get_status(self, is_main_task: bool, task_name: str, main_task_name: str, is_complete: bool) -> None:
-        '''Updates the status message with the undo button and update the flags in case undo option is clicked'''
-        task_type = "main" if is_main_task else "sub"
-        task_action = "Completed" if is_complete else "Deleted"
-        self.status_with_undo_msg.setText(f"{task_action} {task_type} task '{task_name}' <a href='a'><b>[Undo]</b></a>")
-        self.last_task_is_complete = is_complete
-        self.last_task_is_main = is_main_task
-        self.last_task_name = task_name
-        self.last_main_task_name = main_task_name
-
-    def add_main_task_to_tab(self, task: str):
-        # Add main task to the section and emit signal 
-        main_task_list = MainTaskList(task)
-        main_task_list.clicked.connect(self.item_clicked)
-        self.tasks_scroll.all_main_tasks.main_task_dicts[task] = main_task_list
-        self.tasks_scroll.all_main_tasks.layout.addWidget(main_task_list)
+    def push_with_status(self, command):
+        '''Do the command and show the status message with the undo button'''
+        self.history.push(command)
+        self.start_timer() # Start timer to only show the undo option for a while 
+        self.status_with_undo_msg.setText(f"{command.text()} <a href='a'><b>[Undo]</b></a>")
+        self.last_command = command
+
+    @Slot()
+    def tasks_changed(self):
+        self.num_tasks_changed.emit(self)
+
+    def get_num_tasks(self) -> int:
+        '''Return the number of open tasks in the section, counted by the database if the section is not loaded yet'''
+        return self.model.get_num_tasks() if self.loaded else self.num_tasks
+
+    def load_tasks(self, tasks: list):
+        # Add the tasks (in the format of MainTaskTools.get_section_tasks) loaded from the database or the snapshot, replacing the tasks in the section
+        self.blockSignals(True) # Update the tab text once after all the tasks are added
+        if self.model.get_num_tasks():
+            self.reset_flags()
+            self.model.clear()
+        for main_task_id, main_task, sort_key, sub_task_ids, sub_tasks, sub_sort_keys in tasks:
+            node = self.add_main_task_to_tab(main_task, main_task_id, sort_key)
+            self.add_sub_tasks_to_tab(node, sub_tasks, sub_task_ids, sub_sort_keys)
+        self.blockSignals(False)
+        self.loaded = True
+
+    def get_tasks(self) -> list:
+        '''Return the tasks in the same format as MainTaskTools.get_section_tasks, used to save the snapshot'''
+        return [(node.id, node.name, node.sort_key, [child.id for child in node.children], [child.name for child in node.children], 
+                 [child.sort_key for child in node.children]) for node in self.model.root.children]
+
+    def add_main_task_to_tab(self, task: str, main_task_id: int, sort_key: str = None) -> TaskNode:
+        # Add main task to the section when the section is loaded from the database
+        return self.model.get_node(self.model.add_main_task(task, main_task_id, sort_key))
+
+    def add_sub_tasks_to_tab(self, main_task: TaskNode, sub_tasks: list, sub_task_ids: list, sort_keys: list = None):
+        # Add the sub tasks under the main task when the section is loaded from the database
+        self.model.add_sub_tasks(main_task, sub_tasks, sub_task_ids, sort_keys)
 
     def set_mode_main(self):
         # Set the prompt to ask for main task
@@ -445,12 +666,19 @@ class TodolistSection(QWidget):
         self.task_prompt.setEnabled(False)
         self.mode_is_main = None
 
+    def eventFilter(self, obj, event):
+        # The prompt takes the undo and redo shortcuts for its text, let the shortcuts of the to do list through if the text has nothing to undo or redo
+        if obj is self.task_prompt and event.type() == QEvent.Type.ShortcutOverride:
+            if (event.matches(QKeySequence.StandardKey.Undo) and not self.task_prompt.isUndoAvailable()) or \
+                (event.matches(QKeySequence.StandardKey.Redo) and not self.task_prompt.isRedoAvailable()):
+                return True
+        return super().eventFilter(obj, event)
+
     @Slot()
     def reset_flags(self):
-        # Reset all the flags back to initial state
-        self.selected = None
+        # Unselect the task and reset all the flags back to initial state
+        self.tasks.clearSelection()
         self.mode_is_main = True
-        self.selected_widget = None
         self.selected_task = None
         self.set_mode_main()
 
@@ -0,0 +1,241 @@
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QLineEdit, QComboBox, QSpinBox, QPushButton, QListWidget, \
+QListWidgetItem, QTableView, QHeaderView, QAbstractItemView, QDialog, QDialogButtonBox, QMessageBox
+from PySide6.QtCore import Qt, Slot, QAbstractTableModel, QModelIndex
+import bisect, psycopg
+
+import src.overhead as oh
+from src.db import SmartListTools, Changes, SMART_LIST_TYPES
+
+# Get logger and start logging
+logger = oh.get_logger("smart lists")
+logger.debug("Logger started")
+
+# Decorator to display error message when function fails
+def error_handler(func):
+    def inner(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Function execution of {func.__name__} failed: {e}")
+            err = oh.ErrorBox(str(e))
+            err.exec()
+    return inner
+
+def get_task_key(task: tuple) -> tuple:
+    # Order of the tasks in the smart list (start time, task type, task id), same as SmartListTools.get_tasks
+    return task[2], task[0], task[1]
+
+# Model of the tasks of a smart list in the format of SmartListTools.get_tasks, the view only asks for the rows that are shown so
+# thousands of tasks are shown without a widget for each row
+class SmartListModel(QAbstractTableModel):
+    HEADERS = ("Task", "Main Task", "Section", "Started")
+
+    def __init__(self):
+        super().__init__()
+        self.tasks = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.tasks)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return None
+        task_type, task_id, start_time, task, main_task, section_id, section = self.tasks[index.row()]
+        return (task, main_task or "", section, start_time.strftime("%Y-%m-%d %H:%M"))[index.column()]
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def set_tasks(self, tasks: list) -> None:
+        self.beginResetModel()
+        self.tasks = list(tasks)
+        self.endResetModel()
+
+    def update_sections(self, section_ids: set, tasks: list) -> None:
+        '''Replace the tasks of the sections with the tasks (of the same sections), the other rows are kept so the selection and scrolling stay'''
+        # Remove the rows of the sections from the bottom, each run of rows next to each other is removed at once
+        end = len(self.tasks) - 1
+        while end >= 0:
+            if self.tasks[end][5] not in section_ids:
+                end -= 1
+                continue
+            start = end
+            while start > 0 and self.tasks[start - 1][5] in section_ids:
+                start -= 1
+            self.beginRemoveRows(QModelIndex(), start, end)
+            del self.tasks[start:end + 1]
+            self.endRemoveRows()
+            end = start - 1
+
+        for task in tasks:
+            row = bisect.bisect(self.tasks, get_task_key(task), key=get_task_key)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.tasks.insert(row, task)
+            self.endInsertRows()
+
+# Dialog to add a smart list, empty filters match all the pending tasks
+class SmartListDialog(QDialog):
+    TYPES = {"All tasks": SMART_LIST_TYPES[0], "Main tasks": SMART_LIST_TYPES[1], "Sub tasks": SMART_LIST_TYPES[2]}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Add smart list")
+
+        self.name = QLineEdit()
+        self.task_type = QComboBox()
+        self.task_type.addItems(self.TYPES.keys())
+        self.task_text = QLineEdit()
+        self.task_text.setPlaceholderText("Any")
+        self.section_text = QLineEdit()
+        self.section_text.setPlaceholderText("Any")
+        self.min_age_days = QSpinBox()
+        self.min_age_days.setRange(0, 3650)
+        self.min_age_days.setSpecialValueText("Any") # 0 days is not filtered
+        self.min_age_days.setSuffix(" days")
+
+        self.layout = QGridLayout()
+        self.setLayout(self.layout)
+        for row, (label, widget) in enumerate((("Name", self.name), ("Tasks", self.task_type), ("Task name contains", self.task_text),
+                                               ("Section name contains", self.section_text), ("Started more than", self.min_age_days))):
+            self.layout.addWidget(QLabel(label), row, 0, Qt.AlignmentFlag.AlignRight)
+            self.layout.addWidget(widget, row, 1)
+
+        self.buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Save | QDialogButtonBox.StandardButton.Cancel)
+        self.buttonBox.accepted.connect(self.accept)
+        self.buttonBox.rejected.connect(self.reject)
+        self.layout.addWidget(self.buttonBox, row + 1, 0, 1, 2, Qt.AlignmentFlag.AlignCenter)
+
+    def get_smart_list(self) -> tuple:
+        '''Return the (name, task_type, task_text, section_text, min_age_days) entered'''
+        return (self.name.text().strip(), self.TYPES[self.task_type.currentText()], self.task_text.text().strip(), self.section_text.text().strip(),
+                self.min_age_days.value())
+
+# Smart lists of the pending tasks across all the sections, the tasks are filtered by the database and the list is updated from the change log
+# so only the tasks of the sections that changed are read again
+class SmartLists(QWidget):
+    w, h = 900, 700
+    def __init__(self):
+        super().__init__()
+        self.layout = QHBoxLayout(self)
+        self.setLayout = self.layout
+        self.smart_list = None # (smart_list_id, smart_list_name, task_type, task_text, section_text, min_age_days) shown
+        self.version = None # Version of the change log that the tasks shown match
+
+        # Saved smart lists with the buttons to add and delete them
+        lists_layout = QVBoxLayout()
+        self.lists = QListWidget()
+        self.lists.currentItemChanged.connect(self.open_smart_list)
+        self.add_button = QPushButton("Add")
+        self.add_button.released.connect(self.add_smart_list)
+        self.delete_button = QPushButton("Delete")
+        self.delete_button.released.connect(self.delete_smart_list)
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addWidget(self.add_button)
+        buttons_layout.addWidget(self.delete_button)
+        lists_layout.addWidget(self.lists)
+        lists_layout.addLayout(buttons_layout)
+
+        # Tasks of the smart list, the rows have the same height so the view does not measure each row
+        tasks_layout = QVBoxLayout()
+        self.num_tasks = QLabel("")
+        self.model = SmartListModel()
+        self.tasks = QTableView()
+        self.tasks.setModel(self.model)
+        self.tasks.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.tasks.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.tasks.setWordWrap(False)
+        self.tasks.setAlternatingRowColors(True)
+        self.tasks.verticalHeader().hide()
+        self.tasks.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.tasks.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.model.modelReset.connect(self.update_num_tasks)
+        self.model.rowsInserted.connect(self.update_num_tasks)
+        self.model.rowsRemoved.connect(self.update_num_tasks)
+        tasks_layout.addWidget(self.num_tasks)
+        tasks_layout.addWidget(self.tasks)
+
+        self.layout.addLayout(lists_layout, 1)
+        self.layout.addLayout(tasks_layout, 3)
+
+        self.load_smart_lists()
+
+    @error_handler
+    def load_smart_lists(self, smart_list_id=None):
+        # Show the saved smart lists and open the smart list with the id (or the first one)
+        self.lists.blockSignals(True)
+        self.lists.clear()
+        current = 0
+        for i, smart_list in enumerate(SmartListTools.get_smart_lists()):
+            item = QListWidgetItem(smart_list[1])
+            item.setData(Qt.ItemDataRole.UserRole, smart_list)
+            self.lists.addItem(item)
+            if smart_list[0] == smart_list_id:
+                current = i
+        self.lists.blockSignals(False)
+        if self.lists.count():
+            self.lists.setCurrentRow(current)
+        else:
+            self.open_smart_list(None)
+
+    @error_handler
+    @Slot()
+    def open_smart_list(self, item, previous=None):
+        self.smart_list = item.data(Qt.ItemDataRole.UserRole) if item else None
+        if self.smart_list is None:
+            self.model.set_tasks([])
+            return
+        logger.debug(f"Opening smart list '{self.smart_list[1]}'")
+        self.version = Changes.get_version() # Read first so the changes made while the tasks are read are read again on the next refresh
+        self.model.set_tasks(SmartListTools.get_tasks(*self.smart_list[2:]))
+
+    @error_handler
+    @Slot()
+    def refresh(self, *args):
+        # Read the tasks of the sections that changed since the tasks were read, only when the smart lists are shown
+        if self.smart_list is None or not self.isVisible():
+            return
+        version, section_ids, _, _ = Changes.get_changes(self.version)
+        self.version = version
+        if section_ids:
+            logger.debug(f"Updating smart list '{self.smart_list[1]}' with the tasks of sections {section_ids}")
+            self.model.update_sections(section_ids, SmartListTools.get_tasks(*self.smart_list[2:], section_ids=list(section_ids)))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+    @Slot()
+    def update_num_tasks(self, *args):
+        self.num_tasks.setText(f"{self.model.rowCount()} pending tasks" if self.smart_list else "No smart list")
+
+    @error_handler
+    @Slot()
+    def add_smart_list(self):
+        dialog = SmartListDialog(self)
+        while dialog.exec():
+            name, *filters = dialog.get_smart_list()
+            if not name:
+                QMessageBox.warning(self, "Empty name", "Empty name is not allowed.")
+                continue
+            try:
+                smart_list_id = SmartListTools.add_smart_list(name, *filters)
+            except psycopg.errors.UniqueViolation:
+                QMessageBox.warning(self, "Duplicate", f"Duplicate smart list of '{name}' not allowed!")
+                continue
+            self.load_smart_lists(smart_list_id)
+            break
+
+    @error_handler
+    @Slot()
+    def delete_smart_list(self):
+        if self.smart_list is None:
+            return
+        ans = QMessageBox.question(self, "Delete smart list", f"Delete the smart list '{self.smart_list[1]}'? The tasks are not deleted.")
+        if ans == QMessageBox.StandardButton.Yes:
+            SmartListTools.delete_smart_list(self.smart_list[0])
+            self.load_smart_lists()
@@ -0,0 +1,163 @@
+import json, os, datetime
+
+import src.overhead as oh
+from src.db import Transfer, TRANSFER_TABLES
+
+# Get logger and start logging
+logger = oh.get_logger("transfer")
+logger.debug("Logger started")
+
+FORMATS = ("csv", "jsonl", "parquet")
+CHUNK_SIZE = 64 * 1024 # Size of the chunks read from the CSV files in bytes
+BATCH_SIZE = 10000 # Number of rows written to each parquet row group
+
+def get_file_path(directory: str, table: str, fmt: str) -> str:
+    '''Return the path of the exported file of the table'''
+    return os.path.join(directory, f"{table}.{fmt}")
+
+def import_pyarrow():
+    '''Return the pyarrow and pyarrow.parquet modules, pyarrow is only required for the parquet format'''
+    try:
+        import pyarrow, pyarrow.parquet
+        return pyarrow, pyarrow.parquet
+    except ImportError as e:
+        logger.error(f"pyarrow is not installed: {e}")
+        raise ImportError("pyarrow has to be installed to use the parquet format (pip install pyarrow)")
+
+def get_arrow_schema(pa, table: str):
+    '''Return the pyarrow schema for the exported columns of the table'''
+    fields = []
+    for col, col_type in zip(Transfer.get_columns(table), Transfer.get_column_types(table)):
+        if col_type.startswith("TIMESTAMP"):
+            fields.append(pa.field(col, pa.timestamp("us", tz="UTC")))
+        elif col_type == "INT":
+            fields.append(pa.field(col, pa.int32()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+def export_table(table: str, path: str, fmt: str, progress=None) -> int:
+    '''Stream the table into the file at path, returns the number of rows exported
+    progress is called with (table, rows exported, total rows)'''
+    total = Transfer.count_rows(table)
+    done = 0
+    if progress:
+        progress(table, done, total)
+
+    if fmt == "csv":
+        with open(path, "wb") as f:
+            for chunk in Transfer.copy_out(table):
+                f.write(chunk)
+                done += chunk.count(b"\n")
+                if progress:
+                    progress(table, min(max(done - 1, 0), total), total) # First line is the header
+        done = max(done - 1, 0)
+
+    elif fmt == "jsonl":
+        cols = Transfer.get_columns(table)
+        with open(path, "w", encoding="utf-8") as f:
+            for row in Transfer.copy_out(table, csv=False):
+                f.write(json.dumps(dict(zip(cols, row)), default=datetime.datetime.isoformat) + "\n")
+                done += 1
+                if progress and done % BATCH_SIZE == 0:
+                    progress(table, done, total)
+
+    elif fmt == "parquet":
+        pa, pq = import_pyarrow()
+        schema = get_arrow_schema(pa, table)
+        batch = []
+        with pq.ParquetWriter(path, schema) as writer:
+            for row in Transfer.copy_out(table, csv=False):
+                batch.append(row)
+                if len(batch) == BATCH_SIZE:
+                    writer.write_batch(pa.RecordBatch.from_pylist([dict(zip(schema.names, r)) for r in batch], schema=schema))
+                    done += len(batch)
+                    batch = []
+                    if progress:
+                        progress(table, done, total)
+            if batch or not done: # Always write a batch so the file has the schema even if the table is empty
+                writer.write_batch(pa.RecordBatch.from_pylist([dict(zip(schema.names, r)) for r in batch], schema=schema))
+                done += len(batch)
+    else:
+        raise ValueError(f"Unknown export format '{fmt}', use one of {', '.join(FORMATS)}")
+
+    if progress:
+        progress(table, done, total)
+    logger.info(f"Exported {done} rows from ({table}) to {path}")
+    return done
+
+def export_history(directory: str, fmt: str, progress=None) -> dict:
+    '''Export all the tables into the directory with one file per table, returns the number of rows exported per table'''
+    os.makedirs(directory, exist_ok=True)
+    return {table: export_table(table, get_file_path(directory, table, fmt), fmt, progress) for table in TRANSFER_TABLES}
+
+def read_csv(path: str, table: str, progress=None):
+    '''Generator of chunks of the CSV file, progress is called with (table, bytes read, file size)'''
+    total = os.path.getsize(path)
+    done = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            done += len(chunk)
+            if progress:
+                progress(table, done, total)
+            yield chunk
+
+def read_jsonl(path: str, cols: list, table: str, progress=None):
+    '''Generator of the rows in the JSONL file as tuples in the order of cols, progress is called with (table, bytes read, file size)'''
+    total = os.path.getsize(path)
+    done = 0
+    with open(path, "rb") as f:
+        for i, line in enumerate(f, 1):
+            done += len(line)
+            if line.strip():
+                row = json.loads(line)
+                yield tuple(row.get(c) for c in cols)
+            if progress and i % BATCH_SIZE == 0:
+                progress(table, done, total)
+    if progress:
+        progress(table, total, total)
+
+def read_parquet(pq, path: str, table: str, progress=None):
+    '''Generator of the rows in the parquet file as tuples, progress is called with (table, rows read, total rows)'''
+    f = pq.ParquetFile(path)
+    total = f.metadata.num_rows
+    done = 0
+    for batch in f.iter_batches(batch_size=BATCH_SIZE):
+        for row in zip(*[col.to_pylist() for col in batch.columns]):
+            yield row
+        done += batch.num_rows
+        if progress:
+            progress(table, done, total)
+
+def import_history(directory: str, fmt: str, progress=None) -> dict:
+    '''Import the files of the tables in the directory, returns the number of rows added per table
+    Tables without a file in the directory are skipped'''
+    tables = {}
+    for table in TRANSFER_TABLES:
+        path = get_file_path(directory, table, fmt)
+        if not os.path.exists(path):
+            logger.debug(f"No file found for ({table}) at {path}, skipping")
+            continue
+
+        if fmt == "csv":
+            with open(path, encoding="utf-8") as f:
+                cols = f.readline().strip().split(",")
+            tables[table] = (cols, read_csv(path, table, progress), True)
+
+        elif fmt == "jsonl":
+            with open(path, encoding="utf-8") as f:
+                first_line = f.readline()
+            cols = list(json.loads(first_line).keys()) if first_line.strip() else Transfer.get_columns(table)
+            tables[table] = (cols, read_jsonl(path, cols, table, progress), False)
+
+        elif fmt == "parquet":
+            pa, pq = import_pyarrow()
+            cols = pq.read_schema(path).names
+            tables[table] = (cols, read_parquet(pq, path, table, progress), False)
+
+        else:
+            raise ValueError(f"Unknown import format '{fmt}', use one of {', '.join(FORMATS)}")
+
+    if not tables:
+        raise FileNotFoundError(f"No {fmt} files of the tables ({', '.join(TRANSFER_TABLES)}) found in {directory}")
+    return Transfer.copy_in(tables)
@@ -0,0 +1,22 @@
+import os, sys, uuid
+import pytest
+
+# Run from the root directory of the project: python -m pytest tests
+# The tests of the database functions need a separate database (its tables are created and changed by the tests), they are skipped 
+# unless TODODORO_DBNAME is set to it, e.g. TODODORO_DBNAME=tododoro_test python -m pytest tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope="session")
+def db():
+    if not os.environ.get("TODODORO_DBNAME"):
+        pytest.skip("TODODORO_DBNAME is not set to a test database")
+    import src.db as db
+    return db
+
+@pytest.fixture
+def section(db):
+    '''Id of a new empty section, deleted with its tasks after the test'''
+    section_id = db.SectionTools.add_section_name(f"test {uuid.uuid4().hex[:8]}")
+    yield section_id
+    db.conn.rollback()
+    db.SectionTools.delete_section_with_tasks(section_id)
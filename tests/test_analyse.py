@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+# The modules of the tabs connect to the database when they are imported, the functions tested do not use it
+
+@pytest.fixture(scope="module")
+def calendar(db):
+    import src.analyse_calendar as calendar
+    return calendar
+
+@pytest.fixture(scope="module")
+def sessions(db):
+    import src.analyse_sessions as sessions
+    return sessions
+
+def test_dense_days(calendar):
+    days = np.array(["2024-01-01", "2024-01-03", "2024-01-10"], dtype="datetime64[D]")
+    dense = calendar.get_dense_days(days, np.array([5, 7, 9]), np.datetime64("2024-01-01"), np.datetime64("2024-01-05"))
+    assert dense.tolist() == [5, 0, 7, 0, 0]
+    assert len(calendar.get_dense_days(days, np.array([5, 7, 9]), np.datetime64("2024-01-05"), np.datetime64("2024-01-01"))) == 0
+
+@pytest.mark.parametrize("active, streaks", [([], (0, 0)), ([0, 0], (0, 0)), ([1, 1, 0, 1, 1, 1], (3, 3)), ([1, 1, 1, 0, 1, 0], (1, 3)), 
+                                             ([1, 1, 1, 0, 0], (0, 3))])
+def test_streaks(calendar, active, streaks):
+    # The current streak is kept if the last day is not active yet
+    assert calendar.get_streaks(np.array(active, dtype=bool)) == streaks
+
+def test_calendar_starts_on_monday(calendar):
+    grid, offset = calendar.get_calendar(np.arange(1, 9, dtype=float), np.datetime64("2024-01-01")) # Monday
+    assert (grid.shape, offset) == ((7, 2), 0)
+    assert grid[:, 0].tolist() == [1, 2, 3, 4, 5, 6, 7] and grid[0, 1] == 8 and np.isnan(grid[1:, 1]).all()
+
+def test_calendar_offset(calendar):
+    grid, offset = calendar.get_calendar(np.arange(1, 8, dtype=float), np.datetime64("2024-01-03")) # Wednesday
+    assert (grid.shape, offset) == ((7, 2), 2)
+    assert np.isnan(grid[:2, 0]).all() and grid[2, 0] == 1 and grid[1, 1] == 7
+
+def test_completion(sessions):
+    counts = np.zeros((2, 2, 3), dtype=np.int64)
+    counts[0, 0] = [1, 2, 1] # Focus timers not stopped early 
+    counts[0, 1] = [0, 1, 0]
+    completion = sessions.get_completion(counts)
+    assert completion[0] == 0.8 and np.isnan(completion[1])
+
+def test_length_bins(sessions):
+    counts = np.zeros((2, 12), dtype=np.int64)
+    counts[0, [0, 4, 5, 11]] = 1
+    counts[1, 7] = 2
+    labels, completed, stopped = sessions.get_length_bins(counts)
+    assert labels == ["0-4", "5-9", "10-14"]
+    assert completed.tolist() == [2, 1, 1] and stopped.tolist() == [0, 2, 0]
+    assert sessions.get_length_bins(counts, 12)[0] == ["0-11"]
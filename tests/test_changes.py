@@ -0,0 +1,19 @@
+def test_changes_committed_out_of_order_are_not_missed(db, section):
+    version = db.Changes.get_version()
+    # Another connection adds a task first (lower version) and commits after this connection
+    other = db.connect()
+    try:
+        other.execute(f"INSERT INTO {db.Todolist.TABLE_MAIN_TASKS.value} ({db.Todolist.MAIN_TASK_NAME.value}, {db.Todolist.SECTION_ID.value}, \
+                      {db.Todolist.STATUS.value}, {db.Todolist.START_TIME.value}) VALUES ('other', {section}, 'pending', NOW())")
+        other_section = db.SectionTools.add_section_name(f"other {section}")
+        last, section_ids, _, _ = db.Changes.get_changes(version)
+        assert other_section in section_ids and section not in section_ids
+        assert last == version # The changes after the one not committed yet are read again
+        assert other_section in db.Changes.get_changes(last)[1]
+        other.commit()
+    finally:
+        other.close()
+    _, section_ids, _, _ = db.Changes.get_changes(last)
+    assert section in section_ids
+    assert db.Changes.get_changes(db.Changes.get_version())[1] == set()
+    db.SectionTools.delete_section_with_tasks(other_section)
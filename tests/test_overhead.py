@@ -0,0 +1,31 @@
+import src.overhead as oh
+
+def test_sort_key_between_the_keys():
+    assert oh.get_sort_key() == "1"
+    for before, after in ((None, "1"), ("1", None), ("1", "2"), ("1", "11"), ("z", None), ("zz", "zz1"), ("A", "a")):
+        key = oh.get_sort_key(before, after)
+        assert (before or "") < key and (after is None or key < after)
+        assert not key.endswith("0")
+
+def test_sort_key_after_the_key_before_if_the_keys_are_not_in_order():
+    assert oh.get_sort_key("5", "3") == oh.get_sort_key("5")
+
+def test_sort_keys_in_order_between_the_keys():
+    for before, after in ((None, None), ("1", None), ("1", "2"), ("a", "b1")):
+        keys = oh.get_sort_keys(before, after, 100)
+        assert len(keys) == 100 and keys == sorted(set(keys))
+        assert (before or "") < keys[0] and (after is None or keys[-1] < after)
+    assert oh.get_sort_keys("1", "2", 0) == []
+
+def test_sort_keys_stay_short():
+    assert max(len(key) for key in oh.get_sort_keys(None, None, 1000)) <= 3
+
+def test_sort_keys_of_tasks_moved_to_the_top():
+    keys = [oh.get_sort_key()]
+    for _ in range(100):
+        keys.insert(0, oh.get_sort_key(None, keys[0]))
+    assert keys == sorted(set(keys))
+
+def test_escape_like():
+    assert oh.escape_like("100%_done\\") == "100\\%\\_done\\\\"
+    assert oh.escape_like("plain") == "plain"
@@ -0,0 +1,15 @@
+import datetime
+import pytest
+
+@pytest.fixture(scope="module")
+def smart(db):
+    import src.todolist_smart as smart
+    return smart
+
+def test_tasks_ordered_by_start_time_type_and_id(smart):
+    # (task type, task id, start time, task, main task, section id, section) as SmartListTools.get_tasks
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    later = start + datetime.timedelta(minutes=1)
+    tasks = [("sub", 1, start, "b", "a", 1, "s"), ("main", 2, later, "c", None, 1, "s"), ("main", 3, start, "a", None, 1, "s"), 
+             ("main", 1, start, "d", None, 1, "s")]
+    assert [task[:2] for task in sorted(tasks, key=smart.get_task_key)] == [("main", 1), ("main", 3), ("sub", 1), ("main", 2)]
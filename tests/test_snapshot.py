@@ -0,0 +1,23 @@
+import src.snapshot as snapshot
+
+SECTIONS = [(1, "work", 2, [(10, "report", "1", [11, 12], ["draft", "send ✓"], ["1", "2"]), (13, "call", "", [], [], [])]),
+            (2, "home", 5, None)]
+
+def test_snapshot_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "aggregates", {"focus": 1500, "tasks": None})
+    path = str(tmp_path / "tododoro.snapshot")
+    snapshot.save(path, 42, "tododoro", SECTIONS)
+    saved = snapshot.load(path)
+    assert (saved["version"], saved["dbname"], saved["sections"]) == (42, "tododoro", SECTIONS)
+    assert saved["aggregates"] == {"focus": 1500}
+
+def test_snapshot_not_used_if_it_cannot_be_read(tmp_path):
+    path = str(tmp_path / "tododoro.snapshot")
+    assert snapshot.load(path) is None
+    snapshot.save(path, 1, "tododoro", SECTIONS)
+    with open(path, "r+b") as f:
+        f.truncate(40)
+    assert snapshot.load(path) is None
+    with open(path, "wb") as f:
+        f.write(b"not a snapshot")
+    assert snapshot.load(path) is None
@@ -0,0 +1,49 @@
+import pytest
+
+def connection_usable(db) -> bool:
+    return db.cur.execute("SELECT 1").fetchone() == (1,)
+
+@pytest.fixture
+def other_section(db, section):
+    section_id = db.SectionTools.add_section_name(f"other {section}")
+    yield section_id
+    db.conn.rollback()
+    db.SectionTools.delete_section_with_tasks(section_id)
+
+def test_duplicate_sub_tasks_leave_the_connection_usable(db, section):
+    main_task_id = db.MainTaskTools.add_main_task_to_section("main", section)
+    db.SubTaskTools.add_sub_tasks_to_main_task(["sub"], main_task_id, section)
+    with pytest.raises(Exception):
+        db.SubTaskTools.add_sub_tasks_to_main_task(["sub"], main_task_id, section)
+    assert connection_usable(db)
+    assert [name for _, name in db.SubTaskTools.get_sub_tasks(main_task_id)] == ["sub"]
+
+def test_moving_main_task_to_a_section_with_the_name_leaves_the_connection_usable(db, section, other_section):
+    main_task_id = db.MainTaskTools.add_main_task_to_section("main", section)
+    db.MainTaskTools.add_main_task_to_section("main", other_section)
+    with pytest.raises(Exception):
+        db.MainTaskTools.move_main_task(main_task_id, "a", other_section)
+    assert connection_usable(db)
+    assert db.MainTaskTools.get_main_task_id("main", section) == main_task_id
+
+def test_moving_sub_task_under_a_main_task_with_the_name_leaves_the_connection_usable(db, section):
+    first = db.MainTaskTools.add_main_task_to_section("first", section)
+    second = db.MainTaskTools.add_main_task_to_section("second", section)
+    sub_task_id, = db.SubTaskTools.add_sub_tasks_to_main_task(["sub"], first, section)
+    db.SubTaskTools.add_sub_tasks_to_main_task(["sub"], second, section)
+    with pytest.raises(Exception):
+        db.SubTaskTools.move_sub_task(sub_task_id, second, section, "a")
+    assert connection_usable(db)
+    assert db.SubTaskTools.get_sub_tasks(first) == [(sub_task_id, "sub")]
+
+def test_failed_function_in_a_transaction_rolls_back_all_of_it(db, section):
+    # The statements before the failed one are not discarded on their own while the transaction goes on with the next ones
+    with pytest.raises(Exception):
+        with db.transaction():
+            db.MainTaskTools.add_main_task_to_section("first", section)
+            with pytest.raises(Exception):
+                db.MainTaskTools.add_main_task_to_section("first", section)
+            db.MainTaskTools.add_main_task_to_section("second", section)
+    assert connection_usable(db)
+    assert db.MainTaskTools.get_main_task_id("first", section) is None
+    assert db.MainTaskTools.get_main_task_id("second", section) is None
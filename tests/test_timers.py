@@ -0,0 +1,31 @@
+import datetime
+import pytest
+
+def get_timer(db, start):
+    return db.cur.execute(f"SELECT {db.pmdr_main_task_id}, {db.pmdr_sub_task_id} FROM {db.table_name} WHERE start_time = %s", (start,)).fetchone()
+
+@pytest.fixture
+def start(db):
+    start = datetime.datetime(2001, 1, 1, 9, tzinfo=datetime.timezone.utc)
+    yield start
+    db.Completed.delete_pomodoro_row(start)
+
+def test_timer_saved_with_the_task(db, section, start):
+    main_task_id = db.MainTaskTools.add_main_task_to_section("focus", section)
+    sub_task_id, = db.SubTaskTools.add_sub_tasks_to_main_task(["sub"], main_task_id, section)
+    db.add_timer_row(start, start + datetime.timedelta(minutes=25), 1500, "focus", main_task_id, sub_task_id, planned=1500)
+    assert get_timer(db, start) == (main_task_id, sub_task_id)
+
+def test_timer_of_a_deleted_task_is_saved_without_it(db, section, start):
+    # The task can be deleted while the timer runs, the timer is still saved 
+    main_task_id = db.MainTaskTools.add_main_task_to_section("deleted", section)
+    sub_task_id, = db.SubTaskTools.add_sub_tasks_to_main_task(["sub"], main_task_id, section)
+    db.MainTaskTools.delete_main_task_by_id(main_task_id)
+    db.add_timer_row(start, start + datetime.timedelta(minutes=25), 1500, "focus", main_task_id, sub_task_id, planned=1500)
+    assert get_timer(db, start) == (None, None)
+    assert not db.MainTaskTools.has_task(main_task_id, sub_task_id)
+
+def test_failed_timer_leaves_the_connection_usable(db, start):
+    with pytest.raises(Exception):
+        db.add_timer_row(start, start, 0, "not a category")
+    assert db.cur.execute("SELECT 1").fetchone() == (1,)
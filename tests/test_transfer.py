@@ -0,0 +1,53 @@
+import datetime
+import pytest
+
+@pytest.fixture
+def history(db, section):
+    '''Section with a completed main task, a main task with a completed and a pending sub task, and a pending main task'''
+    main_task_id = db.MainTaskTools.add_main_task_to_section("done", section)
+    db.MainTaskTools.complete_main_task_by_id(main_task_id)
+    main_task_id = db.MainTaskTools.add_main_task_to_section("open", section)
+    sub_task_ids = db.SubTaskTools.add_sub_tasks_to_main_task(["first", "second"], main_task_id, section)
+    db.SubTaskTools.complete_sub_task_by_id(sub_task_ids[0])
+    db.MainTaskTools.add_main_task_to_section("last", section)
+    return section
+
+def count_rows(db) -> dict:
+    return {table: db.Transfer.count_rows(table) for table in db.TRANSFER_TABLES}
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_importing_the_export_again_adds_nothing(db, history, tmp_path, fmt):
+    import src.transfer as transfer
+    transfer.export_history(str(tmp_path), fmt)
+    before, completed = count_rows(db), db.AnalyseTodolist.get_num_all_completed_tasks()
+    added = transfer.import_history(str(tmp_path), fmt)
+    assert set(added.values()) == {0}
+    assert count_rows(db) == before
+    assert db.AnalyseTodolist.get_num_all_completed_tasks() == completed
+
+def test_imported_tasks_are_added_after_the_existing_tasks(db, history):
+    # The imported sort keys are the same as the keys of the existing tasks, they are given new keys after them 
+    name = db.cur.execute("SELECT section_name FROM todolist_section WHERE section_id = %s", (history,)).fetchone()[0]
+    keys = [sort_key for _, _, sort_key, _, _, _ in db.MainTaskTools.get_section_tasks(history)]
+    start = datetime.datetime(2001, 1, 1, tzinfo=datetime.timezone.utc)
+    tables = {db.Todolist.TABLE_SECTION.value: (["section_id", "section_name"], iter([(1, name)]), False),
+              db.Todolist.TABLE_MAIN_TASKS.value: (["main_task_id", "main_task_name", "section_id", "status", "start_time", "sort_key"],
+                                                   iter([(1, "new first", 1, "pending", start, keys[0]), (2, "new second", 1, "pending", start, keys[1])]), False)}
+    assert db.Transfer.copy_in(tables)[db.Todolist.TABLE_MAIN_TASKS.value] == 2
+    tasks = db.MainTaskTools.get_section_tasks(history)
+    assert [name for _, name, _, _, _, _ in tasks] == ["open", "last", "new first", "new second"]
+    assert len({sort_key for _, _, sort_key, _, _, _ in tasks}) == len(tasks)
+
+def test_deleted_section_restored_from_the_jsonl_export(db, history, tmp_path):
+    import src.transfer as transfer
+    name = db.cur.execute("SELECT section_name FROM todolist_section WHERE section_id = %s", (history,)).fetchone()[0]
+    tasks = [(name, sub_tasks) for _, name, _, _, sub_tasks, _ in db.MainTaskTools.get_section_tasks(history)]
+    transfer.export_history(str(tmp_path), "jsonl")
+    db.SectionTools.delete_section_with_tasks(history)
+    transfer.import_history(str(tmp_path), "jsonl")
+    section_id = db.SectionTools.get_section_id(name)
+    try:
+        assert [(name, sub_tasks) for _, name, _, _, sub_tasks, _ in db.MainTaskTools.get_section_tasks(section_id)] == tasks
+        assert tasks == [("open", ["second"]), ("last", [])]
+    finally:
+        db.SectionTools.delete_section_with_tasks(section_id)
@@ -1,8 +1,15 @@
-from PySide6.QtCore import Qt, Slot
-from PySide6.QtWidgets import QApplication, QLabel, QMainWindow, QGridLayout, QLineEdit, QMessageBox, QDialog, QDialogButtonBox, QVBoxLayout, QTabWidget, QCheckBox
+import sys, os, collections 
+
+# Running with a subcommand (e.g. export/import/report) does not start the GUI, Qt is not imported so the subcommands start quickly 
+if __name__ == "__main__" and len(sys.argv) > 1:
+    import src.cli as cli
+    sys.exit(cli.main(sys.argv[1:]))
+
+from PySide6.QtCore import Qt, Slot, QObject, QTimer
+from PySide6.QtWidgets import QApplication, QLabel, QMainWindow, QGridLayout, QLineEdit, QMessageBox, QDialog, QDialogButtonBox, QVBoxLayout, QTabWidget, QCheckBox, \
+QFileDialog, QInputDialog, QProgressDialog, QTableWidget, QTableWidgetItem, QPushButton, QHBoxLayout, QHeaderView
 from PySide6.QtGui import QAction
 import src.overhead as oh 
-import sys 
 
 app = QApplication([]) # Start the QApplication here so the error message can be shown 
 
@@ -21,6 +28,12 @@ try:
     import src.pomodoro as pmdr
     import src.analyse as analyse
     import src.todolist_main as todolist
+    import src.todolist_smart as smart
+    import src.transfer as transfer
+    import src.api as api
+    import src.snapshot as snapshot
+    from src.metrics import metrics
+    from src.memory import memory
 except Exception as e:
     error_msg = oh.ErrorBox(f"Failed to import modules: {str(e)}")
     error_msg.exec()
@@ -146,19 +159,175 @@ class SettingsDialog(QDialog):
         # End the dialog if ok
         QDialog.accept(self)
 
+# Progress dialog shown when exporting or importing the history 
+class TransferProgress(QProgressDialog):
+    def __init__(self, title: str, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setCancelButton(None) # The transfer runs in a single transaction and cannot be cancelled halfway 
+        self.setMinimumDuration(0)
+        self.setWindowModality(Qt.WindowModality.WindowModal)
+
+    def update(self, table: str, done: int, total: int):
+        # Called by the transfer functions with the progress of each table 
+        self.setLabelText(f"{self.windowTitle()}: {table}")
+        self.setMaximum(max(total, 1))
+        self.setValue(min(done, max(total, 1)))
+        QApplication.processEvents()
+
+def get_memory_interval() -> float:
+    '''Return the minutes between the memory samples from the TODODORO_MEMORY environment variable or the config, 0 if the memory diagnostics are off'''
+    try:
+        return max(float(os.environ.get("TODODORO_MEMORY") or oh.read_config().get("diagnostics", {}).get("memory_interval", 0)), 0)
+    except ValueError:
+        logger.warning("Memory interval is not a number, the memory diagnostics are off")
+        return 0
+
+def get_qt_counts(root: QObject) -> dict:
+    '''Return the number of QObject children of root by class, with the total and the number of widgets of the application
+    (a widget without a parent, e.g. a dialog that was not deleted, is not a child of root)'''
+    # The children are walked with children() as the objects returned by findChildren are kept by root, which would grow with every sample
+    counts, parents = collections.Counter(), [root]
+    while parents:
+        for child in parents.pop().children():
+            counts[child.metaObject().className()] += 1
+            parents.append(child)
+    counts["all children"] = sum(counts.values())
+    counts["all widgets"] = len(QApplication.allWidgets())
+    return dict(counts)
+
+# Samples the memory of the program every interval while it is open, the growing series are logged as warnings (see src/memory.py)
+class MemorySampler(QObject):
+    def __init__(self, window: QObject):
+        super().__init__(window)
+        self.window = window
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.sample)
+
+    def start(self, minutes: float):
+        memory.start() # Allocations are traced from now, the first sample is taken after the first interval
+        self.timer.start(int(minutes * 60 * 1000))
+        logger.info(f"Memory diagnostics started, sampled every {minutes} minutes")
+
+    def stop(self):
+        self.timer.stop()
+        memory.stop()
+
+    @Slot()
+    def sample(self):
+        values = memory.sample(get_qt_counts(self.window))["values"]
+        logger.info(f"Memory: {values.get("rss_mb", 0):.1f} MB resident, {values.get("traced_mb", 0):.1f} MB traced, {values["objects"]} objects, "
+                    f"{values["qt:all children"]} Qt objects, {values["qt:all widgets"]} widgets")
+        for trend in memory.get_trends():
+            logger.warning(f"Memory: {trend["series"]} grew in every one of the last {trend["samples"]} samples, from {trend["first"]:g} to {trend["last"]:g}")
+
+# Diagnostics dialog showing the latency of the database statements recorded since the program started (or since reset), and the memory samples
+class DiagnosticsDialog(QDialog):
+    columns = (("Statement", "statement"), ("Count", "count"), ("Total (ms)", "total_ms"), ("p50 (ms)", "p50_ms"), 
+               ("p95 (ms)", "p95_ms"), ("p99 (ms)", "p99_ms"), ("Max (ms)", "max_ms"), ("Avg rows", "avg_rows"))
+    memory_columns = ("Series", "First", "Last", "Growth", "Growing")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Diagnostics")
+        self.resize(900, 500)
+        self.layout = QVBoxLayout(self)
+
+        # Table of the statements sorted by the total time, the columns can be sorted by clicking the header 
+        self.table = QTableWidget(0, len(self.columns))
+        self.table.setHorizontalHeaderLabels([c for c, _ in self.columns])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSortIndicator(2, Qt.SortOrder.DescendingOrder)
+
+        # Table of the first and last value of each series of the memory samples, the series growing in every sample of the window first
+        self.memory_table = QTableWidget(0, len(self.memory_columns))
+        self.memory_table.setHorizontalHeaderLabels(self.memory_columns)
+        self.memory_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.memory_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.memory_table.horizontalHeader().setSortIndicator(4, Qt.SortOrder.DescendingOrder)
+        self.tabs = QTabWidget()
+        self.tabs.addTab(self.table, "Statements")
+        self.tabs.addTab(self.memory_table, "Memory")
+        self.tabs.setTabToolTip(1, "Set the minutes between the samples in diagnostics.memory_interval of config.json (0 is off)")
+        self.layout.addWidget(self.tabs)
+
+        buttons = QHBoxLayout()
+        for text, slot in (("Refresh", self.update_table), ("Reset", self.reset_clicked), ("Save JSON...", self.save_clicked), ("Close", self.accept)):
+            button = QPushButton(text)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        self.layout.addLayout(buttons)
+        self.update_table()
+
+    @Slot()
+    def update_table(self):
+        summary = metrics.get_summary()
+        self.table.setSortingEnabled(False) # Sorting is disabled while the items are added so the rows do not move 
+        self.table.setRowCount(len(summary))
+        for row, statement in enumerate(summary):
+            for col, (_, key) in enumerate(self.columns):
+                item = QTableWidgetItem()
+                item.setData(Qt.ItemDataRole.DisplayRole, statement[key])
+                self.table.setItem(row, col, item)
+        self.table.setSortingEnabled(True)
+
+        summary = memory.get_summary()
+        growing = {trend["series"] for trend in summary["growing"]}
+        series = sorted(summary["series"].items(), key=lambda s: (s[0] not in growing, s[0]))
+        self.tabs.setTabText(1, f"Memory ({summary["samples"]} samples)")
+        self.memory_table.setSortingEnabled(False)
+        self.memory_table.setRowCount(len(series))
+        for row, (name, values) in enumerate(series):
+            growth = values["last"] - values["first"] if values["first"] is not None else None
+            for col, value in enumerate((name, values["first"], values["last"], growth, "Yes" if name in growing else "")):
+                item = QTableWidgetItem()
+                item.setData(Qt.ItemDataRole.DisplayRole, round(value, 2) if isinstance(value, float) else value)
+                self.memory_table.setItem(row, col, item)
+        self.memory_table.setSortingEnabled(True)
+
+    @Slot()
+    def reset_clicked(self):
+        metrics.reset()
+        memory.reset()
+        self.update_table()
+
+    @Slot()
+    def save_clicked(self):
+        # Saves the table shown, the statements or the memory samples
+        statements = self.tabs.currentIndex() == 0
+        name = "tododoro_metrics.json" if statements else "tododoro_memory.json"
+        path, _ = QFileDialog.getSaveFileName(self, "Save diagnostics", name, "JSON (*.json)")
+        if not path:
+            return
+        try:
+            if statements:
+                metrics.dump(path)
+            else:
+                memory.dump(path)
+            logger.info(f"Saved diagnostics to {path}")
+        except Exception as e:
+            logger.error(f"Saving diagnostics failed: {e}")
+            error_msg = oh.ErrorBox(str(e))
+            error_msg.exec()
+
 class MainTabWidget(QTabWidget):
     def __init__(self):
         super().__init__()
         self.pomo = pmdr.Pomodoro() 
-        self.tdl = todolist.TodolistwFocus()
+        self.tdl = todolist.TodolistwFocus(snapshot.get_snapshot_path())
         self.analyse = analyse.AnalyseTab()
+        self.smart = smart.SmartLists()
         self.addTab(self.pomo, "Pomodoro")
         self.addTab(self.tdl, "To do list")
         self.addTab(self.analyse, "Analyse")
+        self.addTab(self.smart, "Smart lists")
 
         # Connecting the signals from the todolist focus section to the pomodoro focus qlabel 
         self.tdl.todolist.update_focus_task_section.connect(self.pomo.update_focus_task)
+        self.pomo.pomo_added.connect(self.tdl.todolist.update_focus_time) # Show the focus time added to the focus task 
         self.tdl.focus_section.clear_task.released.connect(self.pomo.clear_focus_task)
+        self.tdl.todolist.focus_task_deleted.connect(self.pomo.focus_task_deleted)
 
         # Add signal to update pomodoro history table when new timer row is added and to update pomodoro section
         self.pomo.pomo_added.connect(self.analyse.completed_widget.completed_pomo.completed_pomo.update_items)
@@ -171,11 +340,30 @@ class MainTabWidget(QTabWidget):
         self.analyse.completed_widget.completed_tasks.completed_tasks.update_items_signal.connect(self.analyse.analyse_todolist.graph.update_plot)
         self.analyse.completed_widget.completed_tasks.completed_tasks.update_items_signal.connect(self.analyse.analyse_todolist.completed_tasks.update_num_task)
 
+        # Update the smart list shown with the tasks of the sections changed by the to do list 
+        self.tdl.todolist.history.flushed.connect(self.smart.refresh)
+        self.tdl.todolist.reconciled.connect(self.smart.refresh)
+
+        # Update the numbers shown from the snapshot once the to do list has loaded the changes since the snapshot 
+        self.tdl.todolist.reconciled.connect(self.analyse.analyse_todolist.completed_tasks.update_num_task)
+        self.tdl.todolist.reconciled.connect(self.analyse.analyse_pomo.completed_timers.update_num_timers)
+
         self.pomo.pomo_added.connect(self.analyse.analyse_pomo.graph.update_plot)
         self.pomo.pomo_added.connect(self.analyse.analyse_pomo.completed_timers.update_num_timers)
         self.analyse.completed_widget.completed_pomo.completed_pomo.update_pomo_items.connect(self.analyse.analyse_pomo.graph.update_plot)
         self.analyse.completed_widget.completed_pomo.completed_pomo.update_pomo_items.connect(self.analyse.analyse_pomo.completed_timers.update_num_timers)
 
+        # The calendar heatmap shows both the focus time and the completed tasks 
+        self.pomo.pomo_added.connect(self.analyse.analyse_pomo.heatmap.update_heatmap)
+        self.analyse.completed_widget.completed_pomo.completed_pomo.update_pomo_items.connect(self.analyse.analyse_pomo.heatmap.update_heatmap)
+        self.tdl.todolist.update_completed_task.connect(self.analyse.analyse_pomo.heatmap.update_heatmap)
+        self.analyse.completed_widget.completed_tasks.completed_tasks.update_items_signal.connect(self.analyse.analyse_pomo.heatmap.update_heatmap)
+
+        # The statistics of the focus sessions are updated when timers are added or deleted
+        self.pomo.pomo_added.connect(self.analyse.analyse_sessions.update_sessions)
+        self.analyse.completed_widget.completed_pomo.completed_pomo.update_pomo_items.connect(self.analyse.analyse_sessions.update_sessions)
+        self.tdl.todolist.reconciled.connect(self.analyse.analyse_sessions.update_sessions)
+
 class Tododoro_Win(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -203,8 +391,60 @@ class Tododoro_Win(QMainWindow):
         settings.triggered.connect(self.settings_clicked)
         file_menu.addAction(settings) 
 
+        # Adding the export and import of the history to the menu bar 
+        export_history = QAction("Export history...", self)
+        export_history.triggered.connect(self.export_clicked)
+        file_menu.addAction(export_history)
+        import_history = QAction("Import history...", self)
+        import_history.triggered.connect(self.import_clicked)
+        file_menu.addAction(import_history)
+
+        # Adding the diagnostics dialog to the menu bar 
+        diagnostics = QAction("Diagnostics", self)
+        diagnostics.triggered.connect(self.diagnostics_clicked)
+        file_menu.addAction(diagnostics)
+
+        # Adding the undo and redo of the to do list to the menu bar 
+        edit_menu = menu.addMenu("Edit")
+        edit_menu.addAction(self.maintab.tdl.todolist.undo_action)
+        edit_menu.addAction(self.maintab.tdl.todolist.redo_action)
+
         # self.setStatusBar(QStatusBar(self))
 
+        # Start the local api server if it is enabled in the config 
+        self.api_server = None
+        api_config = oh.read_config().get("api", {})
+        if api_config.get("enabled", False):
+            self.start_api_server(api_config.get("port", 8765))
+
+        # Sample the memory while the program is open if it is enabled in the config (diagnostics.memory_interval in minutes)
+        self.memory_sampler = None
+        memory_interval = get_memory_interval()
+        if memory_interval > 0:
+            self.memory_sampler = MemorySampler(self)
+            self.memory_sampler.start(memory_interval)
+
+    def start_api_server(self, port: int):
+        # Error is shown if the server failed to start but the program continues without the api
+        try:
+            self.api_server = api.ApiServer(self.maintab.pomo, port)
+            self.api_server.start()
+        except Exception as e:
+            self.api_server = None
+            logger.error(f"Starting api server failed: {e}")
+            error_msg = oh.ErrorBox(f"Failed to start api server on port {port}: {str(e)}")
+            error_msg.exec()
+            return
+
+        # Update the to do list and the completed tables when they are changed from the api 
+        self.api_server.tasks_changed.connect(self.maintab.tdl.todolist.load_changes)
+        self.api_server.completed_tasks_changed.connect(self.maintab.analyse.completed_widget.completed_tasks.completed_tasks.update_items)
+
+    def stop_api_server(self):
+        if self.api_server:
+            self.api_server.stop()
+            self.api_server = None
+
     @Slot()
     def change_window(self, idx):
         self.resize(self.maintab.widget(idx).w, self.maintab.widget(idx).h)
@@ -223,6 +463,62 @@ class Tododoro_Win(QMainWindow):
         else:
             logger.debug("Settings change cancelled by user")
 
+    @Slot()
+    def diagnostics_clicked(self):
+        logger.debug("Diagnostics opened by user")
+        DiagnosticsDialog(self).exec()
+
+    @Slot()
+    def export_clicked(self):
+        directory = QFileDialog.getExistingDirectory(self, "Export history to directory")
+        if not directory:
+            return
+        fmt, ok = QInputDialog.getItem(self, "Export history", "File format:", transfer.FORMATS, 0, False)
+        if not ok:
+            return
+
+        logger.debug(f"Exporting history to {directory} as {fmt}")
+        self.maintab.tdl.todolist.history.flush() # Save the latest changes of the to do list before exporting 
+        progress = TransferProgress("Exporting", self)
+        try:
+            exported = transfer.export_history(directory, fmt, progress.update)
+        except Exception as e:
+            progress.close()
+            logger.error(f"Exporting history failed: {e}")
+            error_msg = oh.ErrorBox(str(e))
+            error_msg.exec()
+            return
+        progress.close()
+        QMessageBox.information(self, "Export history", "\n".join(f"Exported {num} rows from {table}" for table, num in exported.items()))
+
+    @Slot()
+    def import_clicked(self):
+        directory = QFileDialog.getExistingDirectory(self, "Import history from directory")
+        if not directory:
+            return
+        fmt, ok = QInputDialog.getItem(self, "Import history", "File format:", transfer.FORMATS, 0, False)
+        if not ok:
+            return
+
+        logger.debug(f"Importing history from {directory} as {fmt}")
+        self.maintab.tdl.todolist.history.flush()
+        progress = TransferProgress("Importing", self)
+        try:
+            added = transfer.import_history(directory, fmt, progress.update)
+        except Exception as e:
+            progress.close()
+            logger.error(f"Importing history failed: {e}")
+            error_msg = oh.ErrorBox(str(e))
+            error_msg.exec()
+            return
+        progress.close()
+
+        # Reload the to do list and the completed tables (which also updates the plots) with the imported rows 
+        self.maintab.tdl.todolist.reload_sections()
+        self.maintab.analyse.completed_widget.completed_pomo.completed_pomo.update_items()
+        self.maintab.analyse.completed_widget.completed_tasks.completed_tasks.update_items()
+        QMessageBox.information(self, "Import history", "\n".join(f"Imported {num} rows into {table}" for table, num in added.items()))
+
     @Slot()
     def center(self):
         if oh.read_config()["interface"]["center_window"]: # if the center window on tab change is enabled, proceed to center the window 
@@ -237,5 +533,8 @@ if __name__ == "__main__":
     item.show()
 
     app.exec()
+    item.maintab.tdl.todolist.history.flush() # Save the changes of the to do list that are not committed yet 
+    item.maintab.tdl.todolist.save_snapshot()
+    item.stop_api_server()
     db.end_connection()
     sys.exit(0)
\ No newline at end of file